@@ -13,8 +13,21 @@ from hactl import __version__
 @click.version_option(version=__version__)
 @click.option('--verbose', '-v', is_flag=True, help='Verbose output')
 @click.option('--quiet', '-q', is_flag=True, help='Suppress non-error output')
+@click.option('--timeout', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Seconds allowed per network operation '
+                   '(default: $HACTL_TIMEOUT or 30)')
+@click.option('--deadline', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Total seconds allowed for the whole command; network calls '
+                   'fail once it is spent (default: $HACTL_DEADLINE or none)')
+@click.option('--cache-ttl', type=click.FloatRange(min=0, min_open=True), default=None,
+              metavar='SECONDS',
+              help='Serve reads (states, registries) from ~/.hactl/cache for up '
+                   'to SECONDS (default: $HACTL_CACHE_TTL or no cache)')
+@click.option('--no-cache', is_flag=True, help='Bypass the on-disk response cache')
+@click.option('--no-agent', is_flag=True,
+              help='Do not read from a running `hactl agent` (default: $HACTL_AGENT=0)')
 @click.pass_context
-def cli(ctx, verbose, quiet):
+def cli(ctx, verbose, quiet, timeout, deadline, cache_ttl, no_cache, no_agent):
     """hactl - Home Assistant Control CLI
 
     A kubectl-style interface for managing Home Assistant via API.
@@ -40,6 +53,30 @@ def cli(ctx, verbose, quiet):
         # Kubernetes operations
         hactl k8s update-config battery-summary.yaml
 
+    \b
+        # Cron-safe health check: give up after 60s in total
+        hactl --deadline 60 doctor
+
+    \b
+        # Scripted reads: reuse responses for 60s across invocations
+        hactl --cache-ttl 60 get states
+
+    \b
+        # Follow live state changes
+        hactl watch states --domain sensor --entity 'sensor.*battery*'
+
+    \b
+        # Find the chattiest integrations and entities
+        hactl top
+
+    \b
+        # Keep a live mirror for fast repeated reads
+        hactl agent start
+
+    \b
+        # Keep weeks of entity history locally, fetching only what is new
+        hactl history sync --entity sensor.outdoor_temp --since 30d
+
     \b
         # AI Context Management
         hactl memory sync
@@ -49,9 +86,46 @@ def cli(ctx, verbose, quiet):
     ctx.obj['verbose'] = verbose
     ctx.obj['quiet'] = quiet
 
+    # Bound every REST/WebSocket operation so a wedged HA cannot hang a
+    # cron job forever.
+    from hactl.core import deadline as budget
+    budget.reset()
+    budget.configure(timeout=timeout, deadline=deadline)
+
+    # Opt-in on-disk cache shared by consecutive invocations
+    from hactl.core import configure_cache
+    cache = configure_cache(ttl=cache_ttl, enabled=not no_cache)
+
+    # Prefer a running agent's live mirror over fresh downloads
+    from hactl.core import agent
+    agent.reset(enabled=False if no_agent else None)
+
+    # One keep-alive HTTP session and one HassContext (shared WebSocket +
+    # memoized states/registries) serve every handler in this command;
+    # release both when the command finishes.
+    from hactl.core import HassContext, close_session, get_session
+    hass = ctx.obj['hass'] = HassContext()
+
+    def _finish():
+        if verbose:
+            click.echo(f"[hactl] {get_session().transfer_summary()}", err=True)
+            for line in budget.latency_summary().splitlines():
+                click.echo(f"[hactl] slowest: {line}", err=True)
+            if cache.enabled:
+                click.echo(f"[hactl] {cache.summary()}", err=True)
+        # Let stale entries served this run finish revalidating, within budget
+        try:
+            cache.wait(timeout=budget.op_timeout())
+        except budget.DeadlineExceeded:
+            pass
+        hass.close()
+        close_session()
+
+    ctx.call_on_close(_finish)
+
 
 # Register command groups
-from hactl.commands import get_group, update_group, delete_group, label_group, battery_group, k8s_group, memory_group, doctor_command, generate_group, pull_group
+from hactl.commands import get_group, update_group, delete_group, label_group, battery_group, k8s_group, memory_group, doctor_command, generate_group, pull_group, agent_group, watch_group, top_command, history_group
 
 cli.add_command(get_group)
 cli.add_command(update_group)
@@ -63,6 +137,10 @@ cli.add_command(memory_group)
 cli.add_command(doctor_command)
 cli.add_command(generate_group)
 cli.add_command(pull_group)
+cli.add_command(agent_group)
+cli.add_command(watch_group)
+cli.add_command(top_command)
+cli.add_command(history_group)
 
 
 if __name__ == '__main__':
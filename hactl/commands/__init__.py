@@ -12,5 +12,9 @@ from .memory import memory_group
 from .doctor import doctor_command
 from .generate import generate_group
 from .pull import pull_group
+from .agent import agent_group
+from .watch import watch_group
+from .top import top_command
+from .history import history_group
 
-__all__ = ['get_group', 'update_group', 'delete_group', 'label_group', 'battery_group', 'k8s_group', 'memory_group', 'doctor_command', 'generate_group', 'pull_group']
+__all__ = ['get_group', 'update_group', 'delete_group', 'label_group', 'battery_group', 'k8s_group', 'memory_group', 'doctor_command', 'generate_group', 'pull_group', 'agent_group', 'watch_group', 'top_command', 'history_group']
@@ -0,0 +1,130 @@
+"""
+AGENT command group for hactl
+"""
+
+import subprocess
+import sys
+import time
+
+import click
+
+# How long `agent start` waits for the new agent's first sync
+START_TIMEOUT = 30.0
+
+
+@click.group('agent')
+def agent_group():
+    """Background agent serving a live Home Assistant mirror
+
+    While the agent runs, `get states`, `doctor` and the registry-based
+    commands read states and registries from its in-memory mirror over
+    ~/.hactl/agent.sock instead of downloading them again.
+    """
+    pass
+
+
+@agent_group.command('start')
+@click.option('--foreground', is_flag=True, help='Run in this process instead of detaching')
+def agent_start(foreground):
+    """Start the agent
+
+    Examples:
+
+    \b
+        hactl agent start
+        hactl agent start --foreground
+    """
+    from hactl.core import agent, deadline, load_config
+
+    HASS_URL, HASS_TOKEN = load_config()
+    try:
+        status = agent.request('status')
+        raise click.ClickException(f"Agent is already running (pid {status['pid']})")
+    except agent.AgentUnavailable:
+        pass
+
+    if foreground:
+        import asyncio
+        # The agent outlives any --deadline given to this command
+        deadline.reset()
+        click.echo(f"[hactl agent] serving {HASS_URL} on {agent.socket_path()}", err=True)
+        asyncio.run(agent.AgentServer(HASS_URL, HASS_TOKEN).run())
+        return
+
+    agent.AGENT_DIR.mkdir(parents=True, exist_ok=True, mode=0o700)
+    with open(agent.LOG_FILE, 'ab') as log:
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'hactl.cli', 'agent', 'start', '--foreground'],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True, close_fds=True)
+
+    end = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < end:
+        if proc.poll() is not None:
+            raise click.ClickException(
+                f"Agent exited during startup (code {proc.returncode}); see {agent.LOG_FILE}")
+        try:
+            status = agent.request('status')
+            if status.get('live'):
+                click.echo(f"Agent started (pid {status['pid']}), "
+                           f"mirroring {status['entities']} entities")
+                return
+        except agent.AgentUnavailable:
+            pass
+        time.sleep(0.2)
+    click.echo(f"Agent started (pid {proc.pid}) but has not synced yet; see {agent.LOG_FILE}")
+
+
+@agent_group.command('stop')
+def agent_stop():
+    """Stop the agent
+
+    Examples:
+
+    \b
+        hactl agent stop
+    """
+    from hactl.core import agent
+
+    try:
+        agent.request('stop')
+    except agent.AgentUnavailable:
+        raise click.ClickException('Agent is not running')
+    end = time.monotonic() + 5
+    while agent.socket_path().exists() and time.monotonic() < end:
+        time.sleep(0.05)
+    click.echo('Agent stopped')
+
+
+@agent_group.command('status')
+@click.option('--format', '-f', type=click.Choice(['table', 'json']), default='table',
+              help='Output format')
+def agent_status(format):
+    """Show whether the agent is running and what it mirrors
+
+    Exits with status 1 when no agent is running.
+
+    Examples:
+
+    \b
+        hactl agent status
+        hactl agent status --format json
+    """
+    import json
+    from hactl.core import agent
+
+    try:
+        status = agent.request('status')
+    except agent.AgentUnavailable:
+        raise click.ClickException('Agent is not running')
+
+    if format == 'json':
+        click.echo(json.dumps(status, indent=2))
+        return
+    click.echo(f"Agent:      pid {status['pid']}, up {status['uptime']:.0f}s")
+    click.echo(f"Instance:   {status['url']} ({'live' if status['live'] else 'reconnecting'})")
+    click.echo(f"Entities:   {status['entities']}")
+    click.echo(f"Registries: {', '.join(r.split('/')[1] for r in status['registries']) or '-'}")
+    click.echo(f"Served:     {status['requests']} request(s), {status['events']} event(s), "
+               f"{status['registry_refreshes']} registry refresh(es), "
+               f"{status['reconnects']} reconnect(s)")
@@ -10,12 +10,27 @@ import click
               help='Output format')
 @click.option('--check', '-c', 'check_name', default=None,
               help='Run a single check (e.g., unavailable, batteries, stale)')
-def doctor_command(format, check_name):
+@click.option('--rules', 'rules_path', type=click.Path(exists=True, dir_okay=False),
+              default=None,
+              help='Extra entity classification rules (YAML/JSON; default '
+                   '~/.hactl/doctor-rules.yaml, env HACTL_DOCTOR_RULES)')
+@click.option('--watch', '-w', is_flag=True, default=False,
+              help='Keep running and stream status transitions as NDJSON')
+@click.option('--interval', type=click.FloatRange(min=1), default=60.0, show_default=True,
+              help='Seconds between re-checks of time-based conditions in --watch mode')
+@click.option('--duration', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Stop watching after this many seconds (default: until Ctrl-C)')
+def doctor_command(format, check_name, rules_path, watch, interval, duration):
     """Run health checks on your Home Assistant instance
 
     Checks API connectivity, unavailable entities, low batteries,
-    error log, configuration, stale entities, automations, and
-    integration status.
+    error log, configuration, stale entities, automations,
+    integration status, and recorder health.
+
+    With --watch, the per-entity checks (unavailable, batteries, stale,
+    zombie_devices) are evaluated once and then kept up to date from
+    state and registry events. Only changes are printed, one JSON object
+    per line, so a dashboard can follow health without polling HA.
 
     Examples:
 
@@ -24,6 +39,15 @@ def doctor_command(format, check_name):
         hactl doctor --format json
         hactl doctor --check unavailable
         hactl doctor --check batteries
+        hactl doctor --check recorder
+        hactl doctor --check unavailable --rules my-rules.yaml
+        hactl doctor --watch
+        hactl doctor --watch --check batteries
     """
+    if watch:
+        from hactl.handlers import doctor_watch
+        doctor_watch.run_watch(check_name=check_name, rules_path=rules_path,
+                               sweep_interval=interval, duration=duration)
+        return
     from hactl.handlers import doctor
-    doctor.run_doctor(format_type=format, check_name=check_name)
+    doctor.run_doctor(format_type=format, check_name=check_name, rules_path=rules_path)
@@ -21,6 +21,23 @@ def format_option(formats=None):
     return decorator
 
 
+def logbook_options(func):
+    """Decorator for the logbook window and server-side filters"""
+    options = [
+        click.option('--since', default=None,
+                     help='Window start: ISO timestamp or age like 6h, 7d (default 24h)'),
+        click.option('--until', default=None,
+                     help='Window end: ISO timestamp or age (default now)'),
+        click.option('--entity', '-e', 'entity_ids', multiple=True,
+                     help='Only this entity (repeatable)'),
+        click.option('--context', 'context_id', default=None,
+                     help='Only entries caused by this context id'),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
 @click.group('get')
 def get_group():
     """Get resources from Home Assistant"""
@@ -177,18 +194,38 @@ def get_helpers(format):
 
 @get_group.command('actions')
 @format_option()
-def get_actions(format):
-    """Get action/script execution history"""
+@logbook_options
+def get_actions(format, since, until, entity_ids, context_id):
+    """Get action/script execution history
+
+    Examples:
+
+    \b
+        hactl get actions
+        hactl get actions --since 7d --entity automation.morning_lights
+        hactl get actions --context 01HXYZ... --format json
+    """
     from hactl.handlers import actions
-    actions.get_actions(format)
+    actions.get_actions(format, since=since, until=until, entity_ids=entity_ids,
+                        context_id=context_id)
 
 
 @get_group.command('activity')
 @format_option()
-def get_activity(format):
-    """Get recent activity and state changes"""
+@logbook_options
+def get_activity(format, since, until, entity_ids, context_id):
+    """Get recent activity and state changes
+
+    Examples:
+
+    \b
+        hactl get activity
+        hactl get activity --since 2026-10-01T00:00 --until 2026-10-02T00:00
+        hactl get activity --entity light.kitchen --since 3d
+    """
     from hactl.handlers import activity
-    activity.get_activity(format)
+    activity.get_activity(format, since=since, until=until, entity_ids=entity_ids,
+                          context_id=context_id)
 
 
 @get_group.command('assist')
@@ -247,11 +284,43 @@ def get_hacs(format):
 
 
 @get_group.command('history')
-@format_option()
-def get_history(format):
-    """Get entity state history"""
+@format_option(['table', 'json', 'yaml', 'detail', 'ndjson', 'csv'])
+@click.option('--entity', '-e', 'entity_ids', multiple=True,
+              help='Entity to read state history for (repeatable, or comma-separated)')
+@click.option('--since', default=None,
+              help='Window start: ISO timestamp or age like 6h, 7d (default 24h)')
+@click.option('--until', default=None, help='Window end: ISO timestamp or age (default now)')
+@click.option('--attributes', is_flag=True, default=False,
+              help='Include state attributes (larger, slower responses)')
+@click.option('--workers', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Concurrent history requests')
+@click.option('--chunk-hours', type=click.FloatRange(min=0, min_open=True), default=6.0,
+              show_default=True, help='Hours of history per request')
+@click.option('--local', is_flag=True, default=False,
+              help='Sync the missing range into the local history store and read from it')
+def get_history(format, entity_ids, since, until, attributes, workers, chunk_hours, local):
+    """Get entity state history
+
+    Without --entity, summarises the logbook for the window. With
+    --entity, streams every state change of those entities in time
+    order. The range is fetched as concurrent time windows and entity
+    batches, so multi-day queries do not hit one giant request. With
+    --local, only what the local store (see `hactl history`) is missing
+    is fetched.
+
+    Examples:
+
+    \b
+        hactl get history
+        hactl get history --entity sensor.outdoor_temp --since 7d --format csv
+        hactl get history -e light.hall,light.kitchen --since 2026-10-01 --format ndjson
+        hactl get history -e sensor.outdoor_temp --since 30d --local --format csv
+    """
     from hactl.handlers import history
-    history.get_history(format)
+    entity_ids = [e.strip() for value in entity_ids for e in value.split(',') if e.strip()]
+    history.get_history(format, entity_ids=entity_ids, since=since, until=until,
+                        attributes=attributes, workers=workers, chunk_hours=chunk_hours,
+                        local=local)
 
 
 @get_group.command('home-structure')
@@ -293,6 +362,44 @@ def get_persons_zones(format):
     persons_zones.get_persons_zones(format)
 
 
+@get_group.command('recorder-cost')
+@format_option(['table', 'json', 'yaml'])
+@click.option('--days', type=click.FloatRange(min=0, min_open=True), default=1.0,
+              show_default=True, help='History window to analyse')
+@click.option('--sample', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Sample live state changes for SECONDS instead of reading history')
+@click.option('--limit', '-l', type=click.IntRange(min=1), default=20, show_default=True,
+              help='Rows per ranking')
+@click.option('--threshold', type=click.FloatRange(min=0, max=100), default=5.0,
+              show_default=True,
+              help='Suggest excluding entities above this percentage of writes')
+@click.option('--workers', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Concurrent history requests')
+@click.option('--chunk-hours', type=click.FloatRange(min=0, min_open=True), default=6.0,
+              show_default=True, help='Hours of history per request')
+def get_recorder_cost(format, days, sample, limit, threshold, workers, chunk_hours):
+    """Rank entities and integrations by recorder database growth
+
+    Counts every recorded state row (attribute-only updates included) and
+    the attribute payload written with it, extrapolated to bytes per day.
+    History is fetched in parallel chunks and folded into running totals,
+    so long windows do not need the whole history in memory. Ends with a
+    ready-to-paste recorder `exclude:` block for the worst offenders.
+
+    Examples:
+
+    \b
+        hactl get recorder-cost
+        hactl get recorder-cost --days 7 --workers 8
+        hactl get recorder-cost --sample 300
+        hactl get recorder-cost --format json
+    """
+    from hactl.handlers import recorder_cost
+    recorder_cost.get_recorder_cost(format, days=days, sample=sample, limit=limit,
+                                    threshold=threshold / 100, workers=workers,
+                                    chunk_hours=chunk_hours)
+
+
 @get_group.command('scenes')
 @format_option()
 def get_scenes(format):
@@ -301,11 +408,74 @@ def get_scenes(format):
     scenes.get_scenes(format)
 
 
+@get_group.command('startup-profile')
+@format_option(['table', 'json', 'yaml'])
+@click.option('--limit', '-l', type=click.IntRange(min=1), default=25, show_default=True,
+              help='Rows shown in table format')
+@click.option('--baseline', 'baseline_path', type=click.Path(exists=True, dir_okay=False),
+              default=None, help='Compare against a baseline saved earlier')
+@click.option('--save-baseline', 'save_path', type=click.Path(dir_okay=False), default=None,
+              help='Save the current timings as a baseline file')
+@click.option('--regression-threshold', type=click.FloatRange(min=0), default=50.0,
+              show_default=True,
+              help='Percent slowdown against the baseline that counts as a regression')
+@click.option('--min-delta', type=click.FloatRange(min=0), default=1.0, show_default=True,
+              help='Ignore slowdowns smaller than this many seconds')
+def get_startup_profile(format, limit, baseline_path, save_path, regression_threshold,
+                        min_delta):
+    """Rank integrations by setup time at the last HA start
+
+    Reads per-integration setup durations (integration/setup_info) and
+    joins them with config entries. Save a baseline before an upgrade or
+    config change and compare after the restart to flag regressions.
+
+    Examples:
+
+    \b
+        hactl get startup-profile
+        hactl get startup-profile --save-baseline startup-2026.10.json
+        hactl get startup-profile --baseline startup-2026.10.json
+        hactl get startup-profile --format json
+    """
+    from hactl.handlers import startup_profile
+    startup_profile.get_startup_profile(
+        format, limit=limit, baseline_path=baseline_path, save_path=save_path,
+        ratio=regression_threshold / 100, min_seconds=min_delta)
+
+
 @get_group.command('statistics')
-@format_option()
-def get_statistics(format):
-    """Get statistics for entities"""
+@format_option(['table', 'json', 'yaml', 'detail', 'csv'])
+@click.option('--entity', '-e', 'entity_ids', multiple=True,
+              help='Statistic id or glob to read long-term statistics for '
+                   '(repeatable, or comma-separated)')
+@click.option('--period', type=click.Choice(['5minute', 'hour', 'day', 'week', 'month']),
+              default='hour', show_default=True, help='Aggregation period')
+@click.option('--since', default=None,
+              help='Period start: ISO timestamp or age like 30d (default 7d)')
+@click.option('--until', default=None, help='Period end: ISO timestamp or age (default now)')
+def get_statistics(format, entity_ids, period, since, until):
+    """Get statistics for entities
+
+    Without --entity, lists entities whose attributes look statistical.
+    With --entity, reads the recorder's long-term statistics (mean, min,
+    max and sum per period) for those ids, many per WebSocket call.
+    JSON output is columnar: one list per field per statistic.
+
+    Examples:
+
+    \b
+        hactl get statistics
+        hactl get statistics -e sensor.outdoor_temp --period day --since 30d --format json
+        hactl get statistics -e 'sensor.*_energy' --period month --since 365d --format csv
+    """
     from hactl.handlers import statistics
+    entity_ids = [e.strip() for value in entity_ids for e in value.split(',') if e.strip()]
+    if entity_ids:
+        statistics.get_long_term_statistics(format, entity_ids, period=period,
+                                            since=since, until=until)
+        return
+    if format == 'csv':
+        raise click.ClickException("--format csv needs --entity")
     statistics.get_statistics(format)
 
 
@@ -0,0 +1,52 @@
+"""
+HISTORY command group for hactl
+"""
+
+import click
+
+
+def _split(values):
+    return [e.strip() for value in values for e in value.split(',') if e.strip()]
+
+
+@click.group('history')
+def history_group():
+    """Keep a local, incrementally synced copy of entity history"""
+    pass
+
+
+@history_group.command('sync')
+@click.option('--entity', '-e', 'entity_ids', multiple=True,
+              help='Entity to sync (repeatable, or comma-separated; default: all stored)')
+@click.option('--since', default='7d', show_default=True,
+              help='Oldest time to keep: ISO timestamp or age like 30d')
+@click.option('--workers', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Concurrent history requests')
+@click.option('--chunk-hours', type=click.FloatRange(min=0, min_open=True), default=6.0,
+              show_default=True, help='Hours of history per request')
+def history_sync(entity_ids, since, workers, chunk_hours):
+    """Backfill the local history store
+
+    Only the gap since each entity's last stored timestamp is fetched
+    (plus any older range --since newly asks for), so repeated syncs are
+    cheap. The store lives in ~/.hactl/history.db ($HACTL_HISTORY_DB).
+
+    Examples:
+
+    \b
+        hactl history sync --entity sensor.outdoor_temp --since 30d
+        hactl history sync -e light.hall,light.kitchen
+        hactl history sync
+    """
+    from hactl.handlers import history
+    history.sync_history(_split(entity_ids), since=since, workers=workers,
+                         chunk_hours=chunk_hours)
+
+
+@history_group.command('status')
+@click.option('--format', '-f', type=click.Choice(['table', 'json']), default='table',
+              help='Output format')
+def history_status(format):
+    """Show which entities and time ranges the local store holds"""
+    from hactl.handlers import history
+    history.history_status(format)
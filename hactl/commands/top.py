@@ -0,0 +1,39 @@
+"""
+TOP command for hactl
+"""
+
+import click
+
+
+@click.command('top')
+@click.option('--interval', '-n', type=click.FloatRange(min=0, min_open=True), default=2.0,
+              show_default=True, help='Seconds between redraws')
+@click.option('--window', '-w', type=click.FloatRange(min=0, min_open=True), default=60.0,
+              show_default=True, help='Sliding window of the rates, in seconds')
+@click.option('--limit', '-l', type=click.IntRange(min=1), default=10, show_default=True,
+              help='Rows per table')
+@click.option('--by', '-b', 'dimensions', multiple=True,
+              type=click.Choice(['event_type', 'integration', 'domain', 'entity']),
+              help='Only show these tables (repeatable; default: all)')
+@click.option('--format', '-f', type=click.Choice(['table', 'json']), default='table',
+              help='Output format (json: one object per interval)')
+@click.option('--duration', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Stop after SECONDS (default: until Ctrl-C)')
+def top_command(interval, window, limit, dimensions, format, duration):
+    """Live view of the busiest event types, integrations and entities
+
+    Subscribes to the whole event bus and ranks events/s, attribute
+    bytes/s and share of traffic per event type, integration, domain and
+    entity. Memory stays bounded however many entities are chatty, so it
+    can run for hours.
+
+    Examples:
+
+    \b
+        hactl top
+        hactl top --by integration --by entity --interval 5
+        hactl top --format json --duration 300 > bus-load.ndjson
+    """
+    from hactl.handlers import top
+    top.run_top(interval=interval, window=window, limit=limit, dimensions=dimensions,
+                output_format=format, duration=duration)
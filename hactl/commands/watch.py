@@ -0,0 +1,40 @@
+"""
+WATCH command group for hactl
+"""
+
+import click
+
+
+@click.group('watch')
+def watch_group():
+    """Stream live changes from Home Assistant"""
+    pass
+
+
+@watch_group.command('states')
+@click.option('--domain', '-d', multiple=True, help='Only watch this domain (repeatable)')
+@click.option('--entity', '-e', multiple=True,
+              help='Only watch entity ids matching this glob (repeatable)')
+@click.option('--format', '-f', type=click.Choice(['table', 'ndjson']), default='table',
+              help='Output format')
+@click.option('--duration', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Stop after SECONDS (default: until Ctrl-C)')
+@click.pass_context
+def watch_states(ctx, domain, entity, format, duration):
+    """Stream state changes as they happen
+
+    Filters are resolved to an entity list that Home Assistant filters on
+    its side. If stdout falls behind, pending changes are coalesced per
+    entity instead of buffering without bound. A throughput summary is
+    printed to stderr on exit.
+
+    Examples:
+
+    \b
+        hactl watch states --domain sensor --entity 'sensor.*battery*'
+        hactl watch states --format ndjson | jq .
+        hactl watch states -d light --duration 60
+    """
+    from hactl.handlers import watch
+    watch.watch_states(domain, entity, format, duration=duration,
+                       quiet=(ctx.obj or {}).get('quiet', False))
@@ -3,7 +3,13 @@ Core utilities for hactl
 """
 
 from .config import load_config
-from .api import make_api_request
+from .cache import ResponseCache, configure_cache, get_cache
+from .session import HassSession, get_session, close_session
+from .api import make_api_request, iter_api_array
+from .async_client import AsyncHassClient
+from .context import HassContext
 from .formatting import format_output, json_to_yaml
 
-__all__ = ['load_config', 'make_api_request', 'format_output', 'json_to_yaml']
+__all__ = ['load_config', 'make_api_request', 'iter_api_array', 'format_output', 'json_to_yaml',
+           'HassSession', 'get_session', 'close_session', 'AsyncHassClient',
+           'HassContext', 'ResponseCache', 'configure_cache', 'get_cache']
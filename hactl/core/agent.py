@@ -0,0 +1,315 @@
+"""
+hactl agent: a background process serving a live Home Assistant mirror
+
+Every ``hactl`` invocation pays interpreter startup, TLS, WebSocket auth
+and a full ``/api/states`` download. ``hactl agent start`` runs one
+long-lived process that authenticates once and keeps an in-memory mirror:
+
+* states, kept current with ``subscribe_entities`` (compressed initial
+  snapshot, then per-entity diffs) in an ``EntityMirror``; and
+* the device/entity/area/label/floor registries, refetched when their
+  ``*_registry_updated`` event fires.
+
+The agent serves CLI invocations over a Unix domain socket
+(``~/.hactl/agent.sock``, mode 0600). The protocol is one JSON request
+line and one JSON reply per connection. ``make_api_request`` /
+``iter_api_array`` (for ``/api/states``) and ``get_registries`` ask the
+agent first, via `query`. When no agent is running, or it serves another
+instance, or it is reconnecting, `query` returns None and the caller
+goes to the API as before.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import click
+
+from .async_client import AsyncHassClient, Subscription
+from .cache import REGISTRY_EVENTS, instance_id
+from .websocket import EntityMirror
+
+AGENT_DIR = Path.home() / '.hactl'
+DEFAULT_SOCKET = AGENT_DIR / 'agent.sock'
+LOG_FILE = AGENT_DIR / 'agent.log'
+
+# A CLI call gives up on a silent agent quickly and uses the API instead
+CLIENT_TIMEOUT = 2.0
+RECONNECT_MAX = 60.0
+# Registry events arrive in bursts (one per edited entry); refetch once
+REGISTRY_DEBOUNCE = 0.5
+
+
+class AgentUnavailable(Exception):
+    """No agent is answering, or it cannot serve this request."""
+
+
+def socket_path() -> Path:
+    """Agent socket path ($HACTL_AGENT_SOCKET or ~/.hactl/agent.sock)."""
+    return Path(os.environ.get('HACTL_AGENT_SOCKET') or DEFAULT_SOCKET)
+
+
+def request(op: str, timeout: float = CLIENT_TIMEOUT, **fields) -> Any:
+    """
+    Send one request to the agent and return its result.
+
+    Args:
+        op: Operation ('ping', 'status', 'states', 'state', 'registries', 'stop')
+        timeout: Seconds to wait for the agent
+        **fields: Operation arguments
+
+    Returns:
+        The reply's result
+
+    Raises:
+        AgentUnavailable: If no agent answers or it returns an error
+    """
+    path = socket_path()
+    if not path.exists():
+        raise AgentUnavailable('agent is not running')
+    chunks = []
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(path))
+            sock.sendall(json.dumps({'op': op, **fields}).encode() + b'\n')
+            while True:
+                chunk = sock.recv(1 << 16)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        reply = json.loads(b''.join(chunks))
+    except (OSError, ValueError) as e:
+        raise AgentUnavailable(f'agent did not answer: {e}')
+    if not reply.get('ok'):
+        raise AgentUnavailable(reply.get('error') or 'agent error')
+    return reply.get('result')
+
+
+_enabled = True
+_down = False
+
+
+def reset(enabled: Optional[bool] = None) -> None:
+    """
+    Reset per-invocation agent state.
+
+    Args:
+        enabled: Whether to consult the agent (None: unless HACTL_AGENT=0)
+    """
+    global _enabled, _down
+    if enabled is None:
+        enabled = os.environ.get('HACTL_AGENT', '1') != '0'
+    _enabled = enabled
+    _down = False
+
+
+def query(url: str, token: str, op: str, **fields) -> Any:
+    """
+    Ask the agent for data about the instance at `url`.
+
+    After the first failure the agent is not asked again in this process,
+    so a dead socket costs at most one connect.
+
+    Returns:
+        The result, or None when the caller should use the API instead
+    """
+    global _down
+    if not _enabled or _down or not socket_path().exists():
+        return None
+    try:
+        return request(op, instance=instance_id(url, token), **fields)
+    except AgentUnavailable:
+        _down = True
+        return None
+
+
+class AgentServer:
+    """Live state/registry mirror served over a Unix socket."""
+
+    def __init__(self, url: str, token: str, path: Optional[Path] = None,
+                 client_factory=AsyncHassClient):
+        self.url = url
+        self.token = token
+        self.instance = instance_id(url, token)
+        self.path = Path(path) if path else socket_path()
+        self.client_factory = client_factory
+        self.mirror = EntityMirror()
+        self.registries: Dict[str, Any] = {}
+        self.live = False
+        self.started = time.time()
+        self.stats = {'requests': 0, 'events': 0, 'registry_refreshes': 0,
+                      'reconnects': 0}
+        self._states_blob: Optional[bytes] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    # ------------------------------------------------------------------
+    # Mirror
+    # ------------------------------------------------------------------
+
+    def apply_entities(self, event: Dict[str, Any]) -> None:
+        """Apply one `subscribe_entities` event to the mirror."""
+        if self.mirror.apply(event):
+            self._states_blob = None
+        self.stats['events'] += 1
+
+    async def _mirror(self, client) -> None:
+        """Sync once, then follow events until the connection drops."""
+        # The first subscribe_entities event is the full (compressed)
+        # snapshot; later ones carry only diffs. Subscribing to registry
+        # events before fetching the registries leaves no gap.
+        entities_sub = await client.subscribe('subscribe_entities')
+        registry_subs = {}
+        for event_type, command in REGISTRY_EVENTS.items():
+            registry_subs[command] = await client.subscribe(
+                'subscribe_events', event_type=event_type)
+
+        commands = list(registry_subs)
+        results = await client.call_many(commands, return_exceptions=True)
+        self.registries = {c: r for c, r in zip(commands, results)
+                           if not isinstance(r, Exception)}
+        self.mirror = EntityMirror()
+        try:
+            snapshot = await entities_sub.__anext__()
+        except StopAsyncIteration:
+            return
+        self.apply_entities(snapshot)
+        self.live = True
+
+        async def follow_states():
+            async for event in entities_sub:
+                self.apply_entities(event)
+
+        async def follow_registry(command, sub):
+            async for _event in sub:
+                await asyncio.sleep(REGISTRY_DEBOUNCE)
+                while not sub.queue.empty():
+                    if sub.queue.get_nowait() is Subscription._CLOSED:
+                        return
+                self.registries[command] = await client.call(command)
+                self.stats['registry_refreshes'] += 1
+
+        tasks = [asyncio.ensure_future(follow_states())]
+        tasks += [asyncio.ensure_future(follow_registry(c, s))
+                  for c, s in registry_subs.items() if c in self.registries]
+        try:
+            # A subscription ends only when the connection is lost
+            done, _pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception():
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _mirror_forever(self) -> None:
+        delay = 1.0
+        while True:
+            client = self.client_factory(self.url, self.token)
+            try:
+                await self._mirror(client)
+                delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                click.echo(f'[hactl agent] connection lost: {e}', err=True)
+            finally:
+                self.live = False
+                await client.close()
+            self.stats['reconnects'] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
+
+    # ------------------------------------------------------------------
+    # Socket server
+    # ------------------------------------------------------------------
+
+    def status(self) -> Dict[str, Any]:
+        """Agent status for `hactl agent status`."""
+        return {
+            'pid': os.getpid(),
+            'url': self.url,
+            'live': self.live,
+            'uptime': round(time.time() - self.started, 1),
+            'entities': len(self.mirror),
+            'registries': sorted(self.registries),
+            **self.stats,
+        }
+
+    def _reply(self, req: Dict[str, Any]) -> bytes:
+        op = req.get('op')
+        if op == 'ping':
+            return _ok({'pid': os.getpid()})
+        if op == 'status':
+            return _ok(self.status())
+        if op == 'stop':
+            self._stop.set()
+            return _ok(True)
+        if req.get('instance') != self.instance:
+            return _error('agent serves a different instance')
+        if not self.live:
+            return _error('agent is reconnecting')
+        if op == 'states':
+            if self._states_blob is None:
+                self._states_blob = json.dumps(self.mirror.states()).encode()
+            return b'{"ok": true, "result": ' + self._states_blob + b'}'
+        if op == 'state':
+            return _ok(self.mirror.state(req.get('entity_id')))
+        if op == 'registries':
+            # null for a registry this instance lacks (e.g. labels on old HA)
+            return _ok([self.registries.get(c) for c in req.get('commands') or []])
+        return _error(f'unknown op: {op}')
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            line = await reader.readline()
+            self.stats['requests'] += 1
+            try:
+                reply = self._reply(json.loads(line))
+            except ValueError:
+                reply = _error('malformed request')
+            writer.write(reply)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def run(self) -> None:
+        """Serve until a 'stop' request or SIGTERM/SIGINT."""
+        self._stop = asyncio.Event()
+        self.path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        if self.path.exists():
+            self.path.unlink()
+        server = await asyncio.start_unix_server(self._handle, path=str(self.path))
+        os.chmod(self.path, 0o600)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+        mirror = asyncio.ensure_future(self._mirror_forever())
+        try:
+            await self._stop.wait()
+        finally:
+            mirror.cancel()
+            server.close()
+            await server.wait_closed()
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+
+
+def _ok(result: Any) -> bytes:
+    return json.dumps({'ok': True, 'result': result}).encode()
+
+
+def _error(message: str) -> bytes:
+    return json.dumps({'ok': False, 'error': message}).encode()
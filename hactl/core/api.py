@@ -2,11 +2,17 @@
 API request utilities for hactl
 """
 
+import codecs
 import json
-import urllib.request
-import urllib.error
 import click
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, Iterator
+from urllib.parse import unquote, urlsplit
+
+from . import agent
+from .cache import get_cache, instance_id
+from .session import get_session
+
+_WHITESPACE = ' \t\n\r'
 
 
 def make_api_request(url: str, token: str, method: str = 'GET',
@@ -14,6 +20,9 @@ def make_api_request(url: str, token: str, method: str = 'GET',
     """
     Make an API request to Home Assistant.
 
+    Thin wrapper around the process-wide keep-alive ``HassSession``, so
+    every handler in a command reuses the same connection per host.
+
     Args:
         url: Full URL for the API endpoint
         token: Home Assistant API token
@@ -34,24 +43,181 @@ def make_api_request(url: str, token: str, method: str = 'GET',
     if data is not None and method in ('POST', 'PUT', 'PATCH'):
         body = json.dumps(data).encode('utf-8')
 
-    # Pass method explicitly so it never depends on body presence —
+    if method == 'GET':
+        mirrored = _from_agent(url, token)
+        if mirrored is not None:
+            return mirrored
+
+    cache = get_cache()
+    if not cache.enabled:
+        return _request_json(url, token, method, body)
+    instance = instance_id(url, token)
+    if method == 'GET':
+        return cache.fetch(instance, f'GET {url}',
+                           lambda: _request_json(url, token, method, body))
+    result = _request_json(url, token, method, body)
+    # Anything but a GET may have changed what the cached reads return
+    cache.invalidate(instance, registries='/api/config/' in url)
+    return result
+
+
+def _from_agent(url: str, token: str) -> Any:
+    """States from a running `hactl agent` mirror, or None to use the API."""
+    path = urlsplit(url).path
+    if path.endswith('/api/states'):
+        return agent.query(url, token, 'states')
+    head, sep, entity_id = path.rpartition('/api/states/')
+    if sep and entity_id:
+        return agent.query(url, token, 'state', entity_id=unquote(entity_id))
+    return None
+
+
+def _request_json(url: str, token: str, method: str, body: Optional[bytes]) -> Any:
+    # Method is passed explicitly so it never depends on body presence —
     # previously a body-less POST degraded to GET and HA returned 405.
-    req = urllib.request.Request(url, data=body, method=method)
-    req.add_header('Authorization', f'Bearer {token}')
-    req.add_header('Content-Type', 'application/json')
-    # Browser-shaped UA: Cloudflare's WAF returns 1010 on the default
-    # `Python-urllib/<ver>` UA when DNS for HASS_URL falls back to a CF
-    # edge IP (e.g. AdGuard split-horizon temporarily unreachable).
-    req.add_header('User-Agent', 'Mozilla/5.0 (hactl)')
+    try:
+        response = get_session().request(method, url, token, body=body)
+        return response.json()
+    except click.ClickException:
+        raise
+    except Exception as e:
+        raise click.ClickException(f'API request failed: {e}')
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Incrementally decode a top-level JSON array, yielding one element at a time.
+
+    Only the element currently being decoded (plus one network chunk) is
+    held in memory, never the whole document.
+
+    Args:
+        chunks: Iterable of raw UTF-8 byte chunks
+
+    Yields:
+        Each element of the array, in order
+
+    Raises:
+        ValueError: If the document is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill(min_size: int = 0) -> bool:
+        """Append chunks until the unread buffer exceeds `min_size`."""
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        pending = [buf[pos:]]
+        size = len(pending[0])
+        while True:
+            chunk = next(chunks, None)
+            if chunk is None:
+                pending.append(utf8.decode(b'', final=True))
+                eof = True
+                break
+            text = utf8.decode(chunk)
+            pending.append(text)
+            size += len(text)
+            if size > min_size:
+                break
+        buf = ''.join(pending)
+        pos = 0
+        return True
+
+    def next_char() -> str:
+        """Skip whitespace and return the next significant char ('' at EOF)."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                return ''
+
+    if next_char() != '[':
+        raise ValueError('expected a JSON array')
+    pos += 1
+
+    if next_char() == ']':
+        return
+    while True:
+        # Decode one element. An incomplete element raises; a complete-looking
+        # one that ends exactly at the buffer edge may be a truncated number or
+        # literal, so both cases pull more data (doubling the window, so a
+        # large element costs linear rather than quadratic time) and retry.
+        while True:
+            if next_char() == '':
+                raise ValueError('unexpected end of JSON array')
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not fill(2 * (len(buf) - pos)):
+                    raise
+                continue
+            if end == len(buf) and not eof:
+                fill(2 * (len(buf) - pos))
+                continue
+            break
+        pos = end
+        yield value
+
+        sep = next_char()
+        if sep == ',':
+            pos += 1
+        elif sep == ']':
+            return
+        else:
+            raise ValueError(f'expected "," or "]" in JSON array, got {sep!r}')
+
+
+def iter_api_array(url: str, token: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a JSON-array endpoint (e.g. /api/states) one element at a time.
+
+    Memory stays roughly constant regardless of the response size: neither
+    the raw body, the decoded text nor the full object graph is ever held
+    at once. Handlers that only count or filter should prefer this over
+    `make_api_request`.
+
+    Args:
+        url: Full URL for the API endpoint
+        token: Home Assistant API token
+
+    Yields:
+        dict: One array element (e.g. one state object) at a time
+
+    Raises:
+        click.ClickException: If the API request fails
+    """
+    mirrored = _from_agent(url, token)
+    if mirrored is not None:
+        yield from mirrored
+        return
+
+    yield from _stream_array(url, token)
+
 
+def _stream_array(url: str, token: str) -> Iterator[Any]:
+    chunks = get_session().stream('GET', url, token)
+    cache = get_cache()
+    if cache.enabled:
+        # The raw body is cached as it streams and replayed from disk, so
+        # the array is never held in memory either way
+        chunks = cache.stream(instance_id(url, token), f'STREAM {url}', chunks)
     try:
-        with urllib.request.urlopen(req) as response:
-            return json.loads(response.read().decode())
-    except urllib.error.HTTPError as e:
-        error_msg = f'HTTP {e.code} {e.reason}'
-        if e.fp:
-            error_body = e.fp.read().decode()
-            error_msg += f'\nResponse: {error_body}'
-        raise click.ClickException(error_msg)
+        yield from iter_json_array(chunks)
+        # Read past the closing bracket so a cached copy is completed
+        for _ in chunks:
+            pass
+    except click.ClickException:
+        raise
     except Exception as e:
         raise click.ClickException(f'API request failed: {e}')
+    finally:
+        chunks.close()
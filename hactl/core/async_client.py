@@ -0,0 +1,510 @@
+"""
+Native asyncio client for the Home Assistant REST and WebSocket APIs
+
+``HassSession`` and ``WebSocketClient`` are blocking: one request at a
+time per connection. ``AsyncHassClient`` is built on asyncio streams so
+fan-out handlers can keep many requests in flight without threads:
+
+* REST calls share a small pool of keep-alive connections, bounded by
+  ``max_connections``.
+* One multiplexed WebSocket is opened lazily. A background reader task
+  routes every ``result`` to the awaiting call by id, and every ``event``
+  to its subscription's queue, so calls and subscriptions can be awaited
+  concurrently from any number of tasks.
+
+The blocking ``make_api_request``/``WebSocketClient`` API is unchanged;
+sync code can drive this client with ``asyncio.run``.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import ssl
+import struct
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import click
+
+from . import deadline
+from .session import (
+    ACCEPT_ENCODING, USER_AGENT, HassHTTPError, _IDEMPOTENT_METHODS, _endpoint_label,
+    _make_decoder,
+)
+from .websocket import (
+    OP_CLOSE, OP_CONTINUATION, OP_PING, OP_PONG, OP_TEXT, WebSocketCallError,
+    encode_frame, mask_payload,
+)
+
+# Concurrent REST requests (and pooled connections) per client. HA's
+# aiohttp server handles far more, but a CLI has no business flooding it.
+MAX_CONNECTIONS = 8
+
+_STALE_ERRORS = (asyncio.IncompleteReadError, ConnectionResetError,
+                 BrokenPipeError, ConnectionAbortedError)
+
+
+async def _bounded(awaitable, what: str):
+    """Await `awaitable` within the per-operation timeout / remaining deadline."""
+    timeout = deadline.op_timeout()
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise click.ClickException(f'{what} timed out after {timeout:.0f}s')
+
+
+class Subscription:
+    """Async iterator over the events of one WebSocket subscription."""
+
+    _CLOSED = object()
+
+    def __init__(self, client: 'AsyncHassClient', sub_id: int):
+        self.client = client
+        self.id = sub_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        event = await self.queue.get()
+        if event is self._CLOSED:
+            raise StopAsyncIteration
+        return event
+
+    async def unsubscribe(self) -> None:
+        """Stop the subscription server-side and end iteration."""
+        if self.client._subscriptions.pop(self.id, None) is None:
+            return
+        self.queue.put_nowait(self._CLOSED)
+        try:
+            await self.client.call('unsubscribe_events', subscription=self.id)
+        except click.ClickException:
+            # Connection already gone; nothing left to unsubscribe from
+            pass
+
+
+class AsyncHassClient:
+    """asyncio client with pooled REST and a multiplexed WebSocket.
+
+    Use as an async context manager so the pool and socket are closed:
+
+        async with AsyncHassClient(url, token) as client:
+            states, config = await asyncio.gather(
+                client.get('/api/states'), client.get('/api/config'))
+            panels = await client.call('get_panels')
+    """
+
+    def __init__(self, url: str, token: str,
+                 max_connections: int = MAX_CONNECTIONS):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise click.ClickException('Unsupported scheme in HASS_URL')
+        self.url = url.rstrip('/')
+        self.token = token
+        self.max_connections = max_connections
+        self._host = parts.hostname
+        self._port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self._ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self._base_path = parts.path.rstrip('/')
+
+        # Created on first use so they bind to the running loop
+        self._limit: Optional[asyncio.Semaphore] = None
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+        self._ws_reader: Optional[asyncio.StreamReader] = None
+        self._ws_writer: Optional[asyncio.StreamWriter] = None
+        self._ws_task: Optional[asyncio.Task] = None
+        self._ws_connecting: Optional[asyncio.Lock] = None
+        self._ws_sending: Optional[asyncio.Lock] = None
+        self._ws_error: Optional[Exception] = None
+        self._req_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._subscriptions: Dict[int, Subscription] = {}
+
+    async def __aenter__(self) -> 'AsyncHassClient':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close pooled connections and the WebSocket."""
+        idle, self._idle = self._idle, []
+        for _reader, writer in idle:
+            writer.close()
+        if self._ws_task:
+            self._ws_task.cancel()
+            try:
+                await self._ws_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._ws_task = None
+        if self._ws_writer:
+            self._ws_writer.close()
+            self._ws_writer = None
+        self._fail_pending(click.ClickException('WebSocket closed'))
+
+    async def _open_connection(self):
+        try:
+            return await _bounded(asyncio.open_connection(
+                self._host, self._port, ssl=self._ssl,
+                server_hostname=self._host if self._ssl else None), 'Connect')
+        except OSError as e:
+            raise click.ClickException(f'API request failed: {e}')
+
+    # ------------------------------------------------------------------
+    # REST
+    # ------------------------------------------------------------------
+
+    async def request(self, method: str, path: str,
+                      data: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Make a REST request and return the decoded JSON body.
+
+        Args:
+            method: HTTP method
+            path: Path below HASS_URL (e.g. '/api/states') or a full URL
+            data: Optional JSON payload for POST/PUT/PATCH
+
+        Returns:
+            Decoded JSON response (None for an empty body)
+
+        Raises:
+            click.ClickException: If the request fails; HTTP error
+                statuses raise HassHTTPError
+        """
+        if path.startswith(('http://', 'https://')):
+            path = urlsplit(path)._replace(scheme='', netloc='').geturl()
+        else:
+            path = self._base_path + path
+        body = None
+        if data is not None and method in ('POST', 'PUT', 'PATCH'):
+            body = json.dumps(data).encode('utf-8')
+
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_connections)
+        started = time.monotonic()
+        try:
+            return await self._request(method, path, body)
+        finally:
+            deadline.record(f'{method} {_endpoint_label(path)}',
+                            time.monotonic() - started)
+
+    async def _request(self, method: str, path: str, body: Optional[bytes]) -> Any:
+        async with self._limit:
+            reused = bool(self._idle)
+            conn = self._idle.pop() if reused else await self._open_connection()
+            try:
+                status, reason, raw, keep_alive = await _bounded(
+                    self._exchange(conn, method, path, body), f'{method} {path}')
+            except _STALE_ERRORS:
+                conn[1].close()
+                # HA may have acted on a written POST before the reset, so
+                # only idempotent requests are replayed
+                if not reused or method not in _IDEMPOTENT_METHODS:
+                    raise click.ClickException('API request failed: connection closed')
+                # Pooled socket went stale while idle; replay once fresh
+                conn = await self._open_connection()
+                try:
+                    status, reason, raw, keep_alive = await _bounded(
+                        self._exchange(conn, method, path, body), f'{method} {path}')
+                except Exception:
+                    conn[1].close()
+                    raise
+            except Exception:
+                conn[1].close()
+                raise
+            if keep_alive:
+                self._idle.append(conn)
+            else:
+                conn[1].close()
+
+        text = raw.decode('utf-8', errors='replace')
+        if status >= 400:
+            raise HassHTTPError(status, reason, text)
+        if not text.strip():
+            return None
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            raise click.ClickException(f'API request failed: {e}')
+
+    async def get(self, path: str) -> Any:
+        """GET `path` and return the decoded JSON body."""
+        return await self.request('GET', path)
+
+    async def post(self, path: str, data: Optional[Dict[str, Any]] = None) -> Any:
+        """POST `data` to `path` and return the decoded JSON body."""
+        return await self.request('POST', path, data)
+
+    async def _exchange(self, conn, method: str, path: str,
+                        body: Optional[bytes]) -> Tuple[int, str, bytes, bool]:
+        """Send one request on `conn` and read the full response."""
+        reader, writer = conn
+        host = self._host if self._port in (80, 443) else f'{self._host}:{self._port}'
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {host}',
+            f'Authorization: Bearer {self.token}',
+            'Content-Type: application/json',
+            f'User-Agent: {USER_AGENT}',
+            f'Accept-Encoding: {ACCEPT_ENCODING}',
+            'Connection: keep-alive',
+            f'Content-Length: {len(body) if body else 0}',
+        ]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        version, _, rest = status_line.decode('latin-1').rstrip('\r\n').partition(' ')
+        code, _, reason = rest.partition(' ')
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = (version == 'HTTP/1.1'
+                      and headers.get('connection', '').lower() != 'close')
+        if method == 'HEAD' or code in ('204', '304'):
+            raw = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if not size:
+                    # Trailers end with an empty line
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                parts.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            raw = b''.join(parts)
+        elif 'content-length' in headers:
+            raw = await reader.readexactly(int(headers['content-length']))
+        else:
+            raw = await reader.read()
+            keep_alive = False
+
+        decoder = _make_decoder(headers.get('content-encoding'))
+        if decoder is not None:
+            raw = decoder.decompress(raw) + decoder.flush()
+        return int(code), reason, raw, keep_alive
+
+    # ------------------------------------------------------------------
+    # WebSocket
+    # ------------------------------------------------------------------
+
+    async def ws_connect(self) -> None:
+        """Open and authenticate the WebSocket (no-op when already open)."""
+        if self._ws_connecting is None:
+            self._ws_connecting = asyncio.Lock()
+            self._ws_sending = asyncio.Lock()
+        async with self._ws_connecting:
+            if self._ws_task and not self._ws_task.done():
+                return
+            reader, writer = await self._open_connection()
+            key = base64.b64encode(os.urandom(16)).decode()
+            req = (f"GET {self._base_path}/api/websocket HTTP/1.1\r\n"
+                   f"Host: {self._host}\r\n"
+                   "Upgrade: websocket\r\n"
+                   "Connection: Upgrade\r\n"
+                   f"Sec-WebSocket-Key: {key}\r\n"
+                   "Sec-WebSocket-Version: 13\r\n"
+                   f"User-Agent: {USER_AGENT}\r\n"
+                   f"Origin: {self.url}\r\n\r\n")
+            writer.write(req.encode())
+            await writer.drain()
+            try:
+                response = await _bounded(reader.readuntil(b'\r\n\r\n'),
+                                          'WebSocket handshake')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                writer.close()
+                raise click.ClickException('WebSocket handshake failed')
+            if b' 101 ' not in response.split(b'\r\n', 1)[0] + b' ':
+                writer.close()
+                raise click.ClickException(
+                    'WebSocket handshake unsuccessful:\n' + response.decode(errors='ignore'))
+
+            self._ws_reader, self._ws_writer = reader, writer
+            await self._ws_send({'type': 'auth', 'access_token': self.token})
+            while True:
+                msg = await _bounded(self._ws_recv_json(), 'WebSocket auth')
+                if msg.get('type') == 'auth_ok':
+                    break
+                if msg.get('type') == 'auth_invalid':
+                    writer.close()
+                    raise click.ClickException('Authentication failed')
+
+            self._ws_error = None
+            self._ws_task = asyncio.ensure_future(self._ws_read_loop())
+
+    async def _ws_send(self, message: Dict[str, Any], opcode: int = OP_TEXT) -> None:
+        payload = message if isinstance(message, bytes) else json.dumps(message).encode()
+        async with self._ws_sending:
+            self._ws_writer.write(encode_frame(payload, opcode))
+            await self._ws_writer.drain()
+
+    async def _ws_recv_message(self) -> Tuple[int, bytes]:
+        """Read one complete message, reassembling fragments, answering pings."""
+        reader = self._ws_reader
+        message_opcode = None
+        fragments = []
+        while True:
+            b1, b2 = await reader.readexactly(2)
+            fin, opcode, length = b1 & 0x80, b1 & 0x0F, b2 & 0x7F
+            if length == 126:
+                length = struct.unpack('>H', await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('>Q', await reader.readexactly(8))[0]
+            mask = await reader.readexactly(4) if b2 & 0x80 else None
+            payload = await reader.readexactly(length)
+            if mask:
+                payload = mask_payload(payload, mask)
+            if opcode == OP_PING:
+                await self._ws_send(payload, OP_PONG)
+                continue
+            if opcode == OP_CLOSE:
+                return opcode, payload
+            if opcode > OP_CLOSE:
+                continue
+            if opcode != OP_CONTINUATION:
+                message_opcode = opcode
+            elif message_opcode is None:
+                raise click.ClickException('Unexpected WebSocket continuation frame')
+            fragments.append(payload)
+            if fin:
+                return message_opcode, b''.join(fragments)
+
+    async def _ws_recv_json(self) -> Dict[str, Any]:
+        while True:
+            opcode, payload = await self._ws_recv_message()
+            if opcode == OP_CLOSE:
+                raise click.ClickException('WebSocket closed by server')
+            if opcode == OP_TEXT:
+                try:
+                    return json.loads(payload)
+                except json.JSONDecodeError:
+                    continue
+
+    async def _ws_read_loop(self) -> None:
+        """Background task: route results to futures and events to queues."""
+        try:
+            while True:
+                msg = await self._ws_recv_json()
+                msg_id = msg.get('id')
+                if msg.get('type') == 'event':
+                    sub = self._subscriptions.get(msg_id)
+                    if sub is not None:
+                        sub.queue.put_nowait(msg.get('event'))
+                    continue
+                future = self._pending.pop(msg_id, None)
+                if future is None or future.done():
+                    continue
+                if msg.get('type') == 'pong' or msg.get('success', False):
+                    future.set_result(msg.get('result'))
+                else:
+                    future.set_exception(WebSocketCallError(msg))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = e if isinstance(e, click.ClickException) else \
+                click.ClickException(f'WebSocket connection lost: {e}')
+            self._ws_error = error
+            self._fail_pending(error)
+
+    def _fail_pending(self, error: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+        subscriptions, self._subscriptions = self._subscriptions, {}
+        for sub in subscriptions.values():
+            sub.queue.put_nowait(Subscription._CLOSED)
+
+    async def _ws_request(self, message_type: str, kwargs: Dict[str, Any]) -> Tuple[int, asyncio.Future]:
+        await self.ws_connect()
+        if self._ws_error is not None:
+            raise self._ws_error
+        self._req_id += 1
+        req_id = self._req_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        await self._ws_send({'id': req_id, 'type': message_type, **kwargs})
+        return req_id, future
+
+    async def call(self, message_type: str, **kwargs) -> Any:
+        """
+        Call a WebSocket command and await its result.
+
+        Any number of calls may be awaited concurrently; they share one
+        socket and are matched to their results by id.
+
+        Raises:
+            click.ClickException: If the command fails or the socket closes
+        """
+        _req_id, future = await self._ws_request(message_type, kwargs)
+        started = time.monotonic()
+        try:
+            return await _bounded(future, f'WebSocket call {message_type}')
+        finally:
+            deadline.record(f'WS {message_type}', time.monotonic() - started)
+
+    async def call_many(self, calls: Iterable[Union[str, Tuple[str, Dict[str, Any]]]],
+                        return_exceptions: bool = False) -> List[Any]:
+        """
+        Run several WebSocket commands concurrently.
+
+        Args:
+            calls: Command types, or (type, kwargs) tuples
+            return_exceptions: Return failures in place instead of raising
+
+        Returns:
+            list: Results in the same order as `calls`
+        """
+        coros = []
+        for item in calls:
+            message_type, kwargs = (item, {}) if isinstance(item, str) else item
+            coros.append(self.call(message_type, **kwargs))
+        return list(await asyncio.gather(*coros, return_exceptions=return_exceptions))
+
+    async def subscribe(self, message_type: str = 'subscribe_events',
+                        **kwargs) -> Subscription:
+        """
+        Start a subscription and return an async iterator over its events.
+
+        Args:
+            message_type: Subscription command (e.g. 'subscribe_events',
+                'subscribe_trigger', 'subscribe_entities')
+            **kwargs: Command fields (e.g. event_type='state_changed')
+
+        Returns:
+            Subscription: Yields each event payload; call `unsubscribe()`
+            to stop
+        """
+        await self.ws_connect()
+        if self._ws_error is not None:
+            raise self._ws_error
+        self._req_id += 1
+        req_id = self._req_id
+        # Register the queue before sending: events can follow the result
+        # immediately, in the same read.
+        sub = Subscription(self, req_id)
+        self._subscriptions[req_id] = sub
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        try:
+            await self._ws_send({'id': req_id, 'type': message_type, **kwargs})
+            await _bounded(future, f'WebSocket subscribe {message_type}')
+        except Exception:
+            self._subscriptions.pop(req_id, None)
+            self._pending.pop(req_id, None)
+            raise
+        return sub
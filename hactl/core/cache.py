@@ -0,0 +1,579 @@
+"""
+Opt-in on-disk response cache for hactl
+
+Scripts and agents run many ``hactl get ...`` commands back to back, and
+every one used to re-download ``/api/states`` and the registries. With a
+cache TTL configured (``--cache-ttl`` or ``HACTL_CACHE_TTL``), GET
+responses from ``make_api_request`` and ``iter_api_array`` and read-only
+WebSocket list commands from ``WebSocketClient.call`` are stored under
+``~/.hactl/cache``:
+
+* Entries are keyed by instance URL, a hash of the token, and the
+  endpoint (plus arguments for WebSocket commands).
+* Within the TTL an entry is served as-is. For ``max_stale`` seconds after
+  that it is served stale, while a background thread revalidates it for
+  the next command (stale-while-revalidate).
+* Streamed arrays keep their raw body, written while it streams and
+  replayed in chunks, and are only served fresh.
+* Writes are atomic (temp file + ``os.replace``) and private (0600). The
+  directory is bounded in size; least-recently-used entries are evicted.
+* Any mutating call (non-GET REST, WebSocket create/update/delete/...)
+  drops every entry for that instance.
+
+Registries are kept apart in a ``RegistryCache`` (``registries/`` below the
+cache directory). The device and entity registries are several MB, so they
+are not refetched on every run:
+
+* Each registry is stored with the HA version. A version change drops
+  them all. Its entry count and highest ``modified_at`` are kept only to
+  count refetches that found changes (``-v`` statistics).
+* The small area, label and floor registries are refetched every time, in
+  the same pipelined round-trip as the ``get_config`` version check.
+* A socket that stays open across fetches (the agent, watch loops)
+  subscribes to the ``*_registry_updated`` events, and a registry whose
+  event arrives is refetched on its next use. A fresh CLI run cannot see
+  edits made before it connected.
+* There is no change detection across CLI runs: the device and entity
+  registries can be up to ``max_age`` old (``HACTL_REGISTRY_MAX_AGE``,
+  default 5 min). Commands that edit registries read them ``fresh``.
+
+Without a TTL the cache is disabled and nothing touches the disk.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import click
+
+DEFAULT_CACHE_DIR = Path.home() / '.hactl' / 'cache'
+DEFAULT_MAX_STALE = 300.0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_REGISTRY_MAX_AGE = 300.0
+
+FRESH = 'fresh'
+STALE = 'stale'
+
+# Read-only WebSocket commands whose results are safe to cache
+_CACHEABLE_WS_COMMANDS = frozenset([
+    'get_states', 'get_config', 'get_services', 'get_panels',
+    'lovelace/config', 'lovelace/dashboards/list',
+])
+_MUTATING_WS_MARKERS = ('create', 'update', 'delete', 'remove', 'save',
+                        'reload', 'call_service', 'fire_event', 'set')
+
+
+# Registry update events -> the list command whose result they invalidate
+REGISTRY_EVENTS = {
+    'device_registry_updated': 'config/device_registry/list',
+    'entity_registry_updated': 'config/entity_registry/list',
+    'area_registry_updated': 'config/area_registry/list',
+    'label_registry_updated': 'config/label_registry/list',
+    'floor_registry_updated': 'config/floor_registry/list',
+}
+# Cheap enough to refetch on every use; only device/entity are trusted
+# from disk for up to max_age
+_ALWAYS_REFETCHED_REGISTRIES = frozenset([
+    'config/area_registry/list', 'config/label_registry/list',
+    'config/floor_registry/list',
+])
+
+
+def is_registry_command(message_type: str) -> bool:
+    """Whether a WebSocket command reads or edits a config registry."""
+    return message_type.startswith('config/') and '_registry/' in message_type
+
+
+def is_cacheable_ws(message_type: str) -> bool:
+    """
+    Whether a WebSocket command is a read-only listing worth caching.
+
+    Registry lists are excluded: `RegistryCache` revalidates those.
+    """
+    if is_registry_command(message_type):
+        return False
+    return message_type.endswith('/list') or message_type in _CACHEABLE_WS_COMMANDS
+
+
+def is_mutating_ws(message_type: str) -> bool:
+    """Whether a WebSocket command changes state on the instance."""
+    last = message_type.rsplit('/', 1)[-1]
+    return any(marker in last for marker in _MUTATING_WS_MARKERS)
+
+
+def instance_id(url: str, token: str) -> str:
+    """Stable id for one (instance, token) pair; used as the file prefix."""
+    parts = urlsplit(url)
+    raw = f'{parts.scheme}://{parts.netloc}|{token}'
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def _atomic_write(path: Path, data: Any) -> bool:
+    """
+    Write `data` as JSON to `path` via a private temp file and os.replace.
+
+    Readers never see a partial file. Failures are swallowed: a cache that
+    cannot be written is just a cache miss next time.
+
+    Returns:
+        bool: Whether the file was written
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        payload = json.dumps(data, separators=(',', ':'))
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
+
+
+class ResponseCache:
+    """Size-bounded LRU file cache with TTL and stale-while-revalidate."""
+
+    def __init__(self, directory=None, ttl: Optional[float] = None,
+                 max_stale: float = DEFAULT_MAX_STALE,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 registry_max_age: float = DEFAULT_REGISTRY_MAX_AGE):
+        self.directory = Path(directory) if directory else DEFAULT_CACHE_DIR
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_bytes = max_bytes
+        self.registries = RegistryCache(self.directory / 'registries', registry_max_age,
+                                        on_write=self._evict)
+        self._lock = threading.Lock()
+        self._revalidating = {}
+        self.stats = {'hits': 0, 'stale': 0, 'misses': 0, 'evicted': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.ttl)
+
+    def _path(self, instance: str, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return self.directory / f'{instance}-{digest}.json'
+
+    def lookup(self, instance: str, key: str) -> Tuple[Optional[str], Any]:
+        """
+        Look up `key` for `instance`.
+
+        Returns:
+            tuple: (FRESH or STALE, value), or (None, None) on a miss or
+            an entry too old to serve
+        """
+        path = self._path(instance, key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        if entry.get('key') != key:
+            return None, None
+        age = time.time() - entry.get('stored_at', 0)
+        if age > self.ttl + self.max_stale:
+            return None, None
+        try:
+            os.utime(path)  # LRU: eviction goes by last use
+        except OSError:
+            pass
+        return (FRESH if age <= self.ttl else STALE), entry.get('value')
+
+    def put(self, instance: str, key: str, value: Any) -> None:
+        """Store `value` atomically, then evict LRU entries over the size bound."""
+        if _atomic_write(self._path(instance, key),
+                         {'key': key, 'stored_at': time.time(), 'value': value}):
+            self._evict()
+
+    def stream(self, instance: str, key: str, chunks: Iterable[bytes],
+               chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Raw body chunks of a streamed response, replayed from disk when fresh.
+
+        On a miss `chunks` is passed through while being written to a temp
+        file, which only replaces the entry once the body is complete.
+        Neither path holds the whole body in memory. The entry is stored as
+        a header line plus the raw body, so `lookup` and `invalidate` treat
+        it like any other. Stale entries are not served: revalidating in
+        the background would have to buffer the body.
+        """
+        path = self._path(instance, key)
+        try:
+            with open(path, 'rb') as f:
+                header = f.readline()
+                entry = json.loads(header.decode('utf-8') + 'null}')
+                if entry.get('key') == key and \
+                        time.time() - entry.get('stored_at', 0) <= self.ttl:
+                    os.utime(path)  # LRU: eviction goes by last use
+                    self.stats['hits'] += 1
+                    # Everything up to the closing brace of the entry
+                    remaining = os.fstat(f.fileno()).st_size - len(header) - 1
+                    while remaining > 0:
+                        data = f.read(min(chunk_size, remaining))
+                        if not data:
+                            break
+                        remaining -= len(data)
+                        yield data
+                    return
+        except (OSError, ValueError, AttributeError):
+            pass
+
+        self.stats['misses'] += 1
+        header = json.dumps({'key': key, 'stored_at': time.time()},
+                            separators=(',', ':'))[:-1] + ',"value":\n'
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.json')
+            out = os.fdopen(fd, 'wb')
+        except OSError:
+            yield from chunks
+            return
+        complete = False
+        try:
+            out.write(header.encode('utf-8'))
+            for data in chunks:
+                out.write(data)
+                yield data
+            out.write(b'}')
+            complete = True
+        finally:
+            out.close()
+            try:
+                if complete:
+                    os.replace(tmp, path)
+                else:
+                    os.unlink(tmp)
+            except OSError:
+                complete = False
+        if complete:
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        # The registries are the largest files, so they count too
+        for directory in (self.directory, self.registries.directory):
+            try:
+                with os.scandir(directory) as it:
+                    for item in it:
+                        if item.name.endswith('.json') and not item.name.startswith('.tmp-'):
+                            stat = item.stat()
+                            entries.append((stat.st_mtime, stat.st_size, item.path))
+                            total += stat.st_size
+            except FileNotFoundError:
+                continue
+            except OSError:
+                return
+        if total <= self.max_bytes:
+            return
+        for _mtime, size, path in sorted(entries):
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            self.stats['evicted'] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def invalidate(self, instance: str, registries: bool = False) -> None:
+        """
+        Drop every entry for `instance` (after a mutating call).
+
+        Args:
+            instance: `instance_id()` of the target instance
+            registries: Also drop its cached registries (the call may have
+                edited devices, entities or config entries)
+        """
+        if registries:
+            self.registries.invalidate(instance)
+        try:
+            for path in self.directory.glob(f'{instance}-*.json'):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        except OSError:
+            pass
+
+    def revalidate(self, instance: str, key: str, fetch: Callable[[], Any]) -> None:
+        """Refresh `key` in a background thread (at most one per key)."""
+        with self._lock:
+            if key in self._revalidating:
+                return
+
+            def run():
+                try:
+                    self.put(instance, key, fetch())
+                except Exception:
+                    # The stale entry stays; the next command tries again
+                    pass
+
+            thread = threading.Thread(target=run, name='hactl-cache-revalidate',
+                                      daemon=True)
+            self._revalidating[key] = thread
+        thread.start()
+
+    def fetch(self, instance: str, key: str, fetch: Callable[[], Any],
+              revalidate: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Return the cached value for `key`, fetching and storing it on a miss.
+
+        Args:
+            instance: `instance_id()` of the target instance
+            key: Endpoint key (e.g. 'GET https://ha/api/states')
+            fetch: Produces the value on a miss, in the caller's thread
+            revalidate: Produces a fresh value from a background thread
+                when a stale entry is served (default: `fetch`)
+
+        Returns:
+            The cached or freshly fetched value
+        """
+        hit, value = self.serve(instance, key, revalidate or fetch)
+        if hit:
+            return value
+        value = fetch()
+        self.put(instance, key, value)
+        return value
+
+    def serve(self, instance: str, key: str,
+              revalidate: Callable[[], Any]) -> Tuple[bool, Any]:
+        """
+        Serve `key` from the cache if possible, counting the outcome.
+
+        A stale entry is returned and `revalidate` is scheduled in the
+        background. On a miss the caller fetches and `put`s the value.
+
+        Returns:
+            tuple: (True, value) when served, (False, None) on a miss
+        """
+        state, value = self.lookup(instance, key)
+        if state == FRESH:
+            self.stats['hits'] += 1
+            return True, value
+        if state == STALE:
+            self.stats['stale'] += 1
+            self.revalidate(instance, key, revalidate)
+            return True, value
+        self.stats['misses'] += 1
+        return False, None
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Wait for background revalidations (called when a command exits)."""
+        with self._lock:
+            threads, self._revalidating = list(self._revalidating.values()), {}
+        end = time.monotonic() + timeout if timeout else None
+        for thread in threads:
+            thread.join(None if end is None else max(0.0, end - time.monotonic()))
+
+    def summary(self) -> str:
+        """One-line hit/miss summary."""
+        s = self.stats
+        r = self.registries.stats
+        return (f"cache: {s['hits']} hit(s), {s['stale']} stale, "
+                f"{s['misses']} miss(es), {s['evicted']} evicted; "
+                f"registries: {r['reused']} reused, {r['fetched']} fetched "
+                f"({r['changed']} changed)")
+
+
+def _max_modified(registry: Any) -> Optional[float]:
+    """Highest `modified_at` among registry entries (None if not reported)."""
+    if not isinstance(registry, list):
+        return None
+    stamps = [e.get('modified_at') for e in registry if isinstance(e, dict)]
+    stamps = [t for t in stamps if isinstance(t, (int, float))]
+    return max(stamps) if stamps else None
+
+
+class RegistryCache:
+    """Persistent registries revalidated by HA version, events and max age."""
+
+    def __init__(self, directory, max_age: float = DEFAULT_REGISTRY_MAX_AGE,
+                 on_write: Optional[Callable[[], None]] = None):
+        self.directory = Path(directory)
+        self.max_age = max_age
+        # Called after each store (the owning ResponseCache's size bound)
+        self._on_write = on_write
+        # WebSocket -> {event_type: subscription id}
+        self._watched = weakref.WeakKeyDictionary()
+        self.stats = {'reused': 0, 'fetched': 0, 'changed': 0}
+
+    def _path(self, instance: str) -> Path:
+        return self.directory / f'{instance}.json'
+
+    def load(self, instance: str) -> Dict[str, Any]:
+        """Stored state: {'version': str, 'registries': {command: entry}}."""
+        try:
+            with open(self._path(instance), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if isinstance(state.get('registries'), dict):
+                os.utime(self._path(instance))  # LRU: eviction goes by last use
+                return state
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {'version': None, 'registries': {}}
+
+    def invalidate(self, instance: str) -> None:
+        """Forget every cached registry for `instance`."""
+        try:
+            self._path(instance).unlink()
+        except OSError:
+            pass
+
+    def _changed(self, ws) -> set:
+        """
+        List commands whose registry changed since the last check.
+
+        The first use of a socket subscribes it to the registry update
+        events; events buffered by later reads on it mark registries dirty.
+        Edits made before the subscription are not reported, so this only
+        helps sockets that outlive one fetch.
+        """
+        try:
+            subs = self._watched.get(ws)
+        except TypeError:
+            return set()
+        if subs is None:
+            subscribe = getattr(ws, 'subscribe_events', None)
+            try:
+                subs = subscribe(list(REGISTRY_EVENTS)) if subscribe else {}
+            except Exception:
+                subs = {}
+            self._watched[ws] = subs
+            return set()
+        return {REGISTRY_EVENTS[event_type] for event_type, sub_id in subs.items()
+                if ws.pop_events(sub_id)}
+
+    def fetch(self, ws, instance: str, commands: Iterable[str],
+              fresh: bool = False) -> List[Any]:
+        """
+        Return registry lists, reusing stored ones younger than `max_age`.
+
+        A `get_config` version check is pipelined with the registries that
+        must be fetched anyway: the small area/label/floor ones, and any
+        that an event marked or that are older than `max_age`. Cached ones
+        are only refetched (in a second round-trip) when the HA version
+        differs.
+
+        Args:
+            ws: Connected WebSocketClient
+            instance: `instance_id()` of the target instance
+            commands: Registry list commands
+            fresh: Refetch everything (commands about to edit registries);
+                the result still refreshes the cache
+
+        Returns:
+            list: One result per command; failures are returned as
+            click.ClickException in their slot, like
+            `call_many(..., return_exceptions=True)`
+        """
+        commands = list(commands)
+        state = self.load(instance)
+        entries = state['registries']
+        changed = self._changed(ws)
+        now = time.time()
+        reusable = [] if fresh else [
+            c for c in commands
+            if c in entries and c not in changed
+            and c not in _ALWAYS_REFETCHED_REGISTRIES
+            and now - entries[c].get('fetched_at', 0) < self.max_age
+        ]
+        to_fetch = [c for c in commands if c not in reusable]
+
+        results = ws.call_many(['get_config'] + to_fetch, return_exceptions=True)
+        config = results[0]
+        fetched = dict(zip(to_fetch, results[1:]))
+        version = config.get('version') if isinstance(config, dict) else None
+        if version is None or version != state.get('version'):
+            # Unknown or upgraded instance: nothing cached can be trusted
+            if reusable:
+                fetched.update(zip(reusable, ws.call_many(reusable, return_exceptions=True)))
+                reusable = []
+            entries = state['registries'] = {}
+            state['version'] = version
+
+        for command, result in fetched.items():
+            if isinstance(result, Exception):
+                continue
+            old = entries.get(command)
+            entry = {'fetched_at': now, 'max_modified_at': _max_modified(result),
+                     'count': len(result) if isinstance(result, list) else None,
+                     'data': result}
+            if old and (old.get('max_modified_at'), old.get('count')) != \
+                    (entry['max_modified_at'], entry['count']):
+                self.stats['changed'] += 1
+            entries[command] = entry
+        # Events that arrived during the fetch may postdate its snapshot
+        for command in self._changed(ws):
+            if command in entries:
+                entries[command]['fetched_at'] = 0
+
+        self.stats['reused'] += len(reusable)
+        self.stats['fetched'] += len(fetched)
+        if version is not None:
+            if _atomic_write(self._path(instance), state) and self._on_write is not None:
+                self._on_write()
+        return [entries[c]['data'] if c in reusable else fetched[c] for c in commands]
+
+
+_cache = ResponseCache()
+_cache_lock = threading.Lock()
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise click.ClickException(f'{name} must be a number, got {value!r}')
+
+
+def configure_cache(ttl: Optional[float] = None, enabled: bool = True) -> ResponseCache:
+    """
+    Configure the process-wide response cache.
+
+    Args:
+        ttl: Seconds an entry is fresh (None: HACTL_CACHE_TTL; unset
+            leaves the cache disabled)
+        enabled: False forces the cache off (--no-cache)
+
+    Returns:
+        ResponseCache: The configured cache
+    """
+    global _cache
+    if ttl is None:
+        ttl = _env_float('HACTL_CACHE_TTL')
+    max_stale = _env_float('HACTL_CACHE_MAX_STALE')
+    max_mb = _env_float('HACTL_CACHE_MAX_MB')
+    registry_max_age = _env_float('HACTL_REGISTRY_MAX_AGE')
+    with _cache_lock:
+        _cache = ResponseCache(
+            directory=os.environ.get('HACTL_CACHE_DIR') or None,
+            ttl=ttl if enabled else None,
+            max_stale=DEFAULT_MAX_STALE if max_stale is None else max_stale,
+            max_bytes=DEFAULT_MAX_BYTES if max_mb is None else int(max_mb * 1024 * 1024),
+            registry_max_age=(DEFAULT_REGISTRY_MAX_AGE if registry_max_age is None
+                              else registry_max_age))
+        return _cache
+
+
+def get_cache() -> ResponseCache:
+    """Return the process-wide response cache (disabled unless configured)."""
+    return _cache
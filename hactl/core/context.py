@@ -0,0 +1,338 @@
+"""
+Per-invocation Home Assistant context for hactl
+
+A single command often needs the same dataset in several handlers: ``hactl
+memory sync`` used to fetch ``/api/states`` about ten times and open five
+separate WebSockets (each with its own auth handshake). ``HassContext`` is
+created once in ``cli()`` and stored in ``ctx.obj['hass']``. It holds one
+authenticated WebSocket for the whole command and memoizes datasets by key,
+so each one is fetched at most once.
+
+Handlers do not talk to the context directly; they go through the helpers
+below, passing their own fetch function / ``WebSocketClient`` factory. That
+keeps every module-level patch point working, and outside a click command
+(e.g. a handler called directly from a test) the helpers simply fetch.
+"""
+
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import click
+from click.globals import pop_context, push_context
+
+from . import agent, websocket
+from .cache import get_cache, instance_id
+
+# Registry datasets memoized by `get_registries`, keyed by short name
+REGISTRY_COMMANDS = {
+    'device': 'config/device_registry/list',
+    'entity': 'config/entity_registry/list',
+    'area': 'config/area_registry/list',
+    'label': 'config/label_registry/list',
+    'floor': 'config/floor_registry/list',
+}
+
+
+class HassContext:
+    """Shared WebSocket and memoized datasets for one hactl invocation."""
+
+    def __init__(self):
+        self._memo: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        # One lock per key being fetched: concurrent callers of the same key
+        # wait for the first fetch, different keys fetch in parallel
+        self._fetching: Dict[str, threading.RLock] = {}
+        # The WebSocket protocol is not thread-safe; one user at a time
+        self.ws_lock = threading.RLock()
+        self._ws = None
+        self._ws_key = None
+        self.stats = {'fetched': 0, 'shared': 0}
+
+    def memo(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Return the value memoized under `key`, calling `fetch()` on first use.
+
+        Failures are not memoized, so a later caller retries.
+
+        Args:
+            key: Dataset key (include the instance URL for REST data)
+            fetch: Zero-argument callable producing the value
+
+        Returns:
+            The memoized value
+        """
+        with self._lock:
+            if key in self._memo:
+                self.stats['shared'] += 1
+                return self._memo[key]
+            key_lock = self._fetching.setdefault(key, threading.RLock())
+        with key_lock:
+            with self._lock:
+                if key in self._memo:
+                    self.stats['shared'] += 1
+                    return self._memo[key]
+            value = fetch()
+            with self._lock:
+                self._memo[key] = value
+                self.stats['fetched'] += 1
+            return value
+
+    def has(self, key: str) -> bool:
+        """Whether `key` is already memoized."""
+        return key in self._memo
+
+    def invalidate(self, *keys: str) -> None:
+        """Forget memoized datasets (all of them when no keys are given)."""
+        with self._lock:
+            if not keys:
+                self._memo.clear()
+            for key in keys:
+                self._memo.pop(key, None)
+
+    def websocket(self, hass_url: str, hass_token: str, factory=None):
+        """
+        Return the shared, authenticated WebSocket for this invocation.
+
+        Connected on first use. A request for a different instance replaces
+        the shared socket.
+
+        Args:
+            hass_url: Home Assistant base URL
+            hass_token: Long-lived access token
+            factory: WebSocketClient class (or stand-in) to construct with
+
+        Returns:
+            A connected WebSocketClient
+        """
+        factory = factory or websocket.WebSocketClient
+        with self._lock:
+            key = (hass_url, hass_token)
+            if self._ws is not None and self._ws_key == key:
+                return self._ws
+            self._close_ws()
+            ws = factory(hass_url, hass_token)
+            ws.connect()
+            self._ws, self._ws_key = ws, key
+            return ws
+
+    def discard_websocket(self) -> None:
+        """Drop the shared WebSocket after an error so the next use reconnects."""
+        with self._lock:
+            self._close_ws()
+
+    def _close_ws(self) -> None:
+        ws, self._ws, self._ws_key = self._ws, None, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        """Close the shared WebSocket and drop memoized data."""
+        with self._lock:
+            self._close_ws()
+            self._memo.clear()
+
+
+def current_context() -> Optional[HassContext]:
+    """Return the active invocation's HassContext, or None outside a command."""
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return None
+    obj = ctx.find_object(dict)
+    if not obj:
+        return None
+    return obj.get('hass')
+
+
+def bind_context(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap `func` to run under the calling thread's click context.
+
+    Click keeps the current context per thread, so work handed to a thread
+    pool would otherwise lose the invocation's memo and shared WebSocket.
+
+    Args:
+        func: Callable to run on another thread
+
+    Returns:
+        A callable that pushes the captured context around `func`
+    """
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return func
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        push_context(ctx)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            pop_context()
+    return run
+
+
+def cached(key: str, fetch: Callable[[], Any]) -> Any:
+    """
+    Memoize `fetch()` under `key` for the current invocation.
+
+    Outside a click command this just calls `fetch()`.
+
+    Example:
+        states = cached(f'{hass_url}/api/states',
+                        lambda: make_api_request(f'{hass_url}/api/states', hass_token))
+    """
+    hass = current_context()
+    if hass is None:
+        return fetch()
+    return hass.memo(key, fetch)
+
+
+@contextmanager
+def shared_websocket(hass_url: str, hass_token: str, factory=None) -> Iterator[Any]:
+    """
+    Yield a connected WebSocket, shared across the invocation when possible.
+
+    Inside a command the socket stays open for later handlers and is closed
+    when the command finishes. Outside one, a private socket is opened and
+    closed around the block.
+
+    Args:
+        hass_url: Home Assistant base URL
+        hass_token: Long-lived access token
+        factory: WebSocketClient class to use (pass the handler module's
+            own name so patches of it still apply)
+    """
+    factory = factory or websocket.WebSocketClient
+    hass = current_context()
+    if hass is None:
+        ws = factory(hass_url, hass_token)
+        try:
+            ws.connect()
+            yield ws
+        finally:
+            ws.close()
+        return
+
+    with hass.ws_lock:
+        ws = hass.websocket(hass_url, hass_token, factory)
+        try:
+            yield ws
+        except websocket.WebSocketCallError:
+            # A failed call leaves the socket usable; a dead one does not
+            raise
+        except Exception:
+            hass.discard_websocket()
+            raise
+
+
+def cached_request(url: str, hass_token: str, request: Callable[..., Any]) -> Any:
+    """
+    GET `url` with `request(url, token)`, at most once per invocation.
+
+    Args:
+        url: Full REST URL; also the memo key
+        hass_token: Long-lived access token
+        request: The caller's `make_api_request` (module-level lookup, so
+            patches of it still apply)
+    """
+    return cached(url, lambda: request(url, hass_token))
+
+
+def cached_call(hass_url: str, hass_token: str, message_type: str, factory=None) -> Any:
+    """
+    Run an argument-less WebSocket list command at most once per invocation.
+
+    Args:
+        hass_url: Home Assistant base URL
+        hass_token: Long-lived access token
+        message_type: Command type (e.g. 'config/area_registry/list')
+        factory: WebSocketClient class to use
+    """
+    names = {command: name for name, command in REGISTRY_COMMANDS.items()}
+    if message_type in names:
+        mirrored = agent.query(hass_url, hass_token, 'registries', commands=[message_type])
+        if mirrored is not None and mirrored[0] is not None:
+            return cached(f'{hass_url}#{message_type}', lambda: mirrored[0])
+        if get_cache().enabled:
+            # Registries go through the persistent, event-revalidated cache
+            return get_registries(hass_url, hass_token, [names[message_type]], factory)[0]
+
+    def fetch():
+        with shared_websocket(hass_url, hass_token, factory) as ws:
+            return ws.call(message_type)
+    return cached(f'{hass_url}#{message_type}', fetch)
+
+
+def get_registries(hass_url: str, hass_token: str, names: Iterable[str],
+                   factory=None, optional: Iterable[str] = (),
+                   fresh: bool = False) -> List[Any]:
+    """
+    Fetch registries by short name, each at most once per invocation.
+
+    Registries not yet memoized are fetched together in one pipelined
+    round-trip over the shared WebSocket. With the on-disk cache enabled
+    they come from the persistent `RegistryCache`, which reuses the device
+    and entity registries for up to its max age.
+
+    Args:
+        hass_url: Home Assistant base URL
+        hass_token: Long-lived access token
+        names: Registry names from REGISTRY_COMMANDS (e.g. 'device', 'entity')
+        factory: WebSocketClient class to use
+        optional: Names whose failure (e.g. older HA without the label
+            registry) yields [] instead of raising
+        fresh: Bypass memoized and persistently cached copies; for
+            commands about to edit registries
+
+    Returns:
+        list: One registry list per name, in order
+
+    Raises:
+        click.ClickException: If a required registry cannot be fetched
+    """
+    names = list(names)
+    optional = set(optional)
+    hass = current_context()
+    keys = {name: f'{hass_url}#{REGISTRY_COMMANDS[name]}' for name in names}
+    if fresh and hass is not None:
+        hass.invalidate(*keys.values())
+    missing = [n for n in names if hass is None or not hass.has(keys[n])]
+
+    fetched = {}
+    if missing and not fresh:
+        # A running `hactl agent` already holds live registries
+        mirrored = agent.query(hass_url, hass_token, 'registries',
+                               commands=[REGISTRY_COMMANDS[n] for n in missing])
+        if mirrored is not None:
+            fetched = {n: r for n, r in zip(missing, mirrored) if r is not None}
+            missing = [n for n in missing if n not in fetched]
+    if missing:
+        cache = get_cache()
+        commands = [REGISTRY_COMMANDS[n] for n in missing]
+        with shared_websocket(hass_url, hass_token, factory) as ws:
+            if cache.enabled:
+                results = cache.registries.fetch(
+                    ws, instance_id(hass_url, hass_token), commands, fresh=fresh)
+            else:
+                results = ws.call_many(commands, return_exceptions=True)
+        for name, result in zip(missing, results):
+            if isinstance(result, Exception):
+                if name not in optional:
+                    raise result
+                result = []
+            fetched[name] = result or []
+
+    registries = []
+    for name in names:
+        if name in fetched:
+            value = fetched[name]
+            if hass is not None:
+                value = hass.memo(keys[name], lambda v=value: v)
+        else:
+            value = hass.memo(keys[name], lambda: [])
+        registries.append(value)
+    return registries
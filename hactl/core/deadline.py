@@ -0,0 +1,135 @@
+"""
+Timeouts, deadline budget and latency accounting for hactl network calls
+
+Every socket hactl opens used to block forever: a wedged Home Assistant
+made ``hactl doctor`` in cron hang and pile up processes. Two limits now
+apply to every REST and WebSocket operation:
+
+* a per-operation timeout (``--timeout`` / ``HACTL_TIMEOUT``), applied to
+  each connect and each blocking read; and
+* an optional overall deadline (``--deadline`` / ``HACTL_DEADLINE``) for
+  the whole command. Each operation's timeout is clamped to the budget
+  that is left, and once it is spent further calls fail immediately.
+
+Per-call latencies are recorded here as well, so ``hactl -v`` can name
+the slowest endpoints.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+DEFAULT_TIMEOUT = 30.0
+
+_lock = threading.Lock()
+_timeout: Optional[float] = None
+_deadline_at: Optional[float] = None
+_latency: Dict[str, List[float]] = {}
+
+
+class DeadlineExceeded(click.ClickException):
+    """The command's overall time budget (--deadline) is spent."""
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise click.ClickException(f'{name} must be a number of seconds, got {value!r}')
+
+
+def configure(timeout: Optional[float] = None, deadline: Optional[float] = None) -> None:
+    """
+    Set the per-operation timeout and the overall deadline budget.
+
+    Args:
+        timeout: Seconds allowed per connect/read (None: HACTL_TIMEOUT or
+            DEFAULT_TIMEOUT)
+        deadline: Total seconds allowed from now (None: HACTL_DEADLINE, or
+            no overall budget)
+    """
+    global _timeout, _deadline_at
+    if timeout is None:
+        timeout = _env_float('HACTL_TIMEOUT')
+    if deadline is None:
+        deadline = _env_float('HACTL_DEADLINE')
+    with _lock:
+        _timeout = timeout
+        _deadline_at = time.monotonic() + deadline if deadline else None
+
+
+def reset() -> None:
+    """Drop configured limits and recorded latencies."""
+    global _timeout, _deadline_at
+    with _lock:
+        _timeout = None
+        _deadline_at = None
+        _latency.clear()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the overall budget, or None when there is none."""
+    if _deadline_at is None:
+        return None
+    return _deadline_at - time.monotonic()
+
+
+def op_timeout() -> float:
+    """
+    Timeout to use for the next blocking network operation.
+
+    Returns:
+        float: The per-operation timeout, clamped to the remaining budget
+
+    Raises:
+        DeadlineExceeded: If the overall budget is already spent
+    """
+    timeout = _timeout if _timeout is not None else DEFAULT_TIMEOUT
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded('Deadline exceeded: the --deadline budget is spent')
+    return min(timeout, left)
+
+
+def record(label: str, seconds: float) -> None:
+    """Record the latency of one network call under `label`."""
+    with _lock:
+        _latency.setdefault(label, []).append(seconds)
+
+
+def latency_stats() -> Dict[str, Dict[str, float]]:
+    """Per-label latency aggregates: count, total, max and mean seconds."""
+    with _lock:
+        items = [(label, list(samples)) for label, samples in _latency.items()]
+    return {
+        label: {
+            'count': len(samples),
+            'total': sum(samples),
+            'max': max(samples),
+            'mean': sum(samples) / len(samples),
+        }
+        for label, samples in items
+    }
+
+
+def slowest(n: int = 5) -> List[Tuple[str, Dict[str, float]]]:
+    """The `n` labels with the highest total time spent."""
+    stats = latency_stats()
+    return sorted(stats.items(), key=lambda item: -item[1]['total'])[:n]
+
+
+def latency_summary(n: int = 5) -> str:
+    """Multi-line summary of the slowest endpoints (empty if none recorded)."""
+    lines = []
+    for label, s in slowest(n):
+        lines.append(f"{label}: {s['total']:.2f}s total over {s['count']} call(s), "
+                     f"max {s['max']:.2f}s")
+    return '\n'.join(lines)
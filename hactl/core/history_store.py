@@ -0,0 +1,373 @@
+"""
+Local, incremental time-series store for entity history
+
+Analyses over weeks of history used to re-download all of it on every
+run. `HistoryStore` keeps what was fetched in a SQLite file
+(``~/.hactl/history.db``, ``HACTL_HISTORY_DB`` to override), and a sync
+only fetches the gaps: the time since the last stored timestamp, and any
+earlier range asked for that was never fetched.
+
+Layout is one compact ``samples`` table keyed by (entity, ts):
+
+* numeric states are stored as REAL in ``value``;
+* other states go in ``text``, run-length encoded: a repeat of the
+  previous state extends the open run (``until``, ``count``) instead of
+  adding a row, so a binary sensor that reports ``off`` all week is one row.
+
+Coverage (``synced_from`` .. ``synced_until``) is tracked per entity, so
+readers know which part of a range still has to come from HA. Samples
+are kept per instance (base URL), so one file can serve several HAs.
+"""
+
+import heapq
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .history import DEFAULT_CHUNK, DEFAULT_WORKERS, iter_history_merged
+
+DEFAULT_HISTORY_DB = Path.home() / '.hactl' / 'history.db'
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY,
+    instance TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    synced_from REAL,
+    synced_until REAL,
+    UNIQUE (instance, entity_id)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    entity INTEGER NOT NULL REFERENCES entities(id) ON DELETE CASCADE,
+    ts REAL NOT NULL,
+    value REAL,
+    text TEXT,
+    until REAL NOT NULL,
+    count INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (entity, ts)
+) WITHOUT ROWID;
+"""
+
+# Plain decimal numbers only: float() would also take 'nan', 'inf', '1_0'
+_NUMERIC = re.compile(r'^-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?$')
+
+# SQLite host parameter limit is 999 on older builds
+_IN_BATCH = 500
+
+
+def default_path() -> Path:
+    """The store file: $HACTL_HISTORY_DB or ~/.hactl/history.db."""
+    override = os.environ.get('HACTL_HISTORY_DB')
+    return Path(override).expanduser() if override else DEFAULT_HISTORY_DB
+
+
+def instance_key(hass_url: str) -> str:
+    """Samples are shared by every token for the same base URL."""
+    parts = urlsplit(hass_url)
+    return f'{parts.scheme}://{parts.netloc}'.lower()
+
+
+def _epoch(when: datetime) -> float:
+    return when.timestamp()
+
+
+def _datetime(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, timezone.utc)
+
+
+def _parse_ts(value: Any) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def encode_state(state: Any) -> Tuple[Optional[float], Optional[str]]:
+    """(value, text): numeric states as a float, everything else as text."""
+    text = '' if state is None else str(state)
+    if _NUMERIC.match(text):
+        return float(text), None
+    return None, text
+
+
+def decode_state(value: Optional[float], text: Optional[str]) -> str:
+    if text is not None:
+        return text
+    # '21.0' -> '21'; trailing zeros of the original string are not kept
+    rendered = repr(value)
+    return rendered[:-2] if rendered.endswith('.0') else rendered
+
+
+class HistoryStore:
+    """
+    SQLite-backed history for one Home Assistant instance.
+
+    Args:
+        hass_url: Instance the samples belong to
+        path: Database file (default: `default_path()`)
+    """
+
+    def __init__(self, hass_url: str, path: Optional[Path] = None, read_only: bool = False):
+        self.path = Path(path) if path else default_path()
+        self.instance = instance_key(hass_url)
+        self.hass_url = hass_url
+        self.read_only = read_only
+        self._open_runs: Dict[int, Tuple[float, str]] = {}
+        if read_only:
+            # Readers (the delete safety check) must not touch the file:
+            # no schema setup, no journal mode change, no commits
+            self.db = sqlite3.connect(f'{self.path.resolve().as_uri()}?mode=ro', uri=True)
+            self.db.execute('SELECT 1 FROM entities LIMIT 1')
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.path.exists()
+        self.db = sqlite3.connect(str(self.path))
+        if new:
+            os.chmod(self.path, 0o600)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.executescript(_SCHEMA)
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+        self.db.commit()
+
+    @classmethod
+    def open_existing(cls, hass_url: str, path: Optional[Path] = None) -> Optional['HistoryStore']:
+        """
+        The store opened read-only if its file exists, else None.
+
+        Never creates or modifies the file; a file that is not a history
+        store (or cannot be read) also gives None.
+        """
+        path = Path(path) if path else default_path()
+        if not path.exists():
+            return None
+        try:
+            return cls(hass_url, path, read_only=True)
+        except sqlite3.Error:
+            return None
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> 'HistoryStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # -- bookkeeping ------------------------------------------------------
+
+    def _entity_pk(self, entity_id: str) -> int:
+        self.db.execute('INSERT OR IGNORE INTO entities (instance, entity_id) VALUES (?, ?)',
+                        (self.instance, entity_id))
+        return self.db.execute('SELECT id FROM entities WHERE instance = ? AND entity_id = ?',
+                               (self.instance, entity_id)).fetchone()[0]
+
+    def entity_ids(self) -> List[str]:
+        """Entities with stored history for this instance."""
+        rows = self.db.execute('SELECT entity_id FROM entities WHERE instance = ? '
+                               'ORDER BY entity_id', (self.instance,))
+        return [row[0] for row in rows]
+
+    def coverage(self, entity_ids: Optional[Iterable[str]] = None
+                 ) -> Dict[str, Tuple[Optional[datetime], Optional[datetime], int]]:
+        """entity_id -> (synced_from, synced_until, stored rows)."""
+        rows = self.db.execute(
+            'SELECT e.entity_id, e.synced_from, e.synced_until, COUNT(s.ts) '
+            'FROM entities e LEFT JOIN samples s ON s.entity = e.id '
+            'WHERE e.instance = ? GROUP BY e.id ORDER BY e.entity_id', (self.instance,))
+        wanted = set(entity_ids) if entity_ids is not None else None
+        return {eid: (_datetime(f) if f is not None else None,
+                      _datetime(u) if u is not None else None, n)
+                for eid, f, u, n in rows if wanted is None or eid in wanted}
+
+    def gaps(self, entity_ids: Iterable[str], start: datetime, end: datetime
+             ) -> List[Tuple[datetime, datetime, bool, List[str]]]:
+        """
+        The ranges still to fetch for [start, end), grouped so that entities
+        with the same gap share requests.
+
+        Gaps always adjoin the stored range, so coverage stays one
+        contiguous interval: a request that starts after (or ends before)
+        it is widened to reach it.
+
+        Returns:
+            list: (gap_start, gap_end, skip_initial_state, [entity_id, ...])
+        """
+        coverage = self.coverage(entity_ids)
+        groups: Dict[Tuple[float, float, bool], List[str]] = {}
+        for entity_id in sorted(set(entity_ids)):
+            synced_from, synced_until, _ = coverage.get(entity_id, (None, None, 0))
+            if synced_from is None or synced_until is None:
+                pieces = [(start, end, False)]
+            else:
+                pieces = []
+                if start < synced_from:
+                    pieces.append((start, synced_from, False))
+                if synced_until < end:
+                    # Always from synced_until, even if `start` is later:
+                    # coverage is one interval, so a gap left between the
+                    # stored range and `start` would be claimed as covered.
+                    # The state at synced_until is already stored.
+                    pieces.append((synced_until, end, True))
+            for gap_start, gap_end, skip in pieces:
+                if gap_end - gap_start < timedelta(seconds=1):
+                    continue
+                key = (round(_epoch(gap_start), 3), round(_epoch(gap_end), 3), skip)
+                groups.setdefault(key, []).append(entity_id)
+        return [(_datetime(s), _datetime(e), skip, ids)
+                for (s, e, skip), ids in sorted(groups.items())]
+
+    # -- writing ------------------------------------------------------------
+
+    def _last_run(self, pk: int) -> Optional[Tuple[float, str]]:
+        row = self.db.execute('SELECT ts, text FROM samples WHERE entity = ? '
+                              'ORDER BY ts DESC LIMIT 1', (pk,)).fetchone()
+        return (row[0], row[1]) if row and row[1] is not None else None
+
+    def add(self, pk: int, ts: float, state: Any) -> bool:
+        """
+        Store one sample. Returns False if it only extended a text run.
+
+        Samples of one entity must arrive in time order for run-length
+        encoding to apply.
+        """
+        value, text = encode_state(state)
+        run = self._open_runs.get(pk)
+        if text is not None and run is not None and run[1] == text and ts >= run[0]:
+            self.db.execute('UPDATE samples SET until = MAX(until, ?), count = count + 1 '
+                            'WHERE entity = ? AND ts = ?', (ts, pk, run[0]))
+            return False
+        self.db.execute('INSERT OR REPLACE INTO samples (entity, ts, value, text, until) '
+                        'VALUES (?, ?, ?, ?, ?)', (pk, ts, value, text, ts))
+        if text is not None:
+            self._open_runs[pk] = (ts, text)
+        else:
+            self._open_runs.pop(pk, None)
+        return True
+
+    def _mark_synced(self, pk: int, start: datetime, end: datetime) -> None:
+        self.db.execute(
+            'UPDATE entities SET synced_from = MIN(COALESCE(synced_from, ?), ?), '
+            'synced_until = MAX(COALESCE(synced_until, ?), ?) WHERE id = ?',
+            (_epoch(start), _epoch(start), _epoch(end), _epoch(end), pk))
+
+    def sync(self, hass_token: str, entity_ids: Iterable[str], start: datetime,
+             end: Optional[datetime] = None, workers: int = DEFAULT_WORKERS,
+             chunk: timedelta = DEFAULT_CHUNK) -> Dict[str, int]:
+        """
+        Fetch and store only the parts of [start, end) not stored yet.
+
+        Each gap group is committed on its own, so an interrupted sync keeps
+        what it finished and resumes from there.
+
+        Returns:
+            dict: entities, gaps, samples (received) and rows (added)
+        """
+        end = end or datetime.now(timezone.utc)
+        entity_ids = sorted(set(entity_ids))
+        gaps = self.gaps(entity_ids, start, end)
+        stats = {'entities': len(entity_ids), 'gaps': len(gaps), 'samples': 0, 'rows': 0}
+        for gap_start, gap_end, skip_initial, ids in gaps:
+            pks = {entity_id: self._entity_pk(entity_id) for entity_id in ids}
+            # Runs continue across a tail gap; a head gap ends before them
+            self._open_runs = {}
+            if skip_initial:
+                for pk in pks.values():
+                    run = self._last_run(pk)
+                    if run is not None:
+                        self._open_runs[pk] = run
+            try:
+                for state in iter_history_merged(
+                        self.hass_url, hass_token, ids, gap_start, gap_end, chunk=chunk,
+                        workers=workers, minimal_response=True, no_attributes=True,
+                        significant_changes_only=False, skip_initial_state=skip_initial):
+                    pk = pks.get(state.get('entity_id'))
+                    ts = _parse_ts(state.get('last_changed') or state.get('last_updated'))
+                    if pk is None or ts is None:
+                        continue
+                    stats['samples'] += 1
+                    stats['rows'] += self.add(pk, ts, state.get('state'))
+                for pk in pks.values():
+                    self._mark_synced(pk, gap_start, gap_end)
+            except BaseException:
+                self.db.rollback()
+                raise
+            self.db.commit()
+        return stats
+
+    # -- reading ------------------------------------------------------------
+
+    def _pks(self, entity_ids: Iterable[str]) -> Dict[int, str]:
+        pks = {}
+        ids = sorted(set(entity_ids))
+        for i in range(0, len(ids), _IN_BATCH):
+            batch = ids[i:i + _IN_BATCH]
+            rows = self.db.execute(
+                f"SELECT id, entity_id FROM entities WHERE instance = ? "
+                f"AND entity_id IN ({','.join('?' * len(batch))})", (self.instance, *batch))
+            pks.update(rows)
+        return pks
+
+    def query(self, entity_ids: Iterable[str], start: datetime,
+              end: datetime) -> Iterator[Dict[str, Any]]:
+        """
+        Stored states in [start, end), oldest first.
+
+        Like the history API, each entity starts with its state at `start`
+        (reported at `start`) when one is stored from before the range.
+        """
+        pks = self._pks(entity_ids)
+        lo, hi = _epoch(start), _epoch(end)
+        initial = []
+        for pk, entity_id in sorted(pks.items(), key=lambda item: item[1]):
+            row = self.db.execute('SELECT value, text FROM samples WHERE entity = ? AND ts < ? '
+                                  'ORDER BY ts DESC LIMIT 1', (pk, lo)).fetchone()
+            if row is not None:
+                initial.append({'entity_id': entity_id, 'state': decode_state(*row),
+                                'last_changed': start.isoformat()})
+        yield from initial
+
+        def rows(batch):
+            cursor = self.db.execute(
+                f"SELECT ts, entity, value, text FROM samples WHERE ts >= ? AND ts < ? "
+                f"AND entity IN ({','.join('?' * len(batch))}) ORDER BY ts, entity",
+                (lo, hi, *batch))
+            for ts, pk, value, text in cursor:
+                yield ts, pks[pk], value, text
+
+        pk_list = sorted(pks)
+        batches = [pk_list[i:i + _IN_BATCH] for i in range(0, len(pk_list), _IN_BATCH)]
+        for ts, entity_id, value, text in heapq.merge(*(rows(b) for b in batches)):
+            yield {'entity_id': entity_id, 'state': decode_state(value, text),
+                   'last_changed': _datetime(ts).isoformat()}
+
+    def recent_activity(self, entity_id: str, start: datetime, end: datetime,
+                        dead_states: Iterable[str]) -> Tuple[bool, Optional[datetime]]:
+        """
+        Look for a live (non-dead) state in [start, end) without calling HA.
+
+        Returns:
+            tuple: (found, covered_until). `found` is only trustworthy
+            within the stored coverage. `covered_until` is where it ends,
+            or None if the store does not cover `start`; the caller still
+            has to check (covered_until, end] against HA.
+        """
+        synced_from, synced_until, _ = self.coverage([entity_id]).get(entity_id,
+                                                                       (None, None, 0))
+        if synced_from is None or synced_from > start or synced_until <= start:
+            return False, None
+        dead = set(dead_states)
+        for state in self.query([entity_id], start, min(end, synced_until)):
+            if state['state'] not in dead:
+                return True, synced_until
+        return False, synced_until
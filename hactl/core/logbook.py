@@ -0,0 +1,190 @@
+"""
+Single-pass, streaming aggregation of the logbook
+
+A day of ``/api/logbook`` on a busy install runs to tens of megabytes, and
+the handlers that read it (activity, actions, history, error-log) only
+need counts, a histogram and a few short lists. `scan_logbook` streams
+the entries one at a time and feeds each to every aggregator in a single
+pass, so memory is bounded by the number of distinct entities, not by the
+length of the window.
+
+Narrowing is left to HA: the time range is the URL timestamp plus
+``end_time``, and ``entity`` / ``context_id`` become query parameters.
+"""
+
+import heapq
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import click
+
+from .api import iter_api_array
+from .history import parse_time
+
+DEFAULT_PERIOD = timedelta(hours=24)
+
+Entry = Dict[str, Any]
+
+ERROR_KEYWORDS = ('error', 'failed', 'unavailable', 'exception')
+
+
+def logbook_window(since: Optional[str] = None, until: Optional[str] = None,
+                   now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """
+    Resolve --since/--until into a (start, end) pair.
+
+    Args:
+        since: ISO timestamp or relative age (default: 24h before `until`)
+        until: ISO timestamp or relative age (default: now)
+        now: Reference time (default: now)
+    """
+    now = now or datetime.now(timezone.utc)
+    end = parse_time(until, now) if until else now
+    start = parse_time(since, now) if since else end - DEFAULT_PERIOD
+    if start >= end:
+        raise click.BadParameter('--since must be before --until')
+    return start, end
+
+
+def logbook_url(hass_url: str, start: datetime, end: Optional[datetime] = None,
+                entity_ids: Iterable[str] = (), context_id: Optional[str] = None) -> str:
+    """Build a /api/logbook URL that lets HA do the filtering."""
+    entity_ids = list(entity_ids or ())
+    if entity_ids and context_id:
+        # HA answers 400 to this combination
+        raise click.ClickException('Filter the logbook by entity or by context, not both')
+    params = []
+    if end is not None:
+        params.append(f"end_time={quote(end.isoformat())}")
+    if entity_ids:
+        params.append(f"entity={','.join(entity_ids)}")
+    if context_id:
+        params.append(f"context_id={quote(context_id)}")
+    url = f"{hass_url}/api/logbook/{quote(start.isoformat())}"
+    return f"{url}?{'&'.join(params)}" if params else url
+
+
+def iter_logbook(hass_url: str, hass_token: str, start: datetime,
+                 end: Optional[datetime] = None, entity_ids: Iterable[str] = (),
+                 context_id: Optional[str] = None) -> Iterator[Entry]:
+    """Stream logbook entries, oldest first, one at a time."""
+    url = logbook_url(hass_url, start, end, entity_ids, context_id)
+    for entry in iter_api_array(url, hass_token):
+        if isinstance(entry, dict):
+            yield entry
+
+
+class Aggregator(ABC):
+    """Sees every entry once through `add`; summarises at the end."""
+
+    @abstractmethod
+    def add(self, entry: Entry) -> None:
+        """Fold one logbook entry into the summary."""
+
+
+class ActivityCounts(Aggregator):
+    """Entries per entity and per domain (domain taken from the entity id)."""
+
+    def __init__(self):
+        self.total = 0
+        self.entities: Counter = Counter()
+        self.domains: Counter = Counter()
+
+    def add(self, entry):
+        entity_id = entry.get('entity_id') or 'unknown'
+        self.total += 1
+        self.entities[entity_id] += 1
+        self.domains[entity_id.split('.')[0] if '.' in entity_id else 'unknown'] += 1
+
+    def most_active(self, n: int) -> List[Tuple[str, int]]:
+        """The `n` busiest entities, busiest first (ties in first-seen order)."""
+        return heapq.nlargest(n, self.entities.items(), key=itemgetter(1))
+
+    def busiest_domains(self, n: int) -> List[Tuple[str, int]]:
+        return heapq.nlargest(n, self.domains.items(), key=itemgetter(1))
+
+
+class HourlyHistogram(Aggregator):
+    """Entries per hour of day, from each entry's `when` timestamp."""
+
+    def __init__(self):
+        self.hours: Counter = Counter()
+
+    def add(self, entry):
+        when = entry.get('when')
+        if not when:
+            return
+        try:
+            self.hours[datetime.fromisoformat(when.replace('Z', '+00:00')).hour] += 1
+        except (ValueError, TypeError, AttributeError):
+            pass
+
+    def result(self) -> List[Dict[str, int]]:
+        return [{'hour': hour, 'count': count} for hour, count in sorted(self.hours.items())]
+
+
+class Matching(Aggregator):
+    """
+    Count the entries a predicate accepts and keep the first `limit` of them.
+
+    Args:
+        predicate: Entry -> bool
+        limit: Entries kept (the count covers all of them)
+        project: Entry -> stored record (default: the entry itself)
+    """
+
+    def __init__(self, predicate: Callable[[Entry], bool], limit: int = 100,
+                 project: Optional[Callable[[Entry], Any]] = None):
+        self.predicate = predicate
+        self.limit = limit
+        self.project = project
+        self.count = 0
+        self.items: List[Any] = []
+
+    def add(self, entry):
+        if not self.predicate(entry):
+            return
+        self.count += 1
+        if len(self.items) < self.limit:
+            self.items.append(self.project(entry) if self.project else entry)
+
+
+def is_service_call(entry: Entry) -> bool:
+    context = entry.get('context')
+    return ((isinstance(context, dict) and context.get('event_type') == 'call_service')
+            or 'service' in (entry.get('name') or '').lower())
+
+
+def in_domain(domain: str) -> Callable[[Entry], bool]:
+    """Predicate: the entry's entity id belongs to `domain`."""
+    prefix = f'{domain}.'
+    return lambda entry: (entry.get('entity_id') or '').startswith(prefix)
+
+
+def is_error_like(entry: Entry) -> bool:
+    name = (entry.get('name') or '').lower()
+    return any(keyword in name for keyword in ERROR_KEYWORDS)
+
+
+def everything(entry: Entry) -> bool:
+    return True
+
+
+def scan_logbook(entries: Iterable[Entry], *aggregators: Aggregator) -> int:
+    """
+    Feed every entry to every aggregator in one pass.
+
+    Returns:
+        int: Number of entries seen
+    """
+    count = 0
+    adders = [aggregator.add for aggregator in aggregators]
+    for entry in entries:
+        count += 1
+        for add in adders:
+            add(entry)
+    return count
@@ -0,0 +1,225 @@
+"""
+Compiled first-match rule tables for classifying entities
+
+``hactl doctor`` sorts unavailable/unknown entities into categories with an
+ordered list of keyword rules ("contains 'iphone' and is unavailable ->
+mobile"). Evaluated naively that is one substring scan per keyword per
+rule, for every entity; after a network blip there are thousands of them.
+
+`RuleSet` compiles the rules once. Per (domain, state) pair it keeps only
+the rules whose filters pass and flattens them into:
+
+* one de-duplicated keyword tuple in rule order, scanned until the first
+  hit (which is then the earliest matching keyword rule);
+* a prefix table keyed by prefix length for the object-id prefix rules,
+  whose hit bounds how far the keyword scan has to go.
+
+The answer is the lowest-numbered matching rule, which is what the
+original top-to-bottom evaluation returns, without re-checking state and
+domain filters or scanning duplicate keywords for every entity.
+
+Rules can also come from a user file (YAML or JSON)::
+
+    rules:
+      - category: lab_bench
+        label: lab bench entities (powered off)
+        contains: [bench_]
+        states: [unavailable]
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import click
+
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+    yaml = None
+
+_NO_MATCH = float('inf')
+
+
+class Rule:
+    """
+    One classification rule.
+
+    A rule applies when the entity's state and domain pass the (optional)
+    `states` / `domains` filters and, if it has any patterns, at least one
+    `contains` keyword occurs in the lower-cased entity id or the object id
+    (the part after the dot) starts with one of `prefixes`.
+
+    Args:
+        category: Category returned on a match
+        contains: Substrings of the lower-cased entity id
+        prefixes: Prefixes of the object id (case-sensitive)
+        domains: Only entities of these domains
+        states: Only entities in these states
+        label: Human-readable description for reports (optional)
+    """
+
+    FIELDS = ('category', 'contains', 'prefixes', 'domains', 'states', 'label')
+
+    def __init__(self, category: str, contains: Iterable[str] = (),
+                 prefixes: Iterable[str] = (), domains: Iterable[str] = (),
+                 states: Iterable[str] = (), label: Optional[str] = None):
+        self.category = category
+        self.contains = tuple(k.lower() for k in contains)
+        self.prefixes = tuple(prefixes)
+        self.domains = frozenset(domains)
+        self.states = frozenset(states)
+        self.label = label
+
+    @property
+    def unconditional(self) -> bool:
+        """True if the rule has no patterns (filters alone decide)."""
+        return not self.contains and not self.prefixes
+
+    def applies(self, domain: str, state: str) -> bool:
+        return ((not self.states or state in self.states)
+                and (not self.domains or domain in self.domains))
+
+    def __repr__(self) -> str:
+        return f"Rule({self.category!r})"
+
+
+class _Matcher:
+    """Compiled rules for one (domain, state) pair."""
+
+    __slots__ = ('unconditional', 'keywords', 'prefixes', 'lengths')
+
+    def __init__(self, indexed_rules):
+        self.unconditional = _NO_MATCH
+        keywords: Dict[str, int] = {}
+        self.prefixes: Dict[str, int] = {}
+        for index, rule in indexed_rules:
+            if rule.unconditional:
+                self.unconditional = min(self.unconditional, index)
+                continue
+            for keyword in rule.contains:
+                keywords.setdefault(keyword, index)
+            for prefix in rule.prefixes:
+                self.prefixes.setdefault(prefix, index)
+        # Rule order, so the first hit is the earliest keyword rule
+        self.keywords: Tuple[Tuple[str, int], ...] = tuple(
+            (k, i) for k, i in sorted(keywords.items(), key=lambda item: item[1])
+            if i < self.unconditional)
+        self.lengths = sorted({len(p) for p in self.prefixes})
+
+    def best(self, entity_lower: str, object_id: str) -> float:
+        best = self.unconditional
+        if self.prefixes:
+            prefixes = self.prefixes
+            for length in self.lengths:
+                index = prefixes.get(object_id[:length], _NO_MATCH)
+                if index < best:
+                    best = index
+        for keyword, index in self.keywords:
+            if index >= best:
+                break
+            if keyword in entity_lower:
+                return index
+        return best
+
+
+class RuleSet:
+    """
+    Ordered rules compiled into per-(domain, state) matchers.
+
+    Args:
+        rules: Rules in priority order (first match wins)
+        default: Category when no rule matches
+    """
+
+    def __init__(self, rules: Iterable[Rule], default: str):
+        self.rules: List[Rule] = list(rules)
+        self.default = default
+        self._matchers: Dict[Tuple[str, str], _Matcher] = {}
+
+    def _matcher(self, domain: str, state: str) -> _Matcher:
+        key = (domain, state)
+        matcher = self._matchers.get(key)
+        if matcher is None:
+            matcher = _Matcher((i, r) for i, r in enumerate(self.rules) if r.applies(domain, state))
+            self._matchers[key] = matcher
+        return matcher
+
+    def classify(self, entity_id: str, state: str) -> str:
+        """Return the category of the first rule matching the entity."""
+        domain, dot, object_id = entity_id.partition('.')
+        if not dot:
+            domain, object_id = '', entity_id
+        matcher = self._matchers.get((domain, state)) or self._matcher(domain, state)
+        best = matcher.best(entity_id.lower(), object_id)
+        return self.default if best == _NO_MATCH else self.rules[best].category
+
+    def labels(self) -> Dict[str, str]:
+        """Category -> label for rules that define one (first rule wins)."""
+        labels: Dict[str, str] = {}
+        for rule in self.rules:
+            if rule.label:
+                labels.setdefault(rule.category, rule.label)
+        return labels
+
+
+def _string_list(value: Any, field: str, path: Path) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return value
+    raise click.ClickException(f"{path}: '{field}' must be a string or a list of strings")
+
+
+def load_rules(path) -> List[Rule]:
+    """
+    Read user rules from a YAML or JSON file.
+
+    Args:
+        path: File with a top-level ``rules`` list (or just the list)
+
+    Returns:
+        list: Rules in file order
+
+    Raises:
+        click.ClickException: If the file cannot be read or is malformed
+    """
+    path = Path(path).expanduser()
+    try:
+        text = path.read_text()
+    except OSError as e:
+        raise click.ClickException(f"Could not read rules file {path}: {e}")
+    try:
+        if path.suffix == '.json' or not HAS_YAML:
+            data = json.loads(text)
+        else:
+            data = yaml.safe_load(text)
+    except ValueError as e:
+        raise click.ClickException(f"Could not parse rules file {path}: {e}")
+    except Exception as e:  # yaml.YAMLError
+        raise click.ClickException(f"Could not parse rules file {path}: {e}")
+
+    entries = data.get('rules') if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise click.ClickException(f"{path}: expected a 'rules' list")
+    rules = []
+    for number, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict) or not isinstance(entry.get('category'), str):
+            raise click.ClickException(f"{path}: rule {number} needs a 'category'")
+        unknown = set(entry) - set(Rule.FIELDS)
+        if unknown:
+            raise click.ClickException(
+                f"{path}: rule {number} has unknown field(s): {', '.join(sorted(unknown))}")
+        rules.append(Rule(
+            entry['category'],
+            contains=_string_list(entry.get('contains'), 'contains', path),
+            prefixes=_string_list(entry.get('prefixes'), 'prefixes', path),
+            domains=_string_list(entry.get('domains'), 'domains', path),
+            states=_string_list(entry.get('states'), 'states', path),
+            label=entry.get('label'),
+        ))
+    return rules
@@ -0,0 +1,493 @@
+"""
+Pooled keep-alive HTTP session for hactl
+
+Every REST call used to go through ``urllib.request.urlopen``, which opens
+a fresh TCP (+TLS) connection per request. A single ``hactl doctor`` or
+``hactl memory sync`` issues dozens of calls against the same host, so most
+of the wall-clock time went to handshakes. ``HassSession`` keeps idle
+``http.client`` connections around per ``(scheme, host, port)`` and hands
+them back out, so a whole command runs over one connection per host.
+"""
+
+import http.client
+import json
+import random
+import socket
+import ssl
+import threading
+import time
+import urllib.request
+import zlib
+from typing import Optional, Dict, Any, Iterator, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import click
+
+from . import deadline
+
+
+# Browser-shaped UA: Cloudflare's WAF returns 1010 on the default
+# `Python-urllib/<ver>` UA when DNS for HASS_URL falls back to a CF
+# edge IP (e.g. AdGuard split-horizon temporarily unreachable).
+USER_AGENT = 'Mozilla/5.0 (hactl)'
+
+# Idle connections kept per host. Sequential commands only ever use one;
+# the extra slots let concurrent callers (thread pools) keep theirs too.
+MAX_IDLE_PER_HOST = 4
+
+# Home Assistant (aiohttp) compresses JSON bodies when asked. /api/states
+# and /api/logbook shrink roughly 10x, which dominates latency over VPN or
+# tethered links.
+ACCEPT_ENCODING = 'gzip, deflate'
+READ_CHUNK_SIZE = 64 * 1024
+
+MAX_REDIRECTS = 5
+_REDIRECT_CODES = frozenset([301, 302, 303, 307, 308])
+
+# Errors that mean a pooled keep-alive socket was closed by the server
+# (or a proxy) while it sat idle. Such a failure is replayed once on a fresh
+# connection only if HA cannot have acted on the request: it failed while
+# the request was still being written, or the method is idempotent. Once a
+# POST has been sent, a reset may just as well mean HA ran it.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+    ConnectionAbortedError,
+)
+
+
+# Idempotent requests are retried with capped, fully-jittered exponential
+# backoff when HA (or the reverse proxy in front of it) is briefly away:
+# gateway errors while it restarts, or a reset connection. Timeouts are
+# never retried: a wedged instance would just multiply the wait.
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.25
+RETRY_BACKOFF_MAX = 4.0
+_RETRY_STATUSES = frozenset([502, 503, 504])
+_IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+_RETRY_ERRORS = (ConnectionError, http.client.RemoteDisconnected)
+
+_sleep = time.sleep
+
+
+class HassHTTPError(click.ClickException):
+    """Home Assistant answered with an HTTP error status (>= 400)."""
+
+    def __init__(self, code: int, reason: str, body: str = ''):
+        message = f'HTTP {code} {reason}'
+        if body:
+            message += f'\nResponse: {body}'
+        super().__init__(message)
+        self.code = code
+        self.reason = reason
+        self.body = body
+
+
+class HassResponse:
+    """Fully-read HTTP response."""
+
+    def __init__(self, status: int, reason: str, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def text(self) -> str:
+        """Return the body decoded as UTF-8."""
+        return self.body.decode()
+
+    def json(self) -> Any:
+        """Return the body parsed as JSON."""
+        return json.loads(self.body.decode())
+
+
+class HassSession:
+    """Keep-alive HTTP session shared by every handler during a command.
+
+    Thread-safe: a connection is checked out for the duration of one
+    request, so concurrent callers never share a socket.
+    """
+
+    def __init__(self, max_idle_per_host: int = MAX_IDLE_PER_HOST):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[Tuple[str, str, int], list] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'connections_opened': 0,
+            'connections_reused': 0,
+            'bytes_received': 0,
+            'bytes_decoded': 0,
+            'retries': 0,
+        }
+
+    # -- connection pool ---------------------------------------------------
+
+    @staticmethod
+    def _pool_key(parts) -> Tuple[str, str, int]:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        return parts.scheme, parts.hostname, port
+
+    @staticmethod
+    def _proxy_for(key: Tuple[str, str, int]) -> Optional[str]:
+        """Return the proxy URL from the environment for `key`, if any."""
+        scheme, host, _port = key
+        proxy = urllib.request.getproxies().get(scheme)
+        if proxy and urllib.request.proxy_bypass(host):
+            return None
+        return proxy
+
+    def _new_connection(self, key: Tuple[str, str, int]) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        proxy = self._proxy_for(key)
+
+        if proxy:
+            proxy_parts = urlsplit(proxy if '://' in proxy else f'http://{proxy}')
+            connect_host = proxy_parts.hostname
+            connect_port = proxy_parts.port or 80
+        else:
+            connect_host, connect_port = host, port
+
+        timeout = deadline.op_timeout()
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(
+                connect_host, connect_port, timeout=timeout,
+                context=ssl.create_default_context())
+        else:
+            conn = http.client.HTTPConnection(connect_host, connect_port,
+                                              timeout=timeout)
+        if proxy and scheme == 'https':
+            conn.set_tunnel(host, port)
+
+        with self._lock:
+            self.stats['connections_opened'] += 1
+        return conn
+
+    def _acquire(self, key: Tuple[str, str, int]) -> Tuple[http.client.HTTPConnection, bool]:
+        """Check out an idle connection for `key`, or open a new one."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats['connections_reused'] += 1
+                return idle.pop(), True
+        return self._new_connection(key), False
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        """Return a connection to the pool (or close it if the pool is full)."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+
+    # -- requests ----------------------------------------------------------
+
+    def _send(self, method: str, url: str, token: str,
+              body: Optional[bytes],
+              headers: Optional[Dict[str, str]]):
+        """Send a request and read the status line and headers.
+
+        Returns (key, conn, response, response_headers). The body is left
+        unread on the checked-out connection; `_iter_body` consumes it and
+        hands the connection back to the pool.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise click.ClickException(f'Unsupported scheme in URL: {url}')
+        key = self._pool_key(parts)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        if parts.scheme == 'http' and self._proxy_for(key):
+            # Plain-HTTP proxies expect the absolute-form request target.
+            target = url
+
+        request_headers = {
+            'Host': parts.netloc,
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json',
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': ACCEPT_ENCODING,
+        }
+        if headers:
+            request_headers.update(headers)
+
+        with self._lock:
+            self.stats['requests'] += 1
+
+        while True:
+            conn, reused = self._acquire(key)
+            # Every send and read on this connection is bounded by the
+            # per-operation timeout, clamped to the remaining deadline.
+            timeout = deadline.op_timeout()
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            sent = False
+            try:
+                conn.request(method, target, body=body, headers=request_headers)
+                sent = True
+                response = conn.getresponse()
+            except _STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused and (not sent or method in _IDEMPOTENT_METHODS):
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            break
+
+        response_headers = {k.lower(): v for k, v in response.getheaders()}
+        return key, conn, response, response_headers
+
+    def _iter_body(self, key, conn, response, response_headers) -> Iterator[bytes]:
+        """Yield the decoded response body in chunks.
+
+        Decompression is incremental, so a multi-megabyte gzip body never
+        sits in memory twice. The connection goes back to the pool once the
+        body has been read to the end.
+        """
+        decoder = _make_decoder(response_headers.get('content-encoding'))
+        try:
+            while True:
+                deadline.op_timeout()  # stop between chunks once the budget is spent
+                chunk = response.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                decoded = decoder.decompress(chunk) if decoder else chunk
+                self._count(len(chunk), len(decoded))
+                if decoded:
+                    yield decoded
+            if decoder:
+                tail = decoder.flush()
+                self._count(0, len(tail))
+                if tail:
+                    yield tail
+        except BaseException:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+
+    def _count(self, wire: int, decoded: int) -> None:
+        with self._lock:
+            self.stats['bytes_received'] += wire
+            self.stats['bytes_decoded'] += decoded
+
+    def _open(self, method: str, url: str, token: str,
+              body: Optional[bytes] = None,
+              headers: Optional[Dict[str, str]] = None):
+        """Send a request, follow redirects and raise on error statuses.
+
+        Returns (key, conn, response, response_headers) with the success
+        body still unread.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            key, conn, response, response_headers = self._send(
+                method, url, token, body, headers)
+            status = response.status
+            location = response_headers.get('location')
+            if status in _REDIRECT_CODES and location:
+                # Drain the redirect body so the connection can be reused.
+                for _chunk in self._iter_body(key, conn, response, response_headers):
+                    pass
+                if status == 303:
+                    method, body = 'GET', None
+                url = urljoin(url, location)
+                continue
+            if status >= 400:
+                data = b''.join(self._iter_body(key, conn, response, response_headers))
+                raise HassHTTPError(status, response.reason,
+                                    data.decode(errors='replace'))
+            return key, conn, response, response_headers
+        raise click.ClickException(f'Too many redirects for {url}')
+
+    def _retrying(self, method: str, url: str, attempt_fn):
+        """Run `attempt_fn()`, retrying idempotent requests on transient failures.
+
+        Retries GET/HEAD/OPTIONS up to MAX_RETRIES times on 502/503/504 and
+        on reset connections, sleeping with full jitter between attempts.
+        A retry that would not fit in the remaining deadline is not tried.
+        Timeouts are turned into a click.ClickException naming the URL.
+        """
+        attempt = 0
+        while True:
+            try:
+                return attempt_fn()
+            except (HassHTTPError, *_RETRY_ERRORS) as e:
+                transient = (not isinstance(e, HassHTTPError)
+                             or e.code in _RETRY_STATUSES)
+                if (not transient or method not in _IDEMPOTENT_METHODS
+                        or attempt >= MAX_RETRIES):
+                    raise
+                delay = random.uniform(
+                    0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * (2 ** attempt)))
+                left = deadline.remaining()
+                if left is not None and left <= delay:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.stats['retries'] += 1
+                _sleep(delay)
+            except socket.timeout:  # not yet a TimeoutError before 3.10
+                raise click.ClickException(
+                    f'Request timed out after {deadline.op_timeout():.0f}s: '
+                    f'{method} {_endpoint_label(url)}')
+
+    def request(self, method: str, url: str, token: str,
+                body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> HassResponse:
+        """
+        Send one request over a pooled connection and read the full body.
+
+        Idempotent methods are retried on transient failures (see
+        `_retrying`), and the call's latency is recorded.
+
+        Args:
+            method: HTTP method
+            url: Full URL for the API endpoint
+            token: Home Assistant API token
+            body: Optional request body
+            headers: Optional extra headers
+
+        Returns:
+            HassResponse: Status, headers and decoded body of the response
+
+        Raises:
+            HassHTTPError: If Home Assistant answers with status >= 400
+            click.ClickException: For unsupported URL schemes, timeouts and
+                an exceeded deadline
+            OSError / http.client.HTTPException: On transport failures
+        """
+        def attempt():
+            key, conn, response, response_headers = self._open(
+                method, url, token, body, headers)
+            data = b''.join(self._iter_body(key, conn, response, response_headers))
+            return HassResponse(response.status, response.reason, response_headers, data)
+
+        started = time.monotonic()
+        try:
+            return self._retrying(method, url, attempt)
+        finally:
+            deadline.record(f'{method} {_endpoint_label(url)}',
+                            time.monotonic() - started)
+
+    def stream(self, method: str, url: str, token: str,
+               body: Optional[bytes] = None,
+               headers: Optional[Dict[str, str]] = None) -> Iterator[bytes]:
+        """
+        Like `request`, but yield the decoded body in chunks as it arrives.
+
+        Only opening the request is retried; once chunks have been yielded
+        a failure propagates. Abandoning the iterator early closes the
+        connection instead of returning a half-read socket to the pool.
+        """
+        started = time.monotonic()
+        try:
+            key, conn, response, response_headers = self._retrying(
+                method, url, lambda: self._open(method, url, token, body, headers))
+            try:
+                yield from self._iter_body(key, conn, response, response_headers)
+            except socket.timeout:
+                raise click.ClickException(
+                    f'Request timed out while reading: {method} {_endpoint_label(url)}')
+        finally:
+            deadline.record(f'{method} {_endpoint_label(url)}',
+                            time.monotonic() - started)
+
+    def transfer_summary(self) -> str:
+        """One-line summary of requests and compressed vs decoded bytes."""
+        with self._lock:
+            stats = dict(self.stats)
+        wire = stats['bytes_received']
+        decoded = stats['bytes_decoded']
+        saved = (1 - wire / decoded) * 100 if decoded else 0.0
+        return (f"{stats['requests']} requests over "
+                f"{stats['connections_opened']} connection(s), "
+                f"{_kib(wire)} received, {_kib(decoded)} decoded "
+                f"({saved:.0f}% saved by compression)")
+
+
+def _endpoint_label(url: str) -> str:
+    """Path of `url` with ids and timestamps collapsed, for latency stats.
+
+    ``/api/states/sensor.x`` and ``/api/history/period/2024-01-01T00:00``
+    become ``/api/states/*`` and ``/api/history/period/*``, so calls to the
+    same endpoint aggregate under one label.
+    """
+    segments = urlsplit(url).path.split('/')
+    return '/'.join('*' if '.' in seg or seg[:1].isdigit() else seg
+                    for seg in segments) or '/'
+
+
+def _kib(n: int) -> str:
+    return f"{n / 1024:.1f} KiB"
+
+
+class _DeflateDecoder:
+    """Decoder for ``Content-Encoding: deflate``.
+
+    RFC 9110 says deflate means zlib-wrapped, but some servers send a raw
+    deflate stream. Sniff the first bytes and fall back to raw mode.
+    """
+
+    def __init__(self):
+        self._obj = None
+
+    def decompress(self, chunk: bytes) -> bytes:
+        if self._obj is None:
+            self._obj = zlib.decompressobj()
+            try:
+                return self._obj.decompress(chunk)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._obj.decompress(chunk)
+
+    def flush(self) -> bytes:
+        return self._obj.flush() if self._obj is not None else b''
+
+
+def _make_decoder(content_encoding: Optional[str]):
+    """Return an incremental decoder for `content_encoding` (or None)."""
+    encoding = (content_encoding or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return _DeflateDecoder()
+    return None
+
+
+_default_session: Optional[HassSession] = None
+_default_lock = threading.Lock()
+
+
+def get_session() -> HassSession:
+    """Return the process-wide session, creating it on first use."""
+    global _default_session
+    with _default_lock:
+        if _default_session is None:
+            _default_session = HassSession()
+        return _default_session
+
+
+def close_session() -> None:
+    """Close the process-wide session's idle connections."""
+    global _default_session
+    with _default_lock:
+        session, _default_session = _default_session, None
+    if session is not None:
+        session.close()
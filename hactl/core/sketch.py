@@ -0,0 +1,125 @@
+"""
+Bounded-memory rate counters for long-running live views
+
+``hactl top`` runs for hours against an event bus whose set of keys
+(entity ids, context ids, ...) is unbounded. `DecayingTopK` keeps at most
+``capacity`` keys, using two standard tricks:
+
+* forward exponential decay: each event is stored with weight
+  ``exp((t - t0) / window)`` instead of 1, so old events fade without ever
+  touching the stored counters again (a rebase keeps the numbers finite);
+* Space-Saving eviction: when a new key arrives and the table is full, the
+  key with the smallest decayed count is replaced and the newcomer inherits
+  its count as an over-estimate (``error``). Heavy hitters therefore stay in
+  the table; only the long tail is approximate.
+"""
+
+import math
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+# Rebase the decay origin before exp() gets anywhere near overflowing
+_REBASE_EXPONENT = 50.0
+
+
+class DecayingTopK:
+    """
+    Approximate per-key event and byte rates over a sliding time window.
+
+    Args:
+        capacity: Maximum number of keys tracked
+        window: Decay time constant in seconds; an event contributes
+            ``exp(-age / window)`` to the rates
+        clock: Time source (monotonic seconds)
+    """
+
+    def __init__(self, capacity: int = 256, window: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        if window <= 0:
+            raise ValueError('window must be positive')
+        self.capacity = capacity
+        self.window = window
+        self._clock = clock
+        self._started = clock()
+        self._t0 = self._started
+        # key -> [weighted count, weighted bytes, weighted count error]
+        self._counters: Dict[Hashable, List[float]] = {}
+        self._total_count = 0.0
+        self._total_bytes = 0.0
+        self.events = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def _weight(self, now: float) -> float:
+        exponent = (now - self._t0) / self.window
+        if exponent > _REBASE_EXPONENT:
+            scale = math.exp(-exponent)
+            for counter in self._counters.values():
+                counter[0] *= scale
+                counter[1] *= scale
+                counter[2] *= scale
+            self._total_count *= scale
+            self._total_bytes *= scale
+            self._t0 = now
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def add(self, key: Hashable, nbytes: int = 0, now: Optional[float] = None) -> None:
+        """Count one event of `nbytes` payload bytes for `key`."""
+        now = self._clock() if now is None else now
+        weight = self._weight(now)
+        self.events += 1
+        self._total_count += weight
+        self._total_bytes += weight * nbytes
+
+        counter = self._counters.get(key)
+        if counter is None:
+            if len(self._counters) >= self.capacity:
+                victim = min(self._counters, key=lambda k: self._counters[k][0])
+                floor = self._counters.pop(victim)[0]
+                self.evicted += 1
+                counter = [floor, 0.0, floor]
+            else:
+                counter = [0.0, 0.0, 0.0]
+            self._counters[key] = counter
+        counter[0] += weight
+        counter[1] += weight * nbytes
+
+    def _per_second(self, now: float) -> float:
+        """Factor turning a stored weighted sum into a rate at `now`."""
+        decay = math.exp(-(now - self._t0) / self.window)
+        # Correct for a window that is not full yet: right after start the
+        # decayed sum of a steady rate r is r * elapsed, not r * window.
+        filled = 1.0 - math.exp(-max(now - self._started, 1e-9) / self.window)
+        return decay / (self.window * filled)
+
+    def totals(self, now: Optional[float] = None) -> Tuple[float, float]:
+        """Return (events/s, bytes/s) over all keys, evicted ones included."""
+        now = self._clock() if now is None else now
+        factor = self._per_second(now)
+        return self._total_count * factor, self._total_bytes * factor
+
+    def top(self, n: int = 10, now: Optional[float] = None) -> List[Dict]:
+        """
+        Return the `n` busiest keys, busiest first.
+
+        Returns:
+            list: Dicts with key, rate (events/s), bytes_rate (bytes/s),
+            share (fraction of all events) and error (upper bound of the
+            over-estimate in `rate`, non-zero only for keys that replaced an
+            evicted one)
+        """
+        now = self._clock() if now is None else now
+        factor = self._per_second(now)
+        ranked = sorted(self._counters.items(), key=lambda item: (-item[1][0], str(item[0])))
+        return [{
+            'key': key,
+            'rate': count * factor,
+            'bytes_rate': nbytes * factor,
+            'share': count / self._total_count if self._total_count else 0.0,
+            'error': error * factor,
+        } for key, (count, nbytes, error) in ranked[:n]]
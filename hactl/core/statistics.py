@@ -0,0 +1,116 @@
+"""
+Long-term statistics from the recorder WebSocket API
+
+The recorder already keeps pre-aggregated statistics (mean/min/max per
+5 minutes and per hour, and running sums for meters) for every entity with
+a ``state_class``. For trend work that is far cheaper than raw history: a
+month of hourly means is ~720 rows per sensor, however chatty the sensor.
+
+`fetch_statistics` resolves the requested ids (globs allowed) against
+``recorder/list_statistic_ids`` and sends ``recorder/statistics_during_period``
+for many statistic ids per call, with the batches in flight concurrently
+on one socket. `columnar` turns the row-per-period answer into one list per
+field, which is what plotting and dataframe tools want.
+"""
+
+import asyncio
+import fnmatch
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .async_client import AsyncHassClient
+
+PERIODS = ('5minute', 'hour', 'day', 'week', 'month')
+FIELDS = ('mean', 'min', 'max', 'sum')
+# Statistic ids per statistics_during_period call
+DEFAULT_BATCH = 100
+
+Rows = List[Dict[str, Any]]
+
+
+def _is_glob(pattern: str) -> bool:
+    return any(c in pattern for c in '*?[')
+
+
+def resolve_ids(patterns: Iterable[str], available: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Match ids and globs against the known statistic ids.
+
+    Returns:
+        tuple: (matched ids in request order, patterns that matched nothing)
+    """
+    available = list(available)
+    known = set(available)
+    matched: Dict[str, None] = {}
+    missing = []
+    for pattern in patterns:
+        if _is_glob(pattern):
+            hits = fnmatch.filter(available, pattern)
+        else:
+            hits = [pattern] if pattern in known else []
+        if not hits:
+            missing.append(pattern)
+        matched.update(dict.fromkeys(hits))
+    return list(matched), missing
+
+
+def _iso(value: Any) -> Optional[str]:
+    """Row timestamps are epoch milliseconds (HA 2023.3+) or ISO strings."""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000, timezone.utc).isoformat()
+    return value
+
+
+def columnar(rows: Rows, fields: Iterable[str] = FIELDS) -> Dict[str, List[Any]]:
+    """Row-per-period statistics as {'start': [...], field: [...], ...}."""
+    fields = list(fields)
+    columns: Dict[str, List[Any]] = {'start': [_iso(row.get('start')) for row in rows]}
+    for field in fields:
+        columns[field] = [row.get(field) for row in rows]
+    return columns
+
+
+async def _fetch(hass_url, hass_token, patterns, start, end, period, fields, batch_size):
+    async with AsyncHassClient(hass_url, hass_token) as client:
+        listed = await client.call('recorder/list_statistic_ids')
+        meta = {item['statistic_id']: item for item in listed or []
+                if isinstance(item, dict) and item.get('statistic_id')}
+        ids, missing = resolve_ids(patterns, meta)
+        batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+        payload = {'start_time': start.isoformat(), 'period': period, 'types': list(fields)}
+        if end is not None:
+            payload['end_time'] = end.isoformat()
+        answers = await client.call_many(
+            [('recorder/statistics_during_period', dict(payload, statistic_ids=batch))
+             for batch in batches])
+    rows: Dict[str, Rows] = {statistic_id: [] for statistic_id in ids}
+    for answer in answers:
+        for statistic_id, series in (answer or {}).items():
+            rows[statistic_id] = series or []
+    found = {statistic_id: meta[statistic_id] for statistic_id in ids}
+    # One listing call plus one per batch
+    return found, rows, missing, len(batches) + 1
+
+
+def fetch_statistics(hass_url: str, hass_token: str, patterns: Iterable[str],
+                     start: datetime, end: Optional[datetime] = None, period: str = 'hour',
+                     fields: Iterable[str] = FIELDS, batch_size: int = DEFAULT_BATCH
+                     ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Rows], List[str], int]:
+    """
+    Read long-term statistics for many statistic ids in a few calls.
+
+    Args:
+        hass_url: Home Assistant base URL
+        hass_token: Access token
+        patterns: Statistic ids (usually entity ids) or globs
+        start: Period start
+        end: Period end (default: now)
+        period: One of `PERIODS`
+        fields: Aggregates to request
+        batch_size: Statistic ids per call
+
+    Returns:
+        tuple: (metadata per id, rows per id, unmatched patterns, calls made)
+    """
+    return asyncio.run(_fetch(hass_url, hass_token, list(patterns), start, end, period,
+                              tuple(fields), max(batch_size, 1)))
@@ -8,9 +8,237 @@ import socket
 import base64
 import json
 import struct
+import time
 import click
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 
+from . import deadline
+from .cache import (
+    get_cache, instance_id, is_cacheable_ws, is_mutating_ws, is_registry_command,
+)
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Receive buffer size. Payloads larger than this are read straight into
+# their own preallocated buffer instead of passing through this one.
+RECV_BUFFER_SIZE = 64 * 1024
+
+
+def mask_payload(data, mask: bytes) -> bytes:
+    """
+    XOR `data` with the repeating 4-byte WebSocket `mask`.
+
+    The whole payload is treated as one little-endian integer and XORed
+    against the mask repeated to the same length, so the work happens in
+    C word by word instead of a Python loop per byte.
+
+    Args:
+        data: Payload bytes (bytes, bytearray or memoryview)
+        mask: 4-byte masking key
+
+    Returns:
+        bytes: The masked (or, applied again, unmasked) payload
+    """
+    length = len(data)
+    if not length:
+        return b''
+    key = (mask * (length // 4 + 1))[:length]
+    value = int.from_bytes(data, 'little') ^ int.from_bytes(key, 'little')
+    return value.to_bytes(length, 'little')
+
+
+def encode_frame(payload: bytes, opcode: int = OP_TEXT, fin: bool = True,
+                 mask: bool = True) -> bytes:
+    """
+    Encode a single WebSocket frame.
+
+    Args:
+        payload: Frame payload
+        opcode: Frame opcode (default: text)
+        fin: Whether this is the final fragment of the message
+        mask: Whether to mask the payload (clients must, servers must not)
+
+    Returns:
+        bytes: The complete frame, ready to send
+    """
+    length = len(payload)
+    header = bytearray()
+    header.append((0x80 if fin else 0x00) | opcode)
+    mask_bit = 0x80 if mask else 0x00
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < (1 << 16):
+        header.append(mask_bit | 126)
+        header.extend(struct.pack('>H', length))
+    else:
+        header.append(mask_bit | 127)
+        header.extend(struct.pack('>Q', length))
+    if mask:
+        key = os.urandom(4)
+        header.extend(key)
+        payload = mask_payload(payload, key)
+    return bytes(header) + payload
+
+
+def _iso(timestamp) -> str:
+    """Epoch seconds (as sent by subscribe_entities) to HA's ISO 8601 format."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _context(value, base=None):
+    """A compressed context: a bare id string, or a (partial) context dict."""
+    context = dict(base) if base else {'id': None, 'parent_id': None, 'user_id': None}
+    if isinstance(value, str):
+        context['id'] = value
+    elif isinstance(value, dict):
+        context.update(value)
+    return context
+
+
+def decode_compressed_state(entity_id, compressed):
+    """
+    Expand one compressed `subscribe_entities` state into a full state dict.
+
+    Compressed states use `s` (state), `a` (attributes), `c` (context id or
+    dict), `lc` (last_changed) and `lu` (last_updated, omitted when equal to
+    last_changed); timestamps are epoch floats.
+
+    Args:
+        entity_id: Entity id (the key the state was sent under)
+        compressed: Compressed state dict
+
+    Returns:
+        dict: State in the shape of a GET /api/states element
+    """
+    last_changed = _iso(compressed.get('lc', 0))
+    lu = compressed.get('lu')
+    return {
+        'entity_id': entity_id,
+        'state': compressed.get('s'),
+        'attributes': dict(compressed.get('a') or {}),
+        'last_changed': last_changed,
+        'last_updated': _iso(lu) if lu else last_changed,
+        'context': _context(compressed.get('c')),
+    }
+
+
+class EntityMirror:
+    """In-place mirror of entity states fed by `subscribe_entities` events
+
+    Events carry `a` (entities added with their full compressed state),
+    `r` (entity ids removed) and `c` (per-entity diffs: `+` with changed
+    compressed fields, `-` with attribute keys to drop). They are applied
+    in that order, the same way the HA frontend applies them.
+
+    States are kept compressed and updated in place, so an event costs
+    work proportional to its diff; full state dicts are only built when
+    asked for.
+
+    Example:
+        mirror = EntityMirror()
+        mirror.apply(event)            # for each subscribe_entities event
+        mirror.state('light.kitchen')  # -> full state dict
+    """
+
+    def __init__(self):
+        # entity_id -> {'s', 'a', 'c', 'lc', 'lu'} with `c` a full context dict
+        self._entities = {}
+        self.stats = {'added': 0, 'changed': 0, 'removed': 0}
+
+    def __len__(self):
+        return len(self._entities)
+
+    def __contains__(self, entity_id):
+        return entity_id in self._entities
+
+    def apply(self, event):
+        """Apply one `subscribe_entities` event
+
+        Args:
+            event: Event payload ({'a': ..., 'r': ..., 'c': ...})
+
+        Returns:
+            set: Entity ids added, changed or removed by the event
+        """
+        touched = set()
+        for entity_id, compressed in (event.get('a') or {}).items():
+            lc = compressed.get('lc', 0)
+            self._entities[entity_id] = {
+                's': compressed.get('s'),
+                'a': dict(compressed.get('a') or {}),
+                'c': _context(compressed.get('c')),
+                'lc': lc,
+                'lu': compressed.get('lu') or lc,
+            }
+            touched.add(entity_id)
+        self.stats['added'] += len(event.get('a') or ())
+
+        for entity_id in event.get('r') or ():
+            if self._entities.pop(entity_id, None) is not None:
+                self.stats['removed'] += 1
+                touched.add(entity_id)
+
+        for entity_id, diff in (event.get('c') or {}).items():
+            entity = self._entities.get(entity_id)
+            if entity is None:
+                # A diff for an entity we never saw added; nothing to patch
+                continue
+            add = diff.get('+') or {}
+            if 's' in add:
+                entity['s'] = add['s']
+            if add.get('c'):
+                entity['c'] = _context(add['c'], entity['c'])
+            if add.get('lc'):
+                entity['lc'] = entity['lu'] = add['lc']
+            elif add.get('lu'):
+                entity['lu'] = add['lu']
+            if add.get('a'):
+                entity['a'].update(add['a'])
+            for key in (diff.get('-') or {}).get('a') or ():
+                entity['a'].pop(key, None)
+            self.stats['changed'] += 1
+            touched.add(entity_id)
+        return touched
+
+    def state(self, entity_id):
+        """Full state dict for `entity_id`, or None when not mirrored"""
+        entity = self._entities.get(entity_id)
+        if entity is None:
+            return None
+        return {
+            'entity_id': entity_id,
+            'state': entity['s'],
+            'attributes': dict(entity['a']),
+            'last_changed': _iso(entity['lc']),
+            'last_updated': _iso(entity['lu']),
+            'context': dict(entity['c']),
+        }
+
+    def states(self):
+        """Full state dicts for every mirrored entity"""
+        return [self.state(entity_id) for entity_id in self._entities]
+
+    def entity_ids(self):
+        """Ids of every mirrored entity"""
+        return list(self._entities)
+
+
+class WebSocketCallError(click.ClickException):
+    """Home Assistant answered a WebSocket command with success=false.
+
+    The connection itself is fine and can carry further commands.
+    """
+
+    def __init__(self, response):
+        super().__init__(f"WebSocket call failed: {response}")
+        self.response = response
+
 
 class WebSocketClient:
     """Simple WebSocket client for Home Assistant API"""
@@ -20,6 +248,18 @@ class WebSocketClient:
         self.token = token
         self.sock = None
         self.req_id = 1
+        self._buf = bytearray(RECV_BUFFER_SIZE)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        # Results that arrived for an in-flight id other than the one being
+        # waited on, keyed by id until their `gather` picks them up.
+        self._inflight = set()
+        self._results = {}
+        # id -> (command type, send time) for latency accounting
+        self._sent_at = {}
+        # Subscription id -> events buffered while reading other results
+        self._subscriptions = {}
 
     def connect(self):
         """Connect to WebSocket and authenticate"""
@@ -31,11 +271,18 @@ class WebSocketClient:
         port = parsed.port or (443 if parsed.scheme == 'https' else 80)
         path = parsed.path.rstrip('/') + '/api/websocket'
 
-        self.sock = socket.create_connection((host, port))
-        if parsed.scheme == 'https':
-            context = ssl.create_default_context()
-            self.sock = context.wrap_socket(self.sock, server_hostname=host)
+        try:
+            self.sock = socket.create_connection((host, port), timeout=deadline.op_timeout())
+            if parsed.scheme == 'https':
+                context = ssl.create_default_context()
+                self.sock = context.wrap_socket(self.sock, server_hostname=host)
+            self._handshake(host, path)
+        except socket.timeout:  # not yet a TimeoutError before 3.10
+            raise click.ClickException(
+                f'WebSocket connect timed out after {deadline.op_timeout():.0f}s')
 
+    def _handshake(self, host, path):
+        """Upgrade the connected socket to a WebSocket and authenticate"""
         # WebSocket handshake
         key = base64.b64encode(os.urandom(16)).decode()
         req = f"GET {path} HTTP/1.1\r\n" \
@@ -48,12 +295,18 @@ class WebSocketClient:
               f"Origin: {self.url}\r\n\r\n"
         self.sock.sendall(req.encode())
 
-        buffer = b''
-        while b"\r\n\r\n" not in buffer:
-            chunk = self.sock.recv(1024)
-            if not chunk:
+        # Read the response headers through the frame buffer: the server may
+        # send the first frame (auth_required) in the same segment, and those
+        # bytes must stay buffered rather than being dropped.
+        self._start = self._end = 0
+        while True:
+            end = self._buf.find(b"\r\n\r\n", self._start, self._end)
+            if end != -1:
+                break
+            if not self._fill():
                 raise click.ClickException('WebSocket handshake failed')
-            buffer += chunk
+        buffer = bytes(self._view[self._start:end + 4])
+        self._start = end + 4
         if b" 101 " not in buffer:
             raise click.ClickException('WebSocket handshake unsuccessful:\n' + buffer.decode(errors='ignore'))
 
@@ -68,20 +321,70 @@ class WebSocketClient:
             if msg.get('type') == 'auth_invalid':
                 raise click.ClickException('Authentication failed')
 
+    def _fill(self):
+        """Read more bytes from the socket into the receive buffer.
+
+        Returns:
+            int: Number of bytes read (0 when the peer closed the socket)
+        """
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif self._end == len(self._buf):
+            # Compact: move the unread tail to the front of the buffer
+            pending = self._end - self._start
+            self._view[:pending] = self._view[self._start:self._end]
+            self._start, self._end = 0, pending
+        n = self.sock.recv_into(self._view[self._end:])
+        self._end += n
+        return n
+
     def recv_exact(self, n):
-        """Receive exactly n bytes"""
-        data = b''
-        while len(data) < n:
-            chunk = self.sock.recv(n - len(data))
-            if not chunk:
+        """Receive exactly n bytes
+
+        Small reads are served from the receive buffer; large payloads are
+        read with ``recv_into`` straight into a buffer of the final size, so
+        a multi-MB frame costs one allocation and no re-copying.
+        """
+        available = self._end - self._start
+        if n <= available:
+            data = bytes(self._view[self._start:self._start + n])
+            self._start += n
+            return data
+
+        if n <= len(self._buf):
+            if self._start + n > len(self._buf):
+                # Not enough room after the read position; compact first
+                self._view[:available] = self._view[self._start:self._end]
+                self._start, self._end = 0, available
+            while self._end - self._start < n:
+                count = self.sock.recv_into(self._view[self._end:])
+                if not count:
+                    raise click.ClickException('Socket closed unexpectedly')
+                self._end += count
+            data = bytes(self._view[self._start:self._start + n])
+            self._start += n
+            return data
+
+        data = bytearray(n)
+        view = memoryview(data)
+        view[:available] = self._view[self._start:self._end]
+        self._start = self._end = 0
+        received = available
+        while received < n:
+            count = self.sock.recv_into(view[received:])
+            if not count:
                 raise click.ClickException('Socket closed unexpectedly')
-            data += chunk
+            received += count
         return data
 
-    def recv_frame(self):
-        """Receive a WebSocket frame"""
-        header = self.recv_exact(2)
-        b1, b2 = header
+    def _read_frame(self):
+        """Receive a single WebSocket frame
+
+        Returns:
+            tuple: (fin, opcode, payload)
+        """
+        b1, b2 = self.recv_exact(2)
+        fin = bool(b1 & 0x80)
         opcode = b1 & 0x0F
         masked = b2 & 0x80
         length = b2 & 0x7F
@@ -91,51 +394,252 @@ class WebSocketClient:
             length = struct.unpack('>Q', self.recv_exact(8))[0]
         mask = self.recv_exact(4) if masked else None
         payload = self.recv_exact(length)
-        if masked and mask:
-            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
-        return opcode, payload
+        if mask:
+            payload = mask_payload(payload, mask)
+        return fin, opcode, payload
+
+    def recv_frame(self):
+        """Receive a complete WebSocket message
+
+        Fragmented messages (a data frame followed by continuation frames)
+        are reassembled. Control frames may arrive between fragments: pings
+        are answered with a pong, and pongs and unknown control frames are
+        dropped; none of these is returned. A close frame is returned at
+        once, discarding any partially received message.
+
+        Returns:
+            tuple: (opcode, payload)
+        """
+        message_opcode = None
+        fragments = []
+        while True:
+            fin, opcode, payload = self._read_frame()
+            if opcode == OP_PING:
+                self.sock.sendall(encode_frame(payload, OP_PONG))
+                continue
+            if opcode >= OP_CLOSE:
+                if opcode == OP_CLOSE:
+                    return opcode, bytes(payload)
+                continue
+            if opcode == OP_CONTINUATION:
+                if message_opcode is None:
+                    raise click.ClickException('Unexpected WebSocket continuation frame')
+            else:
+                if message_opcode is not None:
+                    raise click.ClickException('WebSocket fragment interrupted by a new message')
+                message_opcode = opcode
+            fragments.append(payload)
+            if fin:
+                if len(fragments) == 1:
+                    return message_opcode, payload
+                return message_opcode, b''.join(fragments)
 
-    def send_frame(self, data: bytes):
+    def send_frame(self, data: bytes, opcode: int = OP_TEXT):
         """Send a WebSocket frame"""
-        length = len(data)
-        header = bytearray()
-        header.append(0x81)
-        if length < 126:
-            header.append(0x80 | length)
-        elif length < (1 << 16):
-            header.append(0x80 | 126)
-            header.extend(struct.pack('>H', length))
-        else:
-            header.append(0x80 | 127)
-            header.extend(struct.pack('>Q', length))
-        mask = os.urandom(4)
-        header.extend(mask)
-        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
-        self.sock.sendall(bytes(header) + masked)
+        self.sock.sendall(encode_frame(data, opcode))
 
     def recv_json(self):
         """Receive JSON message"""
         while True:
             opcode, payload = self.recv_frame()
-            if opcode == 0x8:
+            if opcode == OP_CLOSE:
                 raise click.ClickException('WebSocket closed by server')
-            if opcode == 0x1:
+            if opcode == OP_TEXT:
                 try:
-                    return json.loads(payload.decode())
+                    return json.loads(payload)
                 except json.JSONDecodeError:
                     continue
 
-    def call(self, message_type, **kwargs):
-        """Call WebSocket API"""
+    def _next_message(self, message_type, kwargs):
         self.req_id += 1
-        message = {"id": self.req_id, "type": message_type, **kwargs}
+        self._sent_at[self.req_id] = (message_type, time.monotonic())
+        return self.req_id, {"id": self.req_id, "type": message_type, **kwargs}
+
+    def send(self, message_type, **kwargs):
+        """Send a command without waiting for its result
+
+        Args:
+            message_type: WebSocket command type
+            **kwargs: Command fields
+
+        Returns:
+            int: Request id to pass to `gather`
+        """
+        req_id, message = self._next_message(message_type, kwargs)
         self.send_frame(json.dumps(message).encode())
-        while True:
-            msg = self.recv_json()
-            if msg.get('id') == self.req_id:
-                if not msg.get('success', False):
-                    raise click.ClickException(f"WebSocket call failed: {msg}")
-                return msg.get('result')
+        self._inflight.add(req_id)
+        return req_id
+
+    def gather(self, ids, return_exceptions=False):
+        """Wait for the results of previously sent commands
+
+        Responses are routed by id, so they may arrive in any order;
+        results for other in-flight ids are buffered until gathered.
+
+        Args:
+            ids: Request ids returned by `send`
+            return_exceptions: Return a failed command's
+                click.ClickException in its slot instead of raising it
+
+        Returns:
+            list: Results in the same order as `ids`
+
+        Raises:
+            click.ClickException: If a command failed and
+                `return_exceptions` is False
+        """
+        waiting = [i for i in ids if i not in self._results]
+        while waiting:
+            # Each read is bounded by the per-operation timeout, clamped to
+            # the remaining --deadline budget
+            self.sock.settimeout(deadline.op_timeout())
+            try:
+                msg = self.recv_json()
+            except socket.timeout:
+                names = sorted({self._sent_at.get(i, ('?',))[0] for i in waiting})
+                raise click.ClickException(
+                    f"WebSocket call timed out: {', '.join(names)}")
+            msg_id = msg.get('id')
+            if msg_id in self._subscriptions:
+                if msg.get('type') == 'event':
+                    self._subscriptions[msg_id].append(msg.get('event'))
+                continue
+            if msg_id in self._inflight and msg.get('type', 'result') == 'result':
+                self._inflight.discard(msg_id)
+                self._results[msg_id] = msg
+                sent = self._sent_at.pop(msg_id, None)
+                if sent:
+                    deadline.record(f'WS {sent[0]}', time.monotonic() - sent[1])
+                if msg_id == waiting[0]:
+                    while waiting and waiting[0] in self._results:
+                        waiting.pop(0)
+
+        results = []
+        for req_id in ids:
+            msg = self._results.pop(req_id)
+            if msg.get('success', False):
+                results.append(msg.get('result'))
+                continue
+            error = WebSocketCallError(msg)
+            if not return_exceptions:
+                # Drop the siblings too; nobody will gather them now
+                for other in ids:
+                    self._results.pop(other, None)
+                raise error
+            results.append(error)
+        return results
+
+    def call_many(self, calls, return_exceptions=False):
+        """Pipeline several commands over the socket in one round-trip
+
+        All commands are written in a single send before any result is
+        read, so N commands cost one round-trip instead of N.
+
+        Args:
+            calls: Sequence of command types, or (type, kwargs) tuples
+            return_exceptions: Return a failed command's
+                click.ClickException in its slot instead of raising it
+
+        Returns:
+            list: Results in the same order as `calls`
+
+        Example:
+            devices, entities = ws.call_many([
+                'config/device_registry/list',
+                'config/entity_registry/list',
+            ])
+        """
+        calls = [(item, {}) if isinstance(item, str) else item for item in calls]
+        cache = get_cache()
+        if not cache.enabled:
+            return self._call_many(calls, return_exceptions)
+
+        # Read-only list commands are served from the on-disk cache when
+        # possible; only the misses go over the socket.
+        instance = instance_id(self.url, self.token)
+        results = [None] * len(calls)
+        keys = {}
+        pending = []
+        for i, (message_type, kwargs) in enumerate(calls):
+            if is_cacheable_ws(message_type):
+                keys[i] = f'WS {message_type} {json.dumps(kwargs, sort_keys=True)}'
+                hit, value = cache.serve(
+                    instance, keys[i],
+                    lambda c=(message_type, kwargs): self._call_fresh(c))
+                if hit:
+                    results[i] = value
+                    continue
+            pending.append(i)
+        if not pending:
+            return results
+
+        fetched = self._call_many([calls[i] for i in pending], return_exceptions)
+        mutated = [calls[i][0] for i in pending if is_mutating_ws(calls[i][0])]
+        if mutated:
+            cache.invalidate(instance, registries=any(
+                is_registry_command(t) or t.startswith('config_entries/') for t in mutated))
+        for i, result in zip(pending, fetched):
+            results[i] = result
+            if i in keys and not mutated and not isinstance(result, Exception):
+                cache.put(instance, keys[i], result)
+        return results
+
+    def _call_fresh(self, call):
+        """Run one command on a private connection (cache revalidation)."""
+        client = type(self)(self.url, self.token)
+        try:
+            client.connect()
+            return client._call_many([call], False)[0]
+        finally:
+            client.close()
+
+    def _call_many(self, calls, return_exceptions):
+        ids = []
+        frames = []
+        for message_type, kwargs in calls:
+            req_id, message = self._next_message(message_type, kwargs)
+            ids.append(req_id)
+            frames.append(encode_frame(json.dumps(message).encode()))
+        self.sock.sendall(b''.join(frames))
+        self._inflight.update(ids)
+        return self.gather(ids, return_exceptions=return_exceptions)
+
+    def subscribe_events(self, event_types):
+        """Subscribe to event types without waiting for the acks
+
+        Events for these subscriptions are buffered whenever results are
+        read (see `gather`) and picked up with `pop_events`.
+
+        Args:
+            event_types: Event types (e.g. 'entity_registry_updated')
+
+        Returns:
+            dict: event type -> subscription id
+        """
+        subs = {}
+        frames = []
+        for event_type in event_types:
+            req_id, message = self._next_message('subscribe_events',
+                                                 {'event_type': event_type})
+            self._sent_at.pop(req_id, None)
+            self._subscriptions[req_id] = []
+            subs[event_type] = req_id
+            frames.append(encode_frame(json.dumps(message).encode()))
+        self.sock.sendall(b''.join(frames))
+        return subs
+
+    def pop_events(self, sub_id):
+        """Return and clear the events buffered for a subscription"""
+        events = self._subscriptions.get(sub_id) or []
+        if events:
+            self._subscriptions[sub_id] = []
+        return events
+
+    def call(self, message_type, **kwargs):
+        """Call WebSocket API"""
+        if get_cache().enabled:
+            return self.call_many([(message_type, kwargs)])[0]
+        return self.gather([self.send(message_type, **kwargs)])[0]
 
     def close(self):
         """Close WebSocket connection"""
@@ -4,79 +4,68 @@ Handler migrated from get/actions.py
 
 import json
 import click
-from hactl.core import load_config, make_api_request, json_to_yaml
+from hactl.core import load_config, json_to_yaml
+from hactl.core.logbook import (
+    Matching, in_domain, is_service_call, iter_logbook, logbook_window, scan_logbook,
+)
 
-def get_actions(format_type='table'):
+
+def _service_call(entry):
+    return {
+        'when': entry.get('when'),
+        'name': entry.get('name'),
+        'entity_id': entry.get('entity_id'),
+        'domain': entry.get('domain', ''),
+        'state': entry.get('state')
+    }
+
+
+def _execution(entry):
+    return {
+        'when': entry.get('when'),
+        'name': entry.get('name'),
+        'entity_id': entry.get('entity_id'),
+        'state': entry.get('state')
+    }
+
+
+def get_actions(format_type='table', since=None, until=None, entity_ids=(), context_id=None):
     """
     Handler for actions
 
     Args:
         format_type: Output format
+        since: Window start, ISO timestamp or relative age (default 24h)
+        until: Window end (default now)
+        entity_ids: Only these entities (filtered by HA)
+        context_id: Only entries caused by this context (filtered by HA)
     """
 
-    # Get format from command line
-    # format_type passed as parameter
-    
     # Load configuration from environment
     HASS_URL, HASS_TOKEN = load_config()
-    
-    # Calculate time range (last 24 hours)
-    end_time = datetime.now(timezone.utc)
-    start_time = end_time - timedelta(hours=24)
-    
-    # Get logbook entries
-    logbook_url = f"{HASS_URL}/api/logbook/{start_time.isoformat()}"
-    logbook_data = make_api_request(logbook_url, HASS_TOKEN)
-    
-    # Filter for service calls (actions)
-    service_calls = []
-    automation_executions = []
-    script_executions = []
-    
-    for entry in logbook_data:
-        domain = entry.get('domain', '')
-        entity_id = entry.get('entity_id', '')
-        
-        # Filter service calls
-        if entry.get('context', {}).get('event_type') == 'call_service' or 'service' in entry.get('name', '').lower():
-            service_calls.append({
-                'when': entry.get('when'),
-                'name': entry.get('name'),
-                'entity_id': entry.get('entity_id'),
-                'domain': domain,
-                'state': entry.get('state')
-            })
-        
-        # Filter automation executions
-        if entity_id and entity_id.startswith('automation.'):
-            automation_executions.append({
-                'when': entry.get('when'),
-                'name': entry.get('name'),
-                'entity_id': entity_id,
-                'state': entry.get('state')
-            })
-        
-        # Filter script executions
-        if entity_id and entity_id.startswith('script.'):
-            script_executions.append({
-                'when': entry.get('when'),
-                'name': entry.get('name'),
-                'entity_id': entity_id,
-                'state': entry.get('state')
-            })
-    
+
+    start_time, end_time = logbook_window(since, until)
+
+    # Service calls, automation and script runs in a single streamed pass
+    service_calls = Matching(is_service_call, limit=100, project=_service_call)
+    automations = Matching(in_domain('automation'), limit=100, project=_execution)
+    scripts = Matching(in_domain('script'), limit=100, project=_execution)
+    scan_logbook(
+        iter_logbook(HASS_URL, HASS_TOKEN, start_time, end_time, entity_ids, context_id),
+        service_calls, automations, scripts)
+
     result = {
         'period': f"{start_time.isoformat()} to {end_time.isoformat()}",
-        'service_calls': service_calls[:100],
-        'automation_executions': automation_executions[:100],
-        'script_executions': script_executions[:100],
+        'service_calls': service_calls.items,
+        'automation_executions': automations.items,
+        'script_executions': scripts.items,
         'summary': {
-            'total_service_calls': len(service_calls),
-            'total_automation_executions': len(automation_executions),
-            'total_script_executions': len(script_executions)
+            'total_service_calls': service_calls.count,
+            'total_automation_executions': automations.count,
+            'total_script_executions': scripts.count
         }
     }
-    
+
     # Format output
     if format_type == 'json':
         click.echo(json.dumps(result, indent=2))
@@ -4,77 +4,60 @@ Handler migrated from get/activity.py
 
 import json
 import click
-from collections import Counter, defaultdict
-from datetime import datetime, timedelta, timezone
-from hactl.core import load_config, make_api_request, json_to_yaml
+from hactl.core import load_config, json_to_yaml
+from hactl.core.logbook import (
+    ActivityCounts, HourlyHistogram, Matching, everything, iter_logbook, logbook_window,
+    scan_logbook,
+)
 
-def get_activity(format_type='table'):
+
+def _change(entry):
+    entity_id = entry.get('entity_id', 'unknown')
+    return {
+        'when': entry.get('when'),
+        'name': entry.get('name'),
+        'entity_id': entry.get('entity_id'),
+        'state': entry.get('state'),
+        'domain': entity_id.split('.')[0] if '.' in entity_id else 'unknown'
+    }
+
+
+def get_activity(format_type='table', since=None, until=None, entity_ids=(), context_id=None):
     """
     Handler for activity
 
     Args:
         format_type: Output format
+        since: Window start, ISO timestamp or relative age (default 24h)
+        until: Window end (default now)
+        entity_ids: Only these entities (filtered by HA)
+        context_id: Only entries caused by this context (filtered by HA)
     """
 
-    # Get format from command line
-    # format_type passed as parameter
-    
     # Load configuration from environment
     HASS_URL, HASS_TOKEN = load_config()
-    
-    # Calculate time range (last 24 hours)
-    end_time = datetime.now(timezone.utc)
-    start_time = end_time - timedelta(hours=24)
-    
-    # Get logbook entries
-    logbook_url = f"{HASS_URL}/api/logbook/{start_time.isoformat()}"
-    logbook_data = make_api_request(logbook_url, HASS_TOKEN)
-    
-    # Analyze activity
-    entity_activity = Counter()
-    domain_activity = Counter()
-    activity_by_hour = defaultdict(int)
-    recent_changes = []
-    
-    for entry in logbook_data:
-        entity_id = entry.get('entity_id', 'unknown')
-        domain = entity_id.split('.')[0] if '.' in entity_id else 'unknown'
-        
-        entity_activity[entity_id] += 1
-        domain_activity[domain] += 1
-        
-        # Extract hour from timestamp
-        when = entry.get('when')
-        if when:
-            try:
-                hour = datetime.fromisoformat(when.replace('Z', '+00:00')).hour
-                activity_by_hour[hour] += 1
-            except:
-                pass
-        
-        recent_changes.append({
-            'when': entry.get('when'),
-            'name': entry.get('name'),
-            'entity_id': entry.get('entity_id'),
-            'state': entry.get('state'),
-            'domain': domain
-        })
-    
+
+    start_time, end_time = logbook_window(since, until)
+
+    # Stream the logbook once through every aggregator
+    counts = ActivityCounts()
+    hourly = HourlyHistogram()
+    recent = Matching(everything, limit=50, project=_change)
+    total = scan_logbook(
+        iter_logbook(HASS_URL, HASS_TOKEN, start_time, end_time, entity_ids, context_id),
+        counts, hourly, recent)
+
     # Get most active entities
-    most_active_entities = [{'entity_id': eid, 'count': count} 
-                           for eid, count in entity_activity.most_common(20)]
-    
-    # Format activity by hour
-    hourly_activity = [{'hour': hour, 'count': count} 
-                      for hour, count in sorted(activity_by_hour.items())]
-    
+    most_active_entities = [{'entity_id': eid, 'count': count}
+                           for eid, count in counts.most_active(20)]
+
     result = {
         'period': f"{start_time.isoformat()} to {end_time.isoformat()}",
-        'total_events': len(logbook_data),
+        'total_events': total,
         'most_active_entities': most_active_entities,
-        'domain_activity': dict(domain_activity.most_common(10)),
-        'hourly_activity': hourly_activity,
-        'recent_changes': recent_changes[:50]
+        'domain_activity': dict(counts.busiest_domains(10)),
+        'hourly_activity': hourly.result(),
+        'recent_changes': recent.items
     }
     
     # Format output
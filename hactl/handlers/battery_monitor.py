@@ -4,7 +4,7 @@ Battery monitoring utilities handler
 
 import json
 import click
-from hactl.core import load_config, make_api_request
+from hactl.core import load_config, make_api_request, iter_api_array
 
 
 def list_batteries(format_type='table', exclude_mobile=True):
@@ -17,15 +17,14 @@ def list_batteries(format_type='table', exclude_mobile=True):
     """
     HASS_URL, HASS_TOKEN = load_config()
 
-    # Get all states
+    # Stream all states (only battery sensors are kept)
     url = f"{HASS_URL}/api/states"
-    states = make_api_request(url, HASS_TOKEN)
 
     # Filter battery sensors
     exclude_keywords = ['iphone', 'ipad', 'tablet', 'car', 'tesla', 'macbook', 'watch', 'android', 'state', 'tessy']
 
     battery_sensors = []
-    for state in states:
+    for state in iter_api_array(url, HASS_TOKEN):
         entity_id = state.get('entity_id', '').lower()
 
         # Must contain 'battery'
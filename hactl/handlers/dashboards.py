@@ -5,9 +5,50 @@ Handler migrated from get/dashboards.py
 import os
 import sys
 import json
+import asyncio
 import click
 from hactl.core import load_config, make_api_request, json_to_yaml
-from hactl.core.websocket import WebSocketClient
+from hactl.core.async_client import AsyncHassClient
+
+def _lovelace_dashboards(panels):
+    """Extract the lovelace dashboards from a `get_panels` result."""
+    dashboards = []
+    if isinstance(panels, dict):
+        seen_paths = set()
+        for key, panel in panels.items():
+            if isinstance(panel, dict) and panel.get("component_name") == "lovelace":
+                path = panel.get("url_path") or key
+                if path == "lovelace":
+                    continue  # default alias that does not expose config
+                if path in seen_paths:
+                    continue
+                seen_paths.add(path)
+                dashboards.append({
+                    "id": panel.get("config_panel", key),
+                    "title": panel.get("title", key.title()),
+                    "url_path": path,
+                    "icon": panel.get("icon")
+                })
+
+    if not dashboards:
+        dashboards = [{"id": "default", "title": "Home", "url_path": "lovelace"}]
+    return dashboards
+
+
+async def _fetch_dashboard_configs(hass_url, hass_token):
+    """Fetch the dashboard list and all their configs concurrently.
+
+    Returns (dashboards, configs) where each config slot holds either the
+    lovelace config or the exception raised while fetching it.
+    """
+    async with AsyncHassClient(hass_url, hass_token) as client:
+        dashboards = _lovelace_dashboards(await client.call("get_panels"))
+        dash_configs = await client.call_many(
+            [("lovelace/config", {"url_path": dash.get('url_path', 'lovelace')})
+             for dash in dashboards],
+            return_exceptions=True)
+    return dashboards, dash_configs
+
 
 def get_dashboards(format_type='table', url_path=None, output_dir=None):
     """
@@ -23,87 +64,58 @@ def get_dashboards(format_type='table', url_path=None, output_dir=None):
     # Load configuration from environment
     HASS_URL, HASS_TOKEN = load_config()
     
-    # Connect to WebSocket
-    ws = WebSocketClient(HASS_URL, HASS_TOKEN)
-    try:
-        ws.connect()
-        
-        # Get panels
-        panels = ws.call("get_panels")
-        dashboards = []
-        
-        if isinstance(panels, dict):
-            seen_paths = set()
-            for key, panel in panels.items():
-                if isinstance(panel, dict) and panel.get("component_name") == "lovelace":
-                    path = panel.get("url_path") or key
-                    if path == "lovelace":
-                        continue  # default alias that does not expose config
-                    if path in seen_paths:
-                        continue
-                    seen_paths.add(path)
-                    dashboards.append({
-                        "id": panel.get("config_panel", key),
-                        "title": panel.get("title", key.title()),
-                        "url_path": path,
-                        "icon": panel.get("icon")
-                    })
-        
-        if not dashboards:
-            dashboards = [{"id": "default", "title": "Home", "url_path": "lovelace"}]
-        
-        # Get dashboard configs
-        results = []
-        configs = {}
-        
-        for dash in dashboards:
-            try:
-                cfg = ws.call("lovelace/config", url_path=dash.get('url_path', 'lovelace'))
-                configs[dash.get('url_path', 'lovelace')] = cfg
-            except RuntimeError as err:
-                results.append({
-                    'title': dash.get('title', dash.get('id')),
-                    'url_path': dash.get('url_path', 'lovelace'),
-                    'error': str(err)
-                })
-                continue
-            
-            views = cfg.get('views', []) if isinstance(cfg, dict) else []
-            dash_summary = {
+    # Panels first, then every dashboard config concurrently over one
+    # multiplexed WebSocket
+    dashboards, dash_configs = asyncio.run(
+        _fetch_dashboard_configs(HASS_URL, HASS_TOKEN))
+
+    # Summarise dashboard configs
+    results = []
+    configs = {}
+
+    for dash, cfg in zip(dashboards, dash_configs):
+        if isinstance(cfg, Exception):
+            results.append({
                 'title': dash.get('title', dash.get('id')),
                 'url_path': dash.get('url_path', 'lovelace'),
-                'mode': cfg.get('mode') if isinstance(cfg, dict) else dash.get('mode'),
-                'strategy': cfg.get('strategy'),
-                'views': []
-            }
-            
-            for idx, view in enumerate(views):
-                cards = []
-                if isinstance(view.get('cards'), list):
-                    cards.extend(view['cards'])
-                if isinstance(view.get('sections'), list):
-                    for section in view['sections']:
-                        cards.extend(section.get('cards', []))
-                
-                dash_summary['views'].append({
-                    'index': idx,
-                    'title': view.get('title', f'View {idx+1}'),
-                    'path': view.get('path'),
-                    'icon': view.get('icon'),
-                    'badges': len(view.get('badges', [])),
-                    'cards': [
-                        {
-                            'type': card.get('type', 'unknown'),
-                            'title': card.get('title'),
-                            'entities': len(card.get('entities', [])) if isinstance(card.get('entities'), list) else None
-                        }
-                        for card in cards
-                    ]
-                })
-            results.append(dash_summary)
-    
-    finally:
-        ws.close()
+                'error': str(cfg)
+            })
+            continue
+        configs[dash.get('url_path', 'lovelace')] = cfg
+
+        views = cfg.get('views', []) if isinstance(cfg, dict) else []
+        dash_summary = {
+            'title': dash.get('title', dash.get('id')),
+            'url_path': dash.get('url_path', 'lovelace'),
+            'mode': cfg.get('mode') if isinstance(cfg, dict) else dash.get('mode'),
+            'strategy': cfg.get('strategy'),
+            'views': []
+        }
+
+        for idx, view in enumerate(views):
+            cards = []
+            if isinstance(view.get('cards'), list):
+                cards.extend(view['cards'])
+            if isinstance(view.get('sections'), list):
+                for section in view['sections']:
+                    cards.extend(section.get('cards', []))
+
+            dash_summary['views'].append({
+                'index': idx,
+                'title': view.get('title', f'View {idx+1}'),
+                'path': view.get('path'),
+                'icon': view.get('icon'),
+                'badges': len(view.get('badges', [])),
+                'cards': [
+                    {
+                        'type': card.get('type', 'unknown'),
+                        'title': card.get('title'),
+                        'entities': len(card.get('entities', [])) if isinstance(card.get('entities'), list) else None
+                    }
+                    for card in cards
+                ]
+            })
+        results.append(dash_summary)
     
     # Format output
     if format_type == 'json':
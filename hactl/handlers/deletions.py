@@ -33,6 +33,7 @@ import os
 import platform
 import socket
 import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
@@ -40,6 +41,9 @@ import click
 
 from hactl import __version__
 from hactl.core import load_config, make_api_request
+from hactl.core.context import cached_request, get_registries
+from hactl.core.history import history_url
+from hactl.core.history_store import HistoryStore
 from hactl.core.websocket import WebSocketClient
 
 
@@ -52,6 +56,9 @@ VALID_KINDS = (KIND_DEVICE, KIND_ENTITY, KIND_CONFIG_ENTRY)
 # Safety / behaviour defaults.
 DEFAULT_LIMIT = 50
 RECENT_ACTIVITY_WINDOW_DAYS = 7
+# Entity ids per safety history request, and requests in flight
+HISTORY_BATCH_SIZE = 50
+HISTORY_WORKERS = 4
 DEAD_STATES = frozenset(('unavailable', 'unknown', 'unknown_state', '', None))
 
 # Origin tags for the safety driver: tells us whether the entity was
@@ -79,27 +86,21 @@ def fetch_registries(hass_url: str, hass_token: str) -> dict[str, Any]:
     areas: list[dict] = []
     ws_ok = False
 
-    ws = WebSocketClient(hass_url, hass_token)
     try:
-        ws.connect()
-        devices = ws.call('config/device_registry/list') or []
-        entities = ws.call('config/entity_registry/list') or []
-        try:
-            areas = ws.call('config/area_registry/list') or []
-        except Exception:
-            areas = []
-        ws.close()
+        # One pipelined round-trip. Fresh, not cached: these registries are
+        # about to be edited, so never plan against a stale copy.
+        devices, entities, areas = get_registries(
+            hass_url, hass_token, ['device', 'entity', 'area'],
+            WebSocketClient, optional=['area'], fresh=True)
         ws_ok = True
     except Exception:
-        try:
-            ws.close()
-        except Exception:
-            pass
+        pass
 
     config_entries: list[dict] = []
     try:
-        ce = make_api_request(
-            f"{hass_url}/api/config/config_entries/entry", hass_token)
+        ce = cached_request(
+            f"{hass_url}/api/config/config_entries/entry", hass_token,
+            make_api_request)
         if isinstance(ce, list):
             config_entries = ce
     except Exception:
@@ -107,7 +108,8 @@ def fetch_registries(hass_url: str, hass_token: str) -> dict[str, Any]:
 
     states: list[dict] = []
     try:
-        st = make_api_request(f"{hass_url}/api/states", hass_token)
+        st = cached_request(f"{hass_url}/api/states", hass_token,
+                            make_api_request)
         if isinstance(st, list):
             states = st
     except Exception:
@@ -351,88 +353,246 @@ def _entry_state_for_device(device: dict, ce_by_id: dict) -> str | None:
     return None
 
 
-def _has_recent_activity_for_entity(
-        hass_url: str, hass_token: str, entity_id: str,
-        days: int = RECENT_ACTIVITY_WINDOW_DAYS) -> bool:
-    """Check HA history for any non-dead state in the last ``days``.
+def _history_start_for(store: HistoryStore | None, entity_id: str,
+                       start: datetime, end: datetime) -> datetime | None:
+    """Where HA still has to be asked from; None if the store shows activity.
 
-    Network-bound. Caller is responsible for batching. Returns False on
-    any error so a transient API problem doesn't escalate to "blocked".
+    The store only ever short-circuits to "active"; a dead stretch in it
+    just moves the HA query up to where the store's coverage ends.
     """
-    if not entity_id:
-        return False
-    end = datetime.now(timezone.utc)
-    start = end - timedelta(days=days)
-    iso_start = start.strftime('%Y-%m-%dT%H:%M:%S%z')
-    iso_end = end.strftime('%Y-%m-%dT%H:%M:%S%z')
-    url = (f"{hass_url}/api/history/period/{iso_start}"
-           f"?filter_entity_id={entity_id}&end_time={iso_end}"
-           "&minimal_response&no_attributes")
-    try:
-        resp = make_api_request(url, hass_token)
-    except Exception:
-        return False
-    # Response is [[ {state, ...}, ... ]] — one inner list per entity.
-    if not isinstance(resp, list) or not resp:
-        return False
+    if store is None:
+        return start
+    live, covered_until = store.recent_activity(entity_id, start, end, DEAD_STATES)
+    if live:
+        return None
+    if covered_until is not None:
+        return min(covered_until, end)
+    return start
+
+
+def _fetch_live_entities(hass_url: str, hass_token: str, entity_ids: list[str],
+                         start: datetime, end: datetime) -> set[str]:
+    """One /api/history/period request for a chunk of entities.
+
+    Returns the entities with any non-dead sample. Errors propagate: the
+    caller marks the chunk as unchecked rather than as inactive.
+    """
+    url = history_url(hass_url, start, end, entity_ids,
+                      minimal_response=True, no_attributes=True)
+    resp = make_api_request(url, hass_token)
+    # Response is [[ {state, ...}, ... ]] — one inner list per entity; with
+    # minimal_response only the first sample carries the entity_id.
+    if not isinstance(resp, list):
+        raise ValueError(f'unexpected history response: {type(resp).__name__}')
+    live = set()
     for series in resp:
-        if not isinstance(series, list):
+        if not isinstance(series, list) or not series:
+            continue
+        first = series[0] if isinstance(series[0], dict) else {}
+        eid = first.get('entity_id') or (entity_ids[0] if len(entity_ids) == 1 else None)
+        if eid is None:
             continue
         for sample in series:
-            if not isinstance(sample, dict):
+            if isinstance(sample, dict) and sample.get('state') not in DEAD_STATES:
+                live.add(eid)
+                break
+    return live
+
+
+def _recent_activity(hass_url: str, hass_token: str, groups: dict[Any, list[str]],
+                     days: int = RECENT_ACTIVITY_WINDOW_DAYS,
+                     batch_size: int = HISTORY_BATCH_SIZE,
+                     workers: int = HISTORY_WORKERS
+                     ) -> tuple[set[str], set[str], int, int]:
+    """Find entities with non-dead state in the last ``days``, in batches.
+
+    ``groups`` maps whatever is being checked (a device, an entity, a
+    config entry) to the entity ids that would block it. All ids are
+    gathered first and queried with comma-separated ``filter_entity_id``
+    in chunks of ``batch_size``, ``workers`` requests in flight. Once an
+    entity of a group is found live, the group is settled and its other
+    entities are left out of chunks not sent yet.
+
+    A request that fails leaves its chunk unchecked: those entities are
+    returned as unknown (and their groups settled), never as inactive.
+
+    A local history store (``hactl history sync``) answers for the range
+    it covers without any request.
+
+    Returns:
+        (live entity ids, unknown entity ids, history requests made,
+        requests that failed)
+    """
+    end = datetime.now(timezone.utc)
+    window_start = end - timedelta(days=days)
+    owners: dict[str, list[Any]] = {}
+    for key, eids in groups.items():
+        for eid in eids:
+            if eid:
+                owners.setdefault(eid, []).append(key)
+
+    live: set[str] = set()
+    unknown: set[str] = set()
+    settled: set[Any] = set()
+
+    def mark(eid: str, found: set[str]) -> None:
+        found.add(eid)
+        settled.update(owners.get(eid, ()))
+
+    # Entities sharing a start (usually all of them) share requests
+    by_start: dict[datetime, list[str]] = {}
+    store = HistoryStore.open_existing(hass_url)
+    try:
+        for eid in owners:
+            start = _history_start_for(store, eid, window_start, end)
+            if start is None:
+                mark(eid, live)
+            elif start < end:
+                by_start.setdefault(start, []).append(eid)
+    finally:
+        if store is not None:
+            store.close()
+
+    pending = [(start, eids[i:i + batch_size])
+               for start, eids in by_start.items()
+               for i in range(0, len(eids), batch_size)]
+    pending.reverse()
+    calls = failed = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1),
+                            thread_name_prefix='hactl-safety') as pool:
+        in_flight: dict[Any, list[str]] = {}
+        while pending or in_flight:
+            while pending and len(in_flight) < workers:
+                start, chunk = pending.pop()
+                chunk = [eid for eid in chunk
+                         if not all(key in settled for key in owners[eid])]
+                if chunk:
+                    calls += 1
+                    future = pool.submit(_fetch_live_entities, hass_url,
+                                         hass_token, chunk, start, end)
+                    in_flight[future] = chunk
+            if not in_flight:
                 continue
-            if sample.get('state') not in DEAD_STATES:
-                return True
-    return False
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = in_flight.pop(future)
+                try:
+                    found = future.result()
+                except Exception:
+                    failed += 1
+                    for eid in chunk:
+                        mark(eid, unknown)
+                    continue
+                for eid in found:
+                    mark(eid, live)
+    return live, unknown - live, calls, failed
+
+
+def _device_activity_candidates(device: dict, data: dict) -> list[str]:
+    """Entities whose recent activity blocks deleting ``device``."""
+    if device.get('disabled_by'):
+        return []
+    ce_by_id = {ce.get('entry_id'): ce for ce in data['config_entries']}
+    if _entry_state_for_device(device, ce_by_id) != 'loaded':
+        return []
+    return [e.get('entity_id') for e in data['entities']
+            if e.get('device_id') == device.get('id')
+            and not e.get('disabled_by')
+            and e.get('entity_id')]
+
+
+def _entity_activity_candidates(entity: dict, data: dict) -> list[str]:
+    if entity.get('disabled_by') or not entity.get('entity_id'):
+        return []
+    ce_by_id = {ce.get('entry_id'): ce for ce in data['config_entries']}
+    parent_id = entity.get('config_entry_id')
+    parent = ce_by_id.get(parent_id) if parent_id else None
+    if not parent or parent.get('state') != 'loaded':
+        return []
+    return [entity['entity_id']]
+
+
+def _config_entry_activity_candidates(entry: dict, data: dict) -> list[str]:
+    if entry.get('state') != 'loaded':
+        return []
+    entry_id = entry.get('entry_id')
+    owned_eids = [e.get('entity_id') for e in data['entities']
+                  if e.get('config_entry_id') == entry_id
+                  and not e.get('disabled_by')
+                  and e.get('entity_id')]
+    return owned_eids[:25]  # cap network calls
+
+
+def activity_candidates(record: dict, data: dict) -> list[str]:
+    """Entity ids the safety predicate checks history for, per plan record."""
+    if record['kind'] == KIND_DEVICE:
+        return _device_activity_candidates(record['pre_state'], data)
+    if record['kind'] == KIND_ENTITY:
+        return _entity_activity_candidates(record['pre_state'], data)
+    return _config_entry_activity_candidates(record['pre_state'], data)
+
+
+def _activity_block(eids: list[str], live: set[str] | None,
+                    unknown: set[str] | None, hass_url: str, hass_token: str,
+                    parent: str) -> str | None:
+    """Why recent activity among ``eids`` blocks a delete, or None."""
+    if not eids:
+        return None
+    if live is None:
+        live, unknown, _calls, _failed = _recent_activity(
+            hass_url, hass_token, {None: eids})
+    eid = next((eid for eid in eids if eid in live), None)
+    if eid:
+        return (f"{parent} and entity {eid} had non-dead state in last "
+                f"{RECENT_ACTIVITY_WINDOW_DAYS}d")
+    eid = next((eid for eid in eids if eid in (unknown or ())), None)
+    if eid:
+        return (f"{parent} and the history of entity {eid} could not be "
+                "checked")
+    return None
 
 
 def safety_check_device(
         device: dict, data: dict,
-        hass_url: str, hass_token: str) -> tuple[bool, str | None]:
+        hass_url: str, hass_token: str,
+        live: set[str] | None = None,
+        unknown: set[str] | None = None) -> tuple[bool, str | None]:
     """Return (ok_to_delete, reason_if_blocked).
 
     Predicate refuses if parent config_entry is loaded AND any owned
-    entity has had non-dead state in the last 7 days. Disabled devices
-    are also flagged as 'intentional'.
+    entity has had non-dead state in the last 7 days, or its history
+    could not be checked. Disabled devices are also flagged as
+    'intentional'. ``live`` and ``unknown`` are the result of a
+    `_recent_activity` batch covering this device; without them the
+    owned entities are looked up here.
     """
     if device.get('disabled_by'):
         return False, (
             f"device.disabled_by={device['disabled_by']!r} "
             "(looks intentional, not garbage)")
 
-    ce_by_id = {ce.get('entry_id'): ce for ce in data['config_entries']}
-    if _entry_state_for_device(device, ce_by_id) != 'loaded':
-        return True, None
-
-    owned = [e.get('entity_id') for e in data['entities']
-             if e.get('device_id') == device.get('id')
-             and not e.get('disabled_by')
-             and e.get('entity_id')]
-    for eid in owned:
-        if _has_recent_activity_for_entity(hass_url, hass_token, eid):
-            return False, (
-                f"parent config_entry is 'loaded' and entity {eid} had "
-                f"non-dead state in last {RECENT_ACTIVITY_WINDOW_DAYS}d")
+    why = _activity_block(_device_activity_candidates(device, data), live,
+                          unknown, hass_url, hass_token,
+                          "parent config_entry is 'loaded'")
+    if why:
+        return False, why
     return True, None
 
 
 def safety_check_entity(
         entity: dict, data: dict,
-        hass_url: str, hass_token: str) -> tuple[bool, str | None]:
+        hass_url: str, hass_token: str,
+        live: set[str] | None = None,
+        unknown: set[str] | None = None) -> tuple[bool, str | None]:
     if entity.get('disabled_by'):
         return False, (
             f"entity.disabled_by={entity['disabled_by']!r} "
             "(looks intentional)")
-    ce_by_id = {ce.get('entry_id'): ce for ce in data['config_entries']}
-    parent_id = entity.get('config_entry_id')
-    parent = ce_by_id.get(parent_id) if parent_id else None
-    if not parent or parent.get('state') != 'loaded':
-        return True, None
-    eid = entity.get('entity_id')
-    if eid and _has_recent_activity_for_entity(hass_url, hass_token, eid):
-        return False, (
-            f"parent config_entry is 'loaded' and entity {eid} had "
-            f"non-dead state in last {RECENT_ACTIVITY_WINDOW_DAYS}d")
+    why = _activity_block(_entity_activity_candidates(entity, data), live,
+                          unknown, hass_url, hass_token,
+                          "parent config_entry is 'loaded'")
+    if why:
+        return False, why
     return True, None
 
 
@@ -468,23 +628,19 @@ def safety_check_entity_live_state(
 
 def safety_check_config_entry(
         entry: dict, data: dict,
-        hass_url: str, hass_token: str) -> tuple[bool, str | None]:
+        hass_url: str, hass_token: str,
+        live: set[str] | None = None,
+        unknown: set[str] | None = None) -> tuple[bool, str | None]:
     """Config-entry deletes are intrinsically high-blast-radius.
 
-    Block if state == 'loaded' AND any owned entity has recent activity.
+    Block if state == 'loaded' AND any owned entity has recent activity
+    (or unchecked history).
     """
-    if entry.get('state') != 'loaded':
-        return True, None
-    entry_id = entry.get('entry_id')
-    owned_eids = [e.get('entity_id') for e in data['entities']
-                  if e.get('config_entry_id') == entry_id
-                  and not e.get('disabled_by')
-                  and e.get('entity_id')]
-    for eid in owned_eids[:25]:  # cap network calls
-        if _has_recent_activity_for_entity(hass_url, hass_token, eid):
-            return False, (
-                f"config_entry state='loaded' and entity {eid} had "
-                f"non-dead state in last {RECENT_ACTIVITY_WINDOW_DAYS}d")
+    why = _activity_block(_config_entry_activity_candidates(entry, data),
+                          live, unknown, hass_url, hass_token,
+                          "config_entry state='loaded'")
+    if why:
+        return False, why
     return True, None
 
 
@@ -710,19 +866,28 @@ def run_delete(  # noqa: C901 — driver, intentional length
             for _r, why in live_prompts:
                 click.secho(why, fg='yellow', err=True)
 
-    # Safety predicate.
+    # Safety predicate. History for every candidate entity is looked up
+    # up front in a few batched requests, not one request per entity.
     blocked: list[tuple[dict, str]] = []
     if not force:
+        groups = {(r['kind'], r['id']): activity_candidates(r, data)
+                  for r in records}
+        live, unknown, calls, failed = _recent_activity(HASS_URL, HASS_TOKEN, groups)
+        if not quiet:
+            n_eids = len({e for eids in groups.values() for e in eids})
+            click.echo(f"Safety check: {n_eids} entity(s) checked for recent "
+                       f"activity in {calls} history request(s)"
+                       + (f", {failed} failed" if failed else ''), err=True)
         for r in records:
             if r['kind'] == KIND_DEVICE:
                 ok, why = safety_check_device(
-                    r['pre_state'], data, HASS_URL, HASS_TOKEN)
+                    r['pre_state'], data, HASS_URL, HASS_TOKEN, live, unknown)
             elif r['kind'] == KIND_ENTITY:
                 ok, why = safety_check_entity(
-                    r['pre_state'], data, HASS_URL, HASS_TOKEN)
+                    r['pre_state'], data, HASS_URL, HASS_TOKEN, live, unknown)
             else:
                 ok, why = safety_check_config_entry(
-                    r['pre_state'], data, HASS_URL, HASS_TOKEN)
+                    r['pre_state'], data, HASS_URL, HASS_TOKEN, live, unknown)
             if not ok:
                 blocked.append((r, why or 'safety predicate refused'))
 
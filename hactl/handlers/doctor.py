@@ -2,13 +2,17 @@
 Health check handler for hactl doctor command
 """
 
+import asyncio
 import json
+import os
 import re
-import urllib.request
-import urllib.error
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
+from pathlib import Path
 import click
-from hactl.core import load_config, make_api_request
+from hactl.core import load_config, make_api_request, get_session, AsyncHassClient
+from hactl.core.context import bind_context, cached_request, get_registries, shared_websocket
+from hactl.core.rules import Rule, RuleSet, load_rules
 from hactl.core.websocket import WebSocketClient
 
 
@@ -107,50 +111,63 @@ def check_api(hass_url, hass_token):
         ])
 
 
-def _classify_entity(entity_id, state_val):
-    """Classify an unavailable/unknown entity into a category.
+# Classification rules in priority order; the first match wins. Compiled
+# once into a single-pass matcher (see hactl.core.rules).
+BUILTIN_RULES = [
+    # Action-type entities in 'unknown' state — expected, never triggered
+    Rule('expected_unknown', domains=EXPECTED_UNKNOWN_DOMAINS, states=['unknown']),
+    # Mobile devices off-network
+    Rule('mobile', contains=MOBILE_KEYWORDS, states=['unavailable']),
+    # Appliances powered off (both unavailable and unknown — program sensors are unknown when off)
+    Rule('appliance', contains=APPLIANCE_KEYWORDS),
+    # Echo/Alexa devices — alarm/reminder/timer sensors always unavailable
+    Rule('echo_alexa', contains=ECHO_KEYWORDS, states=['unavailable']),
+    # UniFi network switch PoE port controls
+    Rule('unifi_switches', contains=UNIFI_KEYWORDS),
+    # Solar inverter entities — unavailable at night (s1_ch and s1ch spellings)
+    Rule('solar_inverter', prefixes=sorted(
+        SOLAR_INVERTER_PREFIXES | {p.replace('_', '', 1) for p in SOLAR_INVERTER_PREFIXES})),
+    # AirPlay endpoints — unavailable when device is off
+    Rule('airplay', contains=AIRPLAY_KEYWORDS, states=['unavailable']),
+    # Frigate camera review status and person image entities
+    Rule('camera_review', contains=['review_status']),
+    Rule('camera_review', contains=CAMERA_REVIEW_KEYWORDS, domains=CAMERA_REVIEW_DOMAINS),
+]
 
-    Returns one of the category keys used in check_unavailable().
-    """
-    domain = entity_id.split('.')[0] if '.' in entity_id else ''
-    eid_lower = entity_id.lower()
-    name_part = entity_id.split('.', 1)[1] if '.' in entity_id else entity_id
+DEFAULT_RULES_FILE = Path.home() / '.hactl' / 'doctor-rules.yaml'
 
-    # Action-type entities in 'unknown' state — expected, never triggered
-    if state_val == 'unknown' and domain in EXPECTED_UNKNOWN_DOMAINS:
-        return 'expected_unknown'
+_ruleset = None
 
-    # Mobile devices off-network
-    if state_val == 'unavailable' and any(kw in eid_lower for kw in MOBILE_KEYWORDS):
-        return 'mobile'
 
-    # Appliances powered off (both unavailable and unknown — program sensors are unknown when off)
-    if any(kw in eid_lower for kw in APPLIANCE_KEYWORDS):
-        return 'appliance'
+def configure_rules(path=None):
+    """Compile the classification rules, user rules first.
 
-    # Echo/Alexa devices — alarm/reminder/timer sensors always unavailable
-    if state_val == 'unavailable' and any(kw in eid_lower for kw in ECHO_KEYWORDS):
-        return 'echo_alexa'
+    User rules come from `path`, else HACTL_DOCTOR_RULES (empty disables),
+    else DEFAULT_RULES_FILE if it exists.
+    """
+    global _ruleset
+    if path is None:
+        env = os.environ.get('HACTL_DOCTOR_RULES')
+        if env is not None:
+            path = env or None
+        elif DEFAULT_RULES_FILE.exists():
+            path = DEFAULT_RULES_FILE
+    user_rules = load_rules(path) if path else []
+    _ruleset = RuleSet(user_rules + BUILTIN_RULES, default='truly_unavailable')
+    return _ruleset
 
-    # UniFi network switch PoE port controls
-    if any(kw in eid_lower for kw in UNIFI_KEYWORDS):
-        return 'unifi_switches'
 
-    # Solar inverter entities — unavailable at night
-    if any(name_part.startswith(prefix) or name_part.startswith(prefix.replace('_', '', 1))
-           for prefix in SOLAR_INVERTER_PREFIXES):
-        return 'solar_inverter'
+def _rules():
+    return _ruleset if _ruleset is not None else configure_rules()
 
-    # AirPlay endpoints — unavailable when device is off
-    if state_val == 'unavailable' and any(kw in eid_lower for kw in AIRPLAY_KEYWORDS):
-        return 'airplay'
 
-    # Frigate camera review status and person image entities
-    if any(kw in eid_lower for kw in CAMERA_REVIEW_KEYWORDS):
-        if 'review_status' in eid_lower or domain in CAMERA_REVIEW_DOMAINS:
-            return 'camera_review'
+def _classify_entity(entity_id, state_val):
+    """Classify an unavailable/unknown entity into a category.
 
-    return 'truly_unavailable'
+    Returns one of the category keys used in check_unavailable(), or a
+    category from the user's rules file.
+    """
+    return _rules().classify(entity_id, state_val)
 
 
 def _get_device_group(entity_id):
@@ -181,32 +198,30 @@ _INFO_CATEGORY_LABELS = {
 
 def check_unavailable(states):
     """Check for entities with unavailable/unknown state, with smart categorization."""
-    categories = {
-        'expected_unknown': [],
-        'mobile': [],
-        'appliance': [],
-        'echo_alexa': [],
-        'unifi_switches': [],
-        'solar_inverter': [],
-        'airplay': [],
-        'camera_review': [],
-        'truly_unavailable': [],
-    }
+    rules = _rules()
+    categories = {'truly_unavailable': []}
     healthy_count = 0
 
     for s in states:
         state_val = s.get('state', '')
         if state_val in ('unavailable', 'unknown'):
             eid = s.get('entity_id', '?')
-            cat = _classify_entity(eid, state_val)
-            categories[cat].append(eid)
+            cat = rules.classify(eid, state_val)
+            categories.setdefault(cat, []).append(eid)
         else:
             healthy_count += 1
 
     findings = []
 
-    # INFO categories
-    for cat_key, (label, show_domains) in _INFO_CATEGORY_LABELS.items():
+    # INFO categories: built-in ones first, then those from user rules
+    info_labels = dict(_INFO_CATEGORY_LABELS)
+    for cat_key, label in rules.labels().items():
+        info_labels.setdefault(cat_key, (label, False))
+    for cat_key in categories:
+        info_labels.setdefault(cat_key, (f"{cat_key} entities", False))
+    info_labels.pop('truly_unavailable', None)
+
+    for cat_key, (label, show_domains) in info_labels.items():
         entities = categories.get(cat_key, [])
         if not entities:
             continue
@@ -255,22 +270,30 @@ def check_unavailable(states):
     return _check_result('Unavailable Entities', findings)
 
 
+def _battery_status(s):
+    """Severity and level of one battery entity, or None if it is not one."""
+    if s.get('attributes', {}).get('device_class') != 'battery':
+        return None
+    try:
+        level = float(s.get('state', ''))
+    except (ValueError, TypeError):
+        return None
+    if level < BATTERY_CRITICAL_THRESHOLD:
+        return 'critical', level
+    if level < BATTERY_WARNING_THRESHOLD:
+        return 'warning', level
+    return 'ok', level
+
+
 def check_batteries(states):
     """Check for low battery devices."""
     findings = []
     for s in states:
-        attrs = s.get('attributes', {})
-        if attrs.get('device_class') != 'battery':
+        battery = _battery_status(s)
+        if battery is None or battery[0] == 'ok':
             continue
-        try:
-            level = float(s.get('state', ''))
-        except (ValueError, TypeError):
-            continue
-        eid = s.get('entity_id', '?')
-        if level < BATTERY_CRITICAL_THRESHOLD:
-            findings.append(_finding('critical', f"{eid} - {int(level)}%"))
-        elif level < BATTERY_WARNING_THRESHOLD:
-            findings.append(_finding('warning', f"{eid} - {int(level)}%"))
+        status, level = battery
+        findings.append(_finding(status, f"{s.get('entity_id', '?')} - {int(level)}%"))
     if not findings:
         return _check_result('Low Battery Devices', [
             _finding('ok', 'All batteries above 30%')
@@ -280,17 +303,16 @@ def check_batteries(states):
 
 def _fetch_plain_text(url, token):
     """Fetch a plain-text API endpoint (e.g., /api/error_log)."""
-    req = urllib.request.Request(url)
-    req.add_header('Authorization', f'Bearer {token}')
-    with urllib.request.urlopen(req) as response:
-        return response.read().decode()
+    return get_session().request('GET', url, token).text()
 
 
-def check_error_log(hass_url, hass_token):
-    """Analyze error log for issues."""
-    try:
-        log_text = _fetch_plain_text(f"{hass_url}/api/error_log", hass_token)
-    except Exception:
+def check_error_log(log_text):
+    """Analyze error log for issues.
+
+    Args:
+        log_text: The error log, or the exception raised fetching it
+    """
+    if isinstance(log_text, Exception):
         return _check_result('Error Log', [
             _finding('warning', 'Could not retrieve error log')
         ])
@@ -323,12 +345,8 @@ def check_error_log(hass_url, hass_token):
 
 def _post_json(url, token, data=None):
     """Make a POST request returning parsed JSON."""
-    req = urllib.request.Request(url, method='POST')
-    req.add_header('Authorization', f'Bearer {token}')
-    req.add_header('Content-Type', 'application/json')
-    req.data = json.dumps(data or {}).encode('utf-8')
-    with urllib.request.urlopen(req) as response:
-        return json.loads(response.read().decode())
+    body = json.dumps(data or {}).encode('utf-8')
+    return get_session().request('POST', url, token, body=body).json()
 
 
 def check_config(hass_url, hass_token):
@@ -350,31 +368,37 @@ def check_config(hass_url, hass_token):
         ])
 
 
+def _stale_age(s, now):
+    """How long ago a non-static entity last changed, if over STALE_HOURS."""
+    eid = s.get('entity_id', '')
+    domain = eid.split('.')[0] if '.' in eid else ''
+    if domain in STATIC_DOMAINS:
+        return None
+    last_changed = s.get('last_changed', s.get('last_updated', ''))
+    if not last_changed:
+        return None
+    try:
+        ts = datetime.fromisoformat(last_changed.replace('Z', '+00:00'))
+        delta = now - ts
+    except (ValueError, TypeError):
+        return None
+    return delta if delta.total_seconds() / 3600 > STALE_HOURS else None
+
+
 def check_stale(states):
     """Check for entities that haven't updated recently."""
     now = datetime.now(timezone.utc)
     findings = []
     for s in states:
-        eid = s.get('entity_id', '')
-        domain = eid.split('.')[0] if '.' in eid else ''
-        if domain in STATIC_DOMAINS:
-            continue
-        last_changed = s.get('last_changed', s.get('last_updated', ''))
-        if not last_changed:
-            continue
-        try:
-            ts = datetime.fromisoformat(last_changed.replace('Z', '+00:00'))
-            delta = now - ts
-            hours = delta.total_seconds() / 3600
-            if hours > STALE_HOURS:
-                days = delta.days
-                if days >= 1:
-                    age_str = f"{days} day{'s' if days != 1 else ''} ago"
-                else:
-                    age_str = f"{int(hours)} hours ago"
-                findings.append(_finding('warning', f"{eid} - last changed {age_str}"))
-        except (ValueError, TypeError):
+        delta = _stale_age(s, now)
+        if delta is None:
             continue
+        days = delta.days
+        if days >= 1:
+            age_str = f"{days} day{'s' if days != 1 else ''} ago"
+        else:
+            age_str = f"{int(delta.total_seconds() / 3600)} hours ago"
+        findings.append(_finding('warning', f"{s.get('entity_id', '')} - last changed {age_str}"))
 
     if not findings:
         return _check_result('Stale Entities', [
@@ -417,7 +441,7 @@ def check_version(hass_url, hass_token):
 def check_entity_availability_by_domain(states):
     """Group truly unavailable entities by integration domain.
 
-    Uses _classify_entity to exclude all INFO categories (expected unknowns,
+    Uses the classification rules to exclude all INFO categories (expected unknowns,
     mobile devices, appliances, Echo/Alexa, UniFi, solar, AirPlay, cameras).
     Only counts entities classified as 'truly_unavailable'.
 
@@ -426,6 +450,7 @@ def check_entity_availability_by_domain(states):
     integration produces no entities to count. Use check_config_entries()
     for integration-level failures.
     """
+    classify = _rules().classify
     domain_unavail = {}
     domain_totals = {}
     for s in states:
@@ -438,7 +463,7 @@ def check_entity_availability_by_domain(states):
         if state_val not in ('unavailable', 'unknown'):
             continue
         # Only count truly unavailable entities
-        if _classify_entity(eid, state_val) == 'truly_unavailable':
+        if classify(eid, state_val) == 'truly_unavailable':
             domain_unavail[domain] = domain_unavail.get(domain, 0) + 1
 
     findings = []
@@ -471,7 +496,7 @@ _CONFIG_ENTRY_CRIT_STATES = frozenset(['setup_error', 'failed_unload', 'migratio
 _CONFIG_ENTRY_WARN_STATES = frozenset(['setup_retry', 'setup_in_progress', 'not_loaded'])
 
 
-def check_config_entries(hass_url, hass_token):
+def check_config_entries(entries):
     """Check Home Assistant config entries (integrations) for failed setup states.
 
     Uses the REST endpoint /api/config/config_entries/entry, which (since
@@ -479,17 +504,17 @@ def check_config_entries(hass_url, hass_token):
     Entries with `disabled_by` set or `source == "ignore"` are user-suppressed
     and ignored. Remaining non-`loaded` entries are mapped to severities
     via _CONFIG_ENTRY_CRIT_STATES / _CONFIG_ENTRY_WARN_STATES.
+
+    Args:
+        entries: The config entries, or the exception raised fetching them
     """
-    try:
-        entries = make_api_request(
-            f"{hass_url}/api/config/config_entries/entry", hass_token)
-    except click.ClickException as e:
+    if isinstance(entries, click.ClickException):
         return _check_result('Integrations', [
-            _finding('warning', f"Could not fetch config entries: {e.format_message()}")
+            _finding('warning', f"Could not fetch config entries: {entries.format_message()}")
         ])
-    except Exception as e:
+    if isinstance(entries, Exception):
         return _check_result('Integrations', [
-            _finding('warning', f"Could not fetch config entries: {e}")
+            _finding('warning', f"Could not fetch config entries: {entries}")
         ])
 
     if not isinstance(entries, list):
@@ -575,17 +600,10 @@ DEFAULT_IGNORE_LABEL = 'haghs_ignore'
 
 def _fetch_registries(hass_url, hass_token):
     """Pull device + entity registry over websocket. Returns (devices, entities) or None on failure."""
-    ws = WebSocketClient(hass_url, hass_token)
     try:
-        ws.connect()
-        devices = ws.call('config/device_registry/list')
-        entities = ws.call('config/entity_registry/list')
-        ws.close()
+        devices, entities = get_registries(
+            hass_url, hass_token, ['device', 'entity'], WebSocketClient)
     except Exception:
-        try:
-            ws.close()
-        except Exception:
-            pass
         return None
     if not isinstance(devices, list) or not isinstance(entities, list):
         return None
@@ -755,7 +773,24 @@ def classify_zombies(devices, entities, states, ignore_label=None,
     }
 
 
-def check_zombie_devices(hass_url, hass_token, states):
+def _zombie_severity(bucket, count):
+    """Severity of the headline finding for `count` items in a zombie bucket."""
+    if bucket in ('orphans', 'stalled'):
+        return 'warning' if count > ZOMBIE_DEVICE_WARN_THRESHOLD else 'info'
+    if bucket == 'restored_entities':
+        return 'warning' if count > ZOMBIE_RESTORED_ENTITY_WARN_THRESHOLD else 'info'
+    if bucket == 'unavailable_entities':
+        # Tiered: INFO < 10, WARN 10-49, CRIT >=50. Most installs land in
+        # INFO/WARN without action; CRIT means an integration cluster is
+        # misbehaving.
+        if count >= ZOMBIE_UNAVAILABLE_ENTITY_CRIT_THRESHOLD:
+            return 'critical'
+        if count >= ZOMBIE_UNAVAILABLE_ENTITY_WARN_THRESHOLD:
+            return 'warning'
+    return 'info'
+
+
+def check_zombie_devices(states, registries):
     """Identify zombie devices and zombie entities.
 
     Three device-level categories and one entity-level category, all reported
@@ -780,8 +815,10 @@ def check_zombie_devices(hass_url, hass_token, states):
     (no enabled entities at all). Top-N example per category is shown.
     Total count is the sum across all four categories (with overlap kept,
     matching what users see when scanning HA's Devices page + Watchman).
+
+    `registries` is the (devices, entities) pair from `_fetch_registries`,
+    or None if it could not be fetched.
     """
-    registries = _fetch_registries(hass_url, hass_token)
     if registries is None:
         return _check_result('Zombie Devices', [
             _finding('warning', 'Could not fetch device/entity registry over websocket')
@@ -817,7 +854,7 @@ def check_zombie_devices(hass_url, hass_token, states):
 
     # Orphans
     if orphans:
-        sev = 'warning' if len(orphans) > ZOMBIE_DEVICE_WARN_THRESHOLD else 'info'
+        sev = _zombie_severity('orphans', len(orphans))
         findings.append(_finding(sev,
             f"Orphan devices (no enabled entities): {len(orphans)}"))
         for d in orphans[:ZOMBIE_TOP_N]:
@@ -828,7 +865,7 @@ def check_zombie_devices(hass_url, hass_token, states):
 
     # Stalled
     if stalled:
-        sev = 'warning' if len(stalled) > ZOMBIE_DEVICE_WARN_THRESHOLD else 'info'
+        sev = _zombie_severity('stalled', len(stalled))
         findings.append(_finding(sev,
             f"Stalled devices (all entities unavailable): {len(stalled)}"))
         for d in stalled[:ZOMBIE_TOP_N]:
@@ -839,7 +876,7 @@ def check_zombie_devices(hass_url, hass_token, states):
 
     # Disabled
     if disabled_devs:
-        findings.append(_finding('info',
+        findings.append(_finding(_zombie_severity('disabled', len(disabled_devs)),
             f"Disabled devices (user/integration disabled): {len(disabled_devs)}"))
         for d in disabled_devs[:ZOMBIE_TOP_N]:
             findings.append(_finding('info', f"  {_device_label(d)}"))
@@ -849,7 +886,7 @@ def check_zombie_devices(hass_url, hass_token, states):
 
     # Restored entities
     if restored_entities:
-        sev = 'warning' if len(restored_entities) > ZOMBIE_RESTORED_ENTITY_WARN_THRESHOLD else 'info'
+        sev = _zombie_severity('restored_entities', len(restored_entities))
         findings.append(_finding(sev,
             f"Restored entities (integration no longer provides them): {len(restored_entities)}"))
         for s in restored_entities[:ZOMBIE_TOP_N]:
@@ -858,17 +895,10 @@ def check_zombie_devices(hass_url, hass_token, states):
             findings.append(_finding('info',
                 f"  ... and {len(restored_entities) - ZOMBIE_TOP_N} more"))
 
-    # Unavailable entities — HAGHS-parity 5th bucket. Tiered severity:
-    # INFO < 10, WARN 10-49, CRIT >=50. Most installs land in INFO/WARN
-    # without action; CRIT means an integration cluster is misbehaving.
+    # Unavailable entities — HAGHS-parity 5th bucket, tiered severity
     if unavailable_entities:
         n = len(unavailable_entities)
-        if n >= ZOMBIE_UNAVAILABLE_ENTITY_CRIT_THRESHOLD:
-            sev = 'critical'
-        elif n >= ZOMBIE_UNAVAILABLE_ENTITY_WARN_THRESHOLD:
-            sev = 'warning'
-        else:
-            sev = 'info'
+        sev = _zombie_severity('unavailable_entities', n)
         findings.append(_finding(sev,
             f"Unavailable entities (>15min, on healthy domains): {n}"))
         for tup in unavailable_entities[:ZOMBIE_TOP_N]:
@@ -928,6 +958,128 @@ def check_automations(states):
     return _check_result('Automation Health', findings)
 
 
+# Recorder queue: HA drops events once the backlog reaches max_backlog, so
+# warn well before that and go critical at half of it.
+RECORDER_BACKLOG_WARNING = 1000
+RECORDER_BACKLOG_CRITICAL_RATIO = 0.5
+# SQLite past this size makes purges and history queries noticeably slow
+RECORDER_SQLITE_SIZE_WARNING_MIB = 5 * 1024
+RECORDER_HEALTH_TIMEOUT = 10
+
+_DB_ENGINE_NAMES = {
+    'sqlite': 'SQLite',
+    'mysql': 'MySQL/MariaDB',
+    'postgresql': 'PostgreSQL',
+}
+
+
+def _fetch_recorder_info(hass_url, hass_token):
+    """Run `recorder/info` over the shared websocket. Returns None on failure."""
+    try:
+        with shared_websocket(hass_url, hass_token, WebSocketClient) as ws:
+            info = ws.call('recorder/info')
+    except Exception:
+        return None
+    return info if isinstance(info, dict) else None
+
+
+async def _recorder_system_health(hass_url, hass_token):
+    async with AsyncHassClient(hass_url, hass_token) as client:
+        subscription = await client.subscribe('system_health/info')
+        info = {}
+        async for event in subscription:
+            kind = event.get('type')
+            if kind == 'initial':
+                info = dict(((event.get('data') or {}).get('recorder') or {}).get('info') or {})
+            elif kind == 'update' and event.get('domain') == 'recorder':
+                info[event.get('key')] = event.get('data') if event.get('success') else None
+            elif kind == 'finish':
+                break
+        await subscription.unsubscribe()
+        return info
+
+
+def _fetch_recorder_health(hass_url, hass_token):
+    """Recorder section of `system_health/info` (database engine, size).
+
+    Values the recorder computes in the background arrive as updates after
+    the initial snapshot; the subscription ends with a `finish` event.
+    Returns None on failure.
+    """
+    try:
+        return asyncio.run(asyncio.wait_for(
+            _recorder_system_health(hass_url, hass_token), RECORDER_HEALTH_TIMEOUT))
+    except Exception:
+        return None
+
+
+def _mib(size):
+    """Parse system_health's `estimated_db_size` ("1234.56 MiB")."""
+    try:
+        return float(str(size).split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def check_recorder(hass_url, hass_token):
+    """Check recorder queue backlog, migrations and database backend."""
+    info = _fetch_recorder_info(hass_url, hass_token)
+    if info is None:
+        return _check_result('Recorder', [
+            _finding('warning', 'Could not fetch recorder info (recorder/info)')
+        ])
+
+    findings = []
+    migrating = info.get('migration_in_progress')
+    if migrating:
+        if info.get('migration_is_live'):
+            findings.append(_finding('warning',
+                'Database schema migration in progress (live; recording continues)'))
+        else:
+            findings.append(_finding('critical',
+                'Database schema migration in progress; recording is paused until it completes'))
+    else:
+        findings.append(_finding('ok', 'No database migration in progress'))
+
+    if not info.get('thread_running', True):
+        findings.append(_finding('critical', 'Recorder thread is not running'))
+    elif not info.get('recording', True) and not migrating:
+        findings.append(_finding('critical', 'Recorder is not recording'))
+
+    backlog = info.get('backlog')
+    max_backlog = info.get('max_backlog')
+    if isinstance(backlog, int):
+        limit = f" (max {max_backlog})" if max_backlog else ''
+        if max_backlog and backlog >= max_backlog * RECORDER_BACKLOG_CRITICAL_RATIO:
+            findings.append(_finding('critical',
+                f"Queue backlog: {backlog} events{limit}; events are dropped at the max"))
+        elif backlog >= RECORDER_BACKLOG_WARNING:
+            findings.append(_finding('warning',
+                f"Queue backlog: {backlog} events{limit}; database writes are falling behind"))
+        else:
+            findings.append(_finding('ok', f"Queue backlog: {backlog} events{limit}"))
+
+    health = _fetch_recorder_health(hass_url, hass_token)
+    engine = (health or {}).get('database_engine')
+    if not engine:
+        findings.append(_finding('info', 'Database engine unknown (system_health unavailable)'))
+    else:
+        name = _DB_ENGINE_NAMES.get(engine, engine)
+        version = health.get('database_version')
+        size = _mib(health.get('estimated_db_size'))
+        desc = f"Database: {name}{f' {version}' if version else ''}"
+        desc += ' (embedded)' if engine == 'sqlite' else ' (external)'
+        if size is not None:
+            desc += f", {size:.0f} MiB"
+        findings.append(_finding('info', desc))
+        if engine == 'sqlite' and size is not None and size >= RECORDER_SQLITE_SIZE_WARNING_MIB:
+            findings.append(_finding('warning',
+                f"SQLite database is {size / 1024:.1f} GiB; reduce purge_keep_days, exclude "
+                "noisy entities (hactl get recorder-cost) or move to an external database"))
+
+    return _check_result('Recorder', findings)
+
+
 SEVERITY_COLORS = {
     'critical': 'red',
     'warning': 'yellow',
@@ -942,16 +1094,115 @@ SEVERITY_LABELS = {
     'ok': 'OK  ',
 }
 
-ALL_CHECKS = [
-    'api', 'unavailable', 'batteries', 'error_log', 'config',
-    'stale', 'version', 'config_entries', 'entity_availability',
-    'zombie_devices', 'automations',
-]
+def _source_states(hass_url, hass_token):
+    return cached_request(f"{hass_url}/api/states", hass_token, make_api_request)
+
+
+def _source_registries(hass_url, hass_token):
+    return _fetch_registries(hass_url, hass_token)
+
+
+def _source_config_entries(hass_url, hass_token):
+    return cached_request(f"{hass_url}/api/config/config_entries/entry", hass_token,
+                          make_api_request)
+
+
+def _source_error_log(hass_url, hass_token):
+    return _fetch_plain_text(f"{hass_url}/api/error_log", hass_token)
+
+
+# Data shared between checks, each fetched at most once per run
+DATA_SOURCES = {
+    'states': _source_states,
+    'registries': _source_registries,
+    'config_entries': _source_config_entries,
+    'error_log': _source_error_log,
+}
+
+# Checks cannot run without these; a failure aborts the report
+REQUIRED_SOURCES = frozenset(['states'])
+
+# Check name -> (data sources it needs, runner(hass_url, hass_token, data)).
+# Checks without sources make their own single call. Order is report order.
+CHECKS = {
+    'api': ((), lambda url, token, data: check_api(url, token)),
+    'unavailable': (('states',), lambda url, token, data: check_unavailable(data['states'])),
+    'batteries': (('states',), lambda url, token, data: check_batteries(data['states'])),
+    'error_log': (('error_log',), lambda url, token, data: check_error_log(data['error_log'])),
+    'config': ((), lambda url, token, data: check_config(url, token)),
+    'stale': (('states',), lambda url, token, data: check_stale(data['states'])),
+    'version': ((), lambda url, token, data: check_version(url, token)),
+    'config_entries': (('config_entries',),
+                       lambda url, token, data: check_config_entries(data['config_entries'])),
+    'entity_availability': (('states',), lambda url, token, data:
+                            check_entity_availability_by_domain(data['states'])),
+    'zombie_devices': (('states', 'registries'), lambda url, token, data:
+                       check_zombie_devices(data['states'], data['registries'])),
+    'automations': (('states',), lambda url, token, data: check_automations(data['states'])),
+    'recorder': ((), lambda url, token, data: check_recorder(url, token)),
+}
+
+ALL_CHECKS = list(CHECKS)
+
+# Enough for every source and call-making check to be in flight at once
+DOCTOR_WORKERS = 8
+
 
+def _outcome(future):
+    """A finished future's result, or the exception it raised."""
+    error = future.exception()
+    return error if error is not None else future.result()
 
-def run_doctor(format_type='table', check_name=None):
-    """Run health checks and produce a report."""
+
+def _run_checks(hass_url, hass_token, names, workers=DOCTOR_WORKERS):
+    """
+    Run checks on a thread pool, each as soon as its data sources arrive.
+
+    Every source needed by `names` is fetched once, all concurrently. A
+    failed source is handed to its checks as the exception instance, except
+    for REQUIRED_SOURCES, whose dependent checks are skipped.
+
+    Args:
+        hass_url: Home Assistant base URL
+        hass_token: Long-lived access token
+        names: Checks to run
+        workers: Thread pool size
+
+    Returns:
+        tuple: ({check name: result}, {source name: value or exception})
+    """
+    needed = sorted({source for name in names for source in CHECKS[name][0]})
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hactl-doctor') as pool:
+        sources = {source: pool.submit(bind_context(DATA_SOURCES[source]), hass_url, hass_token)
+                   for source in needed}
+        started = {}
+        while True:
+            for name in names:
+                deps, runner = CHECKS[name]
+                if name in started or not all(sources[d].done() for d in deps):
+                    continue
+                data = {d: _outcome(sources[d]) for d in deps}
+                if any(isinstance(data[d], Exception) for d in deps if d in REQUIRED_SOURCES):
+                    started[name] = None
+                    continue
+                started[name] = pool.submit(bind_context(runner), hass_url, hass_token, data)
+            if len(started) == len(names):
+                break
+            wait([f for f in sources.values() if not f.done()], return_when=FIRST_COMPLETED)
+        results = {name: future.result() for name, future in started.items() if future}
+    return results, {source: _outcome(future) for source, future in sources.items()}
+
+
+def run_doctor(format_type='table', check_name=None, rules_path=None):
+    """Run health checks and produce a report.
+
+    Args:
+        format_type: Output format
+        check_name: Run only this check
+        rules_path: User classification rules file (see configure_rules)
+    """
     HASS_URL, HASS_TOKEN = load_config()
+    configure_rules(rules_path)
 
     if check_name and check_name not in ALL_CHECKS:
         raise click.ClickException(
@@ -959,47 +1210,27 @@ def run_doctor(format_type='table', check_name=None):
 
     checks_to_run = [check_name] if check_name else ALL_CHECKS
 
-    # Fetch states once if needed by any check
-    states = None
-    needs_states = {'unavailable', 'batteries', 'stale', 'entity_availability', 'automations', 'zombie_devices'}
-    if needs_states & set(checks_to_run):
-        try:
-            states = make_api_request(f"{HASS_URL}/api/states", HASS_TOKEN)
-        except click.ClickException as e:
-            if format_type == 'json':
-                click.echo(json.dumps({'error': f'Could not fetch states: {e.format_message()}'}, indent=2))
-            else:
-                click.secho(f"Error: Could not fetch states: {e.format_message()}", fg='red')
-            return
-
-    # Run checks
+    # Independent fetches and checks overlap; results keep ALL_CHECKS order
+    by_name, sources = _run_checks(HASS_URL, HASS_TOKEN, checks_to_run)
+
+    states = sources.get('states')
+    if isinstance(states, click.ClickException):
+        if format_type == 'json':
+            click.echo(json.dumps({'error': f'Could not fetch states: {states.format_message()}'}, indent=2))
+        else:
+            click.secho(f"Error: Could not fetch states: {states.format_message()}", fg='red')
+        return
+    if isinstance(states, Exception):
+        raise states
+
     results = []
     version_info = None
-
     for name in checks_to_run:
-        if name == 'api':
-            results.append(check_api(HASS_URL, HASS_TOKEN))
-        elif name == 'unavailable':
-            results.append(check_unavailable(states))
-        elif name == 'batteries':
-            results.append(check_batteries(states))
-        elif name == 'error_log':
-            results.append(check_error_log(HASS_URL, HASS_TOKEN))
-        elif name == 'config':
-            results.append(check_config(HASS_URL, HASS_TOKEN))
-        elif name == 'stale':
-            results.append(check_stale(states))
-        elif name == 'version':
-            version_info = check_version(HASS_URL, HASS_TOKEN)
-            results.append(version_info['check'])
-        elif name == 'config_entries':
-            results.append(check_config_entries(HASS_URL, HASS_TOKEN))
-        elif name == 'entity_availability':
-            results.append(check_entity_availability_by_domain(states))
-        elif name == 'zombie_devices':
-            results.append(check_zombie_devices(HASS_URL, HASS_TOKEN, states))
-        elif name == 'automations':
-            results.append(check_automations(states))
+        result = by_name[name]
+        if name == 'version':
+            version_info = result
+            result = result['check']
+        results.append(result)
 
     # Output
     if format_type == 'json':
@@ -0,0 +1,364 @@
+"""
+Incremental `hactl doctor --watch`: keep doctor's per-entity checks live
+
+One full evaluation seeds a table of per-entity (and, for zombie devices,
+per-device) conditions. After that only the items an event touches are
+re-evaluated: a `state_changed` event re-checks that entity and the other
+entities of its device; a registry update re-checks the records that
+differ from the previous registry snapshot. Time-based conditions (stale
+entities, the zombie grace period) are re-checked locally on a timer.
+
+Nothing is printed for items that did not change. Each transition is one
+NDJSON line: item-level lines carry `entity_id` or `device_id`, check-level
+lines carry the per-condition `counts`.
+"""
+
+import asyncio
+import json
+from collections import Counter
+from datetime import datetime, timezone
+
+import click
+
+from hactl.core import load_config, AsyncHassClient
+from hactl.handlers import doctor
+
+# Checks that are a pure function of individual entities/devices
+WATCH_CHECKS = ('unavailable', 'batteries', 'stale', 'zombie_devices')
+
+# Seconds between local re-checks of time-based conditions
+SWEEP_INTERVAL = 60.0
+# Registry updates arrive in bursts (integration reloads); refetch once
+REGISTRY_DEBOUNCE = 1.0
+
+REGISTRY_EVENTS = ('entity_registry_updated', 'device_registry_updated')
+
+OK = 'ok'
+_SEVERITY_ORDER = ('critical', 'warning', 'info', 'ok')
+_ZOMBIE_DEVICE_BUCKETS = ('disabled', 'orphans', 'stalled')
+_ZOMBIE_ENTITY_BUCKETS = ('restored_entities', 'unavailable_entities')
+
+
+def _worst(severities):
+    return min(severities, key=_SEVERITY_ORDER.index, default=OK)
+
+
+def _device_key(device_id):
+    return ('device', device_id)
+
+
+class DoctorState:
+    """
+    Per-item doctor conditions, re-evaluated one entity or device at a time.
+
+    Only problem conditions are stored (`conditions[check][key]`); keys are
+    entity ids, or ('device', id) for zombie devices. `counts` keeps the
+    number of items per condition so check-level status never needs a full
+    pass.
+
+    Args:
+        checks: Checks to track (subset of WATCH_CHECKS)
+        rules: Classification RuleSet (default: doctor's configured rules)
+    """
+
+    def __init__(self, checks=WATCH_CHECKS, rules=None):
+        self.checks = tuple(checks)
+        self.rules = rules if rules is not None else doctor._rules()
+        self.states = {}
+        self.devices = None
+        self.entities = None
+        self.device_entities = {}
+        self.conditions = {check: {} for check in self.checks}
+        self.counts = {check: Counter() for check in self.checks}
+        self.status = {}
+        self._records = []
+
+    @property
+    def tracks_zombies(self):
+        return 'zombie_devices' in self.checks
+
+    # -- item evaluation -------------------------------------------------
+
+    def _set(self, check, key, condition, now, **detail):
+        conditions = self.conditions[check]
+        previous = conditions.get(key, OK)
+        if previous == condition:
+            return
+        counts = self.counts[check]
+        for part in previous.split('+') if previous != OK else ():
+            counts[part] -= 1
+            if not counts[part]:
+                del counts[part]
+        for part in condition.split('+') if condition != OK else ():
+            counts[part] += 1
+        if condition == OK:
+            conditions.pop(key, None)
+        else:
+            conditions[key] = condition
+        record = {'ts': now.isoformat(timespec='seconds'), 'check': check}
+        if isinstance(key, tuple):
+            record['device_id'] = key[1]
+        else:
+            record['entity_id'] = key
+        record.update({'from': previous, 'to': condition}, **detail)
+        self._records.append(record)
+
+    def _evaluate_entity(self, entity_id, now, checks=None):
+        s = self.states.get(entity_id)
+        checks = self.checks if checks is None else checks
+        state_val = s.get('state', '') if s else None
+        if 'unavailable' in checks:
+            condition = OK
+            if state_val in ('unavailable', 'unknown'):
+                condition = self.rules.classify(entity_id, state_val)
+            self._set('unavailable', entity_id, condition, now, state=state_val)
+        if 'batteries' in checks:
+            battery = doctor._battery_status(s) if s else None
+            self._set('batteries', entity_id, battery[0] if battery else OK, now,
+                      level=battery[1] if battery else None)
+        if 'stale' in checks:
+            stale = s is not None and doctor._stale_age(s, now) is not None
+            self._set('stale', entity_id, 'stale' if stale else OK, now,
+                      last_changed=s.get('last_changed') if s else None)
+
+    def _evaluate_zombies(self, device_ids, entity_ids, now):
+        """Re-classify these devices and entities, plus everything on those devices."""
+        if not self.tracks_zombies or self.devices is None:
+            return
+        entity_ids = set(entity_ids)
+        device_ids = set(device_ids)
+        for entity_id in list(entity_ids):
+            device_id = (self.entities.get(entity_id) or {}).get('device_id')
+            if device_id:
+                device_ids.add(device_id)
+        for device_id in device_ids:
+            entity_ids.update(self.device_entities.get(device_id, ()))
+
+        classified = doctor.classify_zombies(
+            [self.devices[d] for d in device_ids if d in self.devices],
+            [self.entities[e] for e in entity_ids if e in self.entities],
+            [self.states[e] for e in entity_ids if e in self.states],
+            now=now)
+
+        device_buckets = {}
+        for bucket in _ZOMBIE_DEVICE_BUCKETS:
+            for device in classified[bucket]:
+                device_buckets[device.get('id')] = bucket
+        entity_buckets = {}
+        for s in classified['restored_entities']:
+            entity_buckets.setdefault(s.get('entity_id'), []).append('restored_entities')
+        for s, _ent_reg, _dev_reg in classified['unavailable_entities']:
+            entity_buckets.setdefault(s.get('entity_id'), []).append('unavailable_entities')
+
+        for device_id in sorted(device_ids):
+            self._set('zombie_devices', _device_key(device_id),
+                      device_buckets.get(device_id, OK), now)
+        for entity_id in sorted(entity_ids):
+            self._set('zombie_devices', entity_id,
+                      '+'.join(entity_buckets.get(entity_id, ())) or OK, now)
+
+    # -- check-level status -----------------------------------------------
+
+    def _check_status(self, check):
+        counts = self.counts[check]
+        if check == 'unavailable':
+            if counts.get('truly_unavailable'):
+                return 'warning'
+            return 'info' if counts else OK
+        if check == 'zombie_devices':
+            if self.devices is None:
+                return 'warning'
+            if not counts:
+                return OK
+            # Every non-empty bucket adds its headline plus the 'info' total
+            return _worst([doctor._zombie_severity(bucket, n) for bucket, n in counts.items()]
+                          + ['info'])
+        if check == 'stale':
+            return 'warning' if counts else OK
+        return _worst(counts)
+
+    def _flush(self, now):
+        for check in self.checks:
+            status = self._check_status(check)
+            previous = self.status.get(check)
+            if status != previous:
+                self.status[check] = status
+                self._records.append({'ts': now.isoformat(timespec='seconds'), 'check': check,
+                                      'from': previous, 'to': status,
+                                      'counts': dict(sorted(self.counts[check].items()))})
+        records, self._records = self._records, []
+        return records
+
+    # -- inputs -------------------------------------------------------------
+
+    def _index_registries(self, devices, entities):
+        self.devices = {d['id']: d for d in devices or [] if d.get('id')}
+        self.entities = {e['entity_id']: e for e in entities or [] if e.get('entity_id')}
+        self.device_entities = {}
+        for entity_id, entry in self.entities.items():
+            if entry.get('device_id'):
+                self.device_entities.setdefault(entry['device_id'], set()).add(entity_id)
+
+    def load(self, states, registries=None, now=None):
+        """
+        Full evaluation. Returns only the check-level records: the item
+        conditions are the baseline later transitions are measured from.
+
+        Args:
+            states: /api/states list
+            registries: (devices, entities) registry lists, or None
+            now: Evaluation time (default: now)
+        """
+        now = now or datetime.now(timezone.utc)
+        self.states = {s['entity_id']: s for s in states or [] if s.get('entity_id')}
+        if registries is not None:
+            self._index_registries(*registries)
+        for entity_id in self.states:
+            self._evaluate_entity(entity_id, now)
+        self._evaluate_zombies(self.devices or (), self.states, now)
+        self._records = []
+        return self._flush(now)
+
+    def apply_state_changed(self, data, now=None):
+        """Apply one `state_changed` event payload; return transition records."""
+        now = now or datetime.now(timezone.utc)
+        entity_id = (data or {}).get('entity_id')
+        if not entity_id:
+            return []
+        new_state = data.get('new_state')
+        if new_state is None:
+            self.states.pop(entity_id, None)
+        else:
+            current = self.states.get(entity_id)
+            if current is not None:
+                # Events queued before the initial snapshot may be older than it
+                seen = doctor._parse_iso_ts(current.get('last_updated'))
+                incoming = doctor._parse_iso_ts(new_state.get('last_updated'))
+                if seen and incoming and incoming < seen:
+                    return []
+            self.states[entity_id] = new_state
+        self._evaluate_entity(entity_id, now)
+        self._evaluate_zombies((), (entity_id,), now)
+        return self._flush(now)
+
+    def apply_registries(self, devices, entities, now=None):
+        """Swap in fresh registries and re-check only the records that differ."""
+        now = now or datetime.now(timezone.utc)
+        old_devices, old_entities = self.devices or {}, self.entities or {}
+        old_device_of = {e: (r.get('device_id')) for e, r in old_entities.items()}
+        self._index_registries(devices, entities)
+
+        changed_devices = {d for d in set(old_devices) | set(self.devices)
+                           if old_devices.get(d) != self.devices.get(d)}
+        changed_entities = {e for e in set(old_entities) | set(self.entities)
+                            if old_entities.get(e) != self.entities.get(e)}
+        # An entity moving between devices affects the device it left
+        changed_devices.update(old_device_of[e] for e in changed_entities
+                               if old_device_of.get(e))
+        self._evaluate_zombies(changed_devices, changed_entities, now)
+        return self._flush(now)
+
+    def sweep(self, now=None):
+        """Re-check time-based conditions: stale entities and the zombie grace period."""
+        now = now or datetime.now(timezone.utc)
+        if 'stale' in self.checks:
+            for entity_id in list(self.states):
+                self._evaluate_entity(entity_id, now, checks=('stale',))
+        if self.tracks_zombies:
+            waiting = [e for e, s in self.states.items()
+                       if s.get('state') in ('unavailable', 'unknown')
+                       and e.split('.', 1)[0] in doctor.ZOMBIE_UNAVAILABLE_DOMAINS]
+            self._evaluate_zombies((), waiting, now)
+        return self._flush(now)
+
+
+def _emit(records):
+    for record in records:
+        click.echo(json.dumps(record, ensure_ascii=False))
+
+
+async def _fetch_registries(client):
+    try:
+        return tuple(await client.call_many(['config/device_registry/list',
+                                             'config/entity_registry/list']))
+    except click.ClickException:
+        return None
+
+
+async def _follow(hass_url, hass_token, state, sweep_interval, duration, emit):
+    async with AsyncHassClient(hass_url, hass_token) as client:
+        # Subscribe before the snapshot so no change falls in between
+        subscriptions = {'state_changed': await client.subscribe(
+            'subscribe_events', event_type='state_changed')}
+        if state.tracks_zombies:
+            for event_type in REGISTRY_EVENTS:
+                subscriptions[event_type] = await client.subscribe(
+                    'subscribe_events', event_type=event_type)
+
+        states = await client.call('get_states')
+        registries = await _fetch_registries(client) if state.tracks_zombies else None
+        emit(state.load(states, registries))
+
+        registry_dirty = asyncio.Event()
+
+        async def consume_states():
+            async for event in subscriptions['state_changed']:
+                emit(state.apply_state_changed(event.get('data')))
+            raise click.ClickException('WebSocket connection lost')
+
+        async def consume_registry(event_type):
+            async for _event in subscriptions[event_type]:
+                registry_dirty.set()
+            raise click.ClickException('WebSocket connection lost')
+
+        async def refresh_registries():
+            while True:
+                await registry_dirty.wait()
+                await asyncio.sleep(REGISTRY_DEBOUNCE)
+                registry_dirty.clear()
+                fresh = await _fetch_registries(client)
+                if fresh is not None:
+                    emit(state.apply_registries(*fresh))
+
+        async def sweep():
+            while True:
+                await asyncio.sleep(sweep_interval)
+                emit(state.sweep())
+
+        coros = [consume_states(), sweep()]
+        if state.tracks_zombies:
+            coros += [consume_registry(t) for t in REGISTRY_EVENTS] + [refresh_registries()]
+        tasks = [asyncio.ensure_future(c) for c in coros]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=duration,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def run_watch(check_name=None, rules_path=None, sweep_interval=SWEEP_INTERVAL, duration=None):
+    """
+    Evaluate the per-entity checks once, then stream their transitions.
+
+    Args:
+        check_name: Watch only this check (one of WATCH_CHECKS)
+        rules_path: User classification rules file
+        sweep_interval: Seconds between re-checks of time-based conditions
+        duration: Stop after this many seconds (default: until Ctrl-C)
+    """
+    HASS_URL, HASS_TOKEN = load_config()
+    doctor.configure_rules(rules_path)
+
+    if check_name and check_name not in WATCH_CHECKS:
+        raise click.ClickException(
+            f"--watch supports only per-entity checks: {', '.join(WATCH_CHECKS)}")
+    state = DoctorState([check_name] if check_name else WATCH_CHECKS)
+
+    try:
+        asyncio.run(_follow(HASS_URL, HASS_TOKEN, state, sweep_interval, duration, _emit))
+    except KeyboardInterrupt:
+        pass
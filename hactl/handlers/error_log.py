@@ -4,8 +4,8 @@ Handler migrated from get/error_log.py
 
 import json
 import click
-from datetime import datetime, timezone, timedelta
 from hactl.core import load_config, make_api_request, json_to_yaml
+from hactl.core.logbook import Matching, is_error_like, iter_logbook, logbook_window, scan_logbook
 
 def get_error_log(format_type='table'):
     """
@@ -38,28 +38,19 @@ def get_error_log(format_type='table'):
     
     unavailable.sort(key=lambda x: x['entity_id'])
     
-    # Try to fetch logbook for errors
-    end_time = datetime.now(timezone.utc)
-    start_time = end_time - timedelta(hours=24)
-    logbook_url = f"{HASS_URL}/api/logbook/{start_time.isoformat()}"
-    
-    logbook_entries = []
+    # Error-like logbook entries, streamed rather than loaded whole
+    start_time, end_time = logbook_window()
+    errors = Matching(is_error_like, limit=50)
     try:
-        logbook_data = make_api_request(logbook_url, HASS_TOKEN)
-        if isinstance(logbook_data, list) and len(logbook_data) > 0:
-            # Filter for error-like entries
-            for entry in logbook_data:
-                if isinstance(entry, dict):
-                    name = entry.get('name', '')
-                    if any(keyword in name.lower() for keyword in ['error', 'failed', 'unavailable', 'exception']):
-                        logbook_entries.append(entry)
+        scan_logbook(iter_logbook(HASS_URL, HASS_TOKEN, start_time, end_time), errors)
     except Exception:
         # Logbook might not be available or have errors
         pass
-    
+    logbook_entries = errors.items
+
     result = {
         'unavailable_entities': unavailable,
-        'recent_errors': logbook_entries[:50]  # Limit to 50 most recent
+        'recent_errors': logbook_entries
     }
     
     # Format output
@@ -80,7 +71,7 @@ def get_error_log(format_type='table'):
             click.echo()
         
         if logbook_entries:
-            click.echo(f"## Recent Error Log Entries ({len(logbook_entries)})\n")
+            click.echo(f"## Recent Error Log Entries ({errors.count})\n")
             for entry in logbook_entries[:20]:
                 click.echo(f"**{entry.get('name', 'Unknown')}**")
                 if entry.get('when'):
@@ -108,7 +99,7 @@ def get_error_log(format_type='table'):
         click.echo()
         
         if logbook_entries:
-            click.echo(f"## Recent Error Log Entries ({len(logbook_entries)})\n")
+            click.echo(f"## Recent Error Log Entries ({errors.count})\n")
             click.echo(f"{'Name':<40} {'When':<30} {'Entity':<40}")
             click.echo("-" * 110)
             for entry in logbook_entries[:20]:
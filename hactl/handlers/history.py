@@ -2,91 +2,166 @@
 Handler migrated from get/history.py
 """
 
-import sys
+import csv
+import io
 import json
 import click
-from datetime import datetime, timedelta, timezone
-from hactl.core import load_config, make_api_request, json_to_yaml
+from datetime import timedelta
+from hactl.core import load_config, json_to_yaml
+from hactl.core.history import DEFAULT_WORKERS, iter_history_merged, parse_time
+from hactl.core.history_store import HistoryStore
+from hactl.core.logbook import (
+    ActivityCounts, Matching, everything, iter_logbook, logbook_window, scan_logbook,
+)
 
-def get_history(format_type='table'):
+STREAM_FORMATS = ('table', 'json', 'ndjson', 'csv')
+
+
+def _activity(entry):
+    return {
+        'when': entry.get('when'),
+        'name': entry.get('name'),
+        'entity_id': entry.get('entity_id'),
+        'state': entry.get('state'),
+        'domain': entry.get('domain')
+    }
+
+
+def _row(state, attributes):
+    row = {
+        'entity_id': state.get('entity_id'),
+        'state': state.get('state'),
+        'last_changed': state.get('last_changed') or state.get('last_updated'),
+    }
+    if attributes:
+        row['attributes'] = state.get('attributes', {})
+    return row
+
+
+def _csv_line(values):
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue().rstrip('\r\n')
+
+
+def stream_entity_history(hass_url, hass_token, entity_ids, start, end, format_type='ndjson',
+                          attributes=False, workers=DEFAULT_WORKERS, chunk=timedelta(hours=6)):
+    """
+    Write the merged, time-ordered history of `entity_ids` as it arrives.
+
+    Returns:
+        int: Number of states written
+    """
+    # Without attributes HA can drop them and repeat only state + time
+    flags = {'significant_changes_only': False}
+    if not attributes:
+        flags.update(minimal_response=True, no_attributes=True)
+    states = iter_history_merged(hass_url, hass_token, entity_ids, start, end,
+                                 chunk=chunk, workers=workers, **flags)
+    return write_states(states, format_type, attributes)
+
+
+def write_states(states, format_type='ndjson', attributes=False):
+    """
+    Write time-ordered states one at a time in a streaming format.
+
+    Returns:
+        int: Number of states written
+    """
+    columns = ['entity_id', 'state', 'last_changed'] + (['attributes'] if attributes else [])
+    if format_type == 'csv':
+        click.echo(_csv_line(columns))
+    elif format_type == 'json':
+        click.echo('[')
+    elif format_type == 'table':
+        click.echo(f"{'Time':<26} {'Entity':<45} State")
+        click.echo("-" * 90)
+
+    count = 0
+    for state in states:
+        row = _row(state, attributes)
+        if format_type == 'csv':
+            if attributes:
+                row['attributes'] = json.dumps(row['attributes'], ensure_ascii=False)
+            click.echo(_csv_line([row[c] for c in columns]))
+        elif format_type == 'json':
+            click.echo(('  ' if not count else ', ') + json.dumps(row, ensure_ascii=False))
+        elif format_type == 'table':
+            when = (row['last_changed'] or 'N/A')[:26]
+            click.echo(f"{when:<26} {str(row['entity_id'])[:44]:<45} {row['state']}")
+        else:
+            click.echo(json.dumps(row, ensure_ascii=False))
+        count += 1
+
+    if format_type == 'json':
+        click.echo(']')
+    return count
+
+
+def get_history(format_type='table', entity_ids=(), since=None, until=None, attributes=False,
+                workers=DEFAULT_WORKERS, chunk_hours=6.0, local=False):
     """
     Handler for history
 
+    Without entities, summarises the logbook of the window. With entities,
+    streams their state history from /api/history/period, fetched in
+    concurrent windows and batches and merged into one ordered stream.
+
     Args:
         format_type: Output format
+        entity_ids: Entities to read history for
+        since: Window start, ISO timestamp or relative age (default 24h)
+        until: Window end (default now)
+        attributes: Include state attributes (entity history only)
+        workers: Concurrent history requests
+        chunk_hours: Hours of history per request
+        local: Sync the missing part into the local history store and
+            read from there
     """
 
-    # For now, only show general history (entity_id support can be added via Click option later)
-    entity_id = None
-
     # Load configuration from environment
     HASS_URL, HASS_TOKEN = load_config()
-    
-    # Calculate time range (last 24 hours)
-    end_time = datetime.now(timezone.utc)
-    start_time = end_time - timedelta(hours=24)
-    
-    if entity_id:
-        # Get history for specific entity
-        url = f"{HASS_URL}/api/history/period/{start_time.isoformat()}"
-        params = f"?filter_entity_id={entity_id}"
-        history_data = make_api_request(url + params, HASS_TOKEN)
-        
-        if not history_data or not history_data:
-            click.echo(f"No history found for entity: {entity_id}", file=sys.stderr)
-            return
-        
-        # Format entity history
-        history_list = []
-        for entry_list in history_data:
-            for entry in entry_list:
-                history_list.append({
-                    'entity_id': entry.get('entity_id'),
-                    'state': entry.get('state'),
-                    'last_changed': entry.get('last_changed'),
-                    'last_updated': entry.get('last_updated'),
-                    'attributes': entry.get('attributes', {})
-                })
-        
-        result = {
-            'entity_id': entity_id,
-            'period': f"{start_time.isoformat()} to {end_time.isoformat()}",
-            'state_changes': len(history_list),
-            'history': history_list
-        }
-    else:
-        # Get logbook for recent activity
-        logbook_url = f"{HASS_URL}/api/logbook/{start_time.isoformat()}"
-        logbook_data = make_api_request(logbook_url, HASS_TOKEN)
-        
-        # Process logbook entries
-        activity_summary = {}
-        recent_activity = []
-        
-        for entry in logbook_data[:100]:  # Limit to 100 most recent
-            entity = entry.get('entity_id', 'unknown')
-            if entity not in activity_summary:
-                activity_summary[entity] = 0
-            activity_summary[entity] += 1
-            
-            recent_activity.append({
-                'when': entry.get('when'),
-                'name': entry.get('name'),
-                'entity_id': entry.get('entity_id'),
-                'state': entry.get('state'),
-                'domain': entry.get('domain')
-            })
-        
-        # Sort by activity count
-        most_active = sorted(activity_summary.items(), key=lambda x: -x[1])[:20]
-        
-        result = {
-            'period': f"{start_time.isoformat()} to {end_time.isoformat()}",
-            'total_events': len(logbook_data),
-            'most_active_entities': [{'entity_id': eid, 'event_count': count} for eid, count in most_active],
-            'recent_activity': recent_activity[:50]
-        }
-    
+
+    start_time, end_time = logbook_window(since, until)
+
+    if entity_ids:
+        if format_type not in STREAM_FORMATS:
+            raise click.ClickException(
+                f"Entity history is streamed; use --format {', '.join(STREAM_FORMATS)}")
+        if local:
+            if attributes:
+                raise click.ClickException("The local history store keeps no attributes")
+            with HistoryStore(HASS_URL) as store:
+                store.sync(HASS_TOKEN, entity_ids, start_time, end_time, workers=workers,
+                           chunk=timedelta(hours=chunk_hours))
+                count = write_states(store.query(entity_ids, start_time, end_time),
+                                     format_type)
+        else:
+            count = stream_entity_history(HASS_URL, HASS_TOKEN, entity_ids, start_time,
+                                          end_time, format_type, attributes=attributes,
+                                          workers=workers, chunk=timedelta(hours=chunk_hours))
+        if not count:
+            click.echo(f"No history found for: {', '.join(entity_ids)}", err=True)
+        return
+    if format_type in ('ndjson', 'csv'):
+        raise click.ClickException(f"--format {format_type} needs --entity")
+    if local:
+        raise click.ClickException("--local needs --entity")
+
+    # Stream the logbook once; counts cover the whole window
+    counts = ActivityCounts()
+    recent = Matching(everything, limit=50, project=_activity)
+    total = scan_logbook(iter_logbook(HASS_URL, HASS_TOKEN, start_time, end_time),
+                         counts, recent)
+
+    result = {
+        'period': f"{start_time.isoformat()} to {end_time.isoformat()}",
+        'total_events': total,
+        'most_active_entities': [{'entity_id': eid, 'event_count': count}
+                                 for eid, count in counts.most_active(20)],
+        'recent_activity': recent.items
+    }
+
     # Format output
     if format_type == 'json':
         click.echo(json.dumps(result, indent=2))
@@ -95,50 +170,92 @@ def get_history(format_type='table'):
         click.echo("---")
         click.echo(json_to_yaml(result))
     elif format_type == 'detail':
-        if entity_id:
-            click.echo(f"=== History for {entity_id} ===\n")
-            click.echo(f"Period: {result['period']}")
-            click.echo(f"State Changes: {result['state_changes']}\n")
-            for entry in result['history'][:20]:
-                click.echo(f"**{entry['last_changed']}**")
-                click.echo(f"  - State: {entry['state']}")
-                click.echo()
-        else:
-            click.echo("=== Recent Activity Summary ===\n")
-            click.echo(f"Period: {result['period']}")
-            click.echo(f"Total Events: {result['total_events']}\n")
-            click.echo("## Most Active Entities\n")
-            for item in result['most_active_entities']:
-                click.echo(f"  {item['entity_id']}: {item['event_count']} events")
-            click.echo("\n## Recent Activity\n")
-            for entry in result['recent_activity'][:20]:
-                click.echo(f"  {entry['when']} - {entry['name']} ({entry.get('entity_id', 'N/A')})")
+        click.echo("=== Recent Activity Summary ===\n")
+        click.echo(f"Period: {result['period']}")
+        click.echo(f"Total Events: {result['total_events']}\n")
+        click.echo("## Most Active Entities\n")
+        for item in result['most_active_entities']:
+            click.echo(f"  {item['entity_id']}: {item['event_count']} events")
+        click.echo("\n## Recent Activity\n")
+        for entry in result['recent_activity'][:20]:
+            click.echo(f"  {entry['when']} - {entry['name']} ({entry.get('entity_id', 'N/A')})")
     else:  # table format
-        if entity_id:
-            click.echo(f"=== History for {entity_id} ===\n")
-            click.echo(f"Period: {result['period']}")
-            click.echo(f"State Changes: {result['state_changes']}\n")
-            click.echo(f"{'Time':<30} {'State':<30}")
-            click.echo("-" * 60)
-            for entry in result['history'][:50]:
-                time_str = entry['last_changed'][:19] if entry.get('last_changed') else 'N/A'
-                click.echo(f"{time_str:<30} {entry['state']:<30}")
-        else:
-            click.echo("=== Recent Activity Summary ===\n")
-            click.echo(f"Period: {result['period']}")
-            click.echo(f"Total Events: {result['total_events']}\n")
-            click.echo("## Most Active Entities\n")
-            click.echo(f"{'Entity ID':<50} {'Event Count':<15}")
-            click.echo("-" * 65)
-            for item in result['most_active_entities']:
-                click.echo(f"{item['entity_id']:<50} {item['event_count']:<15}")
-            click.echo("\n## Recent Activity (Last 20)\n")
-            click.echo(f"{'When':<30} {'Name':<40} {'Entity':<40}")
-            click.echo("-" * 110)
-            for entry in result['recent_activity'][:20]:
-                when = entry['when'][:19] if entry.get('when') else 'N/A'
-                name = entry['name'][:38] if len(entry.get('name', '')) > 38 else entry.get('name', 'N/A')
-                entity = entry.get('entity_id', 'N/A')[:38] if len(entry.get('entity_id', 'N/A')) > 38 else entry.get('entity_id', 'N/A')
-                click.echo(f"{when:<30} {name:<40} {entity:<40}")
+        click.echo("=== Recent Activity Summary ===\n")
+        click.echo(f"Period: {result['period']}")
+        click.echo(f"Total Events: {result['total_events']}\n")
+        click.echo("## Most Active Entities\n")
+        click.echo(f"{'Entity ID':<50} {'Event Count':<15}")
+        click.echo("-" * 65)
+        for item in result['most_active_entities']:
+            click.echo(f"{item['entity_id']:<50} {item['event_count']:<15}")
+        click.echo("\n## Recent Activity (Last 20)\n")
+        click.echo(f"{'When':<30} {'Name':<40} {'Entity':<40}")
+        click.echo("-" * 110)
+        for entry in result['recent_activity'][:20]:
+            when = entry['when'][:19] if entry.get('when') else 'N/A'
+            name = entry['name'][:38] if len(entry.get('name', '')) > 38 else entry.get('name', 'N/A')
+            entity = entry.get('entity_id', 'N/A')[:38] if len(entry.get('entity_id', 'N/A')) > 38 else entry.get('entity_id', 'N/A')
+            click.echo(f"{when:<30} {name:<40} {entity:<40}")
 
 
+
+
+def sync_history(entity_ids=(), since='7d', workers=DEFAULT_WORKERS, chunk_hours=6.0):
+    """
+    Handler for history sync
+
+    Backfills the local history store: for each entity only the time since
+    its last stored timestamp, plus anything before the stored range that
+    `since` now asks for.
+
+    Args:
+        entity_ids: Entities to sync (default: every entity already stored)
+        since: Oldest time to keep, ISO timestamp or relative age
+        workers: Concurrent history requests
+        chunk_hours: Hours of history per request
+    """
+    HASS_URL, HASS_TOKEN = load_config()
+    start = parse_time(since)
+
+    with HistoryStore(HASS_URL) as store:
+        entity_ids = list(entity_ids) or store.entity_ids()
+        if not entity_ids:
+            raise click.ClickException("Nothing stored yet; name entities with --entity")
+        stats = store.sync(HASS_TOKEN, entity_ids, start, workers=workers,
+                           chunk=timedelta(hours=chunk_hours))
+        click.echo(f"Synced {stats['entities']} entities into {store.path}: "
+                   f"{stats['gaps']} gap(s), {stats['samples']} states received, "
+                   f"{stats['rows']} rows added")
+
+
+def history_status(format_type='table'):
+    """
+    Handler for history status
+
+    Lists what the local history store holds for this instance.
+
+    Args:
+        format_type: Output format (table, json)
+    """
+    HASS_URL, _ = load_config()
+    store = HistoryStore.open_existing(HASS_URL)
+    coverage = store.coverage() if store else {}
+    if store:
+        store.close()
+
+    rows = [{'entity_id': entity_id,
+             'synced_from': synced_from.isoformat() if synced_from else None,
+             'synced_until': synced_until.isoformat() if synced_until else None,
+             'rows': count}
+            for entity_id, (synced_from, synced_until, count) in coverage.items()]
+    if format_type == 'json':
+        click.echo(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        click.echo("The local history store is empty; run `hactl history sync --entity ...`")
+        return
+    click.echo(f"{'Entity':<45} {'From':<26} {'Until':<26} Rows")
+    click.echo("-" * 105)
+    for row in rows:
+        click.echo(f"{row['entity_id'][:44]:<45} {(row['synced_from'] or '-')[:25]:<26} "
+                   f"{(row['synced_until'] or '-')[:25]:<26} {row['rows']}")
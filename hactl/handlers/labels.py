@@ -34,6 +34,7 @@ import click
 
 from hactl import __version__
 from hactl.core import load_config
+from hactl.core.context import get_registries
 from hactl.core.websocket import WebSocketClient
 
 
@@ -48,34 +49,29 @@ ALLOWLIST_SECTIONS = ('flaky_zigbee_devices', 'flaky_iot_devices')
 # Registry fetch.
 # ---------------------------------------------------------------------------
 
-def fetch_registries(hass_url: str, hass_token: str) -> dict[str, Any]:
+def fetch_registries(hass_url: str, hass_token: str,
+                     fresh: bool = False) -> dict[str, Any]:
     """Pull device + entity + label registries.
 
     Returns ``{devices, entities, labels, ws_ok}``. On WS failure the
     lists are empty and ``ws_ok`` is False — callers should error out.
+    ``fresh`` bypasses the memoized and on-disk copies; pass it before
+    editing, since ``*_registry/update`` replaces the whole labels list.
     """
     devices: list[dict] = []
     entities: list[dict] = []
     labels: list[dict] = []
     ws_ok = False
 
-    ws = WebSocketClient(hass_url, hass_token)
     try:
-        ws.connect()
-        devices = ws.call('config/device_registry/list') or []
-        entities = ws.call('config/entity_registry/list') or []
-        try:
-            labels = ws.call('config/label_registry/list') or []
-        except Exception:
-            # Older HA may not expose label_registry — treat as empty.
-            labels = []
-        ws.close()
+        # One pipelined round-trip.
+        # Older HA may not expose label_registry — treat as empty.
+        devices, entities, labels = get_registries(
+            hass_url, hass_token, ['device', 'entity', 'label'],
+            WebSocketClient, optional=['label'], fresh=fresh)
         ws_ok = True
     except Exception:
-        try:
-            ws.close()
-        except Exception:
-            pass
+        pass
 
     return {
         'devices': devices,
@@ -439,7 +435,9 @@ def run_label(  # noqa: C901 — driver, intentional length
             'No targets: pass --device, --entity, or --from-allowlist')
 
     HASS_URL, HASS_TOKEN = load_config()
-    data = fetch_registries(HASS_URL, HASS_TOKEN)
+    # Never plan against a cached copy: pre_labels/post_labels become the
+    # full labels list written back, so a stale one erases newer labels.
+    data = fetch_registries(HASS_URL, HASS_TOKEN, fresh=True)
     if not data['ws_ok']:
         raise click.ClickException(
             'WebSocket fetch failed — cannot read registries.')
@@ -11,6 +11,7 @@ from pathlib import Path
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from hactl.core import load_config, make_api_request
+from hactl.core.context import cached_call, cached_request
 from hactl.core.websocket import WebSocketClient
 
 
@@ -197,11 +198,9 @@ def sync_from_hass(categories: Optional[List[str]] = None):
 
 def sync_devices(hass_url: str, hass_token: str) -> int:
     """Sync devices to memory as CSV"""
-    ws = WebSocketClient(hass_url, hass_token)
     try:
-        ws.connect()
-        device_list = ws.call('config/device_registry/list')
-        ws.close()
+        device_list = cached_call(hass_url, hass_token,
+                                  'config/device_registry/list', WebSocketClient)
     except Exception as e:
         click.secho(f"✗ Failed to get devices: {e}", fg='red')
         return 0
@@ -231,7 +230,7 @@ def sync_devices(hass_url: str, hass_token: str) -> int:
 def sync_sensors(hass_url: str, hass_token: str) -> int:
     """Sync all entity states to memory as CSV"""
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     # Save all states to CSV for comprehensive view
     memory_dir = ensure_memory_dir()
@@ -263,7 +262,7 @@ def sync_sensors(hass_url: str, hass_token: str) -> int:
 def sync_automations(hass_url: str, hass_token: str) -> int:
     """Sync automations to memory as CSV"""
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     # Extract automations
     automations = [s for s in states if s.get('entity_id', '').startswith('automation.')]
@@ -291,11 +290,8 @@ def sync_automations(hass_url: str, hass_token: str) -> int:
 
 def sync_dashboards(hass_url: str, hass_token: str) -> int:
     """Sync dashboards to memory as CSV"""
-    ws = WebSocketClient(hass_url, hass_token)
     try:
-        ws.connect()
-        panels = ws.call("get_panels")
-        ws.close()
+        panels = cached_call(hass_url, hass_token, "get_panels", WebSocketClient)
 
         dashboards = []
         if isinstance(panels, dict):
@@ -333,11 +329,9 @@ def sync_dashboards(hass_url: str, hass_token: str) -> int:
 
 def sync_hacs(hass_url: str, hass_token: str) -> int:
     """Sync HACS installed repositories to memory as CSV"""
-    ws = WebSocketClient(hass_url, hass_token)
     try:
-        ws.connect()
-        all_repos = ws.call("hacs/repositories/list")
-        ws.close()
+        all_repos = cached_call(hass_url, hass_token, "hacs/repositories/list",
+                                WebSocketClient)
 
         # Filter for only installed repositories
         repositories = [r for r in all_repos if r.get('installed', False)] if isinstance(all_repos, list) else []
@@ -375,11 +369,9 @@ def sync_hacs(hass_url: str, hass_token: str) -> int:
 
 def sync_areas(hass_url: str, hass_token: str) -> int:
     """Sync areas to memory as CSV"""
-    ws = WebSocketClient(hass_url, hass_token)
     try:
-        ws.connect()
-        area_list = ws.call('config/area_registry/list')
-        ws.close()
+        area_list = cached_call(hass_url, hass_token,
+                                'config/area_registry/list', WebSocketClient)
     except Exception as e:
         click.secho(f"✗ Failed to get areas: {e}", fg='red')
         return 0
@@ -407,7 +399,7 @@ def sync_areas(hass_url: str, hass_token: str) -> int:
 def sync_integrations(hass_url: str, hass_token: str) -> int:
     """Sync integrations to memory as CSV"""
     url = f"{hass_url}/api/config/config_entries/entry"
-    integrations_data = make_api_request(url, hass_token)
+    integrations_data = cached_request(url, hass_token, make_api_request)
 
     # Save to CSV
     memory_dir = ensure_memory_dir()
@@ -432,7 +424,7 @@ def sync_integrations(hass_url: str, hass_token: str) -> int:
 def sync_scripts(hass_url: str, hass_token: str) -> int:
     """Sync scripts to memory as CSV"""
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     # Extract scripts
     scripts = [s for s in states if s.get('entity_id', '').startswith('script.')]
@@ -460,7 +452,7 @@ def sync_scripts(hass_url: str, hass_token: str) -> int:
 def sync_scenes(hass_url: str, hass_token: str) -> int:
     """Sync scenes to memory as CSV"""
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     # Extract scenes
     scenes = [s for s in states if s.get('entity_id', '').startswith('scene.')]
@@ -488,7 +480,7 @@ def sync_scenes(hass_url: str, hass_token: str) -> int:
 def sync_templates(hass_url: str, hass_token: str) -> int:
     """Sync template entities and their formulas to memory as CSV"""
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     # Extract template entities
     templates = []
@@ -531,13 +523,10 @@ def sync_templates(hass_url: str, hass_token: str) -> int:
 def sync_entity_relationships(hass_url: str, hass_token: str) -> int:
     """Sync entity relationships extracted from area groupings to memory as CSV"""
     # Use WebSocket to get entity and device registries
-    ws = WebSocketClient(hass_url, hass_token)
-    try:
-        ws.connect()
-        entity_registry = ws.call('config/entity_registry/list')
-        device_registry = ws.call('config/device_registry/list')
-    finally:
-        ws.close()
+    entity_registry = cached_call(hass_url, hass_token,
+                                  'config/entity_registry/list', WebSocketClient)
+    device_registry = cached_call(hass_url, hass_token,
+                                  'config/device_registry/list', WebSocketClient)
 
     relationships = []
 
@@ -606,7 +595,7 @@ def sync_entity_relationships(hass_url: str, hass_token: str) -> int:
 def sync_automation_stats(hass_url: str, hass_token: str) -> int:
     """Sync automation statistics to memory as CSV"""
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     # Extract automations with their stats
     automations = [s for s in states if s.get('entity_id', '').startswith('automation.')]
@@ -648,7 +637,7 @@ def sync_automation_stats(hass_url: str, hass_token: str) -> int:
 def sync_service_capabilities(hass_url: str, hass_token: str) -> int:
     """Sync service capabilities (available services and parameters) to memory as CSV"""
     url = f"{hass_url}/api/services"
-    services_data = make_api_request(url, hass_token)
+    services_data = cached_request(url, hass_token, make_api_request)
 
     services_list = []
 
@@ -732,7 +721,7 @@ def sync_service_capabilities(hass_url: str, hass_token: str) -> int:
 def sync_battery_health(hass_url: str, hass_token: str) -> int:
     """Sync battery health information to memory as CSV"""
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     # Extract battery sensors
     battery_sensors = []
@@ -792,7 +781,7 @@ def sync_battery_health(hass_url: str, hass_token: str) -> int:
 def sync_energy_data(hass_url: str, hass_token: str) -> int:
     """Sync energy and power sensors to memory as CSV"""
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     energy_sensors = []
 
@@ -882,7 +871,7 @@ def sync_automation_context(hass_url: str, hass_token: str) -> int:
     Context is preserved across syncs - only new automations are added.
     """
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     # Extract all automations
     automations = [s for s in states if s.get('entity_id', '').startswith('automation.')]
@@ -939,7 +928,7 @@ def sync_automation_context(hass_url: str, hass_token: str) -> int:
 def sync_persons_presence(hass_url: str, hass_token: str) -> int:
     """Sync persons and presence detection to memory as CSV"""
     url = f"{hass_url}/api/states"
-    states = make_api_request(url, hass_token)
+    states = cached_request(url, hass_token, make_api_request)
 
     presence_data = []
 
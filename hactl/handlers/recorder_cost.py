@@ -0,0 +1,277 @@
+"""
+Recorder write-cost profiler: which entities make the database grow
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import click
+
+from hactl.core import load_config, iter_api_array, json_to_yaml, AsyncHassClient
+from hactl.core.context import get_registries
+from hactl.core.history import iter_history, DEFAULT_WORKERS
+from hactl.core.websocket import WebSocketClient
+
+# Rough on-disk cost of one `states` row (ids, float timestamps, binary
+# context ids, index entries) before the state string itself. The
+# recorder stores attributes separately in `state_attributes`, deduplicated
+# by content, so attribute bytes only count when they change.
+STATE_ROW_BYTES = 200
+ATTRIBUTES_ROW_BYTES = 60
+
+NO_INTEGRATION = '(none)'
+
+
+def _attr_json(attributes):
+    return json.dumps(attributes or {}, separators=(',', ':'), ensure_ascii=False,
+                      sort_keys=True)
+
+
+class RecorderCost:
+    """
+    Running per-entity write totals; memory is O(entities), not O(history).
+
+    Args:
+        platforms: entity_id -> integration (entity registry `platform`)
+    """
+
+    def __init__(self, platforms=None):
+        self.platforms = platforms or {}
+        # entity_id -> [state rows, attribute rows, state bytes, attribute bytes]
+        self.entities = {}
+        self._last_attrs = {}
+        # entity_id -> [(window start, first attrs, its bytes, last attrs)];
+        # attributes as hashes, compared across windows in report()
+        self._edges = {}
+        self.samples = 0
+
+    def _count(self, entity_id, state, attrs, previous):
+        totals = self.entities.setdefault(entity_id, [0, 0, 0, 0])
+        totals[0] += 1
+        totals[2] += STATE_ROW_BYTES + len(str(state or '').encode())
+        if attrs != previous:
+            totals[1] += 1
+            totals[3] += ATTRIBUTES_ROW_BYTES + len(attrs.encode())
+        self.samples += 1
+
+    def add_series(self, series, window=None):
+        """
+        Fold one entity's history series (one window) into the totals.
+
+        Windows may arrive in any order (see `iter_history`). Whether a
+        window's first row wrote attributes depends on how the previous
+        window ended, so that is settled in `report()`. Without `window`,
+        series are taken to arrive in time order.
+        """
+        first = previous = None
+        for sample in series:
+            entity_id = sample.get('entity_id')
+            if not entity_id:
+                continue
+            attrs = _attr_json(sample.get('attributes'))
+            if first is None:
+                first = attrs
+                self._count(entity_id, sample.get('state'), attrs, attrs)
+            else:
+                self._count(entity_id, sample.get('state'), attrs, previous)
+            previous = attrs
+        if first is not None:
+            start = window[0] if window is not None else self.samples
+            self._edges.setdefault(entity_id, []).append(
+                (start, hash(first), len(first.encode()), hash(previous)))
+
+    def _settle_edges(self):
+        """Count window-opening attribute writes, walking windows in time order."""
+        for entity_id, edges in self._edges.items():
+            totals = self.entities[entity_id]
+            previous = None
+            for _, first, nbytes, last in sorted(edges, key=lambda e: e[0]):
+                if first != previous:
+                    totals[1] += 1
+                    totals[3] += ATTRIBUTES_ROW_BYTES + nbytes
+                previous = last
+        self._edges.clear()
+
+    def add_state(self, new_state):
+        """Fold one live `state_changed` new_state into the totals."""
+        if not new_state or not new_state.get('entity_id'):
+            return
+        entity_id = new_state['entity_id']
+        attrs = _attr_json(new_state.get('attributes'))
+        self._count(entity_id, new_state.get('state'), attrs, self._last_attrs.get(entity_id))
+        self._last_attrs[entity_id] = attrs
+
+    def report(self, seconds, limit=20, threshold=0.05):
+        """
+        Rank entities and integrations by estimated bytes written per day.
+
+        Args:
+            seconds: Length of the observed period
+            limit: Rows per ranking
+            threshold: Minimum share of the total for an entity to be
+                suggested for exclusion
+
+        Returns:
+            dict: Totals, rankings and the suggested exclude list
+        """
+        self._settle_edges()
+        per_day = 86400 / max(seconds, 1e-9)
+        total = sum(t[2] + t[3] for t in self.entities.values())
+        integrations = {}
+        rows = []
+        for entity_id, (writes, attr_writes, state_bytes, attr_bytes) in self.entities.items():
+            nbytes = state_bytes + attr_bytes
+            integration = self.platforms.get(entity_id) or NO_INTEGRATION
+            agg = integrations.setdefault(integration, {'integration': integration,
+                                                        'entities': 0, 'writes_per_day': 0.0,
+                                                        'bytes_per_day': 0.0})
+            agg['entities'] += 1
+            agg['writes_per_day'] += writes * per_day
+            agg['bytes_per_day'] += nbytes * per_day
+            rows.append({
+                'entity_id': entity_id,
+                'integration': integration,
+                'writes_per_day': round(writes * per_day, 1),
+                'attribute_writes_per_day': round(attr_writes * per_day, 1),
+                'avg_attribute_bytes': round(attr_bytes / attr_writes) if attr_writes else 0,
+                'bytes_per_day': round(nbytes * per_day),
+                'share': round(nbytes / total, 4) if total else 0.0,
+            })
+        rows.sort(key=lambda r: (-r['bytes_per_day'], r['entity_id']))
+        ranked_integrations = sorted(integrations.values(),
+                                     key=lambda r: (-r['bytes_per_day'], r['integration']))
+        for agg in ranked_integrations:
+            agg['share'] = round(agg['bytes_per_day'] / (total * per_day), 4) if total else 0.0
+            agg['writes_per_day'] = round(agg['writes_per_day'], 1)
+            agg['bytes_per_day'] = round(agg['bytes_per_day'])
+
+        return {
+            'period_hours': round(seconds / 3600, 2),
+            'entities': len(self.entities),
+            'samples': self.samples,
+            'bytes_per_day': round(total * per_day),
+            'top_entities': rows[:limit],
+            'top_integrations': ranked_integrations[:limit],
+            'exclude_entities': sorted(r['entity_id'] for r in rows[:limit]
+                                       if r['share'] >= threshold),
+        }
+
+
+def exclude_snippet(entity_ids):
+    """Render a recorder `exclude:` block for configuration.yaml."""
+    lines = ['recorder:', '  exclude:', '    entities:']
+    lines.extend(f'      - {entity_id}' for entity_id in entity_ids)
+    return '\n'.join(lines)
+
+
+def _human_bytes(n):
+    for unit in ('B', 'KiB', 'MiB'):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def _load_platforms(hass_url, hass_token):
+    try:
+        [entities] = get_registries(hass_url, hass_token, ['entity'], WebSocketClient)
+    except Exception:
+        # Rankings still work per entity; integrations show as (none)
+        return {}
+    return {e.get('entity_id'): e.get('platform') for e in entities}
+
+
+async def _sample_live(hass_url, hass_token, cost, seconds):
+    async with AsyncHassClient(hass_url, hass_token) as client:
+        subscription = await client.subscribe('subscribe_events', event_type='state_changed')
+
+        async def consume():
+            async for event in subscription:
+                cost.add_state((event.get('data') or {}).get('new_state'))
+            raise click.ClickException('WebSocket connection lost')
+
+        try:
+            await asyncio.wait_for(consume(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+def get_recorder_cost(format_type='table', days=1.0, sample=None, limit=20,
+                      threshold=0.05, workers=DEFAULT_WORKERS, chunk_hours=6.0):
+    """
+    Estimate recorder write volume per entity and integration.
+
+    Args:
+        format_type: Output format
+        days: History window to analyse
+        sample: Instead of history, sample live state changes for this many
+            seconds
+        limit: Rows per ranking
+        threshold: Minimum share of total bytes for an exclude suggestion
+        workers: Concurrent history requests
+        chunk_hours: Hours of history per request
+    """
+    HASS_URL, HASS_TOKEN = load_config()
+    cost = RecorderCost(_load_platforms(HASS_URL, HASS_TOKEN))
+
+    if sample:
+        source = f"live sample of {sample:g}s"
+        started = time.monotonic()
+        try:
+            asyncio.run(_sample_live(HASS_URL, HASS_TOKEN, cost, sample))
+        except KeyboardInterrupt:
+            pass
+        seconds = time.monotonic() - started
+    else:
+        source = f"history of the last {days:g} day(s)"
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(days=days)
+        entity_ids = [s['entity_id'] for s in iter_api_array(f"{HASS_URL}/api/states", HASS_TOKEN)
+                      if s.get('entity_id')]
+        # Every recorded row, including attribute-only updates; the window
+        # start state is not a write inside the window.
+        for window, series in iter_history(HASS_URL, HASS_TOKEN, entity_ids, start, end,
+                                           chunk=timedelta(hours=chunk_hours),
+                                           workers=workers, significant_changes_only=False,
+                                           skip_initial_state=True):
+            cost.add_series(series, window)
+        seconds = (end - start).total_seconds()
+
+    result = cost.report(seconds, limit=limit, threshold=threshold)
+    result['source'] = source
+
+    if format_type == 'json':
+        click.echo(json.dumps(result, indent=2))
+        return
+    if format_type == 'yaml':
+        click.echo("# Home Assistant Recorder Write Cost")
+        click.echo("---")
+        click.echo(json_to_yaml(result))
+        return
+
+    click.echo("=== Recorder Write Cost ===\n")
+    click.echo(f"Source: {source}")
+    click.echo(f"Entities: {result['entities']}, rows: {result['samples']}")
+    click.echo(f"Estimated growth: {_human_bytes(result['bytes_per_day'])}/day\n")
+    click.echo("## Top Entities\n")
+    click.echo(f"{'Entity ID':<50} {'Integration':<16} {'Writes/day':>11} "
+               f"{'Avg attrs':>10} {'Bytes/day':>11} {'Share':>7}")
+    click.echo("-" * 110)
+    for row in result['top_entities']:
+        click.echo(f"{row['entity_id'][:49]:<50} {str(row['integration'])[:15]:<16} "
+                   f"{row['writes_per_day']:>11.0f} {row['avg_attribute_bytes']:>8} B "
+                   f"{_human_bytes(row['bytes_per_day']):>11} {row['share']:>7.1%}")
+    click.echo("\n## Top Integrations\n")
+    click.echo(f"{'Integration':<30} {'Entities':>9} {'Writes/day':>11} {'Bytes/day':>11} {'Share':>7}")
+    click.echo("-" * 72)
+    for row in result['top_integrations']:
+        click.echo(f"{str(row['integration'])[:29]:<30} {row['entities']:>9} "
+                   f"{row['writes_per_day']:>11.0f} {_human_bytes(row['bytes_per_day']):>11} "
+                   f"{row['share']:>7.1%}")
+    if result['exclude_entities']:
+        click.echo(f"\n## Suggested exclusions (>= {threshold:.0%} of writes each)\n")
+        click.echo(exclude_snippet(result['exclude_entities']))
+    else:
+        click.echo(f"\nNo single entity accounts for {threshold:.0%} of writes.")
@@ -0,0 +1,215 @@
+"""
+Integration startup-time profile (integration/setup_info)
+"""
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import click
+
+from hactl.core import load_config, make_api_request, json_to_yaml
+from hactl.core.context import cached_request, shared_websocket
+from hactl.core.websocket import WebSocketClient
+
+# A domain regressed if it got this much slower relative to the baseline...
+REGRESSION_RATIO = 0.5
+# ...and by at least this many seconds (sub-second noise is not a regression)
+REGRESSION_MIN_SECONDS = 1.0
+
+BASELINE_VERSION = 1
+
+
+def _fetch_setup_timings(hass_url, hass_token):
+    """Return {domain: seconds} from `integration/setup_info`."""
+    with shared_websocket(hass_url, hass_token, WebSocketClient) as ws:
+        timings = ws.call('integration/setup_info')
+    return {t['domain']: float(t.get('seconds') or 0.0)
+            for t in timings or [] if t.get('domain')}
+
+
+def build_profile(timings, entries):
+    """
+    Join setup timings with config entries, slowest first.
+
+    Args:
+        timings: {domain: seconds} from `integration/setup_info`
+        entries: Config entries from /api/config/config_entries/entry
+
+    Returns:
+        list: One row per domain with seconds, share and its config entries
+    """
+    by_domain = {}
+    for entry in entries or []:
+        by_domain.setdefault(entry.get('domain', 'unknown'), []).append(entry)
+
+    total = sum(timings.values())
+    rows = []
+    for domain, seconds in timings.items():
+        domain_entries = by_domain.get(domain, [])
+        not_loaded = [e for e in domain_entries
+                      if e.get('state') != 'loaded' and not e.get('disabled_by')]
+        rows.append({
+            'domain': domain,
+            'seconds': round(seconds, 3),
+            'share': round(seconds / total, 4) if total else 0.0,
+            'entries': len(domain_entries),
+            'titles': sorted(e.get('title') or '?' for e in domain_entries),
+            'not_loaded': sorted(f"{e.get('title') or '?'}: {e.get('state', 'unknown')}"
+                                 for e in not_loaded),
+        })
+    rows.sort(key=lambda r: (-r['seconds'], r['domain']))
+    return rows
+
+
+def compare_baseline(rows, baseline, ratio=REGRESSION_RATIO,
+                     min_seconds=REGRESSION_MIN_SECONDS):
+    """
+    Annotate profile rows with their change against a baseline.
+
+    Each row gains `baseline_seconds`, `delta` and `change`, one of
+    'regression', 'improved', 'new' or 'same'. Domains only in the
+    baseline are returned separately.
+
+    Returns:
+        list: Domains present in the baseline but no longer set up
+    """
+    previous = dict(baseline.get('timings') or {})
+    for row in rows:
+        before = previous.pop(row['domain'], None)
+        row['baseline_seconds'] = before
+        if before is None:
+            row['delta'] = None
+            row['change'] = 'new'
+            continue
+        delta = row['seconds'] - before
+        row['delta'] = round(delta, 3)
+        if delta >= min_seconds and delta > before * ratio:
+            row['change'] = 'regression'
+        elif -delta >= min_seconds and -delta > before * ratio:
+            row['change'] = 'improved'
+        else:
+            row['change'] = 'same'
+    return sorted(previous)
+
+
+def load_baseline(path):
+    """Read a baseline written by `save_baseline`."""
+    try:
+        data = json.loads(Path(path).read_text())
+    except (OSError, ValueError) as e:
+        raise click.ClickException(f"Could not read baseline {path}: {e}")
+    if not isinstance(data, dict) or not isinstance(data.get('timings'), dict):
+        raise click.ClickException(f"{path} is not a startup-profile baseline")
+    return data
+
+
+def save_baseline(path, timings, version):
+    """Write the current timings as a baseline file."""
+    data = {
+        'format': BASELINE_VERSION,
+        'saved_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'ha_version': version,
+        'timings': {domain: round(seconds, 3) for domain, seconds in sorted(timings.items())},
+    }
+    Path(path).write_text(json.dumps(data, indent=2) + '\n')
+
+
+def get_startup_profile(format_type='table', limit=25, baseline_path=None, save_path=None,
+                        ratio=REGRESSION_RATIO, min_seconds=REGRESSION_MIN_SECONDS):
+    """
+    Rank integrations by setup time at the last Home Assistant start.
+
+    Args:
+        format_type: Output format
+        limit: Rows shown in table format
+        baseline_path: Compare against this baseline file
+        save_path: Save the current timings as a baseline file
+        ratio: Relative slowdown that counts as a regression
+        min_seconds: Absolute slowdown that counts as a regression
+    """
+    HASS_URL, HASS_TOKEN = load_config()
+
+    try:
+        timings = _fetch_setup_timings(HASS_URL, HASS_TOKEN)
+    except click.ClickException as e:
+        raise click.ClickException(
+            f"Could not fetch integration/setup_info (needs HA 2024.4+): {e.format_message()}")
+    entries = cached_request(f"{HASS_URL}/api/config/config_entries/entry", HASS_TOKEN,
+                             make_api_request)
+    rows = build_profile(timings, entries if isinstance(entries, list) else [])
+
+    version = None
+    if baseline_path or save_path:
+        config = cached_request(f"{HASS_URL}/api/config", HASS_TOKEN, make_api_request)
+        version = (config or {}).get('version')
+
+    baseline = load_baseline(baseline_path) if baseline_path else None
+    removed = compare_baseline(rows, baseline, ratio, min_seconds) if baseline else []
+
+    if save_path:
+        save_baseline(save_path, timings, version)
+        click.echo(f"Saved baseline of {len(timings)} integrations to {save_path}", err=True)
+
+    total = round(sum(timings.values()), 3)
+    result = {
+        'integrations': len(rows),
+        'total_setup_seconds': total,
+        'profile': rows,
+    }
+    if baseline:
+        result['baseline'] = {
+            'path': str(baseline_path),
+            'saved_at': baseline.get('saved_at'),
+            'ha_version': baseline.get('ha_version'),
+            'current_version': version,
+            'regressions': [r['domain'] for r in rows if r['change'] == 'regression'],
+            'removed': removed,
+        }
+
+    if format_type == 'json':
+        click.echo(json.dumps(result, indent=2))
+        return
+    if format_type == 'yaml':
+        click.echo("# Home Assistant Startup Profile")
+        click.echo("---")
+        click.echo(json_to_yaml(result))
+        return
+
+    click.echo("=== Integration Startup Profile ===\n")
+    click.echo(f"Integrations: {len(rows)}")
+    click.echo(f"Summed setup time: {total:.1f}s (integrations set up concurrently, "
+               "so this exceeds the wall-clock start time)")
+    if baseline:
+        click.echo(f"Baseline: {baseline_path} (HA {baseline.get('ha_version') or '?'}, "
+                   f"saved {baseline.get('saved_at') or '?'})")
+    click.echo()
+
+    header = f"{'Domain':<30} {'Seconds':>8} {'Share':>7} {'Entries':>8}"
+    if baseline:
+        header += f" {'Baseline':>9} {'Delta':>8}  Change"
+    click.echo(header)
+    click.echo("-" * len(header))
+    for row in rows[:limit]:
+        line = (f"{row['domain'][:29]:<30} {row['seconds']:>8.2f} {row['share']:>7.1%} "
+                f"{row['entries']:>8}")
+        if baseline:
+            before = '-' if row['baseline_seconds'] is None else f"{row['baseline_seconds']:.2f}"
+            delta = '-' if row['delta'] is None else f"{row['delta']:+.2f}"
+            line += f" {before:>9} {delta:>8}  "
+            line += row['change'].upper() if row['change'] == 'regression' else row['change']
+        click.echo(line)
+        for problem in row['not_loaded']:
+            click.echo(f"    ! {problem}")
+    if len(rows) > limit:
+        click.echo(f"... and {len(rows) - limit} more (use --limit or --format json)")
+
+    if baseline:
+        regressions = result['baseline']['regressions']
+        click.echo()
+        if regressions:
+            click.secho(f"{len(regressions)} regression(s): {', '.join(regressions)}", fg='yellow')
+        else:
+            click.echo("No regressions against the baseline.")
+        if removed:
+            click.echo(f"No longer set up: {', '.join(removed)}")
@@ -5,7 +5,7 @@ Entity states operations handler
 import json
 import click
 from collections import Counter, defaultdict
-from hactl.core import load_config, make_api_request, json_to_yaml
+from hactl.core import load_config, iter_api_array, json_to_yaml
 
 
 def get_states(format_type='table', entity_filter=None, domain_filter=None):
@@ -20,45 +20,42 @@ def get_states(format_type='table', entity_filter=None, domain_filter=None):
     # Load configuration from environment
     HASS_URL, HASS_TOKEN = load_config()
 
-    # Fetch all states
+    # Stream states one at a time; only the aggregates below are kept, so
+    # memory stays flat no matter how many entities the instance has.
     url = f"{HASS_URL}/api/states"
-    states = make_api_request(url, HASS_TOKEN)
-
-    # Apply filters if provided
-    if entity_filter or domain_filter:
-        filtered_states = []
-        for state in states:
-            entity_id = state.get('entity_id', '')
-            domain = entity_id.split('.')[0] if '.' in entity_id else 'unknown'
-
-            if domain_filter and domain != domain_filter:
-                continue
-            if entity_filter and entity_filter not in entity_id:
-                continue
-
-            filtered_states.append(state)
-        states = filtered_states
 
     # Analyze states
+    total_entities = 0
     domain_counts = Counter()
     state_distribution = Counter()
+    unavailable_count = 0
     unavailable_entities = []
     entity_attributes_summary = defaultdict(set)
 
-    for state in states:
+    for state in iter_api_array(url, HASS_TOKEN):
         entity_id = state.get('entity_id', '')
         domain = entity_id.split('.')[0] if '.' in entity_id else 'unknown'
+
+        # Apply filters if provided
+        if domain_filter and domain != domain_filter:
+            continue
+        if entity_filter and entity_filter not in entity_id:
+            continue
+
+        total_entities += 1
         domain_counts[domain] += 1
 
         entity_state = state.get('state', 'unknown')
         state_distribution[entity_state] += 1
 
         if entity_state == 'unavailable':
-            unavailable_entities.append({
-                'entity_id': entity_id,
-                'friendly_name': state.get('attributes', {}).get('friendly_name', entity_id),
-                'last_updated': state.get('last_updated')
-            })
+            unavailable_count += 1
+            if len(unavailable_entities) < 50:  # Limit to 50
+                unavailable_entities.append({
+                    'entity_id': entity_id,
+                    'friendly_name': state.get('attributes', {}).get('friendly_name', entity_id),
+                    'last_updated': state.get('last_updated')
+                })
 
         # Collect attribute types
         attrs = state.get('attributes', {})
@@ -67,11 +64,11 @@ def get_states(format_type='table', entity_filter=None, domain_filter=None):
 
     # Format results
     result = {
-        'total_entities': len(states),
+        'total_entities': total_entities,
         'domains': dict(sorted(domain_counts.items())),
         'state_distribution': dict(state_distribution),
-        'unavailable_count': len(unavailable_entities),
-        'unavailable_entities': unavailable_entities[:50],  # Limit to 50
+        'unavailable_count': unavailable_count,
+        'unavailable_entities': unavailable_entities,
         'common_attributes': {k: len(v) for k, v in sorted(entity_attributes_summary.items(), key=lambda x: -len(x[1]))[:20]}
     }
 
@@ -2,14 +2,100 @@
 Handler migrated from get/statistics.py
 """
 
+import csv
+import io
 import json
 import click
-from hactl.core import load_config, make_api_request, json_to_yaml
+from datetime import datetime, timezone
+from hactl.core import load_config, iter_api_array, json_to_yaml
+from hactl.core.history import parse_time
+from hactl.core.statistics import FIELDS, columnar, fetch_statistics
+
+LONG_TERM_FORMATS = ('table', 'json', 'csv')
+
+
+def _number(value):
+    return '-' if value is None else f"{value:.6g}"
+
+
+def _unit(meta):
+    return (meta.get('statistics_unit_of_measurement')
+            or meta.get('display_unit_of_measurement')
+            or meta.get('unit_of_measurement'))
+
+
+def get_long_term_statistics(format_type='table', entity_ids=(), period='hour',
+                             since=None, until=None):
+    """
+    Handler for statistics --entity
+
+    Reads the recorder's long-term statistics (mean/min/max/sum per period)
+    for many statistic ids in a few WebSocket calls.
+
+    Args:
+        format_type: Output format (table, json, csv)
+        entity_ids: Statistic ids or globs (e.g. sensor.*_energy)
+        period: 5minute, hour, day, week or month
+        since: Period start, ISO timestamp or relative age (default 7d)
+        until: Period end (default now)
+    """
+    if format_type not in LONG_TERM_FORMATS:
+        raise click.ClickException(
+            f"Long-term statistics support --format {', '.join(LONG_TERM_FORMATS)}")
+
+    HASS_URL, HASS_TOKEN = load_config()
+    now = datetime.now(timezone.utc)
+    start_time = parse_time(since or '7d', now)
+    end_time = parse_time(until, now) if until else now
+    if start_time >= end_time:
+        raise click.BadParameter('--since must be before --until')
+
+    meta, rows, missing, _calls = fetch_statistics(HASS_URL, HASS_TOKEN, entity_ids,
+                                                   start_time, end_time, period)
+    if missing:
+        click.echo(f"No long-term statistics for: {', '.join(missing)}", err=True)
+
+    if format_type == 'json':
+        result = {
+            'period': period,
+            'start': start_time.isoformat(),
+            'end': end_time.isoformat(),
+            'statistics': {
+                statistic_id: dict({'name': meta[statistic_id].get('name'),
+                                    'unit': _unit(meta[statistic_id])},
+                                   **columnar(series))
+                for statistic_id, series in rows.items()
+            },
+        }
+        click.echo(json.dumps(result, indent=2))
+    elif format_type == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        writer.writerow(['statistic_id', 'start', *FIELDS])
+        for statistic_id, series in rows.items():
+            columns = columnar(series)
+            for i, when in enumerate(columns['start']):
+                writer.writerow([statistic_id, when, *(columns[f][i] for f in FIELDS)])
+        click.echo(buf.getvalue(), nl=False)
+    else:
+        click.echo(f"{'Statistic':<40} {'Start':<26} {'Mean':>10} {'Min':>10} "
+                   f"{'Max':>10} {'Sum':>12}")
+        click.echo("-" * 113)
+        for statistic_id, series in rows.items():
+            columns = columnar(series)
+            for i, when in enumerate(columns['start']):
+                click.echo(f"{statistic_id[:39]:<40} {(when or 'N/A')[:25]:<26} "
+                           f"{_number(columns['mean'][i]):>10} {_number(columns['min'][i]):>10} "
+                           f"{_number(columns['max'][i]):>10} {_number(columns['sum'][i]):>12}")
+
 
 def get_statistics(format_type='table'):
     """
     Handler for statistics
 
+    Lists entities whose current attributes look statistical. See
+    `get_long_term_statistics` for the recorder's aggregated data.
+
     Args:
         format_type: Output format
     """
@@ -20,13 +106,12 @@ def get_statistics(format_type='table'):
     # Load configuration from environment
     HASS_URL, HASS_TOKEN = load_config()
     
-    # Fetch all states
+    # Stream all states (only matching entities are kept)
     url = f"{HASS_URL}/api/states"
-    states = make_api_request(url, HASS_TOKEN)
     
     # Filter statistics entities
     statistics = []
-    for state in states:
+    for state in iter_api_array(url, HASS_TOKEN):
         entity_id = state.get('entity_id', '')
         attrs = state.get('attributes', {})
         
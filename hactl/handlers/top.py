@@ -0,0 +1,180 @@
+"""
+Live event bus load handler (``hactl top``)
+"""
+
+import asyncio
+import json
+import time
+
+import click
+
+from hactl.core import load_config, AsyncHassClient
+from hactl.core.sketch import DecayingTopK
+
+DIMENSIONS = ('event_type', 'integration', 'domain', 'entity')
+
+HEADINGS = {
+    'event_type': 'EVENT TYPE',
+    'integration': 'INTEGRATION',
+    'domain': 'DOMAIN',
+    'entity': 'ENTITY',
+}
+
+# Entities without an entity registry entry (YAML-only, template, ...)
+NO_INTEGRATION = '(none)'
+
+
+class BusLoad:
+    """
+    Decaying top-k counters of event bus traffic per dimension.
+
+    Args:
+        platforms: entity_id -> integration (entity registry `platform`)
+        window: Decay time constant in seconds
+        capacity: Keys tracked per dimension
+        clock: Time source (monotonic seconds)
+    """
+
+    def __init__(self, platforms=None, window=60.0, capacity=256, clock=time.monotonic):
+        self.platforms = platforms or {}
+        self.window = window
+        self.started = clock()
+        self._clock = clock
+        self.sketches = {dim: DecayingTopK(capacity, window, clock) for dim in DIMENSIONS}
+
+    def observe(self, event, now=None):
+        """Count one `subscribe_events` event."""
+        now = self._clock() if now is None else now
+        data = event.get('data') or {}
+        if event.get('event_type') == 'state_changed':
+            payload = (data.get('new_state') or {}).get('attributes') or {}
+        else:
+            payload = data
+        nbytes = len(json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode())
+
+        self.sketches['event_type'].add(event.get('event_type', '?'), nbytes, now)
+        entity_id = data.get('entity_id')
+        if not isinstance(entity_id, str) or '.' not in entity_id:
+            return
+        self.sketches['entity'].add(entity_id, nbytes, now)
+        self.sketches['domain'].add(entity_id.split('.', 1)[0], nbytes, now)
+        self.sketches['integration'].add(self.platforms.get(entity_id) or NO_INTEGRATION,
+                                         nbytes, now)
+
+    def snapshot(self, limit=10, dimensions=DIMENSIONS, now=None):
+        """Return the current rates as a JSON-serializable dict."""
+        now = self._clock() if now is None else now
+        rate, bytes_rate = self.sketches['event_type'].totals(now)
+        result = {
+            'elapsed': round(now - self.started, 1),
+            'window': self.window,
+            'events': self.sketches['event_type'].events,
+            'rate': round(rate, 3),
+            'bytes_rate': round(bytes_rate, 1),
+        }
+        for dim in dimensions:
+            result[dim] = [{
+                'key': row['key'],
+                'rate': round(row['rate'], 3),
+                'bytes_rate': round(row['bytes_rate'], 1),
+                'share': round(row['share'], 4),
+                'approximate': row['error'] > 0,
+            } for row in self.sketches[dim].top(limit, now)]
+        return result
+
+
+def _human_bytes(n):
+    for unit in ('B', 'KiB', 'MiB'):
+        if n < 1024 or unit == 'MiB':
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def render_table(snapshot, dimensions=DIMENSIONS):
+    """Render a `BusLoad.snapshot` as the text shown by `hactl top`."""
+    elapsed = int(snapshot['elapsed'])
+    lines = [
+        f"hactl top - {snapshot['rate']:.1f} events/s, "
+        f"{_human_bytes(snapshot['bytes_rate'])}/s "
+        f"({snapshot['window']:g}s window, {snapshot['events']} events in "
+        f"{elapsed // 3600:02d}:{elapsed // 60 % 60:02d}:{elapsed % 60:02d})",
+    ]
+    approximate = False
+    for dim in dimensions:
+        lines.append('')
+        lines.append(f"{HEADINGS[dim]:<50} {'EV/S':>8} {'BYTES/S':>11} {'SHARE':>7}")
+        rows = snapshot[dim]
+        if not rows:
+            lines.append('  (no events yet)')
+        for row in rows:
+            mark = '~' if row['approximate'] else ' '
+            approximate = approximate or row['approximate']
+            lines.append(f"{str(row['key'])[:49]:<49}{mark} {row['rate']:>8.2f} "
+                         f"{_human_bytes(row['bytes_rate']) + '/s':>11} {row['share']:>7.1%}")
+    if approximate:
+        lines.append('')
+        lines.append('~ counted after a quieter key was evicted; rate is an upper bound')
+    return '\n'.join(lines)
+
+
+async def _follow(hass_url, hass_token, load, interval, duration, draw):
+    async with AsyncHassClient(hass_url, hass_token) as client:
+        registry = await client.call('config/entity_registry/list')
+        load.platforms = {e['entity_id']: e.get('platform') for e in registry or []}
+        subscription = await client.subscribe('subscribe_events')
+
+        async def consume():
+            async for event in subscription:
+                load.observe(event)
+            raise click.ClickException('WebSocket connection lost')
+
+        async def redraw():
+            while True:
+                await asyncio.sleep(interval)
+                draw()
+
+        tasks = [asyncio.ensure_future(consume()), asyncio.ensure_future(redraw())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=duration,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def run_top(interval=2.0, window=60.0, limit=10, dimensions=DIMENSIONS,
+            output_format='table', duration=None, capacity=256):
+    """
+    Show the busiest event types, integrations, domains and entities.
+
+    Args:
+        interval: Seconds between redraws
+        window: Decay time constant of the rates in seconds
+        limit: Rows per dimension
+        dimensions: Dimensions to show, in order
+        output_format: 'table' (redrawn in place) or 'json' (one line per
+            interval)
+        duration: Stop after this many seconds (default: until Ctrl-C)
+        capacity: Keys tracked per dimension (bounds memory)
+    """
+    HASS_URL, HASS_TOKEN = load_config()
+    dimensions = tuple(dimensions) or DIMENSIONS
+    load = BusLoad(window=window, capacity=capacity)
+
+    def draw():
+        snapshot = load.snapshot(limit, dimensions)
+        if output_format == 'json':
+            click.echo(json.dumps(snapshot, ensure_ascii=False))
+            return
+        # Redraw in place on a terminal; plain successive frames otherwise
+        click.clear()
+        click.echo(render_table(snapshot, dimensions))
+
+    try:
+        asyncio.run(_follow(HASS_URL, HASS_TOKEN, load, interval, duration, draw))
+    except KeyboardInterrupt:
+        pass
+    draw()
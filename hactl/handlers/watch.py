@@ -0,0 +1,181 @@
+"""
+Live state change streaming handler
+"""
+
+import asyncio
+import fnmatch
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import click
+
+from hactl.core import load_config, AsyncHassClient
+from hactl.core.websocket import EntityMirror
+
+
+class CoalescingBuffer:
+    """
+    Latest-wins buffer between the WebSocket reader and a (slow) writer.
+
+    The reader never blocks on stdout: if an entity changes again before
+    its previous change was written, the two are merged into one record
+    (first `old_state`, latest everything else). Memory is therefore
+    bounded by the number of watched entities, not by the event rate, and
+    HA never sees a stalled client.
+    """
+
+    def __init__(self):
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.coalesced = 0
+
+    def put(self, key, record):
+        with self._cond:
+            previous = self._pending.get(key)
+            if previous is not None:
+                record = dict(record, old_state=previous['old_state'])
+                self.coalesced += 1
+            self._pending[key] = record
+            self._cond.notify()
+
+    def take(self):
+        """Block until records are pending; [] once closed and drained."""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            batch = list(self._pending.values())
+            self._pending.clear()
+            return batch
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def _matches(entity_id, domains, patterns):
+    if domains and entity_id.split('.', 1)[0] not in domains:
+        return False
+    if patterns and not any(fnmatch.fnmatchcase(entity_id, p) for p in patterns):
+        return False
+    return True
+
+
+def _format_record(record, output_format):
+    if output_format == 'ndjson':
+        return json.dumps(record, ensure_ascii=False)
+    unit = (record.get('attributes') or {}).get('unit_of_measurement')
+    new = '(removed)' if record['state'] is None else record['state']
+    if unit and record['state'] is not None:
+        new = f"{new} {unit}"
+    old = '-' if record['old_state'] is None else record['old_state']
+    stamp = (record.get('last_updated') or '')[11:19]
+    return f"{stamp}  {record['entity_id']:<45} {old} → {new}"
+
+
+def _writer(buffer, output_format, stats, out):
+    """Writer thread: drain the buffer to stdout until it is closed."""
+    while True:
+        batch = buffer.take()
+        if not batch:
+            return
+        try:
+            for record in batch:
+                out.write(_format_record(record, output_format) + '\n')
+            out.flush()
+        except BrokenPipeError:
+            # Reader went away (e.g. `| head`); stop writing, keep counting
+            stats['broken_pipe'] = True
+            return
+        stats['written'] += len(batch)
+
+
+async def _follow(hass_url, hass_token, domains, patterns, buffer, stats, duration):
+    async with AsyncHassClient(hass_url, hass_token) as client:
+        kwargs = {}
+        if domains or patterns:
+            # Resolve the filter to an explicit entity list so HA filters on
+            # its side instead of sending every change in the house.
+            states = await client.call('get_states')
+            entity_ids = sorted(s['entity_id'] for s in states
+                                if _matches(s['entity_id'], domains, patterns))
+            if not entity_ids:
+                raise click.ClickException('No entities match the given --domain/--entity filters')
+            kwargs['entity_ids'] = entity_ids
+            stats['entities'] = len(entity_ids)
+
+        subscription = await client.subscribe('subscribe_entities', **kwargs)
+        mirror = EntityMirror()
+
+        async def consume():
+            snapshot = True
+            async for event in subscription:
+                if snapshot:
+                    # First event: the current state of every watched entity
+                    mirror.apply(event)
+                    stats.setdefault('entities', len(mirror))
+                    snapshot = False
+                    continue
+                changed = set(event.get('a') or ()) | set(event.get('r') or ()) \
+                    | set(event.get('c') or ())
+                old = {eid: mirror.state(eid) for eid in changed}
+                for entity_id in sorted(mirror.apply(event)):
+                    new = mirror.state(entity_id)
+                    before = old.get(entity_id)
+                    buffer.put(entity_id, {
+                        'entity_id': entity_id,
+                        'old_state': before['state'] if before else None,
+                        'state': new['state'] if new else None,
+                        'last_updated': new['last_updated'] if new else None,
+                        'attributes': new['attributes'] if new else None,
+                    })
+                    stats['received'] += 1
+                if stats.get('broken_pipe'):
+                    return
+            raise click.ClickException('WebSocket connection lost')
+
+        try:
+            await asyncio.wait_for(consume(), duration)
+        except asyncio.TimeoutError:
+            pass
+
+
+def watch_states(domains=(), patterns=(), output_format='table', duration=None, quiet=False):
+    """
+    Stream live state changes until interrupted.
+
+    Args:
+        domains: Only watch these domains (optional)
+        patterns: Only watch entity ids matching these globs (optional)
+        output_format: 'ndjson' (one JSON object per change) or 'table'
+        duration: Stop after this many seconds (default: run until Ctrl-C)
+        quiet: Skip the throughput summary on exit
+    """
+    HASS_URL, HASS_TOKEN = load_config()
+
+    buffer = CoalescingBuffer()
+    stats = {'received': 0, 'written': 0}
+    writer = threading.Thread(target=_writer, name='hactl-watch-writer',
+                              args=(buffer, output_format, stats, sys.stdout),
+                              daemon=True)
+    writer.start()
+    started = time.monotonic()
+    try:
+        asyncio.run(_follow(HASS_URL, HASS_TOKEN, set(domains), list(patterns),
+                            buffer, stats, duration))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        buffer.close()
+        writer.join()
+        if not quiet:
+            elapsed = max(time.monotonic() - started, 1e-9)
+            click.echo(
+                f"[hactl] watch: {stats['received']} change(s) received, "
+                f"{stats['written']} written, {buffer.coalesced} coalesced "
+                f"in {elapsed:.1f}s ({stats['received'] / elapsed:.1f}/s)",
+                err=True)
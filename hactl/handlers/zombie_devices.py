@@ -27,6 +27,7 @@ from datetime import datetime, timezone
 import click
 
 from hactl.core import load_config, make_api_request
+from hactl.core.context import cached_request, get_registries
 from hactl.core.websocket import WebSocketClient
 from hactl.handlers.doctor import (
     DEFAULT_IGNORE_LABEL,
@@ -51,29 +52,22 @@ def _fetch_all(hass_url, hass_token):
     """
     devices, entities, areas = [], [], []
     ws_ok = False
-    ws = WebSocketClient(hass_url, hass_token)
     try:
-        ws.connect()
-        devices = ws.call('config/device_registry/list') or []
-        entities = ws.call('config/entity_registry/list') or []
-        try:
-            areas = ws.call('config/area_registry/list') or []
-        except Exception:
-            areas = []
-        ws.close()
+        # One pipelined round-trip, shared with other handlers in this command
+        devices, entities, areas = get_registries(
+            hass_url, hass_token, ['device', 'entity', 'area'],
+            WebSocketClient, optional=['area'])
         ws_ok = True
     except Exception:
-        try:
-            ws.close()
-        except Exception:
-            pass
+        pass
 
     # config_entries via REST (websocket also exposes this, but REST is simpler
     # and we already use it in check_config_entries).
     config_entries = []
     try:
-        ce = make_api_request(
-            f"{hass_url}/api/config/config_entries/entry", hass_token)
+        ce = cached_request(
+            f"{hass_url}/api/config/config_entries/entry", hass_token,
+            make_api_request)
         if isinstance(ce, list):
             config_entries = ce
     except Exception:
@@ -81,7 +75,8 @@ def _fetch_all(hass_url, hass_token):
 
     states = []
     try:
-        st = make_api_request(f"{hass_url}/api/states", hass_token)
+        st = cached_request(f"{hass_url}/api/states", hass_token,
+                            make_api_request)
         if isinstance(st, list):
             states = st
     except Exception:
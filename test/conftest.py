@@ -8,6 +8,15 @@ import os
 from unittest.mock import Mock, patch
 
 
+@pytest.fixture(autouse=True)
+def isolated_home_state(monkeypatch, tmp_path):
+    """Keep tests away from a developer's real agent socket, cache, rules and history store"""
+    monkeypatch.setenv('HACTL_AGENT_SOCKET', str(tmp_path / 'agent.sock'))
+    monkeypatch.delenv('HACTL_CACHE_TTL', raising=False)
+    monkeypatch.setenv('HACTL_DOCTOR_RULES', '')
+    monkeypatch.setenv('HACTL_HISTORY_DB', str(tmp_path / 'history.db'))
+
+
 @pytest.fixture
 def mock_env_vars(monkeypatch):
     """Mock environment variables"""
@@ -414,6 +423,9 @@ def mock_api_request(monkeypatch, mock_states_response, mock_services_response,
         'hactl.handlers.dashboard_ops',
         'hactl.handlers.helper_ops',
         'hactl.handlers.doctor',
+        'hactl.handlers.recorder_cost',
+        'hactl.core.history',
+        'hactl.core.logbook',
     ]
 
     for module in handler_modules:
@@ -422,3 +434,15 @@ def mock_api_request(monkeypatch, mock_states_response, mock_services_response,
         except (ImportError, AttributeError):
             # Module doesn't exist or doesn't import make_api_request
             pass
+
+    # Streaming handlers read JSON arrays through iter_api_array instead
+    def mock_iter_request(url, token):
+        return iter(mock_request(url, token))
+
+    monkeypatch.setattr('hactl.core.api.iter_api_array', mock_iter_request)
+    for module in handler_modules:
+        try:
+            monkeypatch.setattr(f'{module}.iter_api_array', mock_iter_request)
+        except (ImportError, AttributeError):
+            # Module doesn't stream any endpoint
+            pass
@@ -16,7 +16,9 @@ from __future__ import annotations
 import json
 import os
 import tempfile
+from datetime import datetime
 from unittest.mock import MagicMock, patch
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
 from click.testing import CliRunner
@@ -150,8 +152,8 @@ def patch_env_and_registries(monkeypatch, registries, fake_ws, tmp_path):
     # Default: no recent activity for any entity (so safety predicate
     # only blocks on `loaded + recent activity`, not on transient errors).
     monkeypatch.setattr(
-        'hactl.handlers.deletions._has_recent_activity_for_entity',
-        lambda *a, **kw: False)
+        'hactl.handlers.deletions._recent_activity',
+        lambda *a, **kw: (set(), set(), 0, 0))
 
     # Audit logs go into the test tmpdir.
     audit_dir = tmp_path / 'audit'
@@ -401,6 +403,11 @@ class TestDeleteFilter:
 # TestDeleteSafetyPredicate
 # ---------------------------------------------------------------------------
 
+def all_live(hass_url, hass_token, groups, **kw):
+    """_recent_activity stand-in: every candidate entity had activity."""
+    return {eid for eids in groups.values() for eid in eids}, set(), 1, 0
+
+
 class TestDeleteSafetyPredicate:
     def test_safety_blocks_loaded_with_recent_activity(
             self, patch_env_and_registries, monkeypatch, tmp_path):
@@ -408,8 +415,8 @@ class TestDeleteSafetyPredicate:
         ws = patch_env_and_registries['fake_ws']
         # Force "recent activity = True" globally.
         monkeypatch.setattr(
-            'hactl.handlers.deletions._has_recent_activity_for_entity',
-            lambda *a, **kw: True)
+            'hactl.handlers.deletions._recent_activity',
+            all_live)
         audit = str(tmp_path / 'audit.json')
         runner = CliRunner()
         result = runner.invoke(cli, [
@@ -424,8 +431,8 @@ class TestDeleteSafetyPredicate:
         """LIFELINE: --force lets a dangerous delete through (still audited)."""
         ws = patch_env_and_registries['fake_ws']
         monkeypatch.setattr(
-            'hactl.handlers.deletions._has_recent_activity_for_entity',
-            lambda *a, **kw: True)
+            'hactl.handlers.deletions._recent_activity',
+            all_live)
         audit = str(tmp_path / 'audit.json')
         runner = CliRunner()
         result = runner.invoke(cli, [
@@ -451,6 +458,135 @@ class TestDeleteSafetyPredicate:
         assert 'disabled_by' in result.output or 'safety' in result.output.lower()
         ws.call.assert_not_called()
 
+    def test_recent_activity_uses_local_history_store(self, monkeypatch):
+        """A stored live state blocks without a request; dead history narrows it."""
+        from datetime import datetime, timedelta, timezone
+        from hactl.core.history_store import HistoryStore
+
+        url = 'https://test-hass.example.com'
+        now = datetime.now(timezone.utc)
+        with HistoryStore(url) as store:
+            for entity_id, state in (('switch.live', 'on'), ('switch.dead', 'unavailable')):
+                pk = store._entity_pk(entity_id)
+                store.add(pk, (now - timedelta(days=3)).timestamp(), state)
+                store._mark_synced(pk, now - timedelta(days=30), now - timedelta(hours=1))
+            store.db.commit()
+
+        api = MagicMock(return_value=[[{'entity_id': 'switch.dead', 'state': 'unavailable'}]])
+        monkeypatch.setattr('hactl.handlers.deletions.make_api_request', api)
+
+        live, _unknown, calls, _failed = deletions._recent_activity(
+            url, 'token', {'a': ['switch.live'], 'b': ['switch.dead']})
+
+        assert live == {'switch.live'}
+        assert calls == 1
+        url_asked = api.call_args[0][0]
+        assert 'filter_entity_id=switch.dead&' in url_asked
+        asked_from = url_asked.split('/period/')[1].split('?')[0]
+        assert asked_from.startswith((now - timedelta(hours=1)).strftime('%Y-%m-%dT%H'))
+
+
+class FixedNow(datetime):
+    """datetime whose now() is pinned, for exact history URLs."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2026, 10, 17, 12, 0, tzinfo=tz)
+
+
+class TestRecentActivityBatch:
+    """History lookups for the safety predicate are batched per chunk."""
+
+    @staticmethod
+    def fake_history(live_ids, urls):
+        def request(url, token):
+            urls.append(url)
+            ids = url.split('filter_entity_id=')[1].split('&')[0].split(',')
+            return [[{'entity_id': eid, 'state': 'on' if eid in live_ids else 'unavailable'},
+                     {'state': 'unavailable'}] for eid in ids]
+        return request
+
+    def test_many_devices_few_requests(self, monkeypatch):
+        urls = []
+        groups = {f'dev_{d}': [f'sensor.d{d}_{e}' for e in range(3)] for d in range(300)}
+        monkeypatch.setattr('hactl.handlers.deletions.make_api_request',
+                            self.fake_history({'sensor.d7_1', 'sensor.d250_2'}, urls))
+
+        live, _unknown, calls, _failed = deletions._recent_activity(
+            'https://test-hass.example.com', 'token', groups, batch_size=50, workers=4)
+
+        assert live == {'sensor.d7_1', 'sensor.d250_2'}
+        assert calls == len(urls) == 18  # 900 entities / 50
+
+    def test_settled_devices_are_dropped_from_later_chunks(self, monkeypatch):
+        urls = []
+        groups = {'dev_a': ['sensor.a1', 'sensor.a2', 'sensor.a3', 'sensor.a4'],
+                  'dev_b': ['sensor.b1']}
+        monkeypatch.setattr('hactl.handlers.deletions.make_api_request',
+                            self.fake_history({'sensor.a1'}, urls))
+
+        live, _unknown, calls, _failed = deletions._recent_activity(
+            'https://test-hass.example.com', 'token', groups, batch_size=2, workers=1)
+
+        assert live == {'sensor.a1'}
+        # a3/a4 never asked once dev_a was blocked by a1
+        assert calls == 2
+        assert not any('sensor.a3' in url for url in urls)
+        assert 'filter_entity_id=sensor.b1&' in urls[-1]
+
+    def test_history_url_is_quoted(self, monkeypatch):
+        urls = []
+        monkeypatch.setattr('hactl.handlers.deletions.make_api_request',
+                            self.fake_history(set(), urls))
+        monkeypatch.setattr('hactl.handlers.deletions.datetime', FixedNow)
+
+        deletions._recent_activity('https://test-hass.example.com', 'token',
+                                   {'d': ['sensor.x', 'sensor.y']})
+
+        assert urls == [
+            'https://test-hass.example.com/api/history/period/'
+            '2026-10-10T12%3A00%3A00%2B00%3A00'
+            '?filter_entity_id=sensor.x,sensor.y'
+            '&end_time=2026-10-17T12%3A00%3A00%2B00%3A00'
+            '&minimal_response&no_attributes']
+        query = parse_qs(urlsplit(urls[0]).query, keep_blank_values=True)
+        assert query['end_time'] == ['2026-10-17T12:00:00+00:00']
+
+    def test_failed_requests_leave_their_groups_unknown(self, monkeypatch):
+        def failing(url, token):
+            if 'sensor.x' in url:
+                raise RuntimeError('boom')
+            return [[{'entity_id': 'sensor.y', 'state': 'unavailable'}]]
+
+        monkeypatch.setattr('hactl.handlers.deletions.make_api_request', failing)
+        live, unknown, calls, failed = deletions._recent_activity(
+            'https://test-hass.example.com', 'token',
+            {'a': ['sensor.x'], 'b': ['sensor.y']}, batch_size=1, workers=1)
+        assert (live, unknown, calls, failed) == (set(), {'sensor.x'}, 2, 1)
+
+        device = {'id': 'a', 'config_entries': ['ce']}
+        data = {'config_entries': [{'entry_id': 'ce', 'state': 'loaded'}],
+                'entities': [{'entity_id': 'sensor.x', 'device_id': 'a'}]}
+        ok, why = deletions.safety_check_device(device, data, '', '', live, unknown)
+        assert not ok and 'could not be checked' in why
+
+    def test_delete_reports_request_count(
+            self, patch_env_and_registries, monkeypatch, tmp_path):
+        seen = {}
+
+        def recent(hass_url, hass_token, groups, **kw):
+            seen.update(groups)
+            return set(), set(), 2, 1
+
+        monkeypatch.setattr('hactl.handlers.deletions._recent_activity', recent)
+        result = CliRunner().invoke(cli, ['delete', 'device', 'dev_live',
+                                          '--dry-run', '--audit', str(tmp_path / 'a.json')])
+
+        assert result.exit_code == 0, result.output
+        assert seen == {('device', 'dev_live'): ['sensor.live_temp']}
+        assert ('1 entity(s) checked for recent activity in 2 history request(s), '
+                '1 failed') in result.output
+
 
 # ---------------------------------------------------------------------------
 # TestDeleteDryRun
@@ -3,9 +3,11 @@ Tests for hactl doctor command using Click's CliRunner
 """
 
 import json
+import time
 import pytest
 from datetime import datetime, timezone, timedelta
 from unittest.mock import patch
+import click
 from click.testing import CliRunner
 from hactl.cli import cli
 
@@ -417,6 +419,33 @@ class TestDoctorUnavailableDetection:
         assert all(f['status'] in ('ok', 'info') for f in findings)
         assert any('1 entities healthy' in f['message'] for f in findings)
 
+    def test_user_rules_add_category(self, mock_env_vars, monkeypatch, tmp_path,
+                                     mock_config_response, mock_check_config_response,
+                                     mock_error_log_response):
+        """Rules from --rules are applied before the built-in rules."""
+        rules = tmp_path / 'rules.json'
+        rules.write_text(json.dumps({'rules': [
+            {'category': 'lab_bench', 'label': 'lab bench entities (powered off)',
+             'contains': ['bench_'], 'states': ['unavailable']},
+        ]}))
+        states = [
+            {'entity_id': 'switch.bench_psu', 'state': 'unavailable', 'attributes': {}},
+            {'entity_id': 'sensor.bench_psu_voltage', 'state': 'unavailable', 'attributes': {}},
+            {'entity_id': 'sensor.bench_psu_current', 'state': 'unknown', 'attributes': {}},
+        ]
+        _make_doctor_api(monkeypatch, states, mock_config_response,
+                         mock_check_config_response, mock_error_log_response)
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ['doctor', '--check', 'unavailable', '--format', 'json',
+                                     '--rules', str(rules)])
+
+        assert result.exit_code == 0
+        messages = ' '.join(f['message'] for f in
+                            json.loads(result.output)['checks'][0]['findings'])
+        assert '2 lab bench entities (powered off)' in messages
+        assert 'Truly unavailable: 1' in messages
+
 
 class TestDoctorEntityAvailability:
     """Test entity-availability-by-domain check with smart filtering"""
@@ -749,6 +778,34 @@ class TestDoctorHelp:
         assert 'doctor' in result.output
 
 
+class TestDoctorDeadline:
+    """--timeout / --deadline keep a cron doctor run from hanging."""
+
+    def test_spent_deadline_reports_instead_of_hanging(self, mock_env_vars, monkeypatch):
+        from hactl.core import deadline
+        monkeypatch.setattr(deadline, 'remaining', lambda: -1.0)
+        runner = CliRunner()
+        result = runner.invoke(cli, ['--deadline', '30', 'doctor', '--check', 'api'])
+
+        assert result.exit_code == 0
+        assert 'Deadline exceeded' in result.output
+
+    def test_timeout_must_be_positive(self):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['--timeout', '0', 'doctor', '--help'])
+
+        assert result.exit_code == 2
+
+    def test_timeout_is_configured(self, mock_env_vars, mock_doctor_api):
+        from hactl.core import deadline
+        runner = CliRunner()
+        result = runner.invoke(cli, ['--timeout', '4', 'doctor', '--check', 'api'])
+
+        assert result.exit_code == 0
+        assert deadline.op_timeout() == 4
+        deadline.reset()
+
+
 class TestDoctorZombieDevices:
     """Test zombie-device check (orphan / stalled / disabled / restored)."""
 
@@ -1037,3 +1094,126 @@ class TestDoctorZombieDevices:
                          mock_error_log_response)
         findings = data['checks'][0]['findings']
         assert any('Total zombie items' in f['message'] for f in findings)
+
+
+class TestDoctorRecorder:
+    """Test the recorder/info based recorder check"""
+
+    INFO = {'backlog': 3, 'max_backlog': 65000, 'migration_in_progress': False,
+            'migration_is_live': False, 'recording': True, 'thread_running': True}
+
+    def _run(self, monkeypatch, info, health=None):
+        monkeypatch.setattr('hactl.handlers.doctor._fetch_recorder_info',
+                            lambda url, token: info)
+        monkeypatch.setattr('hactl.handlers.doctor._fetch_recorder_health',
+                            lambda url, token: health)
+        result = CliRunner().invoke(cli, ['doctor', '--check', 'recorder', '--format', 'json'])
+        assert result.exit_code == 0, result.output
+        return json.loads(result.output)['checks'][0]
+
+    def test_healthy_sqlite(self, mock_env_vars, monkeypatch):
+        check = self._run(monkeypatch, self.INFO, {
+            'database_engine': 'sqlite', 'database_version': '3.45.3',
+            'estimated_db_size': '812.40 MiB'})
+        assert check['name'] == 'Recorder'
+        assert check['status'] == 'info'  # nothing actionable, backend reported
+        messages = [f['message'] for f in check['findings']]
+        assert 'Queue backlog: 3 events (max 65000)' in messages
+        assert 'Database: SQLite 3.45.3 (embedded), 812 MiB' in messages
+
+    def test_backlog_thresholds(self, mock_env_vars, monkeypatch):
+        check = self._run(monkeypatch, dict(self.INFO, backlog=2500))
+        assert check['status'] == 'warning'
+        check = self._run(monkeypatch, dict(self.INFO, backlog=40000))
+        assert check['status'] == 'critical'
+        assert any('dropped' in f['message'] for f in check['findings'])
+
+    def test_migration_and_stopped_recorder(self, mock_env_vars, monkeypatch):
+        check = self._run(monkeypatch, dict(self.INFO, migration_in_progress=True,
+                                            migration_is_live=True))
+        assert check['status'] == 'warning'
+        check = self._run(monkeypatch, dict(self.INFO, migration_in_progress=True,
+                                            recording=False))
+        assert check['status'] == 'critical'
+        assert not any('not recording' in f['message'] for f in check['findings'])
+        check = self._run(monkeypatch, dict(self.INFO, recording=False))
+        assert any(f['message'] == 'Recorder is not recording' for f in check['findings'])
+
+    def test_large_sqlite_and_external_db(self, mock_env_vars, monkeypatch):
+        check = self._run(monkeypatch, self.INFO, {
+            'database_engine': 'sqlite', 'estimated_db_size': '9216.00 MiB'})
+        assert check['status'] == 'warning'
+        assert any('9.0 GiB' in f['message'] for f in check['findings'])
+        check = self._run(monkeypatch, self.INFO, {
+            'database_engine': 'postgresql', 'database_version': '16.2',
+            'estimated_db_size': '20480.00 MiB'})
+        assert check['status'] == 'info'
+        assert any('PostgreSQL 16.2 (external)' in f['message'] for f in check['findings'])
+
+    def test_unreachable(self, mock_env_vars, monkeypatch):
+        check = self._run(monkeypatch, None)
+        assert check['status'] == 'warning'
+        assert 'recorder/info' in check['findings'][0]['message']
+
+
+class TestDoctorScheduler:
+    """Checks run concurrently, fetch shared data once, report in fixed order"""
+
+    DELAY = 0.3
+
+    def test_parallel_and_deterministic(self, mock_env_vars, monkeypatch, mock_states_response,
+                                        mock_config_response, mock_check_config_response,
+                                        mock_config_entries_response):
+        calls = []
+
+        def slow(value):
+            def call(*args, **kwargs):
+                calls.append(args[0] if args and isinstance(args[0], str) else value)
+                time.sleep(self.DELAY)
+                return value() if callable(value) else value
+            return call
+
+        def request(url, token, method='GET', data=None):
+            calls.append(url)
+            time.sleep(self.DELAY)
+            if url.endswith('/api/'):
+                return {'message': 'API running.'}
+            if url.endswith('/api/states'):
+                return mock_states_response
+            if url.endswith('/api/config/config_entries/entry'):
+                return mock_config_entries_response
+            return mock_config_response
+
+        monkeypatch.setattr('hactl.handlers.doctor.make_api_request', request)
+        monkeypatch.setattr('hactl.handlers.doctor._fetch_plain_text', slow(''))
+        monkeypatch.setattr('hactl.handlers.doctor._post_json', slow(mock_check_config_response))
+        monkeypatch.setattr('hactl.handlers.doctor._fetch_registries', slow(([], [])))
+        monkeypatch.setattr('hactl.handlers.doctor._fetch_recorder_info',
+                            slow({'backlog': 0, 'recording': True, 'thread_running': True}))
+        monkeypatch.setattr('hactl.handlers.doctor._fetch_recorder_health', lambda url, token: None)
+
+        started = time.monotonic()
+        result = CliRunner().invoke(cli, ['doctor', '--format', 'json'])
+        elapsed = time.monotonic() - started
+
+        assert result.exit_code == 0, result.output
+        # 9 slow calls; run one after another they would take 2.7s
+        assert elapsed < 4 * self.DELAY
+        assert sum(1 for c in calls if str(c).endswith('/api/states')) == 1
+        assert [c['name'] for c in json.loads(result.output)['checks']] == [
+            'API Connectivity', 'Unavailable Entities', 'Low Battery Devices', 'Error Log',
+            'Configuration', 'Stale Entities', 'Version & System Info',
+            'Integrations', 'Entity Availability by Domain', 'Zombie Devices',
+            'Automation Health', 'Recorder']
+
+    def test_states_failure_aborts_report(self, mock_env_vars, monkeypatch):
+        def request(url, token, method='GET', data=None):
+            if url.endswith('/api/states'):
+                raise click.ClickException('API request failed: 502')
+            return {}
+
+        monkeypatch.setattr('hactl.handlers.doctor.make_api_request', request)
+        monkeypatch.setattr('hactl.handlers.doctor._fetch_registries', lambda url, token: None)
+        result = CliRunner().invoke(cli, ['doctor', '--check', 'stale', '--format', 'json'])
+        assert result.exit_code == 0
+        assert json.loads(result.output) == {'error': 'Could not fetch states: API request failed: 502'}
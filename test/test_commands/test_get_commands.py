@@ -2,6 +2,8 @@
 Tests for hactl GET command group using Click's CliRunner
 """
 
+import json
+
 import pytest
 from click.testing import CliRunner
 from hactl.cli import cli
@@ -165,6 +167,142 @@ class TestGetPersonsZones:
         assert 'Persons and Zones' in result.output
 
 
+class TestGetLogbookCommands:
+    """Commands that stream the logbook (activity, actions, history, error-log)"""
+
+    @pytest.fixture
+    def logbook_urls(self, monkeypatch, mock_logbook_response):
+        urls = []
+
+        def fake_iter(url, token):
+            urls.append(url)
+            return iter(mock_logbook_response)
+
+        monkeypatch.setattr('hactl.core.logbook.iter_api_array', fake_iter)
+        return urls
+
+    def test_activity_json(self, mock_env_vars, logbook_urls):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['get', 'activity', '--format', 'json'])
+
+        assert result.exit_code == 0
+        data = json.loads(result.output)
+        assert data['total_events'] == 2
+        assert data['domain_activity'] == {'light': 1, 'automation': 1}
+        assert len(logbook_urls) == 1
+
+    def test_activity_filters_are_sent_to_ha(self, mock_env_vars, logbook_urls):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['get', 'activity', '--since', '2026-10-01T00:00:00Z',
+                                     '--until', '2026-10-02T00:00:00Z',
+                                     '-e', 'light.living_room', '--format', 'json'])
+
+        assert result.exit_code == 0
+        assert logbook_urls[0].startswith(
+            'https://test-hass.example.com/api/logbook/2026-10-01T00%3A00%3A00%2B00%3A00?')
+        assert 'end_time=2026-10-02T00%3A00%3A00%2B00%3A00' in logbook_urls[0]
+        assert 'entity=light.living_room' in logbook_urls[0]
+
+    def test_actions_json(self, mock_env_vars, logbook_urls):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['get', 'actions', '--format', 'json', '--context', 'abc'])
+
+        assert result.exit_code == 0
+        data = json.loads(result.output)
+        assert data['summary']['total_automation_executions'] == 1
+        assert data['automation_executions'][0]['entity_id'] == 'automation.test'
+        assert logbook_urls[0].endswith('context_id=abc')
+
+    def test_actions_rejects_bad_since(self, mock_env_vars, logbook_urls):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['get', 'actions', '--since', 'last tuesday'])
+
+        assert result.exit_code != 0
+        assert logbook_urls == []
+
+    def test_history_and_error_log(self, mock_env_vars, mock_api_request, logbook_urls):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['get', 'history', '--format', 'json'])
+        assert result.exit_code == 0
+        assert json.loads(result.output)['total_events'] == 2
+
+        result = runner.invoke(cli, ['get', 'error-log', '--format', 'json'])
+        assert result.exit_code == 0
+        assert json.loads(result.output)['recent_errors'] == []
+
+
+class TestGetHistoryEntities:
+    """hactl get history --entity: windowed, merged state history"""
+
+    @pytest.fixture
+    def history_api(self, monkeypatch):
+        urls = []
+
+        def fake_iter(url, token):
+            urls.append(url)
+            return iter([
+                [{'entity_id': 'sensor.a', 'state': '1', 'last_changed': '2026-10-01T10:00:00+00:00'},
+                 {'state': '3', 'last_changed': '2026-10-01T10:30:00+00:00'}],
+                [{'entity_id': 'sensor.b', 'state': 'x,y', 'last_changed': '2026-10-01T10:10:00+00:00'}],
+            ])
+
+        monkeypatch.setattr('hactl.core.history.iter_api_array', fake_iter)
+        return urls
+
+    def test_csv_is_merged_in_time_order(self, mock_env_vars, history_api):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['get', 'history', '-e', 'sensor.a,sensor.b',
+                                     '--since', '2026-10-01T10:00:00Z',
+                                     '--until', '2026-10-01T11:00:00Z', '--format', 'csv'])
+
+        assert result.exit_code == 0
+        assert result.output.splitlines() == [
+            'entity_id,state,last_changed',
+            'sensor.a,1,2026-10-01T10:00:00+00:00',
+            'sensor.b,"x,y",2026-10-01T10:10:00+00:00',
+            'sensor.a,3,2026-10-01T10:30:00+00:00',
+        ]
+        assert len(history_api) == 1
+        assert 'minimal_response' in history_api[0] and 'no_attributes' in history_api[0]
+        assert 'filter_entity_id=sensor.a,sensor.b' in history_api[0]
+
+    def test_ndjson_and_json(self, mock_env_vars, history_api):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['get', 'history', '-e', 'sensor.a', '-e', 'sensor.b',
+                                     '--since', '1h', '--format', 'ndjson'])
+        assert result.exit_code == 0
+        assert [json.loads(line)['state'] for line in result.output.splitlines()] == ['1', 'x,y', '3']
+
+        result = runner.invoke(cli, ['get', 'history', '-e', 'sensor.a', '--since', '1h',
+                                     '--format', 'json'])
+        assert result.exit_code == 0
+        assert len(json.loads(result.output)) == 3
+
+    def test_stream_formats_need_entities(self, mock_env_vars, history_api):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['get', 'history', '--format', 'csv'])
+        assert result.exit_code != 0
+        result = runner.invoke(cli, ['get', 'history', '-e', 'sensor.a', '--format', 'yaml'])
+        assert result.exit_code != 0
+
+    def test_local_reads_from_the_store_and_fetches_only_the_gap(self, mock_env_vars,
+                                                                 history_api):
+        runner = CliRunner()
+        args = ['get', 'history', '-e', 'sensor.a,sensor.b', '--local', '--format', 'csv',
+                '--since', '2026-10-01T10:00:00Z', '--until', '2026-10-01T11:00:00Z']
+        first = runner.invoke(cli, args)
+        assert first.exit_code == 0, first.output
+        assert first.output.splitlines()[1:] == [
+            'sensor.a,1,2026-10-01T10:00:00+00:00',
+            'sensor.b,"x,y",2026-10-01T10:10:00+00:00',
+            'sensor.a,3,2026-10-01T10:30:00+00:00',
+        ]
+
+        second = runner.invoke(cli, args)
+        assert second.output == first.output
+        assert len(history_api) == 1
+
+
 class TestGetHelp:
     """Test help output for various commands"""
 
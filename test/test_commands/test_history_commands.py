@@ -0,0 +1,49 @@
+"""
+Tests for the history command group (local history store)
+"""
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from hactl.cli import cli
+
+
+@pytest.fixture
+def history_api(monkeypatch):
+    urls = []
+
+    def fake_iter(url, token):
+        urls.append(url)
+        return iter([[{'entity_id': 'sensor.a', 'state': '1',
+                       'last_changed': '2026-10-01T10:00:00+00:00'}]])
+
+    monkeypatch.setattr('hactl.core.history.iter_api_array', fake_iter)
+    return urls
+
+
+class TestHistorySync:
+
+    def test_sync_then_resync_stored_entities(self, mock_env_vars, history_api):
+        runner = CliRunner()
+        result = runner.invoke(cli, ['history', 'sync', '-e', 'sensor.a', '--since', '2d',
+                                     '--chunk-hours', '72'])
+        assert result.exit_code == 0, result.output
+        assert '1 states received' in result.output
+        assert 'skip_initial_state' not in history_api[0]
+
+        # Without --entity every stored entity is brought up to date
+        result = runner.invoke(cli, ['history', 'sync'])
+        assert result.exit_code == 0, result.output
+        assert 'skip_initial_state' in history_api[-1]
+
+        result = runner.invoke(cli, ['history', 'status', '--format', 'json'])
+        rows = json.loads(result.output)
+        assert [(r['entity_id'], r['rows']) for r in rows] == [('sensor.a', 1)]
+
+    def test_sync_needs_entities_on_an_empty_store(self, mock_env_vars, history_api):
+        result = CliRunner().invoke(cli, ['history', 'sync'])
+        assert result.exit_code != 0
+        assert '--entity' in result.output
+        assert history_api == []
@@ -334,6 +334,26 @@ class TestLabelRemove:
         assert update_calls[0].kwargs['labels'] == []
 
 
+class TestLabelFreshRegistries:
+    def test_apply_plans_against_fresh_registries(self, registries, monkeypatch):
+        seen = []
+
+        def get_registries(*_a, **kw):
+            seen.append(kw.get('fresh'))
+            return registries['devices'], registries['entities'], registries['labels']
+
+        monkeypatch.setattr(
+            'hactl.handlers.labels.load_config',
+            lambda: ('https://test-hass.example.com', 'test_token_12345'))
+        monkeypatch.setattr('hactl.handlers.labels.get_registries', get_registries)
+        result = CliRunner().invoke(cli, [
+            'label', 'apply', '--device', 'dev_soil',
+            '--label', 'haghs_ignore', '--dry-run',
+        ])
+        assert result.exit_code == 0, result.output
+        assert seen == [True]
+
+
 # ---------------------------------------------------------------------------
 # TestLabelDryRun
 # ---------------------------------------------------------------------------
@@ -0,0 +1,108 @@
+"""
+Tests for hactl top command using Click's CliRunner
+"""
+
+import asyncio
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from hactl.cli import cli
+from hactl.handlers import top
+
+
+class FakeSubscription:
+    def __init__(self, events):
+        self.events = list(events)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.events:
+            return self.events.pop(0)
+        await asyncio.sleep(3600)  # quiet until --duration ends the view
+
+
+def state_changed(entity_id, attributes):
+    return {'event_type': 'state_changed',
+            'data': {'entity_id': entity_id,
+                     'new_state': {'entity_id': entity_id, 'state': '1',
+                                   'attributes': attributes}}}
+
+
+class FakeClient:
+    """AsyncHassClient stand-in serving scripted bus events."""
+
+    subscribed = []
+    events = []
+
+    def __init__(self, url, token):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def call(self, message_type):
+        assert message_type == 'config/entity_registry/list'
+        return [{'entity_id': 'sensor.chatty', 'platform': 'zha'},
+                {'entity_id': 'light.hall', 'platform': 'hue'}]
+
+    async def subscribe(self, message_type, **kwargs):
+        FakeClient.subscribed.append((message_type, kwargs))
+        return FakeSubscription(FakeClient.events)
+
+
+@pytest.fixture
+def fake_hass(monkeypatch):
+    monkeypatch.setattr(top, 'AsyncHassClient', FakeClient)
+    FakeClient.subscribed = []
+    FakeClient.events = [
+        state_changed('sensor.chatty', {'power': 1}),
+        state_changed('sensor.chatty', {'power': 2}),
+        state_changed('sensor.chatty', {'power': 3}),
+        state_changed('light.hall', {'brightness': 255, 'friendly_name': 'Hall'}),
+        {'event_type': 'call_service', 'data': {'domain': 'light', 'service': 'turn_on'}},
+    ]
+    return FakeClient
+
+
+class TestTop:
+
+    def test_table_ranks_busiest_first(self, mock_env_vars, fake_hass):
+        result = CliRunner().invoke(cli, ['top', '--interval', '0.05', '--duration', '0.2'])
+        assert result.exit_code == 0, result.output
+        assert fake_hass.subscribed == [('subscribe_events', {})]
+
+        frame = result.output.split('hactl top - ')[-1]
+        assert '5 events in 00:00:00' in frame
+        integration = frame.split('INTEGRATION')[1].split('DOMAIN')[0]
+        assert integration.index('zha') < integration.index('hue')
+        assert '75.0%' in frame.split('ENTITY')[1]   # 3 of 4 entity events
+        assert '80.0%' in frame.split('EVENT TYPE')[1]  # 4 of 5 are state_changed
+
+    def test_json_snapshots(self, mock_env_vars, fake_hass):
+        result = CliRunner().invoke(cli, ['top', '-f', 'json', '--by', 'domain',
+                                          '--interval', '0.05', '--duration', '0.2'])
+        assert result.exit_code == 0, result.output
+        snapshots = [json.loads(line) for line in result.output.splitlines()]
+        assert len(snapshots) >= 2
+        last = snapshots[-1]
+        assert last['events'] == 5
+        assert [row['key'] for row in last['domain']] == ['sensor', 'light']
+        assert 'entity' not in last
+
+
+class TestBusLoad:
+
+    def test_attribute_bytes_and_unknown_integration(self):
+        load = top.BusLoad(platforms={}, clock=lambda: 0.0)
+        load.observe(state_changed('sensor.yaml_only', {'a': 1}), now=1.0)
+        snapshot = load.snapshot(now=1.0)
+        assert snapshot['integration'][0]['key'] == top.NO_INTEGRATION
+        # {"a":1} is 7 bytes over one second
+        assert snapshot['entity'][0]['bytes_rate'] == pytest.approx(7, rel=0.02)
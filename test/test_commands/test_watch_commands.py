@@ -0,0 +1,121 @@
+"""
+Tests for hactl watch command using Click's CliRunner
+"""
+
+import asyncio
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from hactl.cli import cli
+from hactl.handlers import watch
+
+T0 = 1767225600.0
+
+
+class FakeSubscription:
+    def __init__(self, events):
+        self.events = list(events)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.events:
+            return self.events.pop(0)
+        await asyncio.sleep(3600)  # quiet until --duration ends the watch
+
+
+class FakeClient:
+    """AsyncHassClient stand-in serving scripted subscribe_entities events."""
+
+    subscribed = []
+    events = []
+
+    def __init__(self, url, token):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def call(self, message_type):
+        assert message_type == 'get_states'
+        return [{'entity_id': e} for e in
+                ('sensor.phone_battery', 'sensor.door_battery', 'sensor.temp', 'light.hall')]
+
+    async def subscribe(self, message_type, **kwargs):
+        FakeClient.subscribed.append((message_type, kwargs))
+        return FakeSubscription(FakeClient.events)
+
+
+@pytest.fixture
+def fake_hass(monkeypatch):
+    monkeypatch.setattr(watch, 'AsyncHassClient', FakeClient)
+    FakeClient.subscribed = []
+    FakeClient.events = [
+        {'a': {
+            'sensor.phone_battery': {'s': '80', 'a': {'unit_of_measurement': '%'}, 'c': 'x', 'lc': T0},
+            'sensor.door_battery': {'s': '55', 'a': {}, 'c': 'x', 'lc': T0},
+        }},
+        {'c': {'sensor.phone_battery': {'+': {'s': '79', 'lc': T0 + 60}}}},
+        {'c': {'sensor.door_battery': {'+': {'s': '54', 'lc': T0 + 61}}},
+         'r': ['sensor.phone_battery']},
+    ]
+    return FakeClient
+
+
+class TestWatchStates:
+
+    def test_filter_is_resolved_server_side(self, mock_env_vars, fake_hass):
+        result = CliRunner().invoke(cli, [
+            'watch', 'states', '--domain', 'sensor', '--entity', 'sensor.*battery*',
+            '--format', 'ndjson', '--duration', '0.2'])
+        assert result.exit_code == 0, result.output
+        assert fake_hass.subscribed == [('subscribe_entities', {
+            'entity_ids': ['sensor.door_battery', 'sensor.phone_battery']})]
+
+    def test_ndjson_stream_and_throughput_summary(self, mock_env_vars, fake_hass):
+        result = CliRunner().invoke(cli, [
+            'watch', 'states', '-e', 'sensor.*battery*', '-f', 'ndjson', '--duration', '0.2'])
+        assert result.exit_code == 0, result.output
+        lines = [json.loads(line) for line in result.output.splitlines() if line.startswith('{')]
+        changes = {(r['entity_id'], r['old_state'], r['state']) for r in lines}
+        # The initial snapshot is not a change
+        assert ('sensor.door_battery', '55', '54') in changes
+        assert ('sensor.phone_battery', '80', '79') in changes or \
+               ('sensor.phone_battery', '80', None) in changes
+        assert ('sensor.phone_battery', '79', None) in changes or \
+               ('sensor.phone_battery', '80', None) in changes
+        assert '[hactl] watch: 3 change(s) received' in result.output
+
+    def test_table_format(self, mock_env_vars, fake_hass):
+        result = CliRunner().invoke(cli, ['-q', 'watch', 'states', '-d', 'sensor',
+                                          '--duration', '0.2'])
+        assert result.exit_code == 0, result.output
+        assert '00:01:01  sensor.door_battery' in result.output
+        assert '55 → 54' in result.output
+        assert '[hactl] watch' not in result.output
+
+    def test_no_matching_entities(self, mock_env_vars, fake_hass):
+        result = CliRunner().invoke(cli, ['watch', 'states', '-d', 'climate', '--duration', '0.1'])
+        assert result.exit_code == 1
+        assert 'No entities match' in result.output
+
+
+class TestCoalescingBuffer:
+
+    def test_repeated_changes_merge_per_entity(self):
+        buffer = watch.CoalescingBuffer()
+        buffer.put('sensor.a', {'old_state': '1', 'state': '2'})
+        buffer.put('sensor.b', {'old_state': 'x', 'state': 'y'})
+        buffer.put('sensor.a', {'old_state': '2', 'state': '3'})
+
+        assert buffer.take() == [{'old_state': '1', 'state': '3'},
+                                 {'old_state': 'x', 'state': 'y'}]
+        assert buffer.coalesced == 1
+        buffer.close()
+        assert buffer.take() == []
@@ -0,0 +1,53 @@
+"""
+Benchmark: doctor's compiled rule set vs the legacy keyword scan
+
+Not collected by pytest; run by hand from the repository root:
+
+    python -m test.test_core.bench_rules [ENTITIES] [REPEATS]
+
+Reports the best of REPEATS runs (default 50000 entities, 5 runs) for a
+keyword-heavy corpus and a typical one where most unavailable entities
+match no rule. Results are checked for parity, never for speed.
+"""
+
+import os
+import sys
+import time
+
+from hactl.handlers import doctor
+from test.test_core.test_rules import corpus, legacy_classify
+
+
+def best_of(repeats, classify, entities):
+    """Fastest wall time of `repeats` passes, with the last pass's results."""
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        results = [classify(e, s) for e, s in entities]
+        best = min(best, time.perf_counter() - started)
+    return best, results
+
+
+def main(argv):
+    size = int(argv[0]) if argv else 50000
+    repeats = int(argv[1]) if len(argv) > 1 else 5
+    os.environ['HACTL_DOCTOR_RULES'] = ''  # built-in rules only
+    classify = doctor.configure_rules().classify
+
+    keyword_heavy = corpus(size, seed=11)
+    # Most unavailable entities on a real install match no rule
+    typical = [(f"sensor.room_{i % 40}_temperature_{i}", 'unavailable')
+               for i in range(size * 9 // 10)] + keyword_heavy[:size // 10]
+
+    for name, entities in (('keyword_heavy', keyword_heavy), ('typical', typical)):
+        legacy_time, legacy = best_of(repeats, legacy_classify, entities)
+        compiled_time, compiled = best_of(repeats, classify, entities)
+        if compiled != legacy:
+            sys.exit(f'{name}: compiled rules disagree with the legacy classifier')
+        print(f"{len(entities)} entities ({name}): legacy {legacy_time * 1000:.0f} ms, "
+              f"compiled {compiled_time * 1000:.0f} ms "
+              f"({legacy_time / compiled_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,144 @@
+"""
+Tests for hactl.core.agent (live mirror served over a Unix socket)
+"""
+
+import asyncio
+
+import pytest
+from click.testing import CliRunner
+
+from hactl.cli import cli
+from hactl.core import agent
+from hactl.core.agent import AgentServer
+from hactl.core.async_client import Subscription
+
+URL = 'https://test-hass.example.com'
+TOKEN = 'test_token_12345'
+ENTITIES = 'config/entity_registry/list'
+
+
+class FakeClient:
+    """AsyncHassClient stand-in: scripted snapshot, events pushed by the test."""
+
+    subs = {}
+    registries = {ENTITIES: [{'entity_id': 'light.kitchen'}]}
+
+    def __init__(self, url, token):
+        self.closed = False
+
+    async def subscribe(self, message_type, event_type=None):
+        sub = Subscription(self, len(FakeClient.subs))
+        FakeClient.subs[event_type or message_type] = sub
+        if message_type == 'subscribe_entities':
+            sub.queue.put_nowait({'a': {
+                'light.kitchen': {'s': 'on', 'a': {}, 'c': 'ctx1', 'lc': 1767225600.0},
+                'sensor.temp': {'s': '21', 'a': {'unit_of_measurement': '°C'},
+                                'c': 'ctx2', 'lc': 1767225600.0},
+            }})
+        return sub
+
+    async def call_many(self, calls, return_exceptions=False):
+        return [FakeClient.registries.get(command, Exception('unknown_command'))
+                for command in calls]
+
+    async def call(self, command):
+        return FakeClient.registries[command]
+
+    async def close(self):
+        self.closed = True
+
+
+def push(event_type, event):
+    FakeClient.subs[event_type].queue.put_nowait(event)
+
+
+def run_with_agent(scenario):
+    """Run `scenario(server, ask)` against a live AgentServer on the test socket."""
+    FakeClient.subs = {}
+    FakeClient.registries = {ENTITIES: [{'entity_id': 'light.kitchen'}]}
+    agent.reset(enabled=True)
+
+    async def main():
+        server = AgentServer(URL, TOKEN, client_factory=FakeClient)
+        task = asyncio.ensure_future(server.run())
+        loop = asyncio.get_running_loop()
+
+        async def ask(func, *args):
+            return await loop.run_in_executor(None, func, *args)
+
+        try:
+            for _ in range(200):
+                if server.live:
+                    break
+                await asyncio.sleep(0.01)
+            return await scenario(server, ask)
+        finally:
+            server._stop.set()
+            await task
+
+    return asyncio.run(main())
+
+
+class TestServer:
+
+    def test_serves_live_states_and_registries(self, monkeypatch):
+        monkeypatch.setattr(agent, 'REGISTRY_DEBOUNCE', 0)
+
+        async def scenario(server, ask):
+            states = await ask(agent.query, URL, TOKEN, 'states')
+            assert {s['entity_id'] for s in states} == {'light.kitchen', 'sensor.temp'}
+
+            push('subscribe_entities', {'c': {'sensor.temp': {'+': {'s': '22', 'lu': 1767225660.0}}},
+                                        'r': ['light.kitchen']})
+            await asyncio.sleep(0.01)
+            temp = await ask(lambda: agent.query(URL, TOKEN, 'state', entity_id='sensor.temp'))
+            assert temp['state'] == '22'
+            assert temp['last_updated'] == '2026-01-01T00:01:00+00:00'
+            assert temp['attributes'] == {'unit_of_measurement': '°C'}
+            assert await ask(lambda: agent.query(URL, TOKEN, 'state', entity_id='light.kitchen')) is None
+
+            FakeClient.registries[ENTITIES] = [{'entity_id': 'light.hall'}]
+            push('entity_registry_updated', {'data': {'action': 'create'}})
+            await asyncio.sleep(0.05)
+            registries = await ask(lambda: agent.query(URL, TOKEN, 'registries',
+                                                       commands=[ENTITIES, 'config/floor_registry/list']))
+            assert registries == [[{'entity_id': 'light.hall'}], None]
+            assert server.stats['registry_refreshes'] == 1
+
+        run_with_agent(scenario)
+
+    def test_other_instance_falls_back(self):
+        async def scenario(server, ask):
+            assert await ask(agent.query, URL, 'other-token', 'states') is None
+            # One failure and the agent is not asked again in this process
+            assert await ask(agent.query, URL, TOKEN, 'states') is None
+
+        run_with_agent(scenario)
+
+    def test_no_socket_means_no_agent(self):
+        agent.reset(enabled=True)
+        assert agent.query(URL, TOKEN, 'states') is None
+        with pytest.raises(agent.AgentUnavailable):
+            agent.request('status')
+
+
+class TestCliIntegration:
+
+    def test_get_states_reads_the_mirror(self, mock_env_vars):
+        async def scenario(server, ask):
+            result = await ask(lambda: CliRunner().invoke(cli, ['get', 'states', '--format', 'json']))
+            assert result.exit_code == 0, result.output
+            # Summary of the two mirrored entities, no network involved
+            assert '"total_entities": 2' in result.output
+            assert server.stats['requests'] >= 1
+
+            result = await ask(lambda: CliRunner().invoke(cli, ['agent', 'status']))
+            assert result.exit_code == 0, result.output
+            assert 'Entities:   2' in result.output
+
+        run_with_agent(scenario)
+
+    def test_status_without_agent_fails(self, mock_env_vars):
+        result = CliRunner().invoke(cli, ['agent', 'status'])
+        assert result.exit_code == 1
+        assert 'not running' in result.output
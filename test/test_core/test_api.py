@@ -1,5 +1,5 @@
 """
-Tests for hactl.core.api.make_api_request
+Tests for hactl.core.api.make_api_request and hactl.core.session.HassSession
 
 Regression coverage for the empty-body POST bug: `data={}` is falsy, and
 the old guard (`if data and method in (...)`) skipped both attaching the
@@ -7,29 +7,65 @@ body AND overriding the request method, so a POST with an empty JSON
 payload silently went out as GET (HA answered 405 Method Not Allowed).
 """
 
+import gzip
+import http.client
 import io
 import json
-import urllib.error
+import socket
+import zlib
 from unittest.mock import patch, MagicMock
 
 import click
 import pytest
 
-from hactl.core.api import make_api_request
+from hactl.core import deadline, session as session_mod
+from hactl.core.api import make_api_request, iter_api_array, iter_json_array
+from hactl.core.session import HassSession, HassHTTPError
 
 TEST_URL = 'https://test-hass.example.com/api/services/automation/reload'
 TEST_TOKEN = 'test_token_12345'
 
 
-def _mock_urlopen(response_data=None):
-    """Build a mock for urllib.request.urlopen returning a JSON body."""
+def _mock_response(response_data=None, status=200, reason='OK',
+                   will_close=False, raw=None, headers=None):
+    """Build a mock http.client response carrying a JSON body."""
     response = MagicMock()
-    response.read.return_value = json.dumps(
-        response_data if response_data is not None else {}
-    ).encode('utf-8')
-    urlopen = MagicMock()
-    urlopen.return_value.__enter__.return_value = response
-    return urlopen
+    response.status = status
+    response.reason = reason
+    response.will_close = will_close
+    if raw is None:
+        raw = json.dumps(
+            response_data if response_data is not None else {}
+        ).encode('utf-8')
+    response.read.side_effect = io.BytesIO(raw).read
+    response.getheaders.return_value = list((headers or {}).items())
+    return response
+
+
+def _mock_connection(*responses):
+    """Build a mock HTTPSConnection returning `responses` in order."""
+    conn = MagicMock()
+    conn.getresponse.side_effect = list(responses) or [_mock_response()]
+    return conn
+
+
+def _sent(conn, index=-1):
+    """Return (method, target, body, headers) for a recorded request."""
+    call = conn.request.call_args_list[index]
+    method, target = call[0]
+    return method, target, call[1].get('body'), call[1].get('headers')
+
+
+@pytest.fixture(autouse=True)
+def fresh_session(monkeypatch):
+    """Every test starts with an empty session and no configured limits."""
+    session_mod.close_session()
+    deadline.reset()
+    sleeps = []
+    monkeypatch.setattr(session_mod, '_sleep', sleeps.append)
+    yield sleeps
+    session_mod.close_session()
+    deadline.reset()
 
 
 class TestMakeApiRequestMethods:
@@ -37,78 +73,393 @@ class TestMakeApiRequestMethods:
 
     def test_post_with_empty_dict_sends_post_with_empty_json_body(self):
         """POST with data={} must go out as POST with body b'{}' (regression)."""
-        urlopen = _mock_urlopen()
-        with patch('urllib.request.urlopen', urlopen):
+        conn = _mock_connection()
+        with patch('http.client.HTTPSConnection', return_value=conn):
             result = make_api_request(TEST_URL, TEST_TOKEN, method='POST', data={})
 
-        req = urlopen.call_args[0][0]
-        assert req.get_method() == 'POST'
-        assert req.data == b'{}'
+        method, _target, body, _headers = _sent(conn)
+        assert method == 'POST'
+        assert body == b'{}'
         assert result == {}
 
     def test_post_with_none_data_still_sends_post(self):
         """POST with data=None must not degrade to GET."""
-        urlopen = _mock_urlopen()
-        with patch('urllib.request.urlopen', urlopen):
+        conn = _mock_connection()
+        with patch('http.client.HTTPSConnection', return_value=conn):
             make_api_request(TEST_URL, TEST_TOKEN, method='POST', data=None)
 
-        req = urlopen.call_args[0][0]
-        assert req.get_method() == 'POST'
-        assert req.data is None
+        method, _target, body, _headers = _sent(conn)
+        assert method == 'POST'
+        assert body is None
 
     def test_get_unchanged(self):
         """Default GET request has no body and method GET."""
-        urlopen = _mock_urlopen([{'entity_id': 'sensor.temperature'}])
-        with patch('urllib.request.urlopen', urlopen):
+        conn = _mock_connection(_mock_response([{'entity_id': 'sensor.temperature'}]))
+        with patch('http.client.HTTPSConnection', return_value=conn):
             result = make_api_request(TEST_URL, TEST_TOKEN)
 
-        req = urlopen.call_args[0][0]
-        assert req.get_method() == 'GET'
-        assert req.data is None
+        method, target, body, _headers = _sent(conn)
+        assert method == 'GET'
+        assert target == '/api/services/automation/reload'
+        assert body is None
         assert result == [{'entity_id': 'sensor.temperature'}]
 
     def test_post_with_payload_unchanged(self):
         """POST with a real payload still sends the JSON-encoded body."""
         payload = {'entity_id': 'light.living_room', 'brightness': 255}
-        urlopen = _mock_urlopen()
-        with patch('urllib.request.urlopen', urlopen):
+        conn = _mock_connection()
+        with patch('http.client.HTTPSConnection', return_value=conn):
             make_api_request(TEST_URL, TEST_TOKEN, method='POST', data=payload)
 
-        req = urlopen.call_args[0][0]
-        assert req.get_method() == 'POST'
-        assert json.loads(req.data.decode('utf-8')) == payload
+        method, _target, body, _headers = _sent(conn)
+        assert method == 'POST'
+        assert json.loads(body.decode('utf-8')) == payload
 
 
 class TestMakeApiRequestHeaders:
     """Headers must be attached regardless of method/body."""
 
     def test_headers_present_on_empty_body_post(self):
-        urlopen = _mock_urlopen()
-        with patch('urllib.request.urlopen', urlopen):
+        conn = _mock_connection()
+        with patch('http.client.HTTPSConnection', return_value=conn):
             make_api_request(TEST_URL, TEST_TOKEN, method='POST', data={})
 
-        req = urlopen.call_args[0][0]
-        assert req.get_header('Authorization') == f'Bearer {TEST_TOKEN}'
-        assert req.get_header('Content-type') == 'application/json'
+        _method, _target, _body, headers = _sent(conn)
+        assert headers['Authorization'] == f'Bearer {TEST_TOKEN}'
+        assert headers['Content-Type'] == 'application/json'
+        assert headers['User-Agent'] == 'Mozilla/5.0 (hactl)'
 
 
 class TestMakeApiRequestErrors:
     """Error handling stays as click.ClickException."""
 
     def test_http_error_raises_click_exception(self):
-        error = urllib.error.HTTPError(
-            url=TEST_URL, code=405, msg='Method Not Allowed',
-            hdrs=None, fp=io.BytesIO(b'{"message": "Method not allowed"}'),
-        )
-        with patch('urllib.request.urlopen', side_effect=error):
+        conn = _mock_connection(_mock_response(
+            status=405, reason='Method Not Allowed',
+            raw=b'{"message": "Method not allowed"}'))
+        with patch('http.client.HTTPSConnection', return_value=conn):
             with pytest.raises(click.ClickException) as exc_info:
                 make_api_request(TEST_URL, TEST_TOKEN, method='POST', data={})
 
         assert 'HTTP 405' in str(exc_info.value)
+        assert 'Method not allowed' in str(exc_info.value)
+        assert isinstance(exc_info.value, HassHTTPError)
+        assert exc_info.value.code == 405
 
     def test_generic_error_raises_click_exception(self):
-        with patch('urllib.request.urlopen', side_effect=OSError('boom')):
+        conn = MagicMock()
+        conn.request.side_effect = OSError('boom')
+        with patch('http.client.HTTPSConnection', return_value=conn):
             with pytest.raises(click.ClickException) as exc_info:
                 make_api_request(TEST_URL, TEST_TOKEN)
 
         assert 'API request failed' in str(exc_info.value)
+
+
+class TestHassSessionKeepAlive:
+    """One connection per host is reused across calls."""
+
+    def test_sequential_requests_share_one_connection(self):
+        conn = _mock_connection(_mock_response([1]), _mock_response([2]),
+                                _mock_response([3]))
+        factory = MagicMock(return_value=conn)
+        with patch('http.client.HTTPSConnection', factory):
+            assert make_api_request(TEST_URL, TEST_TOKEN) == [1]
+            assert make_api_request(TEST_URL, TEST_TOKEN) == [2]
+            assert make_api_request(TEST_URL, TEST_TOKEN) == [3]
+
+        assert factory.call_count == 1
+        stats = session_mod.get_session().stats
+        assert stats['requests'] == 3
+        assert stats['connections_opened'] == 1
+        assert stats['connections_reused'] == 2
+
+    def test_distinct_hosts_get_distinct_connections(self):
+        factory = MagicMock(side_effect=lambda *a, **kw: _mock_connection(
+            _mock_response(), _mock_response()))
+        with patch('http.client.HTTPSConnection', factory):
+            make_api_request('https://a.example.com/api/', TEST_TOKEN)
+            make_api_request('https://b.example.com/api/', TEST_TOKEN)
+            make_api_request('https://a.example.com/api/', TEST_TOKEN)
+
+        assert factory.call_count == 2
+
+    def test_server_close_is_not_pooled(self):
+        first = _mock_connection(_mock_response(will_close=True))
+        second = _mock_connection()
+        factory = MagicMock(side_effect=[first, second])
+        with patch('http.client.HTTPSConnection', factory):
+            make_api_request(TEST_URL, TEST_TOKEN)
+            make_api_request(TEST_URL, TEST_TOKEN)
+
+        first.close.assert_called()
+        assert factory.call_count == 2
+
+    def test_stale_pooled_connection_is_replayed_once(self):
+        stale = MagicMock()
+        stale.getresponse.side_effect = [
+            _mock_response([1]),
+            http.client.RemoteDisconnected('idle timeout'),
+        ]
+        fresh = _mock_connection(_mock_response([2]))
+        factory = MagicMock(side_effect=[stale, fresh])
+        with patch('http.client.HTTPSConnection', factory):
+            assert make_api_request(TEST_URL, TEST_TOKEN) == [1]
+            assert make_api_request(TEST_URL, TEST_TOKEN) == [2]
+
+        stale.close.assert_called()
+        assert factory.call_count == 2
+
+    def test_sent_post_is_not_replayed_on_stale_connection(self):
+        """A reset after a POST was written may mean HA already ran it."""
+        stale = MagicMock()
+        stale.getresponse.side_effect = [
+            _mock_response([1]),
+            http.client.RemoteDisconnected('reset after send'),
+        ]
+        factory = MagicMock(side_effect=[stale, _mock_connection()])
+        with patch('http.client.HTTPSConnection', factory):
+            make_api_request(TEST_URL, TEST_TOKEN)
+            with pytest.raises(click.ClickException):
+                make_api_request(TEST_URL, TEST_TOKEN, method='POST', data={})
+
+        assert factory.call_count == 1
+
+    def test_unsent_post_is_replayed_on_stale_connection(self):
+        stale = MagicMock()
+        stale.getresponse.side_effect = [_mock_response([1])]
+        stale.request.side_effect = [None, BrokenPipeError('closed while idle')]
+        fresh = _mock_connection(_mock_response({'ok': True}))
+        factory = MagicMock(side_effect=[stale, fresh])
+        with patch('http.client.HTTPSConnection', factory):
+            make_api_request(TEST_URL, TEST_TOKEN)
+            assert make_api_request(TEST_URL, TEST_TOKEN, method='POST',
+                                    data={}) == {'ok': True}
+
+        assert factory.call_count == 2
+
+    def test_fresh_connection_failure_is_not_replayed(self):
+        """Non-idempotent requests are never replayed on a fresh socket."""
+        conn = MagicMock()
+        conn.getresponse.side_effect = http.client.RemoteDisconnected('gone')
+        factory = MagicMock(return_value=conn)
+        with patch('http.client.HTTPSConnection', factory):
+            with pytest.raises(click.ClickException):
+                make_api_request(TEST_URL, TEST_TOKEN, method='POST', data={})
+
+        assert factory.call_count == 1
+
+    def test_redirect_is_followed(self):
+        conn = _mock_connection(
+            _mock_response(status=301, reason='Moved',
+                           headers={'Location': '/api/new'}),
+            _mock_response({'ok': True}))
+        session = HassSession()
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            response = session.request('GET', TEST_URL, TEST_TOKEN)
+
+        assert response.json() == {'ok': True}
+        assert _sent(conn)[1] == '/api/new'
+
+    def test_unsupported_scheme(self):
+        with pytest.raises(click.ClickException):
+            HassSession().request('GET', 'ftp://x/api/', TEST_TOKEN)
+
+
+class TestCompressedTransfer:
+    """gzip/deflate bodies are negotiated and decoded transparently."""
+
+    PAYLOAD = [{'entity_id': f'sensor.s{i}', 'state': 'on'} for i in range(500)]
+
+    def _roundtrip(self, raw, encoding):
+        conn = _mock_connection(_mock_response(
+            raw=raw, headers={'Content-Encoding': encoding}))
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            result = make_api_request(TEST_URL, TEST_TOKEN)
+        return conn, result
+
+    def test_accept_encoding_is_sent(self):
+        conn = _mock_connection()
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            make_api_request(TEST_URL, TEST_TOKEN)
+
+        assert 'gzip' in _sent(conn)[3]['Accept-Encoding']
+
+    def test_gzip_body_is_decoded(self):
+        raw = gzip.compress(json.dumps(self.PAYLOAD).encode())
+        _conn, result = self._roundtrip(raw, 'gzip')
+        assert result == self.PAYLOAD
+
+    def test_zlib_deflate_body_is_decoded(self):
+        raw = zlib.compress(json.dumps(self.PAYLOAD).encode())
+        _conn, result = self._roundtrip(raw, 'deflate')
+        assert result == self.PAYLOAD
+
+    def test_raw_deflate_body_is_decoded(self):
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        raw = compressor.compress(json.dumps(self.PAYLOAD).encode()) + compressor.flush()
+        _conn, result = self._roundtrip(raw, 'deflate')
+        assert result == self.PAYLOAD
+
+    def test_byte_counters_show_saving(self):
+        plain = json.dumps(self.PAYLOAD).encode()
+        raw = gzip.compress(plain)
+        self._roundtrip(raw, 'gzip')
+
+        stats = session_mod.get_session().stats
+        assert stats['bytes_received'] == len(raw)
+        assert stats['bytes_decoded'] == len(plain)
+        assert 'saved by compression' in session_mod.get_session().transfer_summary()
+
+    def test_gzip_error_body_is_decoded(self):
+        raw = gzip.compress(b'{"message": "Entity not found."}')
+        conn = _mock_connection(_mock_response(
+            status=404, reason='Not Found', raw=raw,
+            headers={'Content-Encoding': 'gzip'}))
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            with pytest.raises(HassHTTPError) as exc_info:
+                make_api_request(TEST_URL, TEST_TOKEN)
+
+        assert 'Entity not found' in str(exc_info.value)
+
+
+class TestStreamingJsonArray:
+    """Large arrays are decoded element by element, chunk by chunk."""
+
+    PAYLOAD = [{'entity_id': f'sensor.s{i}', 'state': str(i * 1.5),
+                'attributes': {'friendly_name': f'Caf\u00e9 {i}'}}
+               for i in range(300)] + [12345, -0.5e3, True, None, 'x']
+
+    @pytest.mark.parametrize('size', [1, 2, 7, 64, 4096])
+    def test_any_chunk_size_roundtrips(self, size):
+        raw = json.dumps(self.PAYLOAD, ensure_ascii=False).encode('utf-8')
+        chunks = [raw[i:i + size] for i in range(0, len(raw), size)]
+        assert list(iter_json_array(chunks)) == self.PAYLOAD
+
+    def test_empty_array(self):
+        assert list(iter_json_array([b' [ ', b' ] '])) == []
+
+    def test_is_lazy(self):
+        def chunks():
+            yield b'[{"a": 1},'
+            raise AssertionError('read past the first element')
+        assert next(iter_json_array(chunks())) == {'a': 1}
+
+    @pytest.mark.parametrize('raw', [b'{"a": 1}', b'[1, 2', b'[1 2]', b''])
+    def test_malformed_raises(self, raw):
+        with pytest.raises(ValueError):
+            list(iter_json_array([raw]))
+
+    def test_iter_api_array_streams_gzip_response(self):
+        raw = gzip.compress(json.dumps(self.PAYLOAD).encode())
+        conn = _mock_connection(_mock_response(
+            raw=raw, headers={'Content-Encoding': 'gzip'}))
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            result = list(iter_api_array(TEST_URL, TEST_TOKEN))
+
+        assert result == self.PAYLOAD
+        # Connection goes back to the pool once the stream is exhausted
+        assert session_mod.get_session().stats['connections_opened'] == 1
+
+    def test_iter_api_array_wraps_decode_errors(self):
+        conn = _mock_connection(_mock_response(raw=b'[1, oops]'))
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            with pytest.raises(click.ClickException) as exc_info:
+                list(iter_api_array(TEST_URL, TEST_TOKEN))
+
+        assert 'API request failed' in str(exc_info.value)
+
+
+class TestTimeoutsAndRetries:
+    """Deadline budget, per-operation timeouts and bounded GET retries."""
+
+    def test_timeout_is_applied_to_connections(self):
+        deadline.configure(timeout=7)
+        conn = _mock_connection()
+        factory = MagicMock(return_value=conn)
+        with patch('http.client.HTTPSConnection', factory):
+            make_api_request(TEST_URL, TEST_TOKEN)
+
+        assert factory.call_args[1]['timeout'] == 7
+        conn.sock.settimeout.assert_called_with(7)
+
+    def test_timeout_is_clamped_to_remaining_deadline(self):
+        deadline.configure(timeout=30, deadline=2)
+        assert deadline.op_timeout() <= 2
+
+    def test_spent_deadline_fails_fast(self, monkeypatch):
+        deadline.configure(deadline=5)
+        monkeypatch.setattr(deadline, '_deadline_at', 0.0)
+        factory = MagicMock()
+        with patch('http.client.HTTPSConnection', factory):
+            with pytest.raises(click.ClickException, match='Deadline exceeded'):
+                make_api_request(TEST_URL, TEST_TOKEN)
+
+        factory.assert_not_called()
+
+    def test_socket_timeout_is_reported(self):
+        conn = MagicMock()
+        conn.getresponse.side_effect = socket.timeout('timed out')
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            with pytest.raises(click.ClickException, match='timed out'):
+                make_api_request(TEST_URL, TEST_TOKEN)
+
+        # Timeouts are not retried
+        assert conn.request.call_count == 1
+
+    @pytest.mark.parametrize('status', [502, 503, 504])
+    def test_get_is_retried_on_gateway_errors(self, status, fresh_session):
+        conn = _mock_connection(
+            _mock_response(status=status, reason='Bad Gateway'),
+            _mock_response(status=status, reason='Bad Gateway'),
+            _mock_response({'ok': True}))
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            assert make_api_request(TEST_URL, TEST_TOKEN) == {'ok': True}
+
+        sleeps = fresh_session
+        assert len(sleeps) == 2
+        assert all(0 <= s <= session_mod.RETRY_BACKOFF_MAX for s in sleeps)
+        assert session_mod.get_session().stats['retries'] == 2
+
+    def test_get_is_retried_on_connection_reset(self):
+        broken = MagicMock()
+        broken.getresponse.side_effect = ConnectionResetError('reset')
+        healthy = _mock_connection(_mock_response([1]))
+        factory = MagicMock(side_effect=[broken, healthy])
+        with patch('http.client.HTTPSConnection', factory):
+            assert make_api_request(TEST_URL, TEST_TOKEN) == [1]
+
+    def test_retries_are_bounded(self):
+        conn = MagicMock()
+        conn.getresponse.side_effect = lambda: _mock_response(status=503, reason='Unavailable')
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            with pytest.raises(HassHTTPError):
+                make_api_request(TEST_URL, TEST_TOKEN)
+
+        assert conn.request.call_count == session_mod.MAX_RETRIES + 1
+
+    def test_post_is_not_retried(self):
+        conn = _mock_connection(_mock_response(status=503, reason='Unavailable'))
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            with pytest.raises(HassHTTPError):
+                make_api_request(TEST_URL, TEST_TOKEN, method='POST', data={})
+
+        assert conn.request.call_count == 1
+
+    def test_client_errors_are_not_retried(self):
+        conn = _mock_connection(_mock_response(status=404, reason='Not Found'))
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            with pytest.raises(HassHTTPError):
+                make_api_request(TEST_URL, TEST_TOKEN)
+
+        assert conn.request.call_count == 1
+
+    def test_latency_is_recorded_per_endpoint(self):
+        conn = _mock_connection(_mock_response(), _mock_response())
+        with patch('http.client.HTTPSConnection', return_value=conn):
+            make_api_request('https://h/api/states/sensor.a', TEST_TOKEN)
+            make_api_request('https://h/api/states/sensor.b', TEST_TOKEN)
+
+        stats = deadline.latency_stats()
+        assert stats['GET /api/states/*']['count'] == 2
+        assert 'GET /api/states/*' in deadline.latency_summary()
@@ -0,0 +1,297 @@
+"""
+Tests for hactl.core.async_client.AsyncHassClient
+
+Runs against a tiny in-process asyncio server that speaks just enough
+HTTP/1.1 and WebSocket to look like Home Assistant.
+"""
+
+import asyncio
+import gzip
+import json
+
+import click
+import pytest
+
+from hactl.core import deadline
+from hactl.core.async_client import AsyncHassClient
+from hactl.core.session import HassHTTPError
+from hactl.core.websocket import (
+    OP_TEXT, OP_CLOSE, WebSocketCallError, encode_frame, mask_payload,
+)
+
+
+class FakeHass:
+    """Minimal HA: REST routes plus a WebSocket that answers out of order."""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = []
+        self.ws_messages = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, path, _ = request_line.decode().split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line == b'\r\n':
+                        break
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get('upgrade') == 'websocket':
+                    await self.websocket(reader, writer)
+                    return
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                self.requests.append((method, path, headers, body))
+                await self.rest(writer, method, path, headers, body)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def rest(self, writer, method, path, headers, body):
+        status, payload, extra = 200, None, {}
+        if path == '/api/states':
+            payload = json.dumps([{'entity_id': f'sensor.s{i}'} for i in range(200)]).encode()
+            if 'gzip' in headers.get('accept-encoding', ''):
+                payload = gzip.compress(payload)
+                extra['Content-Encoding'] = 'gzip'
+        elif path == '/api/chunked':
+            data = b'{"chunked": true}'
+            writer.write(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                         + b'%x\r\n%s\r\n0\r\n\r\n' % (len(data), data))
+            await writer.drain()
+            return
+        elif path == '/api/services/test/drop':
+            # Acts on the request, then the connection dies before the answer
+            writer.transport.abort()
+            return
+        elif path.startswith('/api/services/'):
+            payload = json.dumps({'method': method, 'body': json.loads(body or b'null')}).encode()
+        else:
+            status, payload = 404, b'{"message": "Not found"}'
+        head = f'HTTP/1.1 {status} {"OK" if status == 200 else "Not Found"}\r\n'
+        head += f'Content-Length: {len(payload)}\r\n'
+        head += ''.join(f'{k}: {v}\r\n' for k, v in extra.items())
+        writer.write(head.encode() + b'\r\n' + payload)
+        await writer.drain()
+
+    async def websocket(self, reader, writer):
+        writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n\r\n')
+        self.send(writer, {'type': 'auth_required'})
+        held = []
+        while True:
+            msg = await self.recv(reader)
+            if msg is None:
+                return
+            self.ws_messages.append(msg)
+            kind = msg['type']
+            if kind == 'auth':
+                ok = msg['access_token'] == 'token'
+                self.send(writer, {'type': 'auth_ok' if ok else 'auth_invalid'})
+            elif kind == 'slow':
+                # Held back until the next command arrives: forces results
+                # to come back out of order.
+                held.append(msg['id'])
+            elif kind == 'fail':
+                self.send(writer, {'id': msg['id'], 'type': 'result', 'success': False,
+                                   'error': {'code': 'unknown_command'}})
+            elif kind == 'subscribe_events':
+                self.send(writer, {'id': msg['id'], 'type': 'result', 'success': True,
+                                   'result': None})
+                for n in range(3):
+                    self.send(writer, {'id': msg['id'], 'type': 'event',
+                                       'event': {'n': n}})
+            elif kind == 'drop':
+                writer.write(encode_frame(b'', OP_CLOSE, mask=False))
+            else:
+                self.send(writer, {'id': msg['id'], 'type': 'result', 'success': True,
+                                   'result': {'echo': kind}})
+                for held_id in held:
+                    self.send(writer, {'id': held_id, 'type': 'result', 'success': True,
+                                       'result': 'slow'})
+                held.clear()
+            await writer.drain()
+
+    @staticmethod
+    def send(writer, message):
+        writer.write(encode_frame(json.dumps(message).encode(), OP_TEXT, mask=False))
+
+    @staticmethod
+    async def recv(reader):
+        try:
+            b1, b2 = await reader.readexactly(2)
+        except asyncio.IncompleteReadError:
+            return None
+        length = b2 & 0x7F
+        if length == 126:
+            length = int.from_bytes(await reader.readexactly(2), 'big')
+        elif length == 127:
+            length = int.from_bytes(await reader.readexactly(8), 'big')
+        mask = await reader.readexactly(4)
+        payload = mask_payload(await reader.readexactly(length), mask)
+        if b1 & 0x0F == OP_CLOSE:
+            return None
+        return json.loads(payload)
+
+
+def run_with_hass(scenario, token='token'):
+    """Start FakeHass, run `scenario(client, hass)`, always clean up."""
+    async def main():
+        hass = FakeHass()
+        url = await hass.start()
+        try:
+            async with AsyncHassClient(url, token) as client:
+                return await scenario(client, hass)
+        finally:
+            await hass.stop()
+    return asyncio.run(main())
+
+
+class TestAsyncRest:
+
+    def test_concurrent_gets_decode_gzip(self):
+        async def scenario(client, hass):
+            results = await asyncio.gather(*[client.get('/api/states') for _ in range(20)])
+            return results, hass
+
+        results, hass = run_with_hass(scenario)
+        assert all(len(r) == 200 for r in results)
+        # Bounded by the client's connection limit, not one per request
+        assert hass.connections <= 8
+
+    def test_sequential_gets_reuse_one_connection(self):
+        async def scenario(client, hass):
+            for _ in range(5):
+                await client.get('/api/states')
+            return hass.connections
+
+        assert run_with_hass(scenario) == 1
+
+    def test_post_sends_json_and_headers(self):
+        async def scenario(client, hass):
+            result = await client.post('/api/services/light/turn_on', {'entity_id': 'light.x'})
+            return result, hass.requests[-1]
+
+        result, (method, _path, headers, _body) = run_with_hass(scenario)
+        assert result == {'method': 'POST', 'body': {'entity_id': 'light.x'}}
+        assert method == 'POST'
+        assert headers['authorization'] == 'Bearer token'
+        assert headers['user-agent'] == 'Mozilla/5.0 (hactl)'
+
+    def test_post_with_empty_dict_sends_body(self):
+        async def scenario(client, hass):
+            return await client.post('/api/services/automation/reload', {})
+
+        assert run_with_hass(scenario) == {'method': 'POST', 'body': {}}
+
+    def test_post_is_not_replayed_after_connection_reset(self):
+        async def scenario(client, hass):
+            await client.get('/api/states')  # leaves a pooled connection
+            with pytest.raises(click.ClickException, match='connection closed'):
+                await client.post('/api/services/test/drop', {})
+            return [r[0] for r in hass.requests]
+
+        assert run_with_hass(scenario) == ['GET', 'POST']
+
+    def test_chunked_body(self):
+        async def scenario(client, hass):
+            return await client.get('/api/chunked')
+
+        assert run_with_hass(scenario) == {'chunked': True}
+
+    def test_http_error_raises(self):
+        async def scenario(client, hass):
+            with pytest.raises(HassHTTPError) as exc_info:
+                await client.get('/api/nope')
+            return exc_info.value
+
+        error = run_with_hass(scenario)
+        assert error.code == 404
+        assert 'Not found' in str(error)
+
+    def test_unsupported_scheme(self):
+        with pytest.raises(click.ClickException):
+            AsyncHassClient('ftp://x', 'token')
+
+
+class TestAsyncWebSocket:
+
+    def test_concurrent_calls_are_routed_by_id(self):
+        async def scenario(client, hass):
+            return await asyncio.gather(client.call('slow'), client.call('get_panels'))
+
+        slow, panels = run_with_hass(scenario)
+        assert slow == 'slow'
+        assert panels == {'echo': 'get_panels'}
+
+    def test_call_many_with_exceptions(self):
+        async def scenario(client, hass):
+            return await client.call_many(
+                ['get_config', ('fail', {'x': 1})], return_exceptions=True)
+
+        ok, failed = run_with_hass(scenario)
+        assert ok == {'echo': 'get_config'}
+        assert isinstance(failed, click.ClickException)
+
+    def test_failed_call_raises(self):
+        async def scenario(client, hass):
+            with pytest.raises(WebSocketCallError, match='WebSocket call failed'):
+                await client.call('fail')
+
+        run_with_hass(scenario)
+
+    def test_subscription_receives_events(self):
+        async def scenario(client, hass):
+            sub = await client.subscribe('subscribe_events', event_type='state_changed')
+            events = []
+            async for event in sub:
+                events.append(event)
+                if len(events) == 3:
+                    await sub.unsubscribe()
+            return events, hass.ws_messages
+
+        events, messages = run_with_hass(scenario)
+        assert events == [{'n': 0}, {'n': 1}, {'n': 2}]
+        assert messages[1] == {'id': 1, 'type': 'subscribe_events',
+                               'event_type': 'state_changed'}
+        assert messages[-1]['type'] == 'unsubscribe_events'
+
+    def test_unanswered_subscribe_times_out(self):
+        async def scenario(client, hass):
+            deadline.configure(timeout=0.2)
+            try:
+                with pytest.raises(click.ClickException, match='timed out'):
+                    await client.subscribe('slow')
+            finally:
+                deadline.reset()
+
+        run_with_hass(scenario)
+
+    def test_server_close_fails_pending_calls(self):
+        async def scenario(client, hass):
+            with pytest.raises(click.ClickException, match='closed'):
+                await client.call('drop')
+
+        run_with_hass(scenario)
+
+    def test_auth_invalid(self):
+        async def scenario(client, hass):
+            with pytest.raises(click.ClickException, match='Authentication failed'):
+                await client.call('get_config')
+
+        run_with_hass(scenario, token='wrong')
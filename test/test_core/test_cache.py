@@ -0,0 +1,316 @@
+"""
+Tests for hactl.core.cache (opt-in on-disk response cache)
+"""
+
+import json
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from click.testing import CliRunner
+
+from hactl.cli import cli
+from hactl.core import cache as cache_mod
+from hactl.core.api import iter_api_array, make_api_request
+from hactl.core.cache import (
+    RegistryCache, ResponseCache, instance_id, is_cacheable_ws, is_mutating_ws,
+)
+
+URL = 'http://hass:8123/api/states'
+TOKEN = 'token'
+
+
+@pytest.fixture
+def response_cache(tmp_path, monkeypatch):
+    """Enable a cache rooted in tmp_path; disabled again afterwards."""
+    monkeypatch.setenv('HACTL_CACHE_DIR', str(tmp_path))
+    yield cache_mod.configure_cache(ttl=60)
+    cache_mod.configure_cache(enabled=False)
+
+
+def age_entries(directory, seconds):
+    """Pretend every stored entry was written `seconds` ago."""
+    for path in directory.glob('*.json'):
+        entry = json.loads(path.read_text())
+        entry['stored_at'] -= seconds
+        path.write_text(json.dumps(entry))
+
+
+class TestResponseCache:
+
+    def test_disabled_without_ttl(self, monkeypatch):
+        monkeypatch.delenv('HACTL_CACHE_TTL', raising=False)
+        assert not cache_mod.configure_cache().enabled
+        monkeypatch.setenv('HACTL_CACHE_TTL', '30')
+        assert cache_mod.configure_cache().ttl == 30
+        assert not cache_mod.configure_cache(enabled=False).enabled
+        cache_mod.configure_cache(enabled=False)
+
+    def test_miss_then_hit(self, tmp_path):
+        cache = ResponseCache(tmp_path, ttl=60)
+        fetch = MagicMock(return_value=[1, 2])
+        assert cache.fetch('inst', 'k', fetch) == [1, 2]
+        assert cache.fetch('inst', 'k', fetch) == [1, 2]
+        assert fetch.call_count == 1
+        assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+    def test_entries_are_private_and_leave_no_temp_files(self, tmp_path):
+        cache = ResponseCache(tmp_path, ttl=60)
+        cache.put('inst', 'k', {'a': 1})
+        files = list(tmp_path.iterdir())
+        assert len(files) == 1 and files[0].name.startswith('inst-')
+        assert files[0].stat().st_mode & 0o077 == 0
+
+    def test_stale_is_served_and_revalidated(self, tmp_path):
+        cache = ResponseCache(tmp_path, ttl=10, max_stale=100)
+        cache.put('inst', 'k', 'old')
+        age_entries(tmp_path, 50)
+
+        assert cache.fetch('inst', 'k', lambda: 'new') == 'old'
+        cache.wait(timeout=5)
+        assert cache.stats['stale'] == 1
+        assert cache.lookup('inst', 'k') == ('fresh', 'new')
+
+    def test_too_old_is_a_miss(self, tmp_path):
+        cache = ResponseCache(tmp_path, ttl=10, max_stale=10)
+        cache.put('inst', 'k', 'old')
+        age_entries(tmp_path, 50)
+        assert cache.fetch('inst', 'k', lambda: 'new') == 'new'
+        assert cache.stats['misses'] == 1
+
+    def test_lru_eviction_keeps_recently_used(self, tmp_path):
+        cache = ResponseCache(tmp_path, ttl=60, max_bytes=10_000)
+        for name in ('a', 'b', 'c'):
+            cache.put('inst', name, 'x' * 3000)
+        past = time.time() - 100
+        for path in tmp_path.glob('*.json'):
+            os.utime(path, (past, past))
+        cache.lookup('inst', 'a')  # touch: most recently used
+
+        cache.put('inst', 'd', 'x' * 3000)
+        assert cache.lookup('inst', 'a')[0] == 'fresh'
+        assert cache.lookup('inst', 'd')[0] == 'fresh'
+        assert cache.stats['evicted'] == 1
+
+    def test_size_bound_covers_registries(self, tmp_path):
+        cache = ResponseCache(tmp_path, ttl=60, max_bytes=10_000)
+        registries = RegistryWS()
+        registries.registries[DEVICES] = [{'id': 'd' * 8000}]
+        cache.registries.fetch(registries, 'inst', [DEVICES])
+        past = time.time() - 100
+        for path in (tmp_path / 'registries').glob('*.json'):
+            os.utime(path, (past, past))
+
+        cache.put('inst', 'k', 'x' * 3000)
+        assert not list((tmp_path / 'registries').glob('*.json'))
+        assert cache.lookup('inst', 'k')[0] == 'fresh'
+        assert cache.stats['evicted'] == 1
+
+    def test_invalidate_is_per_instance(self, tmp_path):
+        cache = ResponseCache(tmp_path, ttl=60)
+        cache.put('one', 'k', 1)
+        cache.put('two', 'k', 2)
+        cache.invalidate('one')
+        assert cache.lookup('one', 'k') == (None, None)
+        assert cache.lookup('two', 'k') == ('fresh', 2)
+
+    def test_instance_id_scopes_host_and_token(self):
+        assert instance_id('http://a/api/states', 't') == instance_id('http://a/api/config', 't')
+        assert instance_id('http://a/', 't') != instance_id('http://b/', 't')
+        assert instance_id('http://a/', 't') != instance_id('http://a/', 'u')
+
+    def test_ws_command_classification(self):
+        assert is_cacheable_ws('lovelace/dashboards/list')
+        assert is_cacheable_ws('get_panels')
+        # Registries are revalidated by RegistryCache instead
+        assert not is_cacheable_ws('config/entity_registry/list')
+        assert not is_cacheable_ws('config/entity_registry/remove')
+        assert is_mutating_ws('config/device_registry/remove_config_entry')
+        assert is_mutating_ws('lovelace/config/save')
+        assert not is_mutating_ws('config/device_registry/list')
+
+
+class TestRestIntegration:
+
+    def test_get_is_cached_across_calls(self, response_cache):
+        with patch('hactl.core.api._request_json', return_value=[{'a': 1}]) as request:
+            assert make_api_request(URL, TOKEN) == [{'a': 1}]
+            assert make_api_request(URL, TOKEN) == [{'a': 1}]
+        assert request.call_count == 1
+
+    def test_post_bypasses_and_invalidates(self, response_cache):
+        with patch('hactl.core.api._request_json', return_value=[]) as request:
+            make_api_request(URL, TOKEN)
+            make_api_request('http://hass:8123/api/services/x/y', TOKEN, 'POST', {})
+            make_api_request(URL, TOKEN)
+        assert request.call_count == 3
+
+    def test_streamed_array_is_stored_and_replayed(self, response_cache):
+        requests = []
+
+        def stream(*args):
+            requests.append(args)
+            yield from [b'[{"a": 1}', b', {"b": 2}]\n']
+
+        session = MagicMock()
+        session.stream.side_effect = stream
+        with patch('hactl.core.api.get_session', return_value=session):
+            assert list(iter_api_array(URL, TOKEN)) == [{'a': 1}, {'b': 2}]
+            assert list(iter_api_array(URL, TOKEN)) == [{'a': 1}, {'b': 2}]
+        assert len(requests) == 1
+        assert response_cache.stats == {'hits': 1, 'stale': 0, 'misses': 1, 'evicted': 0}
+        # Stored as an ordinary entry around the raw body
+        assert response_cache.lookup(instance_id(URL, TOKEN), f'STREAM {URL}') == (
+            'fresh', [{'a': 1}, {'b': 2}])
+
+    def test_abandoned_stream_is_not_stored(self, tmp_path):
+        cache = ResponseCache(tmp_path, ttl=60)
+        chunks = cache.stream('inst', 'k', iter([b'[1,', b'2]']))
+        assert next(chunks) == b'[1,'
+        chunks.close()
+        assert list(tmp_path.iterdir()) == []
+        assert b''.join(cache.stream('inst', 'k', iter([b'[1]']))) == b'[1]'
+        assert b''.join(cache.stream('inst', 'k', iter([]))) == b'[1]'
+
+
+class TestWebSocketIntegration:
+
+    def make_client(self, results):
+        from hactl.core.websocket import WebSocketClient
+        client = WebSocketClient('ws://hass:8123/api/websocket', TOKEN)
+        client._call_many = MagicMock(side_effect=results)
+        return client
+
+    def test_only_misses_go_over_the_socket(self, response_cache):
+        client = self.make_client([[['panels']], [['dashboards']]])
+        client.call('get_panels')
+        result = client.call_many(['get_panels', 'lovelace/dashboards/list'])
+        assert result == [['panels'], ['dashboards']]
+        assert client._call_many.call_args_list[1].args[0] == [
+            ('lovelace/dashboards/list', {})]
+
+    def test_failures_and_mutations_are_not_cached(self, response_cache):
+        import click
+        error = click.ClickException('failed')
+        client = self.make_client([[error], [['panels']], [None], [['fresh']]])
+        assert client.call_many(['hacs/repositories/list'],
+                                return_exceptions=True) == [error]
+        client.call('get_panels')
+        client.call('lovelace/dashboards/delete', dashboard_id='d')
+        assert client.call('get_panels') == ['fresh']
+
+
+class RegistryWS:
+    """WebSocket stand-in serving versioned registries and buffered events."""
+
+    def __init__(self, version='2026.10.0'):
+        self.version = version
+        self.batches = []
+        self.events = {}
+        self.registries = {
+            'config/device_registry/list': [{'id': 'd1', 'modified_at': 10.0}],
+            'config/entity_registry/list': [{'entity_id': 'light.a', 'modified_at': 20.0}],
+            'config/area_registry/list': [{'area_id': 'kitchen', 'modified_at': 5.0}],
+        }
+
+    def call_many(self, calls, return_exceptions=False):
+        self.batches.append(list(calls))
+        return [{'version': self.version} if c == 'get_config' else self.registries[c]
+                for c in calls]
+
+    def subscribe_events(self, event_types):
+        self.subscribed = list(event_types)
+        return {event_type: n for n, event_type in enumerate(event_types)}
+
+    def pop_events(self, sub_id):
+        return self.events.pop(sub_id, [])
+
+    def fire(self, event_type):
+        self.events[self.subscribed.index(event_type)] = [{'event_type': event_type}]
+
+
+DEVICES = 'config/device_registry/list'
+ENTITIES = 'config/entity_registry/list'
+AREAS = 'config/area_registry/list'
+
+
+class TestRegistryCache:
+
+    def test_unchanged_registries_cost_only_a_version_check(self, tmp_path):
+        cache = RegistryCache(tmp_path)
+        cache.fetch(RegistryWS(), 'inst', [DEVICES, ENTITIES])
+
+        ws = RegistryWS()
+        result = cache.fetch(ws, 'inst', [DEVICES, ENTITIES])
+        assert result == [ws.registries[DEVICES], ws.registries[ENTITIES]]
+        assert ws.batches == [['get_config']]
+        assert cache.stats['reused'] == 2
+
+    def test_version_change_refetches_everything(self, tmp_path):
+        cache = RegistryCache(tmp_path)
+        cache.fetch(RegistryWS(), 'inst', [DEVICES])
+        ws = RegistryWS(version='2026.11.0')
+        cache.fetch(ws, 'inst', [DEVICES])
+        assert ws.batches == [['get_config'], [DEVICES]]
+
+    def test_registry_event_refetches_only_that_registry(self, tmp_path):
+        cache = RegistryCache(tmp_path)
+        ws = RegistryWS()
+        cache.fetch(ws, 'inst', [DEVICES, ENTITIES])
+        ws.fire('entity_registry_updated')
+        ws.registries[ENTITIES] = [{'entity_id': 'light.b', 'modified_at': 30.0}]
+
+        assert cache.fetch(ws, 'inst', [DEVICES, ENTITIES])[1] == ws.registries[ENTITIES]
+        assert ws.batches[-1] == ['get_config', ENTITIES]
+        assert cache.stats['changed'] == 1
+
+    def test_small_registries_are_revalidated_across_runs(self, tmp_path):
+        cache = RegistryCache(tmp_path)
+        cache.fetch(RegistryWS(), 'inst', [DEVICES, AREAS])
+
+        ws = RegistryWS()
+        ws.registries[AREAS] = [{'area_id': 'garage', 'modified_at': 6.0}]
+        assert cache.fetch(ws, 'inst', [DEVICES, AREAS])[1] == ws.registries[AREAS]
+        assert ws.batches == [['get_config', AREAS]]
+        assert cache.stats['reused'] == 1 and cache.stats['changed'] == 1
+
+    def test_max_age_and_fresh_bypass(self, tmp_path):
+        cache = RegistryCache(tmp_path, max_age=0)
+        cache.fetch(RegistryWS(), 'inst', [DEVICES])
+        ws = RegistryWS()
+        cache.fetch(ws, 'inst', [DEVICES])
+        assert ws.batches == [['get_config', DEVICES]]
+
+        cache = RegistryCache(tmp_path)
+        ws = RegistryWS()
+        cache.fetch(ws, 'inst', [DEVICES], fresh=True)
+        assert ws.batches == [['get_config', DEVICES]]
+
+    def test_registry_mutation_invalidates(self, response_cache):
+        inst = instance_id('ws://hass:8123/api/websocket', TOKEN)
+        response_cache.registries.fetch(RegistryWS(), inst, [DEVICES])
+        from hactl.core.websocket import WebSocketClient
+        client = WebSocketClient('ws://hass:8123/api/websocket', TOKEN)
+        client._call_many = MagicMock(return_value=[None])
+        client.call('config/device_registry/remove_config_entry', device_id='d')
+        assert response_cache.registries.load(inst)['registries'] == {}
+
+
+class TestCli:
+
+    def test_flags_configure_cache(self, mock_env_vars, mock_api_request, tmp_path,
+                                   monkeypatch):
+        monkeypatch.setenv('HACTL_CACHE_DIR', str(tmp_path))
+        runner = CliRunner()
+        try:
+            result = runner.invoke(cli, ['--cache-ttl', '30', 'get', 'states'])
+            assert result.exit_code == 0, result.output
+            assert cache_mod.get_cache().ttl == 30
+
+            monkeypatch.setenv('HACTL_CACHE_TTL', '30')
+            result = runner.invoke(cli, ['--no-cache', 'get', 'states'])
+            assert result.exit_code == 0, result.output
+            assert not cache_mod.get_cache().enabled
+        finally:
+            cache_mod.configure_cache(enabled=False)
@@ -0,0 +1,196 @@
+"""
+Tests for hactl.core.context (per-invocation HassContext)
+"""
+
+from unittest.mock import MagicMock, patch
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from hactl.cli import cli
+from hactl.core.context import (
+    HassContext, cached, cached_call, get_registries, shared_websocket,
+)
+from hactl.core.websocket import WebSocketCallError
+
+URL = 'http://test'
+TOKEN = 'token'
+
+
+class FakeWS:
+    """WebSocketClient stand-in that records its lifecycle."""
+
+    instances = []
+
+    def __init__(self, url, token):
+        self.connected = 0
+        self.closed = 0
+        self.calls = []
+        self.batches = []
+        FakeWS.instances.append(self)
+
+    def connect(self):
+        self.connected += 1
+
+    def close(self):
+        self.closed += 1
+
+    def call(self, message_type, **kwargs):
+        self.calls.append(message_type)
+        return [message_type]
+
+    def call_many(self, calls, return_exceptions=False):
+        self.batches.append(list(calls))
+        results = []
+        for message_type in calls:
+            if message_type == 'config/label_registry/list':
+                results.append(click.ClickException('unknown_command'))
+            else:
+                results.append([message_type])
+        return results
+
+
+@pytest.fixture(autouse=True)
+def reset_fake_ws():
+    FakeWS.instances = []
+
+
+def in_command(hass, func):
+    """Run `func` inside a click context carrying `hass`."""
+    with click.Context(click.Command('x'), obj={'hass': hass}):
+        return func()
+
+
+class TestOutsideCommand:
+
+    def test_cached_always_fetches(self):
+        fetch = MagicMock(return_value=[1])
+        assert cached('k', fetch) == [1]
+        assert cached('k', fetch) == [1]
+        assert fetch.call_count == 2
+
+    def test_shared_websocket_is_private_and_closed(self):
+        with shared_websocket(URL, TOKEN, FakeWS) as ws:
+            assert ws.connected == 1
+        assert ws.closed == 1
+
+
+class TestInsideCommand:
+
+    def test_memo_fetches_once(self):
+        hass = HassContext()
+        fetch = MagicMock(return_value=[1])
+
+        def run():
+            return cached('k', fetch), cached('k', fetch)
+
+        assert in_command(hass, run) == ([1], [1])
+        assert fetch.call_count == 1
+        assert hass.stats == {'fetched': 1, 'shared': 1}
+
+    def test_failed_fetch_is_not_memoized(self):
+        hass = HassContext()
+        fetch = MagicMock(side_effect=[click.ClickException('boom'), [1]])
+
+        def run():
+            with pytest.raises(click.ClickException):
+                cached('k', fetch)
+            return cached('k', fetch)
+
+        assert in_command(hass, run) == [1]
+
+    def test_one_websocket_for_many_calls(self):
+        hass = HassContext()
+
+        def run():
+            cached_call(URL, TOKEN, 'get_panels', FakeWS)
+            cached_call(URL, TOKEN, 'get_panels', FakeWS)
+            cached_call(URL, TOKEN, 'config/area_registry/list', FakeWS)
+
+        in_command(hass, run)
+        assert len(FakeWS.instances) == 1
+        ws = FakeWS.instances[0]
+        assert ws.calls == ['get_panels', 'config/area_registry/list']
+        assert ws.closed == 0
+
+        hass.close()
+        assert ws.closed == 1
+
+    def test_failed_call_keeps_socket_but_dead_one_is_dropped(self):
+        hass = HassContext()
+
+        def fail(error):
+            with pytest.raises(click.ClickException):
+                with shared_websocket(URL, TOKEN, FakeWS):
+                    raise error
+
+        in_command(hass, lambda: fail(WebSocketCallError({'success': False})))
+        assert FakeWS.instances[0].closed == 0
+        # Same wording, but not a call error: the socket is gone
+        in_command(hass, lambda: fail(click.ClickException('WebSocket call failed: x')))
+        assert FakeWS.instances[0].closed == 1
+
+    def test_registries_pipeline_only_missing(self):
+        hass = HassContext()
+
+        def run():
+            get_registries(URL, TOKEN, ['area'], FakeWS)
+            return get_registries(URL, TOKEN, ['device', 'entity', 'area'], FakeWS)
+
+        devices, entities, areas = in_command(hass, run)
+        assert areas == ['config/area_registry/list']
+        assert devices == ['config/device_registry/list']
+        ws = FakeWS.instances[0]
+        assert ws.batches == [
+            ['config/area_registry/list'],
+            ['config/device_registry/list', 'config/entity_registry/list'],
+        ]
+
+    def test_registries_share_memo_with_cached_call(self):
+        hass = HassContext()
+
+        def run():
+            cached_call(URL, TOKEN, 'config/device_registry/list', FakeWS)
+            return get_registries(URL, TOKEN, ['device'], FakeWS)
+
+        in_command(hass, run)
+        assert FakeWS.instances[0].batches == []
+
+    def test_optional_registry_failure_is_empty(self):
+        hass = HassContext()
+        result = in_command(hass, lambda: get_registries(
+            URL, TOKEN, ['device', 'label'], FakeWS, optional=['label']))
+        assert result == [['config/device_registry/list'], []]
+
+    def test_required_registry_failure_raises(self):
+        hass = HassContext()
+        with pytest.raises(click.ClickException):
+            in_command(hass, lambda: get_registries(URL, TOKEN, ['label'], FakeWS))
+
+
+class TestCliIntegration:
+
+    def test_memory_sync_fetches_each_dataset_once(self, mock_env_vars, tmp_path,
+                                                   monkeypatch, mock_states_response):
+        monkeypatch.setattr('hactl.handlers.memory_mgmt.MEMORY_DIR', tmp_path)
+        requested = []
+
+        def fake_request(url, token, method='GET', data=None):
+            requested.append(url)
+            if url.endswith('/api/states'):
+                return mock_states_response
+            return []
+
+        with patch('hactl.handlers.memory_mgmt.make_api_request', fake_request), \
+             patch('hactl.handlers.memory_mgmt.WebSocketClient', FakeWS):
+            result = CliRunner().invoke(cli, ['memory', 'sync'])
+
+        assert result.exit_code == 0, result.output
+        assert requested.count('https://test-hass.example.com/api/states') == 1
+        assert len(requested) == len(set(requested))
+        # One WebSocket (one auth handshake) for the whole command
+        assert len(FakeWS.instances) == 1
+        ws = FakeWS.instances[0]
+        assert len(ws.calls) == len(set(ws.calls))
+        assert ws.closed == 1
@@ -0,0 +1,141 @@
+"""
+Tests for hactl.core.history (parallel chunked history reads)
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import click
+import pytest
+
+from hactl.core import history
+
+URL = 'https://test-hass.example.com'
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def parse(url):
+    parts = urlsplit(url)
+    query = parse_qs(parts.query, keep_blank_values=True)
+    start = datetime.fromisoformat(unquote(parts.path.rsplit('/', 1)[1]))
+    end = datetime.fromisoformat(query['end_time'][0])
+    return start, end, query['filter_entity_id'][0].split(','), query
+
+
+class TestWindows:
+
+    def test_windows_cover_the_range_without_overlap(self):
+        windows = history.history_windows(START, START + timedelta(hours=14), timedelta(hours=6))
+        assert windows == [
+            (START, START + timedelta(hours=6)),
+            (START + timedelta(hours=6), START + timedelta(hours=12)),
+            (START + timedelta(hours=12), START + timedelta(hours=14)),
+        ]
+
+    def test_url_flags(self):
+        url = history.history_url(URL, START, START + timedelta(hours=1), ['a.b', 'c.d'],
+                                  significant_changes_only=False, skip_initial_state=True)
+        start, end, ids, query = parse(url)
+        assert (start, end, ids) == (START, START + timedelta(hours=1), ['a.b', 'c.d'])
+        assert query['significant_changes_only'] == ['0']
+        assert 'skip_initial_state' in query
+
+
+class TestIterHistory:
+
+    def test_every_window_and_batch_is_fetched_concurrently(self, monkeypatch):
+        calls = []
+        active = {'now': 0, 'max': 0}
+        lock = threading.Lock()
+
+        def fake_iter(url, token):
+            start, end, ids, _ = parse(url)
+            with lock:
+                calls.append((start, tuple(ids)))
+                active['now'] += 1
+                active['max'] = max(active['max'], active['now'])
+            time.sleep(0.02)
+            with lock:
+                active['now'] -= 1
+            return iter([[{'entity_id': eid, 'state': str(start.hour)}] for eid in ids])
+
+        monkeypatch.setattr(history, 'iter_api_array', fake_iter)
+        ids = [f'sensor.s{i}' for i in range(5)]
+        results = list(history.iter_history(URL, 'token', ids, START, START + timedelta(hours=12),
+                                            chunk=timedelta(hours=3), batch_size=2, workers=4))
+
+        # 4 windows x 3 batches, one series per entity per window
+        assert len(calls) == 12
+        assert len(results) == 20
+        assert {(w[0].hour, s[0]['entity_id']) for w, s in results} == \
+            {(h, eid) for h in (0, 3, 6, 9) for eid in ids}
+        assert active['max'] > 1
+
+    def test_errors_propagate_and_stop_the_pool(self, monkeypatch):
+        def fake_iter(url, token):
+            if parse(url)[0].hour == 6:
+                raise click.ClickException('API request failed: boom')
+            return iter([[{'entity_id': 'a.b'}]])
+
+        monkeypatch.setattr(history, 'iter_api_array', fake_iter)
+        with pytest.raises(click.ClickException, match='boom'):
+            list(history.iter_history(URL, 'token', ['a.b'], START, START + timedelta(hours=12),
+                                      chunk=timedelta(hours=1)))
+
+    def test_early_exit_does_not_hang(self, monkeypatch):
+        monkeypatch.setattr(history, 'iter_api_array',
+                            lambda url, token: iter([[{'entity_id': 'a.b'}]] * 100))
+        stream = history.iter_history(URL, 'token', ['a.b'], START, START + timedelta(days=2),
+                                      chunk=timedelta(hours=1), workers=2)
+        assert next(stream)[1] == [{'entity_id': 'a.b'}]
+        stream.close()
+        assert not any(t.name.startswith('hactl-history') for t in threading.enumerate())
+
+
+def fake_history(url, token):
+    """Two states per entity per hour, at :10 and :40 (offset per entity)."""
+    start, end, ids, query = parse(url)
+    result = []
+    for offset, entity_id in enumerate(ids):
+        series = []
+        t = start
+        while t < end:
+            for minute in (10 + offset, 40 + offset):
+                ts = (t + timedelta(minutes=minute)).isoformat()
+                series.append({'state': f'{entity_id}@{ts}', 'last_changed': ts})
+            t += timedelta(hours=1)
+        if 'skip_initial_state' not in query:
+            series.insert(0, {'state': 'initial', 'last_changed': start.isoformat()})
+        series[0]['entity_id'] = entity_id
+        result.append(series)
+    return iter(result)
+
+
+class TestIterHistoryMerged:
+
+    def test_one_time_ordered_stream_across_windows_and_batches(self, monkeypatch):
+        monkeypatch.setattr(history, 'iter_api_array', fake_history)
+        ids = ['sensor.a', 'sensor.b', 'sensor.c']
+
+        states = list(history.iter_history_merged(
+            URL, 'token', ids, START, START + timedelta(hours=5),
+            chunk=timedelta(hours=2), workers=3, batch_size=2, minimal_response=True))
+
+        times = [datetime.fromisoformat(s['last_changed']) for s in states]
+        assert times == sorted(times)
+        # 5 hours x 2 states x 3 entities, plus one initial state per entity
+        assert len(states) == 5 * 2 * 3 + 3
+        assert [s['state'] for s in states[:3]] == ['initial'] * 3
+        assert {s['entity_id'] for s in states} == set(ids)
+        assert all(s['entity_id'] in s['state'] for s in states[3:])
+
+    def test_errors_propagate(self, monkeypatch):
+        def failing(url, token):
+            raise click.ClickException('boom')
+
+        monkeypatch.setattr(history, 'iter_api_array', failing)
+        with pytest.raises(click.ClickException, match='boom'):
+            list(history.iter_history_merged(URL, 'token', ['a.b'], START,
+                                             START + timedelta(hours=12)))
@@ -0,0 +1,208 @@
+"""
+Tests for hactl.core.history_store (local incremental history)
+"""
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+
+from hactl.core import history
+from hactl.core.history_store import HistoryStore, decode_state, encode_state
+
+URL = 'https://test-hass.example.com'
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeHistory:
+    """/api/history/period over a fixed timeline, recording the ranges asked for."""
+
+    def __init__(self, timeline):
+        self.timeline = timeline  # entity_id -> [(datetime, state), ...]
+        self.calls = []
+
+    def __call__(self, url, token):
+        parts = urlsplit(url)
+        query = parse_qs(parts.query, keep_blank_values=True)
+        start = datetime.fromisoformat(unquote(parts.path.rsplit('/', 1)[1]))
+        end = datetime.fromisoformat(query['end_time'][0])
+        ids = query['filter_entity_id'][0].split(',')
+        self.calls.append((start, end, tuple(ids)))
+        result = []
+        for entity_id in ids:
+            samples = self.timeline.get(entity_id, [])
+            series = [{'state': s, 'last_changed': t.isoformat()}
+                      for t, s in samples if start <= t < end]
+            before = [s for t, s in samples if t < start]
+            if before and 'skip_initial_state' not in query:
+                series.insert(0, {'state': before[-1], 'last_changed': start.isoformat()})
+            if series:
+                series[0]['entity_id'] = entity_id
+                result.append(series)
+        return iter(result)
+
+
+def hours(n):
+    return START + timedelta(hours=n)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    timeline = {
+        'sensor.temp': [(hours(h), str(20 + h / 2)) for h in range(48)],
+        'binary_sensor.door': [(hours(h), 'off') for h in range(48)] + [(hours(48.5), 'on')],
+    }
+    timeline['binary_sensor.door'].sort()
+    api = FakeHistory(timeline)
+    monkeypatch.setattr(history, 'iter_api_array', api)
+    return api
+
+
+@pytest.fixture
+def store(tmp_path):
+    with HistoryStore(URL, tmp_path / 'history.db') as store:
+        yield store
+
+
+class TestEncoding:
+
+    @pytest.mark.parametrize('state,expected', [
+        ('21.5', (21.5, None)),
+        ('-3', (-3.0, None)),
+        ('1e3', (1000.0, None)),
+        ('on', (None, 'on')),
+        ('nan', (None, 'nan')),
+        ('1_000', (None, '1_000')),
+        ('unavailable', (None, 'unavailable')),
+    ])
+    def test_only_plain_numbers_are_real(self, state, expected):
+        assert encode_state(state) == expected
+
+    def test_round_trip(self):
+        assert decode_state(*encode_state('21')) == '21'
+        assert decode_state(*encode_state('21.25')) == '21.25'
+        assert decode_state(*encode_state('on')) == 'on'
+
+
+class TestSync:
+
+    def test_numbers_stored_as_real_and_repeats_run_length_encoded(self, fake, store):
+        stats = store.sync('token', ['sensor.temp', 'binary_sensor.door'], START, hours(24))
+
+        assert stats['samples'] == 48
+        rows = store.db.execute(
+            'SELECT e.entity_id, typeof(s.value), s.text, s.count FROM samples s '
+            'JOIN entities e ON e.id = s.entity ORDER BY e.entity_id, s.ts').fetchall()
+        door = [r for r in rows if r[0] == 'binary_sensor.door']
+        temp = [r for r in rows if r[0] == 'sensor.temp']
+        assert door == [('binary_sensor.door', 'null', 'off', 24)]
+        assert len(temp) == 24 and all(r[1] == 'real' and r[2] is None for r in temp)
+
+    def test_second_sync_only_fetches_the_gap(self, fake, store):
+        ids = ['sensor.temp', 'binary_sensor.door']
+        store.sync('token', ids, START, hours(24))
+        fake.calls.clear()
+
+        stats = store.sync('token', ids, START, hours(49), chunk=timedelta(hours=48))
+
+        assert fake.calls == [(hours(24), hours(49), tuple(sorted(ids)))]
+        assert stats['samples'] == 24 + 24 + 1
+        # The 'off' run continued across the sync; 'on' opened a new one
+        runs = store.db.execute("SELECT text, count FROM samples WHERE text IS NOT NULL "
+                                "ORDER BY ts").fetchall()
+        assert runs == [('off', 48), ('on', 1)]
+
+        fake.calls.clear()
+        assert store.sync('token', ids, START, hours(49))['gaps'] == 0
+        assert fake.calls == []
+
+    def test_earlier_since_backfills_the_head(self, fake, store):
+        store.sync('token', ['sensor.temp'], hours(12), hours(24))
+        fake.calls.clear()
+
+        store.sync('token', ['sensor.temp'], START, hours(24), chunk=timedelta(hours=48))
+
+        assert fake.calls == [(START, hours(12), ('sensor.temp',))]
+        synced_from, synced_until, rows = store.coverage()['sensor.temp']
+        assert (synced_from, synced_until, rows) == (START, hours(24), 24)
+
+    def test_disjoint_later_sync_fills_the_gap(self, fake, store):
+        store.sync('token', ['sensor.temp'], START, hours(10))
+        fake.calls.clear()
+
+        store.sync('token', ['sensor.temp'], hours(40), hours(48), chunk=timedelta(hours=48))
+
+        # Fetched from where coverage ended, not from the requested start
+        assert fake.calls == [(hours(10), hours(48), ('sensor.temp',))]
+        assert store.coverage()['sensor.temp'] == (START, hours(48), 48)
+        assert store.recent_activity('sensor.temp', hours(1), hours(48), set()) == (
+            True, hours(48))
+
+    def test_disjoint_earlier_sync_fills_the_gap(self, fake, store):
+        store.sync('token', ['sensor.temp'], hours(40), hours(48))
+        fake.calls.clear()
+
+        store.sync('token', ['sensor.temp'], START, hours(10), chunk=timedelta(hours=48))
+
+        assert fake.calls == [(START, hours(40), ('sensor.temp',))]
+        assert store.coverage()['sensor.temp'] == (START, hours(48), 48)
+
+    def test_failed_sync_keeps_no_partial_coverage(self, fake, store, monkeypatch):
+        def failing(url, token):
+            raise RuntimeError('boom')
+
+        monkeypatch.setattr(history, 'iter_api_array', failing)
+        with pytest.raises(RuntimeError):
+            store.sync('token', ['sensor.temp'], START, hours(24))
+        assert store.coverage() == {}
+
+
+class TestQuery:
+
+    def test_ordered_with_state_at_start(self, fake, store):
+        store.sync('token', ['sensor.temp', 'binary_sensor.door'], START, hours(49))
+
+        states = list(store.query(['sensor.temp', 'binary_sensor.door'],
+                                  hours(10.5), hours(12)))
+
+        assert states[:2] == [
+            {'entity_id': 'binary_sensor.door', 'state': 'off',
+             'last_changed': hours(10.5).isoformat()},
+            {'entity_id': 'sensor.temp', 'state': '25', 'last_changed': hours(10.5).isoformat()},
+        ]
+        assert states[2:] == [{'entity_id': 'sensor.temp', 'state': '25.5',
+                               'last_changed': hours(11).isoformat()}]
+
+    def test_recent_activity_within_coverage(self, fake, store):
+        store.sync('token', ['binary_sensor.door'], START, hours(40))
+        dead = {'off', 'unavailable'}
+
+        assert store.recent_activity('binary_sensor.door', hours(1), hours(49), dead) == (
+            False, hours(40))
+        assert store.recent_activity('binary_sensor.door', hours(-1), hours(49), dead) == (
+            False, None)
+        assert store.recent_activity('binary_sensor.door', hours(1), hours(49), {'on'}) == (
+            True, hours(40))
+
+    def test_open_existing_never_creates(self, tmp_path):
+        assert HistoryStore.open_existing(URL, tmp_path / 'missing.db') is None
+        assert not (tmp_path / 'missing.db').exists()
+
+    def test_open_existing_is_read_only(self, fake, tmp_path):
+        path = tmp_path / 'history.db'
+        with HistoryStore(URL, path) as store:
+            store.sync('token', ['binary_sensor.door'], START, hours(40))
+        before = path.read_bytes()
+
+        with HistoryStore.open_existing(URL, path) as reader:
+            assert reader.recent_activity('binary_sensor.door', hours(1), hours(49),
+                                          {'on'}) == (True, hours(40))
+            with pytest.raises(sqlite3.OperationalError):
+                reader.db.execute('DELETE FROM samples')
+        assert path.read_bytes() == before
+
+    def test_open_existing_ignores_foreign_files(self, tmp_path):
+        path = tmp_path / 'other.db'
+        sqlite3.connect(str(path)).close()
+        assert HistoryStore.open_existing(URL, path) is None
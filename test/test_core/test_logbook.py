@@ -0,0 +1,71 @@
+"""
+Tests for hactl.core.logbook streaming aggregation
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import click
+import pytest
+
+from hactl.core.history import parse_time
+from hactl.core.logbook import (
+    ActivityCounts, HourlyHistogram, Matching, everything, in_domain, is_error_like,
+    is_service_call, logbook_url, logbook_window, scan_logbook,
+)
+
+NOW = datetime(2026, 10, 2, 12, 0, tzinfo=timezone.utc)
+
+
+def entries():
+    yield {'when': '2026-10-02T08:15:00+00:00', 'entity_id': 'light.hall', 'name': 'Hall'}
+    yield {'when': '2026-10-02T08:45:00+00:00', 'entity_id': 'automation.wake',
+           'name': 'Wake', 'context': {'event_type': 'call_service'}}
+    yield {'when': '2026-10-02T09:00:00Z', 'entity_id': 'light.hall', 'name': 'Hall'}
+    yield {'when': 'not a time', 'entity_id': 'script.night', 'name': 'Night failed'}
+    yield {'name': 'Home Assistant started'}
+
+
+class TestWindowAndUrl:
+
+    def test_relative_and_absolute_times(self):
+        assert parse_time('90m', NOW) == NOW - timedelta(minutes=90)
+        assert parse_time('2w', NOW) == NOW - timedelta(weeks=2)
+        assert parse_time('2026-10-01T10:00:00+02:00') == datetime(2026, 10, 1, 8, tzinfo=timezone.utc)
+        with pytest.raises(click.BadParameter):
+            parse_time('yesterday')
+
+    def test_window_defaults_to_last_24h(self):
+        assert logbook_window(now=NOW) == (NOW - timedelta(hours=24), NOW)
+        assert logbook_window('7d', '1d', now=NOW) == (NOW - timedelta(days=7), NOW - timedelta(days=1))
+        with pytest.raises(click.BadParameter):
+            logbook_window('1h', '2h', now=NOW)
+
+    def test_filters_go_to_ha(self):
+        url = logbook_url('http://ha', NOW - timedelta(hours=1), NOW, ['light.a', 'light.b'])
+        assert url == ('http://ha/api/logbook/2026-10-02T11%3A00%3A00%2B00%3A00'
+                       '?end_time=2026-10-02T12%3A00%3A00%2B00%3A00&entity=light.a,light.b')
+        assert logbook_url('http://ha', NOW, context_id='01ABC').endswith('?context_id=01ABC')
+        with pytest.raises(click.ClickException):
+            logbook_url('http://ha', NOW, entity_ids=['light.a'], context_id='01ABC')
+
+
+class TestAggregators:
+
+    def test_single_pass_feeds_every_aggregator(self):
+        counts = ActivityCounts()
+        hourly = HourlyHistogram()
+        services = Matching(is_service_call)
+        automations = Matching(in_domain('automation'))
+        errors = Matching(is_error_like, project=lambda e: e['entity_id'])
+        head = Matching(everything, limit=2)
+
+        total = scan_logbook(entries(), counts, hourly, services, automations, errors, head)
+
+        assert total == 5
+        assert counts.most_active(2) == [('light.hall', 2), ('automation.wake', 1)]
+        assert dict(counts.busiest_domains(1)) == {'light': 2}
+        assert counts.entities['unknown'] == 1
+        assert hourly.result() == [{'hour': 8, 'count': 2}, {'hour': 9, 'count': 1}]
+        assert services.count == automations.count == 1
+        assert errors.items == ['script.night']
+        assert head.count == 5 and len(head.items) == 2
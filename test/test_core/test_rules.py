@@ -0,0 +1,138 @@
+"""
+Tests for hactl.core.rules and doctor's compiled entity classification
+"""
+
+import random
+
+import click
+import pytest
+
+from hactl.core.rules import Rule, RuleSet, load_rules
+from hactl.handlers import doctor
+from hactl.handlers.doctor import (
+    AIRPLAY_KEYWORDS, APPLIANCE_KEYWORDS, BUILTIN_RULES, CAMERA_REVIEW_DOMAINS,
+    CAMERA_REVIEW_KEYWORDS, ECHO_KEYWORDS, EXPECTED_UNKNOWN_DOMAINS, MOBILE_KEYWORDS,
+    SOLAR_INVERTER_PREFIXES, UNIFI_KEYWORDS,
+)
+
+
+def legacy_classify(entity_id, state_val):
+    """The keyword-scan classifier the rule engine replaced (reference)."""
+    domain = entity_id.split('.')[0] if '.' in entity_id else ''
+    eid_lower = entity_id.lower()
+    name_part = entity_id.split('.', 1)[1] if '.' in entity_id else entity_id
+    if state_val == 'unknown' and domain in EXPECTED_UNKNOWN_DOMAINS:
+        return 'expected_unknown'
+    if state_val == 'unavailable' and any(kw in eid_lower for kw in MOBILE_KEYWORDS):
+        return 'mobile'
+    if any(kw in eid_lower for kw in APPLIANCE_KEYWORDS):
+        return 'appliance'
+    if state_val == 'unavailable' and any(kw in eid_lower for kw in ECHO_KEYWORDS):
+        return 'echo_alexa'
+    if any(kw in eid_lower for kw in UNIFI_KEYWORDS):
+        return 'unifi_switches'
+    if any(name_part.startswith(prefix) or name_part.startswith(prefix.replace('_', '', 1))
+           for prefix in SOLAR_INVERTER_PREFIXES):
+        return 'solar_inverter'
+    if state_val == 'unavailable' and any(kw in eid_lower for kw in AIRPLAY_KEYWORDS):
+        return 'airplay'
+    if any(kw in eid_lower for kw in CAMERA_REVIEW_KEYWORDS):
+        if 'review_status' in eid_lower or domain in CAMERA_REVIEW_DOMAINS:
+            return 'camera_review'
+    return 'truly_unavailable'
+
+
+def corpus(size, seed=7):
+    """Entity ids mixing every keyword, prefix and domain with filler."""
+    rng = random.Random(seed)
+    fragments = sorted(MOBILE_KEYWORDS | APPLIANCE_KEYWORDS | ECHO_KEYWORDS | UNIFI_KEYWORDS
+                       | AIRPLAY_KEYWORDS | CAMERA_REVIEW_KEYWORDS
+                       | {'Kitchen', 'IPHONE', 'living_room', 'power', 'temp', 'x'})
+    prefixes = sorted(SOLAR_INVERTER_PREFIXES) + ['s1ch', 's2voltage', 'S1_ch', '']
+    domains = sorted(EXPECTED_UNKNOWN_DOMAINS | CAMERA_REVIEW_DOMAINS
+                     | {'sensor', 'binary_sensor', 'switch', 'light', 'media_player'})
+    entities = []
+    for _ in range(size):
+        parts = [rng.choice(prefixes)] + rng.sample(fragments, rng.randint(0, 3))
+        object_id = '_'.join(p for p in parts if p) or 'x'
+        entity_id = object_id if rng.random() < 0.01 else f"{rng.choice(domains)}.{object_id}"
+        entities.append((entity_id, rng.choice(['unavailable', 'unknown'])))
+    return entities
+
+
+@pytest.fixture
+def builtin_only():
+    doctor.configure_rules()
+    yield
+    doctor.configure_rules()
+
+
+class TestParity:
+
+    def test_matches_legacy_classifier(self, builtin_only):
+        for entity_id, state in corpus(20000):
+            assert doctor._classify_entity(entity_id, state) == \
+                legacy_classify(entity_id, state), entity_id
+
+    def test_known_cases(self, builtin_only):
+        assert doctor._classify_entity('button.restart', 'unknown') == 'expected_unknown'
+        assert doctor._classify_entity('sensor.iphone_battery', 'unavailable') == 'mobile'
+        assert doctor._classify_entity('sensor.iphone_battery', 'unknown') == 'truly_unavailable'
+        assert doctor._classify_entity('sensor.s1ch0_power', 'unknown') == 'solar_inverter'
+        assert doctor._classify_entity('image.front_person', 'unknown') == 'camera_review'
+        assert doctor._classify_entity('sensor.front_person', 'unknown') == 'truly_unavailable'
+
+
+class TestRuleSet:
+
+    def test_first_rule_wins_even_when_a_later_keyword_comes_first(self):
+        rules = RuleSet([Rule('late', contains=['zzz']), Rule('early', contains=['aaa'])], 'none')
+        assert rules.classify('sensor.aaa_zzz', 'unknown') == 'late'
+
+    def test_filters_do_not_hide_later_rules_at_the_same_position(self):
+        rules = RuleSet([Rule('only_unknown', contains=['echo'], states=['unknown']),
+                         Rule('any', contains=['echo_dot'])], 'none')
+        assert rules.classify('media_player.echo_dot', 'unavailable') == 'any'
+        assert rules.classify('media_player.echo_dot', 'unknown') == 'only_unknown'
+
+    def test_user_rules_file(self, tmp_path):
+        path = tmp_path / 'rules.yaml'
+        path.write_text(
+            "rules:\n"
+            "  - category: lab_bench\n"
+            "    label: lab bench entities (powered off)\n"
+            "    contains: [bench_]\n"
+            "    states: [unavailable]\n")
+        [rule] = load_rules(path)
+        assert (rule.category, rule.contains, rule.states) == \
+            ('lab_bench', ('bench_',), frozenset(['unavailable']))
+
+        json_path = tmp_path / 'rules.json'
+        json_path.write_text('[{"category": "x", "prefixes": "s9_"}]')
+        assert load_rules(json_path)[0].prefixes == ('s9_',)
+
+    def test_invalid_rules_file(self, tmp_path):
+        path = tmp_path / 'rules.json'
+        path.write_text('{"rules": [{"category": "x", "contain": ["typo"]}]}')
+        with pytest.raises(click.ClickException, match='unknown field'):
+            load_rules(path)
+        path.write_text('{"rules": [{"contains": ["a"]}]}')
+        with pytest.raises(click.ClickException, match="needs a 'category'"):
+            load_rules(path)
+
+
+@pytest.mark.slow
+class TestLargeCorpus:
+    """Parity on the benchmark corpora; timings: test/test_core/bench_rules.py"""
+
+    @pytest.mark.parametrize('hit_rate', ['keyword_heavy', 'typical'])
+    def test_50k_entities_match_legacy(self, builtin_only, hit_rate):
+        entities = corpus(50000, seed=11)
+        if hit_rate == 'typical':
+            # Most unavailable entities on a real install match no rule
+            entities = [(f"sensor.room_{i % 40}_temperature_{i}", 'unavailable')
+                        for i in range(45000)] + entities[:5000]
+        classify = doctor._rules().classify
+
+        assert [classify(e, s) for e, s in entities] == \
+            [legacy_classify(e, s) for e, s in entities]
@@ -0,0 +1,86 @@
+"""
+Tests for hactl.core.sketch (decaying top-k counters)
+"""
+
+import math
+
+import pytest
+
+from hactl.core.sketch import DecayingTopK
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDecayingTopK:
+
+    def test_steady_rate_is_reported_per_second(self):
+        clock = Clock()
+        sketch = DecayingTopK(capacity=8, window=60, clock=clock)
+        # 5 events/s with 100 bytes each for two minutes
+        for _ in range(600):
+            clock.now += 0.2
+            sketch.add('sensor.power', 100)
+
+        [row] = sketch.top(1)
+        assert row['key'] == 'sensor.power'
+        assert row['rate'] == pytest.approx(5, rel=0.02)
+        assert row['bytes_rate'] == pytest.approx(500, rel=0.02)
+        assert row['share'] == pytest.approx(1)
+        assert row['error'] == 0
+
+    def test_warm_up_is_not_diluted_by_the_window(self):
+        clock = Clock()
+        sketch = DecayingTopK(window=60, clock=clock)
+        for _ in range(20):
+            clock.now += 0.1
+            sketch.add('a')
+        # 2 s into a 60 s window: still 10 events/s, not 20/60
+        assert sketch.totals()[0] == pytest.approx(10, rel=0.05)
+
+    def test_old_traffic_decays(self):
+        clock = Clock()
+        sketch = DecayingTopK(window=10, clock=clock)
+        clock.now += 200  # past warm-up
+        for _ in range(100):
+            clock.now += 0.1
+            sketch.add('burst')
+        rate = sketch.top(1)[0]['rate']
+        clock.now += 30
+        assert sketch.top(1)[0]['rate'] == pytest.approx(rate * math.exp(-3), rel=1e-6)
+
+    def test_memory_is_bounded_and_heavy_hitters_survive(self):
+        clock = Clock()
+        sketch = DecayingTopK(capacity=16, window=60, clock=clock)
+        for i in range(5000):
+            clock.now += 0.01
+            sketch.add('sensor.chatty')
+            sketch.add(f'sensor.tail_{i}')
+
+        assert len(sketch) == 16
+        assert sketch.evicted > 4000
+        top = sketch.top(3)
+        assert top[0]['key'] == 'sensor.chatty'
+        assert top[0]['share'] == pytest.approx(0.5, rel=0.01)
+        assert top[1]['error'] > 0
+
+    def test_rebase_keeps_numbers_finite(self):
+        clock = Clock()
+        sketch = DecayingTopK(window=1, clock=clock)
+        for _ in range(200):
+            clock.now += 1
+            sketch.add('a', 10)
+        rate, bytes_rate = sketch.totals()
+        assert math.isfinite(rate) and rate == pytest.approx(1 / (1 - math.exp(-1)), rel=1e-6)
+        assert bytes_rate == pytest.approx(10 * rate)
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            DecayingTopK(capacity=0)
+        with pytest.raises(ValueError):
+            DecayingTopK(window=0)
@@ -0,0 +1,119 @@
+"""
+Tests for hactl.core.statistics (recorder long-term statistics)
+"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+from click.testing import CliRunner
+
+from hactl.cli import cli
+from hactl.core import statistics
+
+URL = 'https://test-hass.example.com'
+START = datetime(2026, 10, 1, tzinfo=timezone.utc)
+# 2026-10-01T00:00:00Z and 01:00 in epoch milliseconds
+T0, T1 = 1790812800000, 1790816400000
+
+
+class FakeClient:
+    """AsyncHassClient stand-in recording the WebSocket calls."""
+
+    ids = []
+    calls = []
+
+    def __init__(self, url, token):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def call(self, message_type, **kwargs):
+        FakeClient.calls.append((message_type, kwargs))
+        if message_type == 'recorder/list_statistic_ids':
+            return [{'statistic_id': sid, 'name': sid, 'statistics_unit_of_measurement': 'kWh'}
+                    for sid in FakeClient.ids]
+        return {sid: [{'start': T0, 'mean': 1.5, 'min': 1.0, 'max': 2.0},
+                      {'start': T1, 'mean': 2.5, 'min': 2.0, 'max': 3.0, 'sum': 7.0}]
+                for sid in kwargs['statistic_ids']}
+
+    async def call_many(self, calls):
+        return [await self.call(message_type, **kwargs) for message_type, kwargs in calls]
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setattr(statistics, 'AsyncHassClient', FakeClient)
+    FakeClient.ids = [f'sensor.meter_{i}_energy' for i in range(250)] + ['sensor.outdoor_temp']
+    FakeClient.calls = []
+    return FakeClient
+
+
+class TestResolve:
+
+    def test_ids_and_globs_in_request_order(self):
+        available = ['sensor.a_energy', 'sensor.b_energy', 'sensor.temp']
+        ids, missing = statistics.resolve_ids(
+            ['sensor.temp', 'sensor.*_energy', 'sensor.a_energy', 'sensor.gone'], available)
+        assert ids == ['sensor.temp', 'sensor.a_energy', 'sensor.b_energy']
+        assert missing == ['sensor.gone']
+
+    def test_columnar_converts_epoch_milliseconds(self):
+        columns = statistics.columnar([{'start': T0, 'mean': 1.5},
+                                       {'start': '2026-10-01T01:00:00+00:00', 'sum': 2}])
+        assert columns == {'start': ['2026-10-01T00:00:00+00:00', '2026-10-01T01:00:00+00:00'],
+                           'mean': [1.5, None], 'min': [None, None], 'max': [None, None],
+                           'sum': [None, 2]}
+
+
+class TestFetch:
+
+    def test_many_statistic_ids_per_call(self, fake_client):
+        meta, rows, missing, calls = statistics.fetch_statistics(
+            URL, 'token', ['sensor.*_energy'], START, period='day', batch_size=100)
+
+        assert len(rows) == 250 and missing == []
+        assert calls == 4
+        periods = [kw for t, kw in fake_client.calls if t == 'recorder/statistics_during_period']
+        assert [len(kw['statistic_ids']) for kw in periods] == [100, 100, 50]
+        assert periods[0]['period'] == 'day'
+        assert periods[0]['types'] == ['mean', 'min', 'max', 'sum']
+        assert 'end_time' not in periods[0]
+
+
+class TestGetStatisticsCommand:
+
+    def test_columnar_json(self, mock_env_vars, fake_client):
+        result = CliRunner().invoke(cli, ['get', 'statistics', '-e', 'sensor.outdoor_temp',
+                                          '--period', 'hour', '--since', '2026-10-01T00:00:00Z',
+                                          '--until', '2026-10-02T00:00:00Z', '--format', 'json'])
+
+        assert result.exit_code == 0, result.output
+        data = json.loads(result.output)
+        assert data['period'] == 'hour'
+        assert data['statistics']['sensor.outdoor_temp'] == {
+            'name': 'sensor.outdoor_temp', 'unit': 'kWh',
+            'start': ['2026-10-01T00:00:00+00:00', '2026-10-01T01:00:00+00:00'],
+            'mean': [1.5, 2.5], 'min': [1.0, 2.0], 'max': [2.0, 3.0], 'sum': [None, 7.0]}
+
+    def test_csv_and_unknown_ids(self, mock_env_vars, fake_client):
+        result = CliRunner().invoke(
+            cli, ['get', 'statistics', '-e', 'sensor.outdoor_temp,sensor.nope',
+                  '--format', 'csv'])
+
+        assert result.exit_code == 0, result.output
+        lines = result.output.splitlines()
+        assert lines[-3:] == [
+            'statistic_id,start,mean,min,max,sum',
+            'sensor.outdoor_temp,2026-10-01T00:00:00+00:00,1.5,1.0,2.0,',
+            'sensor.outdoor_temp,2026-10-01T01:00:00+00:00,2.5,2.0,3.0,7.0',
+        ]
+        assert 'No long-term statistics for: sensor.nope' in lines[0]
+
+    def test_csv_needs_entities(self, mock_env_vars):
+        result = CliRunner().invoke(cli, ['get', 'statistics', '--format', 'csv'])
+        assert result.exit_code != 0
@@ -0,0 +1,317 @@
+"""
+Tests for the WebSocket frame codec in hactl.core.websocket
+
+A fake socket feeds server bytes in arbitrary segment sizes, so frame
+headers and payloads regularly straddle `recv_into` boundaries.
+"""
+
+import json
+import os
+import socket
+import struct
+
+import click
+import pytest
+
+from hactl.core import deadline, websocket as ws_mod
+from hactl.core.websocket import (
+    EntityMirror, WebSocketCallError, WebSocketClient, decode_compressed_state, encode_frame,
+    mask_payload, OP_TEXT, OP_BINARY, OP_CONTINUATION, OP_PING, OP_PONG, OP_CLOSE,
+)
+
+
+class FakeSocket:
+    """Socket stand-in that returns `data` at most `segment` bytes at a time."""
+
+    def __init__(self, data=b'', segment=1 << 20):
+        self.data = bytearray(data)
+        self.segment = segment
+        self.sent = bytearray()
+
+    def recv_into(self, view):
+        count = min(len(view), self.segment, len(self.data))
+        view[:count] = self.data[:count]
+        del self.data[:count]
+        return count
+
+    def sendall(self, data):
+        self.sent.extend(data)
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def close(self):
+        pass
+
+
+def server_frame(payload, opcode=OP_TEXT, fin=True):
+    """Unmasked server-to-client frame."""
+    return encode_frame(payload, opcode, fin=fin, mask=False)
+
+
+def decode_client_frame(raw):
+    """Decode one masked client frame -> (fin, opcode, payload, rest)."""
+    b1, b2 = raw[0], raw[1]
+    assert b2 & 0x80, 'client frames must be masked'
+    length, pos = b2 & 0x7F, 2
+    if length == 126:
+        length, pos = struct.unpack('>H', raw[2:4])[0], 4
+    elif length == 127:
+        length, pos = struct.unpack('>Q', raw[2:10])[0], 10
+    mask = bytes(raw[pos:pos + 4])
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(raw[pos + 4:pos + 4 + length]))
+    return bool(b1 & 0x80), b1 & 0x0F, payload, raw[pos + 4 + length:]
+
+
+def client_for(data, segment=1 << 20):
+    client = WebSocketClient('http://test', 'token')
+    client.sock = FakeSocket(data, segment)
+    return client
+
+
+class TestMasking:
+
+    @pytest.mark.parametrize('length', [0, 1, 3, 4, 5, 125, 126, 65535, 65536, 100003])
+    def test_matches_bytewise_reference(self, length):
+        data = os.urandom(length)
+        mask = os.urandom(4)
+        expected = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+        assert mask_payload(data, mask) == expected
+        assert mask_payload(expected, mask) == data
+
+    @pytest.mark.parametrize('length', [5, 200, 70000])
+    def test_encode_frame_roundtrip(self, length):
+        payload = os.urandom(length)
+        fin, opcode, decoded, rest = decode_client_frame(encode_frame(payload, OP_BINARY))
+        assert (fin, opcode, decoded, rest) == (True, OP_BINARY, payload, b'')
+
+
+class TestFrameReader:
+
+    @pytest.mark.parametrize('segment', [1, 3, 1000, 1 << 20])
+    @pytest.mark.parametrize('length', [10, 300, 70000, 3 * ws_mod.RECV_BUFFER_SIZE])
+    def test_frames_across_segment_boundaries(self, segment, length):
+        first = os.urandom(length)
+        second = b'{"id": 2}'
+        client = client_for(server_frame(first, OP_BINARY) + server_frame(second), segment)
+
+        assert client.recv_frame() == (OP_BINARY, first)
+        assert client.recv_frame() == (OP_TEXT, second)
+
+    def test_masked_server_frame_is_unmasked(self):
+        client = client_for(encode_frame(b'{"a": 1}', OP_TEXT, mask=True))
+        assert client.recv_json() == {'a': 1}
+
+    def test_fragmented_message_is_reassembled(self):
+        message = json.dumps({'id': 7, 'result': list(range(5000))}).encode()
+        parts = [message[:10], message[10:20000], message[20000:]]
+        data = (server_frame(parts[0], OP_TEXT, fin=False)
+                + server_frame(parts[1], OP_CONTINUATION, fin=False)
+                + server_frame(b'hb', OP_PING)
+                + server_frame(parts[2], OP_CONTINUATION, fin=True))
+        client = client_for(data, segment=777)
+
+        assert client.recv_json() == json.loads(message)
+        fin, opcode, payload, _rest = decode_client_frame(client.sock.sent)
+        assert (fin, opcode, payload) == (True, OP_PONG, b'hb')
+
+    def test_orphan_continuation_raises(self):
+        client = client_for(server_frame(b'x', OP_CONTINUATION))
+        with pytest.raises(click.ClickException):
+            client.recv_frame()
+
+    def test_close_frame_raises_in_recv_json(self):
+        client = client_for(server_frame(b'', OP_CLOSE))
+        with pytest.raises(click.ClickException, match='closed by server'):
+            client.recv_json()
+
+    def test_truncated_frame_raises(self):
+        client = client_for(server_frame(os.urandom(500))[:100])
+        with pytest.raises(click.ClickException, match='closed unexpectedly'):
+            client.recv_frame()
+
+    def test_call_skips_unrelated_messages(self):
+        data = (server_frame(b'{"id": 99, "type": "event"}')
+                + server_frame(b'{"id": 2, "type": "result", "success": true, "result": [1]}'))
+        client = client_for(data, segment=5)
+
+        assert client.call('config/entity_registry/list') == [1]
+        _fin, _op, payload, _rest = decode_client_frame(client.sock.sent)
+        assert json.loads(payload) == {'id': 2, 'type': 'config/entity_registry/list'}
+
+
+class TestHandshake:
+
+    def test_frame_in_same_segment_as_headers_is_kept(self, monkeypatch):
+        response = (b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n\r\n'
+                    + server_frame(b'{"type": "auth_required"}')
+                    + server_frame(b'{"type": "auth_ok"}'))
+        sock = FakeSocket(response)
+        monkeypatch.setattr(ws_mod.socket, 'create_connection',
+                            lambda addr, timeout=None: sock)
+
+        client = WebSocketClient('http://test', 'token')
+        client.connect()
+
+        request, _, frame = bytes(sock.sent).partition(b'\r\n\r\n')
+        assert request.startswith(b'GET /api/websocket HTTP/1.1')
+        _fin, _op, payload, _rest = decode_client_frame(frame)
+        assert json.loads(payload) == {'type': 'auth', 'access_token': 'token'}
+
+
+class TestPipelining:
+
+    @staticmethod
+    def result(req_id, result=None, success=True):
+        return server_frame(json.dumps({
+            'id': req_id, 'type': 'result', 'success': success,
+            'result': result}).encode())
+
+    def test_call_many_sends_everything_before_reading(self):
+        # Replies arrive out of order, with an event interleaved
+        data = (self.result(4, ['labels'])
+                + server_frame(b'{"id": 1, "type": "event", "event": {}}')
+                + self.result(2, ['devices'])
+                + self.result(3, ['entities']))
+        client = client_for(data, segment=9)
+
+        devices, entities, labels = client.call_many([
+            'config/device_registry/list',
+            ('config/entity_registry/list', {}),
+            ('config/label_registry/list', {'x': 1}),
+        ])
+
+        assert (devices, entities, labels) == (['devices'], ['entities'], ['labels'])
+        sent = []
+        rest = bytes(client.sock.sent)
+        while rest:
+            _fin, _op, payload, rest = decode_client_frame(rest)
+            sent.append(json.loads(payload))
+        assert [m['id'] for m in sent] == [2, 3, 4]
+        assert sent[2] == {'id': 4, 'type': 'config/label_registry/list', 'x': 1}
+
+    def test_return_exceptions_keeps_other_results(self):
+        data = self.result(3, success=False) + self.result(2, [1])
+        client = client_for(data)
+
+        first, second = client.call_many(['a', 'b'], return_exceptions=True)
+
+        assert first == [1]
+        assert isinstance(second, WebSocketCallError)
+
+    def test_failure_raises_by_default(self):
+        client = client_for(self.result(2, success=False) + self.result(3, [1]))
+        with pytest.raises(WebSocketCallError, match='WebSocket call failed'):
+            client.call_many(['a', 'b'])
+
+    def test_send_gather_buffers_early_results(self):
+        client = client_for(self.result(2, 'a') + self.result(3, 'b'))
+        first = client.send('a')
+        second = client.send('b')
+
+        assert client.gather([second]) == ['b']
+        assert client.gather([first]) == ['a']
+
+    def test_subscription_events_are_buffered_while_gathering(self):
+        event = server_frame(json.dumps({
+            'id': 2, 'type': 'event',
+            'event': {'event_type': 'entity_registry_updated'}}).encode())
+        client = client_for(self.result(2) + event + self.result(3, ['x']))
+        subs = client.subscribe_events(['entity_registry_updated'])
+
+        assert client.call('a') == ['x']
+        assert client.pop_events(subs['entity_registry_updated']) == [
+            {'event_type': 'entity_registry_updated'}]
+        assert client.pop_events(subs['entity_registry_updated']) == []
+
+
+class TestTimeouts:
+
+    def test_silent_server_times_out(self):
+        class SilentSocket(FakeSocket):
+            def recv_into(self, view):
+                raise socket.timeout('timed out')
+
+        client = WebSocketClient('http://test', 'token')
+        client.sock = SilentSocket()
+        with pytest.raises(click.ClickException, match='timed out: get_config'):
+            client.call('get_config')
+        assert client.sock.timeout == deadline.DEFAULT_TIMEOUT
+
+    def test_call_latency_is_recorded(self):
+        deadline.reset()
+        client = client_for(server_frame(b'{"id": 2, "type": "result", "success": true}'))
+        client.call('get_config')
+        assert deadline.latency_stats()['WS get_config']['count'] == 1
+        deadline.reset()
+
+
+class TestEntityMirror:
+    """subscribe_entities compressed protocol, as the HA frontend applies it."""
+
+    SNAPSHOT = {'a': {
+        'light.kitchen': {'s': 'on', 'a': {'brightness': 200, 'friendly_name': 'Kitchen'},
+                          'c': '01HCTX', 'lc': 1767225600.5},
+        'sensor.temp': {'s': '21.5', 'a': {}, 'c': {'id': 'c2', 'parent_id': None,
+                                                     'user_id': 'u1'},
+                        'lc': 1767225600.0, 'lu': 1767225630.0},
+    }}
+
+    def test_decode_expands_fields_and_timestamps(self):
+        state = decode_compressed_state('light.kitchen', self.SNAPSHOT['a']['light.kitchen'])
+        assert state == {
+            'entity_id': 'light.kitchen',
+            'state': 'on',
+            'attributes': {'brightness': 200, 'friendly_name': 'Kitchen'},
+            'last_changed': '2026-01-01T00:00:00.500000+00:00',
+            # lu omitted: same as last_changed
+            'last_updated': '2026-01-01T00:00:00.500000+00:00',
+            'context': {'id': '01HCTX', 'parent_id': None, 'user_id': None},
+        }
+
+    def test_snapshot_matches_decoder(self):
+        mirror = EntityMirror()
+        assert mirror.apply(self.SNAPSHOT) == {'light.kitchen', 'sensor.temp'}
+        for entity_id, compressed in self.SNAPSHOT['a'].items():
+            assert mirror.state(entity_id) == decode_compressed_state(entity_id, compressed)
+        assert mirror.state('sensor.temp')['context']['user_id'] == 'u1'
+
+    def test_diff_patches_in_place(self):
+        mirror = EntityMirror()
+        mirror.apply(self.SNAPSHOT)
+        touched = mirror.apply({'c': {
+            'light.kitchen': {'+': {'s': 'off', 'a': {'color_mode': 'onoff'}, 'c': 'NEW',
+                                    'lc': 1767225700.0},
+                              '-': {'a': ['brightness']}},
+            'sensor.temp': {'+': {'lu': 1767225760.0}},
+        }})
+
+        assert touched == {'light.kitchen', 'sensor.temp'}
+        light = mirror.state('light.kitchen')
+        assert light['state'] == 'off'
+        assert light['attributes'] == {'friendly_name': 'Kitchen', 'color_mode': 'onoff'}
+        assert light['context'] == {'id': 'NEW', 'parent_id': None, 'user_id': None}
+        # A new lc moves both timestamps
+        assert light['last_changed'] == light['last_updated'] == '2026-01-01T00:01:40+00:00'
+
+        temp = mirror.state('sensor.temp')
+        assert temp['state'] == '21.5'
+        assert temp['last_changed'] == '2026-01-01T00:00:00+00:00'
+        assert temp['last_updated'] == '2026-01-01T00:02:40+00:00'
+        # Partial context keeps the other fields
+        assert temp['context']['user_id'] == 'u1'
+
+    def test_remove_and_unknown_diff(self):
+        mirror = EntityMirror()
+        mirror.apply(self.SNAPSHOT)
+        touched = mirror.apply({'r': ['sensor.temp', 'sensor.never'],
+                                'c': {'sensor.ghost': {'+': {'s': '1'}}}})
+        assert touched == {'sensor.temp'}
+        assert mirror.entity_ids() == ['light.kitchen']
+        assert mirror.state('sensor.ghost') is None
+
+    def test_returned_states_are_copies(self):
+        mirror = EntityMirror()
+        mirror.apply(self.SNAPSHOT)
+        mirror.state('light.kitchen')['attributes']['brightness'] = 1
+        assert mirror.state('light.kitchen')['attributes']['brightness'] == 200
@@ -0,0 +1,206 @@
+"""
+Tests for the incremental doctor --watch state (hactl.handlers.doctor_watch)
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from click.testing import CliRunner
+
+from hactl.cli import cli
+from hactl.handlers import doctor, doctor_watch
+from hactl.handlers.doctor_watch import DoctorState
+
+NOW = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def state(entity_id, value, age=timedelta(minutes=5), **attributes):
+    ts = (NOW - age).isoformat()
+    return {'entity_id': entity_id, 'state': value, 'attributes': attributes,
+            'last_changed': ts, 'last_updated': ts}
+
+
+def changed(entity_id, value, at=NOW, **attributes):
+    new = {'entity_id': entity_id, 'state': value, 'attributes': attributes,
+           'last_changed': at.isoformat(), 'last_updated': at.isoformat()}
+    return {'entity_id': entity_id, 'new_state': new}
+
+
+@pytest.fixture
+def registries():
+    devices = [{'id': 'dev_plug', 'name': 'Plug'}, {'id': 'dev_empty', 'name': 'Empty'}]
+    entities = [{'entity_id': 'switch.plug', 'device_id': 'dev_plug'},
+                {'entity_id': 'sensor.plug_power', 'device_id': 'dev_plug'}]
+    return devices, entities
+
+
+@pytest.fixture
+def states():
+    return [
+        state('switch.plug', 'on'),
+        state('sensor.plug_power', '12'),
+        state('sensor.door_battery', '80', device_class='battery'),
+        state('sensor.hall_temp', '21', age=timedelta(days=3)),
+        state('sensor.iphone_battery_state', 'unavailable'),
+        state('button.restart', 'unknown'),
+    ]
+
+
+@pytest.fixture
+def rules():
+    doctor.configure_rules()
+    return doctor._rules()
+
+
+def items(records):
+    return [r for r in records if 'entity_id' in r or 'device_id' in r]
+
+
+class TestDoctorState:
+
+    def test_initial_status_matches_full_checks(self, rules, states, registries):
+        watch = DoctorState(rules=rules)
+        records = watch.load(states, registries, now=NOW)
+
+        assert [r['check'] for r in records] == list(doctor_watch.WATCH_CHECKS)
+        assert all(r['from'] is None for r in records)
+        assert watch.status == {
+            'unavailable': doctor.check_unavailable(states)['status'],
+            'batteries': doctor.check_batteries(states)['status'],
+            'stale': doctor.check_stale(states)['status'],
+            'zombie_devices': doctor.check_zombie_devices(states, registries)['status'],
+        }
+        assert watch.counts['unavailable'] == {'mobile': 1, 'expected_unknown': 1}
+        assert watch.counts['zombie_devices'] == {'orphans': 1}
+
+    def test_only_transitions_are_reported(self, rules, states, registries):
+        watch = DoctorState(rules=rules)
+        watch.load(states, registries, now=NOW)
+
+        assert watch.apply_state_changed(changed('sensor.plug_power', '13'), now=NOW) == []
+
+        records = watch.apply_state_changed(
+            changed('sensor.door_battery', '9', device_class='battery'), now=NOW)
+        assert items(records) == [{'ts': NOW.isoformat(), 'check': 'batteries',
+                                   'entity_id': 'sensor.door_battery',
+                                   'from': 'ok', 'to': 'critical', 'level': 9.0}]
+        assert records[-1]['check'] == 'batteries'
+        assert (records[-1]['from'], records[-1]['to']) == ('ok', 'critical')
+
+    def test_device_goes_stalled_and_recovers(self, rules, states, registries):
+        watch = DoctorState(checks=['unavailable', 'zombie_devices'], rules=rules)
+        watch.load(states, registries, now=NOW)
+
+        watch.apply_state_changed(changed('switch.plug', 'unavailable'), now=NOW)
+        records = watch.apply_state_changed(changed('sensor.plug_power', 'unavailable'), now=NOW)
+        transitions = {(r['check'], r.get('entity_id') or r.get('device_id')): r['to']
+                       for r in items(records)}
+        assert transitions == {('unavailable', 'sensor.plug_power'): 'truly_unavailable',
+                               ('zombie_devices', 'dev_plug'): 'stalled'}
+        assert watch.status['unavailable'] == 'warning'
+
+        records = watch.apply_state_changed(changed('switch.plug', 'off'), now=NOW)
+        assert {'check': 'zombie_devices', 'device_id': 'dev_plug', 'from': 'stalled',
+                'to': 'ok', 'ts': NOW.isoformat()} in records
+
+    def test_stale_events_before_snapshot_are_ignored(self, rules, states, registries):
+        watch = DoctorState(rules=rules)
+        watch.load(states, registries, now=NOW)
+        old = changed('sensor.door_battery', '5', at=NOW - timedelta(hours=1),
+                      device_class='battery')
+        assert watch.apply_state_changed(old, now=NOW) == []
+
+    def test_registry_update_rechecks_changed_records(self, rules, states, registries):
+        watch = DoctorState(checks=['zombie_devices'], rules=rules)
+        watch.load(states, registries, now=NOW)
+        devices, entities = registries
+        entities = entities + [{'entity_id': 'sensor.hall_temp', 'device_id': 'dev_empty'}]
+
+        records = watch.apply_registries(devices, entities, now=NOW)
+
+        assert items(records)[0]['device_id'] == 'dev_empty'
+        assert (items(records)[0]['from'], items(records)[0]['to']) == ('orphans', 'ok')
+        assert watch.status['zombie_devices'] == 'ok'
+
+    def test_sweep_picks_up_time_based_conditions(self, rules, states, registries):
+        watch = DoctorState(checks=['stale', 'zombie_devices'], rules=rules)
+        watch.load(states, registries, now=NOW)
+        watch.apply_state_changed(changed('switch.plug', 'unavailable'), now=NOW)
+
+        later = NOW + timedelta(days=1, minutes=30)
+        records = watch.sweep(now=later)
+        transitions = {(r['check'], r['entity_id']): r['to'] for r in items(records)}
+        assert transitions[('stale', 'sensor.door_battery')] == 'stale'
+        assert transitions[('zombie_devices', 'switch.plug')] == 'unavailable_entities'
+
+
+class FakeSubscription:
+    def __init__(self, events):
+        self.events = list(events)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.events:
+            return self.events.pop(0)
+        await asyncio.sleep(3600)
+
+
+class FakeClient:
+    """AsyncHassClient stand-in: one snapshot, then scripted state changes."""
+
+    states = []
+    events = []
+    subscribed = []
+
+    def __init__(self, url, token):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def call(self, message_type):
+        assert message_type == 'get_states'
+        return FakeClient.states
+
+    async def call_many(self, calls):
+        return [[], []]
+
+    async def subscribe(self, message_type, event_type):
+        FakeClient.subscribed.append(event_type)
+        return FakeSubscription(FakeClient.events if event_type == 'state_changed' else [])
+
+
+class TestDoctorWatchCommand:
+
+    def test_streams_ndjson_transitions(self, mock_env_vars, monkeypatch, states):
+        monkeypatch.setattr(doctor_watch, 'AsyncHassClient', FakeClient)
+        FakeClient.states = states
+        FakeClient.subscribed = []
+        FakeClient.events = [
+            {'event_type': 'state_changed', 'data': changed(
+                'sensor.door_battery', '20', at=datetime.now(timezone.utc),
+                device_class='battery')},
+        ]
+
+        result = CliRunner().invoke(cli, ['doctor', '--watch', '--check', 'batteries',
+                                          '--duration', '0.2'])
+
+        assert result.exit_code == 0, result.output
+        lines = [json.loads(line) for line in result.output.splitlines()]
+        assert [(r['from'], r['to']) for r in lines] == [
+            (None, 'ok'), ('ok', 'warning'), ('ok', 'warning')]
+        assert lines[1]['entity_id'] == 'sensor.door_battery'
+        assert lines[2]['counts'] == {'warning': 1}
+        assert FakeClient.subscribed == ['state_changed']
+
+    def test_rejects_checks_that_need_a_full_run(self, mock_env_vars):
+        result = CliRunner().invoke(cli, ['doctor', '--watch', '--check', 'api'])
+        assert result.exit_code != 0
+        assert 'per-entity checks' in result.output
@@ -0,0 +1,95 @@
+"""
+Tests for the recorder write-cost profiler (hactl get recorder-cost)
+"""
+
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from click.testing import CliRunner
+
+from hactl.cli import cli
+from hactl.core import history
+from hactl.handlers import recorder_cost
+from hactl.handlers.recorder_cost import RecorderCost, STATE_ROW_BYTES
+
+
+def series(entity_id, states, attributes=None):
+    return [{'entity_id': entity_id, 'state': s, 'attributes': (attributes or {})}
+            for s in states]
+
+
+class TestRecorderCost:
+
+    def test_unchanged_attributes_are_written_once_per_series(self):
+        cost = RecorderCost({'sensor.power': 'shelly'})
+        cost.add_series(series('sensor.power', ['1', '2', '3'], {'unit': 'W'}))
+        cost.report(seconds=3600)
+        writes, attr_writes, state_bytes, attr_bytes = cost.entities['sensor.power']
+        assert (writes, attr_writes) == (3, 1)
+        assert state_bytes == 3 * (STATE_ROW_BYTES + 1)
+
+    def test_attributes_carry_across_windows_in_any_order(self):
+        cost = RecorderCost()
+        windows = [(0, 1), (1, 2), (2, 3)]
+        attrs = [{'unit': 'W'}, {'unit': 'W'}, {'unit': 'kW'}]
+        for window, attributes in reversed(list(zip(windows, attrs))):
+            cost.add_series(series('sensor.power', ['1', '2'], attributes), window)
+        cost.report(seconds=3600)
+        writes, attr_writes, _, _ = cost.entities['sensor.power']
+        # Only the first window and the switch to kW wrote attributes
+        assert (writes, attr_writes) == (6, 2)
+
+    def test_report_ranks_and_suggests_exclusions(self):
+        cost = RecorderCost({'sensor.power': 'shelly', 'light.hall': 'hue'})
+        for _ in range(10):
+            cost.add_series(series('sensor.power', ['1', '2'], {'big': 'x' * 500}))
+        cost.add_series(series('light.hall', ['on']))
+        report = cost.report(seconds=43200, threshold=0.1)
+
+        assert [r['entity_id'] for r in report['top_entities']] == ['sensor.power', 'light.hall']
+        power = report['top_entities'][0]
+        assert power['writes_per_day'] == 40.0
+        assert power['integration'] == 'shelly'
+        assert report['top_integrations'][0]['integration'] == 'shelly'
+        assert report['exclude_entities'] == ['sensor.power']
+        assert recorder_cost.exclude_snippet(report['exclude_entities']).endswith(
+            'entities:\n      - sensor.power')
+
+
+class TestRecorderCostCommand:
+
+    def test_history_is_folded_from_all_chunks(self, mock_env_vars, mock_api_request, monkeypatch):
+        requested = []
+
+        def fake_history(url, token):
+            query = parse_qs(urlsplit(url).query, keep_blank_values=True)
+            ids = query['filter_entity_id'][0].split(',')
+            requested.append(ids)
+            return iter([series(eid, ['a', 'b']) for eid in ids])
+
+        monkeypatch.setattr(history, 'iter_api_array', fake_history)
+        monkeypatch.setattr(recorder_cost, 'get_registries',
+                            lambda *a, **kw: [[{'entity_id': 'sensor.temperature',
+                                                'platform': 'mqtt'}]])
+        result = CliRunner().invoke(cli, ['get', 'recorder-cost', '--days', '2',
+                                          '--chunk-hours', '12', '--format', 'json'])
+        assert result.exit_code == 0, result.output
+        report = json.loads(result.output)
+
+        # 4 half-day windows over every entity from /api/states
+        assert len(requested) == 4
+        assert report['samples'] == 4 * 2 * len(requested[0])
+        assert report['source'] == 'history of the last 2 day(s)'
+        temperature = next(r for r in report['top_entities']
+                           if r['entity_id'] == 'sensor.temperature')
+        assert temperature['integration'] == 'mqtt'
+        assert temperature['writes_per_day'] == 4.0  # 8 rows over 2 days
+
+    def test_table_output(self, mock_env_vars, mock_api_request, monkeypatch):
+        monkeypatch.setattr(history, 'iter_api_array',
+                            lambda url, token: iter([series('sensor.temperature', ['1'] * 50)]))
+        monkeypatch.setattr(recorder_cost, 'get_registries', lambda *a, **kw: [[]])
+        result = CliRunner().invoke(cli, ['get', 'recorder-cost'])
+        assert result.exit_code == 0, result.output
+        assert 'Recorder Write Cost' in result.output
+        assert '  exclude:\n    entities:\n      - sensor.temperature' in result.output
@@ -0,0 +1,112 @@
+"""
+Tests for the integration startup profile (hactl get startup-profile)
+"""
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from hactl.cli import cli
+from hactl.handlers import startup_profile
+
+TIMINGS = [
+    {'domain': 'zha', 'seconds': 12.5},
+    {'domain': 'hue', 'seconds': 2.0},
+    {'domain': 'mqtt', 'seconds': 0.5},
+]
+
+ENTRIES = [
+    {'entry_id': '1', 'domain': 'zha', 'title': 'Zigbee', 'state': 'loaded'},
+    {'entry_id': '2', 'domain': 'hue', 'title': 'Bridge A', 'state': 'loaded'},
+    {'entry_id': '3', 'domain': 'hue', 'title': 'Bridge B', 'state': 'setup_retry'},
+]
+
+
+class FakeWebSocket:
+    def __init__(self, url, token):
+        pass
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def call(self, message_type):
+        assert message_type == 'integration/setup_info'
+        return TIMINGS
+
+
+@pytest.fixture
+def fake_hass(monkeypatch):
+    def request(url, token, method='GET', data=None):
+        if url.endswith('/api/config/config_entries/entry'):
+            return ENTRIES
+        if url.endswith('/api/config'):
+            return {'version': '2026.10.1'}
+        raise AssertionError(url)
+
+    monkeypatch.setattr(startup_profile, 'WebSocketClient', FakeWebSocket)
+    monkeypatch.setattr(startup_profile, 'make_api_request', request)
+
+
+class TestProfile:
+
+    def test_join_and_rank(self):
+        rows = startup_profile.build_profile({'hue': 2.0, 'zha': 12.5}, ENTRIES)
+        assert [r['domain'] for r in rows] == ['zha', 'hue']
+        assert rows[1]['entries'] == 2
+        assert rows[1]['not_loaded'] == ['Bridge B: setup_retry']
+        assert rows[0]['share'] == pytest.approx(12.5 / 14.5, abs=1e-4)
+
+    def test_compare_flags_regressions_above_both_thresholds(self):
+        rows = startup_profile.build_profile(
+            {'zha': 12.5, 'hue': 2.0, 'mqtt': 0.9, 'new_one': 1.0}, [])
+        removed = startup_profile.compare_baseline(
+            rows, {'timings': {'zha': 5.0, 'hue': 5.0, 'mqtt': 0.2, 'gone': 1.0}})
+        change = {r['domain']: r['change'] for r in rows}
+        # mqtt is 4.5x slower but only by 0.7s: noise, not a regression
+        assert change == {'zha': 'regression', 'hue': 'improved', 'mqtt': 'same',
+                          'new_one': 'new'}
+        assert removed == ['gone']
+
+
+class TestStartupProfileCommand:
+
+    def test_table(self, mock_env_vars, fake_hass):
+        result = CliRunner().invoke(cli, ['get', 'startup-profile'])
+        assert result.exit_code == 0, result.output
+        lines = result.output.splitlines()
+        zha = next(i for i, l in enumerate(lines) if l.startswith('zha '))
+        hue = next(i for i, l in enumerate(lines) if l.startswith('hue '))
+        assert zha < hue
+        assert '! Bridge B: setup_retry' in result.output
+
+    def test_baseline_round_trip(self, mock_env_vars, fake_hass, tmp_path, monkeypatch):
+        path = tmp_path / 'baseline.json'
+        result = CliRunner().invoke(cli, ['get', 'startup-profile', '--save-baseline', str(path)])
+        assert result.exit_code == 0, result.output
+        saved = json.loads(path.read_text())
+        assert saved['ha_version'] == '2026.10.1'
+        assert saved['timings'] == {'hue': 2.0, 'mqtt': 0.5, 'zha': 12.5}
+
+        monkeypatch.setattr(FakeWebSocket, 'call', lambda self, t: [
+            {'domain': 'zha', 'seconds': 30.0}, {'domain': 'hue', 'seconds': 2.1}])
+        result = CliRunner().invoke(cli, ['get', 'startup-profile', '--baseline', str(path),
+                                          '--format', 'json'])
+        assert result.exit_code == 0, result.output
+        data = json.loads(result.output)
+        assert data['baseline']['regressions'] == ['zha']
+        assert data['baseline']['removed'] == ['mqtt']
+        assert data['profile'][0]['delta'] == 17.5
+
+        result = CliRunner().invoke(cli, ['get', 'startup-profile', '--baseline', str(path)])
+        assert '1 regression(s): zha' in result.output
+
+    def test_bad_baseline(self, mock_env_vars, fake_hass, tmp_path):
+        path = tmp_path / 'nope.json'
+        path.write_text('[]')
+        result = CliRunner().invoke(cli, ['get', 'startup-profile', '--baseline', str(path)])
+        assert result.exit_code == 1
+        assert 'not a startup-profile baseline' in result.output
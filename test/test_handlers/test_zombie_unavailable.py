@@ -293,8 +293,8 @@ def patch_delete_env(monkeypatch, delete_registries, tmp_path):
     # predicate to trip in these tests, not the existing recent-activity
     # one.
     monkeypatch.setattr(
-        'hactl.handlers.deletions._has_recent_activity_for_entity',
-        lambda *a, **kw: False)
+        'hactl.handlers.deletions._recent_activity',
+        lambda *a, **kw: (set(), set(), 0, 0))
     return {'fake_ws': fake_ws, 'registries': delete_registries}
 
 